@@ -0,0 +1,98 @@
+"""
+_common.py — Shared helpers for the StudyForge database benchmarks.
+
+Benchmarks import an app's modules (`database`, `srs_engine`) directly, the
+same way main.py does, but point DB_PATH at a scratch file so the user's
+real database is never touched.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APPS = ("study_app", "study_app_v2")
+
+
+def base_parser(description: str) -> argparse.ArgumentParser:
+    """Argument parser with the options every benchmark accepts."""
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--app", choices=APPS, default="study_app",
+                        help="Which app variant's database.py to benchmark")
+    parser.add_argument("--db", default=None,
+                        help="Database file to use (default: a fresh temp file)")
+    parser.add_argument("--seed", type=int, default=1234)
+    return parser
+
+
+def load_app(app: str, db_path: str = None):
+    """
+    Import the given app's database module, redirect it to `db_path`
+    (a new temp file by default) and initialise the schema.
+
+    Returns:
+        The imported `database` module.
+    """
+    sys.path.insert(0, os.path.join(REPO_ROOT, app))
+    import database as db
+
+    if db_path is None:
+        db_path = os.path.join(tempfile.mkdtemp(prefix="studyforge-bench-"), "bench.db")
+    db.DB_DIR = os.path.dirname(os.path.abspath(db_path))
+    db.DB_PATH = os.path.abspath(db_path)
+    db.close_all_connections()
+    db.init_db()
+    return db
+
+
+def seed_flashcards(db, count: int, seed: int = 1234):
+    """Insert `count` cards with realistic SM-2 state spread over +/- 1 year."""
+    rng = random.Random(seed)
+    today = date.today()
+    now = datetime.now().isoformat()
+    rows = []
+    for i in range(count):
+        interval = rng.choice((0, 1, 3, 6, 15, 40, 90, 200))
+        due = today + timedelta(days=rng.randint(-30, 365))
+        rows.append((f"Front {i}", f"Back {i} " + "x" * rng.randint(20, 200), "",
+                     round(rng.uniform(1.3, 2.8), 2), interval, rng.randint(0, 8),
+                     due.isoformat(), now))
+    with db.get_connection() as conn:
+        conn.executemany(
+            "INSERT INTO flashcards (front, back, tags, easiness_factor, interval, repetitions, next_review, created_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+
+
+def time_calls(fn, calls: int) -> dict:
+    """Call `fn` repeatedly and return latency percentiles in microseconds."""
+    samples = []
+    for _ in range(calls):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1e6)
+    samples.sort()
+    return {
+        "calls": calls,
+        "mean_us": statistics.fmean(samples),
+        "p50_us": samples[len(samples) // 2],
+        "p95_us": samples[int(len(samples) * 0.95) - 1],
+    }
+
+
+def print_table(title: str, rows: list):
+    """Print a list of result dicts as an aligned text table."""
+    if not rows:
+        return
+    print(f"\n{title}")
+    cols = list(rows[0].keys())
+    fmt = lambda v: f"{v:,.1f}" if isinstance(v, float) else str(v)
+    widths = [max(len(c), *(len(fmt(r[c])) for r in rows)) for c in cols]
+    print("  ".join(c.ljust(w) for c, w in zip(cols, widths)))
+    print("  ".join("-" * w for w in widths))
+    for r in rows:
+        print("  ".join(fmt(r[c]).ljust(w) for c, w in zip(cols, widths)))
@@ -0,0 +1,91 @@
+"""
+bench_backup.py — Online snapshot throughput (MB/s) and the writer stall it
+causes: commit latency of a thread reviewing cards before and during
+backup.create_snapshot(), for a few backup batch sizes.
+
+Usage:
+    python benchmarks/bench_backup.py [--cards 100000] [--notes 3000] [--review-ms 20]
+"""
+
+import random
+import tempfile
+import threading
+import time
+
+from _common import base_parser, load_app, seed_flashcards, print_table
+
+
+def seed_notes(db, count: int, seed: int):
+    rng = random.Random(seed)
+    words = ("duty", "breach", "causation", "damages", "offer", "acceptance", "consideration", "estoppel")
+    with db.transaction():
+        for i in range(count):
+            db.add_note(f"Note {i}", " ".join(rng.choice(words) for _ in range(2500)))
+
+
+class Reviewer(threading.Thread):
+    """Reviews a random card every `interval` seconds, recording each commit's latency."""
+
+    def __init__(self, db, srs_engine, card_ids, interval, seed):
+        super().__init__(daemon=True)
+        self.db, self.srs_engine, self.card_ids, self.interval = db, srs_engine, card_ids, interval
+        self.rng = random.Random(seed)
+        self.samples = []  # (start time, latency seconds)
+        self.stopping = threading.Event()
+
+    def run(self):
+        while not self.stopping.wait(self.interval):
+            card = {"id": self.rng.choice(self.card_ids), "easiness_factor": 2.5, "interval": 6, "repetitions": 2}
+            t0 = time.perf_counter()
+            self.srs_engine.review_card(card, self.rng.randint(0, 5))
+            self.samples.append((t0, time.perf_counter() - t0))
+        self.db.close_all_connections()
+
+    def latencies(self, start, end):
+        return sorted(lat for t, lat in self.samples if start <= t <= end) or [0.0]
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[1])
+    parser.add_argument("--cards", type=int, default=100_000)
+    parser.add_argument("--notes", type=int, default=3000, help="~20 KB notes, to give the file some size")
+    parser.add_argument("--review-ms", type=float, default=20, help="Writer's pause between reviews")
+    parser.add_argument("--baseline-s", type=float, default=2.0)
+    args = parser.parse_args()
+
+    db = load_app(args.app, args.db)
+    import backup
+    import srs_engine
+    seed_flashcards(db, args.cards, args.seed)
+    seed_notes(db, args.notes, args.seed)
+    with db.get_connection() as conn:
+        card_ids = [r[0] for r in conn.execute("SELECT id FROM flashcards")]
+    backup_dir = tempfile.mkdtemp(prefix="studyforge-backups-")
+
+    reviewer = Reviewer(db, srs_engine, card_ids, args.review_ms / 1000, args.seed)
+    reviewer.start()
+    t0 = time.perf_counter()
+    time.sleep(args.baseline_s)
+    base = reviewer.latencies(t0, time.perf_counter())
+    results = [{"backup": "none (baseline)", "MB/s": 0.0, "steps": 0, "restarts": 0, "max_step_ms": 0.0,
+                "writer_p99_ms": base[int(len(base) * 0.99) - 1] * 1000, "writer_max_ms": base[-1] * 1000}]
+
+    for label, pages in (("256 pages/step", 256), ("4096 pages/step", 4096), ("one step", -1)):
+        t0 = time.perf_counter()
+        r = backup.create_snapshot(backup_dir, keep=1, pages=pages)
+        during = reviewer.latencies(t0, t0 + r["copy_seconds"])
+        results.append({"backup": label, "MB/s": r["mb_per_s"], "steps": r["steps"], "restarts": r["restarts"],
+                        "max_step_ms": r["max_step_ms"],
+                        "writer_p99_ms": during[int(len(during) * 0.99) - 1] * 1000,
+                        "writer_max_ms": during[-1] * 1000})
+    reviewer.stopping.set()
+    reviewer.join()
+
+    print_table(f"{args.app}: snapshot of {r['bytes'] / 1e6:,.1f} MB ({r['compressed_bytes'] / 1e6:,.1f} MB "
+                f"compressed) while reviewing every {args.review_ms:g} ms; max writer stall = "
+                f"writer_max_ms minus the baseline's", results)
+    db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+bench_bodies.py — File size and latency of the note body layouts: bodies
+inline in `notes` (before migration v9), in the note_bodies side table as
+plain TEXT, and in the side table zlib-compressed (what the app now does).
+
+Every layout carries the same FTS5 index, so file sizes compare like for
+like. search_ms for the inline layout is the bare ranked query, without
+the snippets search_notes() builds.
+
+The corpus is either a directory of real lecture files (--corpus: .pdf via
+PyMuPDF, the same extractor the Notes tab uses, or .txt / .md) or, without
+one, bench_search's synthetic lecture notes. Synthetic text is built from a
+small word pool and compresses better than real lectures, so quote sizes
+from a real corpus.
+
+Usage:
+    python benchmarks/bench_bodies.py [--corpus ~/lectures] [--notes 500] [--note-kb 60]
+"""
+
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from _common import base_parser, load_app, time_calls, print_table
+from bench_search import make_corpus
+
+TEXT_EXTENSIONS = (".txt", ".md")
+
+
+def read_corpus(directory: str):
+    """(title, content, tags) for every PDF / text file under `directory`."""
+    docs = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            ext = os.path.splitext(name)[1].lower()
+            if ext == ".pdf":
+                import fitz  # PyMuPDF
+                with fitz.open(path) as doc:
+                    text = "\n".join(page.get_text() for page in doc)
+            elif ext in TEXT_EXTENSIONS:
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    text = f.read()
+            else:
+                continue
+            if text.strip():
+                docs.append((os.path.splitext(name)[0], text, "lecture"))
+    return docs
+
+
+def checkpointed_size(conn, path: str) -> int:
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return os.path.getsize(path)
+
+
+def bench_inline(path: str, docs, ids, query, calls: int) -> dict:
+    """The pre-v9 layout: bodies in the notes row itself, indexed by an external-content notes_fts."""
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""CREATE TABLE notes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL, content TEXT NOT NULL,
+        tags TEXT DEFAULT '', source_file TEXT DEFAULT '', created_at TEXT NOT NULL, updated_at TEXT NOT NULL)""")
+    conn.execute("CREATE INDEX idx_notes_updated ON notes(updated_at)")
+    t0 = time.perf_counter()
+    with conn:
+        for i, (title, content, tags) in enumerate(docs):
+            now = f"2024-01-01T00:00:{i:06d}"
+            conn.execute("INSERT INTO notes (title, content, tags, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                         (title, content, tags, now, now))
+        conn.execute("""CREATE VIRTUAL TABLE notes_fts USING fts5(title, content, tags, content='notes',
+            content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3')""")
+        conn.execute("INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')")
+    load_s = time.perf_counter() - t0
+    rng = random.Random(1)
+    search = """WITH hits AS (SELECT rowid AS id, bm25(notes_fts, 10.0, 1.0, 5.0) AS score FROM notes_fts
+                WHERE notes_fts MATCH ? ORDER BY score LIMIT 20)
+                SELECT n.* FROM hits JOIN notes n ON n.id = hits.id ORDER BY hits.score"""
+    row = {
+        "layout": "inline (pre-v9)",
+        "file_mb": checkpointed_size(conn, path) / 1e6,
+        "load_s": load_s,
+        "all_notes_ms": time_calls(lambda: conn.execute(
+            "SELECT * FROM notes ORDER BY updated_at DESC").fetchall(), calls)["p50_us"] / 1000,
+        "get_note_us": time_calls(lambda: conn.execute(
+            "SELECT * FROM notes WHERE id = ?", (rng.choice(ids),)).fetchone(), calls * 10)["p50_us"],
+        "search_ms": time_calls(lambda: conn.execute(search, (f'"{query}"*',)).fetchall(),
+                                calls)["p50_us"] / 1000,
+    }
+    conn.close()
+    return row
+
+
+def bench_side_table(app: str, path: str, label: str, docs, ids, query, calls: int, compress=True) -> dict:
+    """The app's own add_note / get_note / search_notes; `compress=False` stores every body as TEXT."""
+    db = load_app(app, path)
+    saved = db.migrations.BODY_COMPRESS_MIN
+    if not compress:
+        db.migrations.BODY_COMPRESS_MIN = float("inf")
+    try:
+        t0 = time.perf_counter()
+        with db.transaction():
+            for title, content, tags in docs:
+                db.add_note(title, content, tags)
+        load_s = time.perf_counter() - t0
+    finally:
+        db.migrations.BODY_COMPRESS_MIN = saved
+    conn = db._thread_connection()
+    rng = random.Random(1)
+    row = {
+        "layout": label,
+        "file_mb": checkpointed_size(conn, path) / 1e6,
+        "load_s": load_s,
+        "all_notes_ms": time_calls(db.get_all_notes, calls)["p50_us"] / 1000,
+        "get_note_us": time_calls(lambda: db.get_note(rng.choice(ids)), calls * 10)["p50_us"],
+        "search_ms": time_calls(lambda: db.search_notes(query, limit=20), calls)["p50_us"] / 1000,
+    }
+    db.close_all_connections()
+    return row
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[1])
+    parser.add_argument("--corpus", default=None, help="Directory of lecture PDFs / text files")
+    parser.add_argument("--notes", type=int, default=500, help="Synthetic notes, without --corpus")
+    parser.add_argument("--note-kb", type=int, default=60)
+    parser.add_argument("--query", default="negligence", help="Search term for search_notes()")
+    parser.add_argument("--calls", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.corpus:
+        docs = read_corpus(args.corpus)
+        source = f"{len(docs)} files from {args.corpus}"
+    else:
+        docs = list(make_corpus(args.notes, args.note_kb, args.seed))
+        source = f"{len(docs)} synthetic notes"
+    if not docs:
+        raise SystemExit(f"No .pdf / .txt / .md files with text under {args.corpus}")
+    raw_mb = sum(len(content.encode("utf-8")) for _, content, _ in docs) / 1e6
+    ids = list(range(1, len(docs) + 1))
+
+    workdir = os.path.dirname(os.path.abspath(args.db)) if args.db else tempfile.mkdtemp(prefix="studyforge-bodies-")
+    results = [
+        bench_inline(os.path.join(workdir, "inline.db"), docs, ids, args.query, args.calls),
+        bench_side_table(args.app, os.path.join(workdir, "plain.db"), "side table, plain",
+                         docs, ids, args.query, args.calls, compress=False),
+        bench_side_table(args.app, os.path.join(workdir, "zlib.db"), "side table, zlib",
+                         docs, ids, args.query, args.calls),
+    ]
+    print_table(f"{args.app}: {source}, {raw_mb:,.1f} MB of text (p50 of {args.calls} calls; "
+                f"get_note over {args.calls * 10} random notes)", results)
+
+
+if __name__ == "__main__":
+    main()
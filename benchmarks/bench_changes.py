@@ -0,0 +1,89 @@
+"""
+bench_changes.py — What the change journal costs and saves: review
+throughput with and without its triggers, and an incremental export via
+iter_changes() versus dumping every journalled table, for a few delta
+sizes (100k cards, 5,000 ~10 KB notes default).
+
+Usage:
+    python benchmarks/bench_changes.py [--cards 100000] [--notes 5000] [--reviews 2000]
+"""
+
+import random
+import time
+
+from _common import base_parser, load_app, seed_flashcards, print_table
+
+
+def review_rate(srs_engine, card_ids, reviews: int, seed: int) -> float:
+    rng = random.Random(seed)
+    t0 = time.perf_counter()
+    for _ in range(reviews):
+        card = {"id": rng.choice(card_ids), "easiness_factor": 2.5, "interval": 6, "repetitions": 2}
+        srs_engine.review_card(card, rng.randint(0, 5))
+    return reviews / (time.perf_counter() - t0)
+
+
+def full_export(db) -> int:
+    """Every journalled table, bodies included: what an export costs without the journal."""
+    count = 0
+    with db.get_connection() as conn:
+        for table in db.migrations.CHANGE_TABLES:
+            count += len(conn.execute(f"SELECT * FROM {table}").fetchall())
+        for side, _, field in db.migrations.BODY_TABLES.values():
+            for (body,) in conn.execute(f"SELECT {field} FROM {side}"):
+                db.migrations.decode_body(body)
+    return count
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[1])
+    parser.add_argument("--cards", type=int, default=100_000)
+    parser.add_argument("--notes", type=int, default=5000)
+    parser.add_argument("--reviews", type=int, default=2000)
+    args = parser.parse_args()
+
+    db = load_app(args.app, args.db)
+    import srs_engine
+    seed_flashcards(db, args.cards, args.seed)
+    rng = random.Random(args.seed)
+    words = ("duty", "breach", "causation", "damages", "offer", "acceptance", "consideration", "estoppel")
+    with db.transaction():
+        for i in range(args.notes):
+            db.add_note(f"Note {i}", " ".join(rng.choice(words) for _ in range(1200)), tags="seeded")
+    with db.get_connection() as conn:
+        card_ids = [r[0] for r in conn.execute("SELECT id FROM flashcards")]
+
+    # Warm the page cache, or whichever side runs first pays for it
+    review_rate(srs_engine, card_ids, args.reviews * 5, args.seed - 1)
+    journalled = review_rate(srs_engine, card_ids, args.reviews, args.seed)
+    with db.get_connection() as conn:
+        triggers = conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type='trigger' AND name LIKE '%_changes_%'").fetchall()
+        for name, _ in triggers:
+            conn.execute(f"DROP TRIGGER {name}")
+    bare = review_rate(srs_engine, card_ids, args.reviews, args.seed + 1)
+    with db.get_connection() as conn:
+        for _, sql in triggers:
+            conn.execute(sql)
+    print_table(f"{args.app}: {args.reviews:,} reviews", [
+        {"journal": "on", "reviews/s": journalled},
+        {"journal": "off", "reviews/s": bare},
+    ])
+
+    results = []
+    t0 = time.perf_counter()
+    rows = full_export(db)
+    full_ms = (time.perf_counter() - t0) * 1000
+    for delta in (100, 1000, 10_000):
+        since = db.get_change_seq()
+        review_rate(srs_engine, card_ids, delta // 2, args.seed + delta)  # two changes per review
+        t0 = time.perf_counter()
+        changes = sum(1 for _ in db.iter_changes(since))
+        results.append({"delta": changes, "iter_changes_ms": (time.perf_counter() - t0) * 1000,
+                        "full_export_ms": full_ms, "full_export_rows": rows})
+    print_table(f"{args.app}: incremental vs. full export", results)
+    db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
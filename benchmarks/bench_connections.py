@@ -0,0 +1,81 @@
+"""
+bench_connections.py — Per-call latency of database helpers with the old
+connect-per-call behaviour versus the pooled per-thread connections.
+
+Usage:
+    python benchmarks/bench_connections.py [--app study_app_v2] [--cards 50000]
+"""
+
+import os
+import sqlite3
+import random
+from contextlib import contextmanager
+
+from _common import base_parser, load_app, seed_flashcards, time_calls, print_table
+
+
+def legacy_connection_factory(db):
+    """Recreate the pre-pooling get_connection(): connect, pragmas, close."""
+    @contextmanager
+    def get_connection():
+        os.makedirs(db.DB_DIR, exist_ok=True)
+        conn = sqlite3.connect(db.DB_PATH)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+    return get_connection
+
+
+def scenarios(db, card_ids, rng):
+    import srs_engine
+
+    def review():
+        card = {"id": rng.choice(card_ids), "easiness_factor": 2.5, "interval": 6, "repetitions": 2}
+        srs_engine.review_card(card, rng.randint(0, 5))
+
+    return {
+        "get_total_cards": db.get_total_cards,
+        "get_today_stats": db.get_today_stats,
+        "get_due_cards(limit=20)": lambda: db.get_due_cards(limit=20),
+        "review_card": review,
+    }
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[1])
+    parser.add_argument("--cards", type=int, default=50_000)
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+
+    db = load_app(args.app, args.db)
+    seed_flashcards(db, args.cards, args.seed)
+    with db.get_connection() as conn:
+        card_ids = [r[0] for r in conn.execute("SELECT id FROM flashcards")]
+
+    pooled = db.get_connection
+    results = []
+    for name in scenarios(db, card_ids, random.Random(args.seed)):
+        row = {"scenario": name}
+        for label, factory in (("before", legacy_connection_factory(db)), ("after", pooled)):
+            db.get_connection = factory
+            fn = scenarios(db, card_ids, random.Random(args.seed))[name]
+            fn()  # warm-up
+            row[f"{label}_p50_us"] = time_calls(fn, args.calls)["p50_us"]
+        row["speedup"] = row["before_p50_us"] / row["after_p50_us"]
+        results.append(row)
+    db.get_connection = pooled
+
+    print_table(f"{args.app}: {args.cards:,} cards, {args.calls} calls per scenario", results)
+    db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+bench_dashboard.py — Dashboard refresh latency: the per-widget queries the
+dashboard used to run versus one get_dashboard_snapshot() call (100k cards).
+
+Usage:
+    python benchmarks/bench_dashboard.py [--cards 100000] [--days 365]
+"""
+
+import random
+from datetime import date, timedelta
+
+from _common import base_parser, load_app, seed_flashcards, time_calls, print_table
+
+
+def seed_history(db, days: int, seed: int):
+    """One daily_stats row per past day, with a few gaps to end streaks."""
+    rng = random.Random(seed)
+    today = date.today()
+    rows = [((today - timedelta(days=i)).isoformat(), rng.randint(0, 150), rng.randint(0, 20),
+             rng.randint(0, 8), rng.randint(0, 200))
+            for i in range(days) if i < 10 or rng.random() > 0.1]
+    with db.get_connection() as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO daily_stats (date, cards_reviewed, cards_added, pomodoro_sessions, study_minutes) "
+            "VALUES (?, ?, ?, ?, ?)", rows)
+
+
+def legacy_refresh(db):
+    """The queries DashboardTab.refresh ran before get_dashboard_snapshot()."""
+    import srs_engine
+    db.get_today_stats()
+    db.get_streak()
+    len(db.get_due_cards())
+    db.get_total_cards()
+    srs_engine.forecast_reviews(db.get_all_flashcards(), days_ahead=7)
+    week = db.get_stats_range(7)
+    sum(s.get("cards_reviewed", 0) for s in week)
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[1])
+    parser.add_argument("--cards", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=365, help="Days of daily_stats history")
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+
+    db = load_app(args.app, args.db)
+    seed_flashcards(db, args.cards, args.seed)
+    seed_history(db, args.days, args.seed)
+
+    # Both paths must agree before their timings mean anything
+    import srs_engine
+    snap = db.get_dashboard_snapshot(7)
+    assert snap["due"] == len(db.get_due_cards())
+    assert snap["forecast"] == srs_engine.forecast_reviews(db.get_all_flashcards(), days_ahead=7)
+    assert snap["streak"] == db.get_streak()
+
+    results = []
+    for label, fn in (("legacy (6 queries, all cards)", lambda: legacy_refresh(db)),
+                      ("get_dashboard_snapshot(7)", lambda: db.get_dashboard_snapshot(7)),
+                      ("get_dashboard_snapshot(30)", lambda: db.get_dashboard_snapshot(30))):
+        t = time_calls(fn, args.calls)
+        results.append({"refresh": label, "p50_ms": t["p50_us"] / 1000, "p95_ms": t["p95_us"] / 1000})
+    print_table(f"{args.app}: dashboard refresh, {args.cards:,} cards "
+                f"({snap['due']:,} due), p50/p95 of {args.calls} calls", results)
+    db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+bench_day_columns.py — Range scans and per-day grouping on the ISO string
+columns versus the integer epoch-day columns (100k cards, 1M reviews default).
+
+The string indexes dropped by migration v7 are recreated on the scratch
+database so both sides run on an index.
+
+Usage:
+    python benchmarks/bench_day_columns.py [--cards 100000] [--reviews 1000000]
+"""
+
+import random
+from datetime import date, datetime, timedelta
+
+from _common import base_parser, load_app, seed_flashcards, time_calls, print_table
+
+
+def seed_reviews(db, count: int, days: int, seed: int):
+    """`count` review_log rows spread over the last `days` days."""
+    rng = random.Random(seed)
+    now = datetime.now()
+    with db.get_connection() as conn:
+        max_card = conn.execute("SELECT MAX(id) FROM flashcards").fetchone()[0]
+        # Bypass the daily_stats trigger: this measures review_log queries only
+        conn.execute("DROP TRIGGER IF EXISTS review_log_stats_ai")
+        conn.executemany(
+            "INSERT INTO review_log (card_id, rating, reviewed_at) VALUES (?, ?, ?)",
+            ((rng.randint(1, max_card), rng.randint(0, 5),
+              (now - timedelta(seconds=rng.randint(0, days * 86400))).isoformat())
+             for _ in range(count)))
+        conn.execute("CREATE INDEX IF NOT EXISTS bench_next_review ON flashcards(next_review)")
+        conn.execute("CREATE INDEX IF NOT EXISTS bench_reviewed_at ON review_log(reviewed_at)")
+        conn.execute("ANALYZE")
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[1])
+    parser.add_argument("--cards", type=int, default=100_000)
+    parser.add_argument("--reviews", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=730, help="Days of review history")
+    parser.add_argument("--calls", type=int, default=10)
+    args = parser.parse_args()
+
+    db = load_app(args.app, args.db)
+    seed_flashcards(db, args.cards, args.seed)
+    seed_reviews(db, args.reviews, args.days, args.seed)
+    conn = db._thread_connection()
+
+    today = date.today()
+    today_s, today_n = today.isoformat(), today.toordinal() - db.EPOCH_ORDINAL
+    month_s, month_n = (today + timedelta(days=29)).isoformat(), today_n + 29
+    year_s, year_n = (today - timedelta(days=365)).isoformat(), today_n - 365
+
+    cases = [
+        ("due count",
+         "SELECT COUNT(*) FROM flashcards WHERE next_review <= ?", (today_s,),
+         "SELECT COUNT(*) FROM flashcards WHERE due_day <= ?", (today_n,)),
+        ("30-day forecast",
+         "SELECT next_review, COUNT(*) FROM flashcards WHERE next_review BETWEEN ? AND ? GROUP BY next_review",
+         (today_s, month_s),
+         "SELECT due_day, COUNT(*) FROM flashcards WHERE due_day BETWEEN ? AND ? GROUP BY due_day",
+         (today_n, month_n)),
+        ("reviews per day, 1 year",
+         "SELECT substr(reviewed_at, 1, 10), COUNT(*) FROM review_log WHERE reviewed_at >= ? GROUP BY 1",
+         (year_s,),
+         "SELECT review_day, COUNT(*) FROM review_log WHERE review_day >= ? GROUP BY review_day",
+         (year_n,)),
+    ]
+    results = []
+    for label, str_sql, str_args, int_sql, int_args in cases:
+        assert len(conn.execute(str_sql, str_args).fetchall()) == len(conn.execute(int_sql, int_args).fetchall())
+        s = time_calls(lambda: conn.execute(str_sql, str_args).fetchall(), args.calls)
+        i = time_calls(lambda: conn.execute(int_sql, int_args).fetchall(), args.calls)
+        results.append({"query": label, "string_ms": s["p50_us"] / 1000, "integer_ms": i["p50_us"] / 1000,
+                        "speedup": s["p50_us"] / i["p50_us"]})
+    print_table(f"{args.app}: {args.cards:,} cards, {args.reviews:,} reviews (p50 of {args.calls} calls)", results)
+    db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+bench_fsrs.py — How long fitting FSRS weights takes and how well it fits.
+A review history is simulated from known weights (so the best log-loss
+any fit can reach is known), written to review_log, read back with
+get_all_review_history() and fitted with fsrs.fit() from the default
+weights, for a few history sizes (50k, 200k and 500k reviews default).
+Needs NumPy.
+
+Usage:
+    python benchmarks/bench_fsrs.py [--reviews 50000,200000,500000]
+"""
+
+import random
+import time
+from datetime import date, timedelta
+
+from _common import base_parser, load_app, seed_flashcards, print_table
+
+# The "true" weights the history is simulated from: defaults, moved
+TRUE_CHANGES = {0: 1.2, 3: 6.0, 8: 1.2, 11: 1.5, 16: 2.0}
+HISTORY_DAYS = 1000
+
+
+def simulate(fsrs, weights, reviews: int, seed: int):
+    """(card index, epoch day, rating) rows of about `reviews` reviews, scheduled at 90% retention +/- 40%."""
+    rng = random.Random(seed)
+    first_day = date.today().toordinal() - date(1970, 1, 1).toordinal() - HISTORY_DAYS
+    rows, card = [], 0
+    while len(rows) < reviews:
+        day, last, state = rng.randrange(HISTORY_DAYS), None, None
+        while day < HISTORY_DAYS:
+            if state is None:
+                rating = rng.choice((1, 3, 4, 4, 5))
+                state = fsrs.initial_state(weights, fsrs.grade(rating))
+            else:
+                recalled = rng.random() < fsrs.retrievability(day - last, state[0])
+                rating = rng.choice((3, 4, 4, 4, 5)) if recalled else rng.randint(0, 2)
+                state = fsrs.next_state(weights, *state, day - last, fsrs.grade(rating))
+            rows.append((card, first_day + day, rating))
+            last = day
+            day += max(1, round(fsrs.next_interval(state[0]) * rng.uniform(0.6, 1.4)))
+        card += 1
+    return rows, card
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[1])
+    parser.add_argument("--reviews", default="50000,200000,500000", help="Comma-separated history sizes")
+    args = parser.parse_args()
+
+    if args.db:
+        parser.error("each history size gets a fresh database; --db is not supported")
+    db = load_app(args.app)
+    import fsrs
+    if fsrs.np is None:
+        parser.error("fsrs.fit() needs NumPy (pip install numpy)")
+    weights = list(fsrs.DEFAULT_WEIGHTS)
+    for i, value in TRUE_CHANGES.items():
+        weights[i] = value
+
+    results = []
+    for size in (int(n) for n in args.reviews.split(",")):
+        rows, cards = simulate(fsrs, weights, size, args.seed)
+        db = load_app(args.app)
+        seed_flashcards(db, cards, args.seed)
+        with db.get_connection() as conn:
+            ids = [r[0] for r in conn.execute("SELECT id FROM flashcards ORDER BY id")]
+        epoch = date(1970, 1, 1)
+        with db.transaction() as conn:
+            conn.executemany("INSERT INTO review_log (card_id, rating, reviewed_at) VALUES (?, ?, ?)",
+                             [(ids[c], rating, f"{epoch + timedelta(days=day)}T12:00:00")
+                              for c, day, rating in sorted(rows, key=lambda r: r[1])])
+
+        t0 = time.perf_counter()
+        history = db.get_all_review_history()
+        read_s = time.perf_counter() - t0
+        best = fsrs.evaluate(weights, fsrs.prepare(history))
+        fitted = fsrs.fit(history)
+        results.append({
+            "reviews": len(history), "cards": cards, "read_s": read_s, "fit_s": fitted["seconds"],
+            "log_loss_default": f"{fitted['log_loss_before']:.4f}", "log_loss_fitted": f"{fitted['log_loss']:.4f}",
+            "log_loss_true": f"{best['log_loss']:.4f}",
+            "rmse_default": f"{fitted['rmse_before']:.2%}", "rmse_fitted": f"{fitted['rmse']:.2%}",
+        })
+        db.close_all_connections()
+    print_table(f"{args.app}: fsrs.fit() on simulated histories", results)
+
+
+if __name__ == "__main__":
+    main()
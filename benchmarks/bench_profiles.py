@@ -0,0 +1,111 @@
+"""
+bench_profiles.py — Review throughput and query latency under each
+performance profile ("safe", "balanced", "fast"), measured on a copy of the
+user's real database.
+
+The source database (the app's own database file by default) is copied
+with the SQLite backup API and rebuilt at each profile's page_size, so the
+real file is only ever opened read-only. When it does not exist yet, a
+seeded scratch database is used instead.
+
+Usage:
+    python benchmarks/bench_profiles.py [--db path/to/studyforge.db] [--reviews 500]
+"""
+
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+
+from _common import REPO_ROOT, base_parser, load_app, seed_flashcards, time_calls, print_table
+
+
+def snapshot(source: str, dest: str, page_size: int):
+    """Copy `source` to `dest` without writing to it, then rebuild at `page_size`."""
+    src = sqlite3.connect(f"file:{source}?mode=ro", uri=True)
+    dst = sqlite3.connect(dest)
+    src.backup(dst)
+    src.close()
+    # page_size can only change outside WAL mode, and takes effect on VACUUM
+    dst.execute("PRAGMA journal_mode=DELETE")
+    dst.execute(f"PRAGMA page_size={page_size}")
+    dst.execute("VACUUM")
+    dst.close()
+
+
+def seed_source(app: str, path: str, cards: int, seed: int):
+    """A stand-in for a missing real database: cards plus a few hundred notes."""
+    db = load_app(app, path)
+    seed_flashcards(db, cards, seed)
+    rng = random.Random(seed)
+    words = ("negligence", "duty", "breach", "causation", "damages", "the", "contract", "offer", "consideration")
+    with db.transaction():
+        for i in range(500):
+            db.add_note(f"Note {i}", " ".join(rng.choice(words) for _ in range(400)), tags="seeded")
+    db.close_all_connections()
+
+
+def run_reviews(db, srs_engine, reviews: int, seed: int) -> float:
+    """Reviews/second for srs_engine.review_card on random existing cards."""
+    with db.get_connection() as conn:
+        cards = [dict(r) for r in conn.execute(
+            "SELECT id, easiness_factor, interval, repetitions FROM flashcards LIMIT 5000")]
+    if not cards:
+        return 0.0
+    rng = random.Random(seed)
+    t0 = time.perf_counter()
+    for _ in range(reviews):
+        srs_engine.review_card(dict(rng.choice(cards)), rng.randint(0, 5))
+    return reviews / (time.perf_counter() - t0)
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[1])
+    parser.add_argument("--reviews", type=int, default=500)
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--query", default="the", help="Search term for the search_notes() latency")
+    parser.add_argument("--cards", type=int, default=20_000,
+                        help="Cards to seed when the real database does not exist")
+    args = parser.parse_args()
+
+    # The app's own DB_PATH, read before load_app() redirects it
+    sys.path.insert(0, os.path.join(REPO_ROOT, args.app))
+    import database as db
+    import srs_engine
+    workdir = tempfile.mkdtemp(prefix="studyforge-profiles-")
+    source = os.path.abspath(args.db or db.DB_PATH)
+    if not os.path.exists(source):
+        print(f"{source} does not exist — using a seeded database with {args.cards:,} cards")
+        source = os.path.join(workdir, "seeded.db")
+        seed_source(args.app, source, args.cards, args.seed)
+
+    results = []
+    for name, pragmas in db.PERFORMANCE_PROFILES.items():
+        path = os.path.join(workdir, f"{name}.db")
+        snapshot(source, path, pragmas["page_size"])
+        db.set_performance_profile(name)
+        load_app(args.app, path)
+
+        queries = {
+            "due_ms": lambda: db.get_due_cards(limit=50),
+            "dashboard_ms": lambda: db.get_dashboard_snapshot(7),
+            "notes_page_ms": lambda: db.list_notes(limit=50),
+            "search_ms": lambda: db.search_notes(args.query, limit=20),
+        }
+        row = {"profile": name, "reviews/s": run_reviews(db, srs_engine, args.reviews, args.seed)}
+        for label, fn in queries.items():
+            fn()  # warm the page cache / mmap
+            row[label] = time_calls(fn, args.calls)["p50_us"] / 1000
+        results.append(row)
+        db.close_all_connections()
+
+    size_mb = os.path.getsize(source) / 1e6
+    print_table(f"{args.app}: {source} ({size_mb:,.1f} MB), {args.reviews:,} reviews, "
+                f"p50 of {args.calls} calls per query", results)
+    db.set_performance_profile(db.DEFAULT_PROFILE)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+"""
+bench_reviews.py — Review throughput (reviews/second) of srs_engine.review_card
+with one commit per review versus the old three separate transactions, and
+the UI-thread cost per rating in write-behind mode (review_writer).
+
+Commits are counted with a trace callback. Alongside the throughput measured
+on this machine's disk, a modelled figure is reported for a spinning-disk
+fsync profile: in WAL mode with synchronous=FULL every commit costs one WAL
+fsync, so reviews/s = 1 / (cpu_time + commits_per_review * fsync_ms).
+In write-behind mode the commits happen on the writer thread, but each
+rating fsyncs the journal on the UI thread (unless the "fast" profile is
+active), so it is modelled as one fsync per review.
+
+Usage:
+    python benchmarks/bench_reviews.py [--reviews 2000] [--fsync-ms 10]
+"""
+
+import random
+import time
+
+from _common import base_parser, load_app, seed_flashcards, print_table
+
+
+def legacy_review(db):
+    """review_card() as it was before transaction(): three commits."""
+    def review(card, rating):
+        with db.get_connection() as conn:
+            conn.execute("UPDATE flashcards SET easiness_factor=?, interval=?, repetitions=?, next_review=? WHERE id=?",
+                         (card["easiness_factor"], 1, 1, "2030-01-01", card["id"]))
+        with db.get_connection() as conn:
+            conn.execute("INSERT INTO review_log (card_id, rating, reviewed_at) VALUES (?, ?, datetime('now'))",
+                         (card["id"], rating))
+        db.increment_daily_stat("cards_reviewed")
+    return review
+
+
+def run(db, review, card_ids, reviews, seed):
+    rng = random.Random(seed)
+    commits = 0
+
+    def count(sql):
+        nonlocal commits
+        if sql.startswith("COMMIT"):
+            commits += 1
+
+    conn = db._thread_connection()
+    conn.set_trace_callback(count)
+    t0 = time.perf_counter()
+    for _ in range(reviews):
+        card = {"id": rng.choice(card_ids), "easiness_factor": 2.5, "interval": 6, "repetitions": 2}
+        review(card, rng.randint(0, 5))
+    elapsed = time.perf_counter() - t0
+    conn.set_trace_callback(None)
+    return elapsed, commits
+
+
+def run_write_behind(db, srs_engine, card_ids, args):
+    """Time review_card() on the caller's thread with the writer running;
+    commits are the writer's batches (one apply_reviews() call each).
+    Also returns whether the writer fsyncs its journal."""
+    import review_writer
+    batches = 0
+    apply_reviews = db.apply_reviews
+
+    def counting_apply(reviews):
+        nonlocal batches
+        batches += 1
+        return apply_reviews(reviews)
+
+    db.apply_reviews = counting_apply
+    writer = review_writer.start(flush_every=args.flush_every)
+    durable = writer.durable
+    elapsed, _ = run(db, srs_engine.review_card, card_ids, args.reviews, args.seed)
+    review_writer.stop()
+    db.apply_reviews = apply_reviews
+    return elapsed, batches, durable
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[1])
+    parser.add_argument("--cards", type=int, default=10_000)
+    parser.add_argument("--reviews", type=int, default=2000)
+    parser.add_argument("--fsync-ms", type=float, default=10.0,
+                        help="Modelled fsync latency (7200 rpm disk ~ 8-12 ms)")
+    parser.add_argument("--flush-every", type=int, default=20,
+                        help="Write-behind batch size")
+    args = parser.parse_args()
+
+    db = load_app(args.app, args.db)
+    import srs_engine
+    seed_flashcards(db, args.cards, args.seed)
+    with db.get_connection() as conn:
+        conn.execute("PRAGMA synchronous=FULL")
+        card_ids = [r[0] for r in conn.execute("SELECT id FROM flashcards")]
+
+    results = []
+    for label, review in (("3 commits (before)", legacy_review(db)),
+                          ("transaction() (after)", srs_engine.review_card),
+                          ("write-behind (UI thread)", None)):
+        if review is None:
+            elapsed, commits, durable = run_write_behind(db, srs_engine, card_ids, args)
+        else:
+            elapsed, commits = run(db, review, card_ids, args.reviews, args.seed)
+        per_review = elapsed / args.reviews
+        commits_per_review = commits / args.reviews
+        # Write-behind commits happen on the writer thread; the rating pays for the journal's fsync
+        if review is None:
+            fsync_s = args.fsync_ms / 1000 if durable else 0
+        else:
+            fsync_s = commits_per_review * args.fsync_ms / 1000
+        modelled = 1 / (per_review + fsync_s)
+        results.append({
+            "mode": label,
+            "commits/review": commits_per_review,
+            "reviews/s (this disk)": 1 / per_review,
+            f"reviews/s (fsync {args.fsync_ms:g} ms)": modelled,
+        })
+    print_table(f"{args.app}: {args.reviews:,} reviews over {args.cards:,} cards, synchronous=FULL", results)
+    db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
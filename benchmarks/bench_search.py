@@ -0,0 +1,88 @@
+"""
+bench_search.py — Notes search latency: substring LIKE scan versus the FTS5
+index, on a synthetic lecture-notes corpus (2,000 notes / ~200 MB default).
+
+Usage:
+    python benchmarks/bench_search.py [--notes 2000] [--note-kb 100]
+"""
+
+import random
+import time
+from datetime import datetime
+
+from _common import base_parser, load_app, time_calls, print_table
+
+LEGAL_TERMS = (
+    "negligence duty breach causation damages contract offer acceptance consideration "
+    "estoppel tort battery assault trespass nuisance liability statute precedent appeal "
+    "jurisdiction plaintiff defendant remedy injunction equity trust fiduciary mens rea "
+    "actus reus evidence hearsay testimony constitution amendment due process standing"
+).split()
+FILLER = ("the of and to in a is that for it as was with be by on not he this are or his "
+          "from at which but have an they you were her she there been one all we their").split()
+RARE_TERMS = ["promissory", "quasimodo", "ultravires", "palsgraf"]
+
+
+def make_corpus(notes: int, note_kb: int, seed: int):
+    """Yield (title, content, tags) rows built from a shared sentence pool."""
+    rng = random.Random(seed)
+    words = LEGAL_TERMS * 3 + FILLER * 6 + [f"term{i}" for i in range(5000)]
+    sentences = [" ".join(rng.choice(words) for _ in range(rng.randint(8, 24))).capitalize() + "."
+                 for _ in range(4000)]
+    target = note_kb * 1024
+    for i in range(notes):
+        parts, size = [], 0
+        while size < target:
+            s = rng.choice(sentences)
+            parts.append(s)
+            size += len(s) + 1
+        if i % 200 == 0:
+            parts.insert(rng.randrange(len(parts)), RARE_TERMS[(i // 200) % len(RARE_TERMS)])
+        yield (f"Lecture {i}: {rng.choice(LEGAL_TERMS).title()}", " ".join(parts),
+               ", ".join(rng.sample(LEGAL_TERMS, 2)))
+
+
+def legacy_search(db, query):
+    """search_notes() as it was before FTS5 (on today's compressed note_bodies)."""
+    with db.get_connection() as conn:
+        rows = conn.execute(
+            "SELECT n.id, n.title, body_text(b.content) AS content, n.tags, n.updated_at "
+            "FROM notes n JOIN note_bodies b ON b.note_id = n.id "
+            "WHERE n.title LIKE ? OR body_text(b.content) LIKE ? OR n.tags LIKE ? ORDER BY n.updated_at DESC",
+            (f"%{query}%", f"%{query}%", f"%{query}%")).fetchall()
+        return [dict(r) for r in rows]
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[1])
+    parser.add_argument("--notes", type=int, default=2000)
+    parser.add_argument("--note-kb", type=int, default=100)
+    parser.add_argument("--calls", type=int, default=5)
+    args = parser.parse_args()
+
+    db = load_app(args.app, args.db)
+    t0 = time.perf_counter()
+    with db.transaction():
+        for title, content, tags in make_corpus(args.notes, args.note_kb, args.seed):
+            db.add_note(title, content, tags)
+    load_s = time.perf_counter() - t0
+    print(f"Loaded {args.notes:,} notes (~{args.notes * args.note_kb / 1024:,.0f} MB) "
+          f"with FTS triggers in {load_s:.1f}s")
+
+    results = []
+    for query in ("palsgraf", "negligence", "estop", "duty breach", "no-such-word"):
+        like = time_calls(lambda: legacy_search(db, query), args.calls)
+        fts = time_calls(lambda: db.search_notes(query), args.calls)
+        results.append({
+            "query": query,
+            "hits": len(db.search_notes(query)),
+            "like_ms": like["p50_us"] / 1000,
+            "fts_ms": fts["p50_us"] / 1000,
+            "speedup": like["p50_us"] / fts["p50_us"],
+        })
+    print_table(f"{args.app}: search latency (p50 of {args.calls} calls)", results)
+    db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+bench_simulate.py — How long simulator.simulate() takes to project a
+year of reviews, 1,000 runs over a generated 50k-card collection
+(collection.py's "50k", cached as for the suite) with 5,000 new cards
+added, under SM-2 and FSRS and a few new-card limits. Needs NumPy.
+
+Usage:
+    python benchmarks/bench_simulate.py [--size 50k] [--runs 1000] [--days 365] [--new-per-day 10,20,50]
+"""
+
+import os
+import shutil
+import time
+
+from _common import base_parser, load_app, print_table
+import collection
+from suite import prepare_collection
+
+NEW_CARDS = 5_000
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[1])
+    parser.add_argument("--size", choices=collection.SIZES, default="50k")
+    parser.add_argument("--runs", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--new-per-day", default="10,20,50", help="Comma-separated new-card limits")
+    args = parser.parse_args()
+    if args.db:
+        parser.error("the benchmark runs on a generated collection; use --size")
+
+    path, generated = prepare_collection(args.app, args.size, args.seed)
+    db = load_app(args.app, path)
+    import simulator
+    import srs_engine
+    if simulator.np is None:
+        parser.error("simulator.simulate() needs NumPy (pip install numpy)")
+    db.add_flashcards_bulk([{"front": f"New {i}?", "back": "Not reviewed yet"} for i in range(NEW_CARDS)])
+
+    t0 = time.perf_counter()
+    col = simulator.load_collection()
+    load_s = time.perf_counter() - t0
+    results = []
+    for name in ("sm2", "fsrs"):
+        scheduler = srs_engine.set_scheduler(name)
+        for limit in (int(n) for n in args.new_per_day.split(",")):
+            r = simulator.simulate(days=args.days, runs=args.runs, new_per_day=limit, scheduler=scheduler,
+                                   collection=col, seed=args.seed)
+            results.append({
+                "scheduler": name, "new_per_day": limit, "seconds": r["seconds"],
+                "card_runs_per_s": f"{len(col['id']) * args.runs / r['seconds']:,.0f}",
+                "reviews_per_day": r["reviews_per_day"], "peak_reviews": r["peak_reviews"],
+                "minutes_per_day": r["minutes_per_day"], "retention": f"{r['retention']:.1%}",
+            })
+    print_table(f"{args.app}: {args.runs:,} runs x {args.days} days, {len(col['id']):,} cards "
+                f"({generated['reviews']:,} reviews of history read in {load_s:.1f}s)", results)
+    db.close_all_connections()
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
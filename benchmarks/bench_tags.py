@@ -0,0 +1,88 @@
+"""
+bench_tags.py — Tag filtering: substring LIKE on the comma strings versus the
+normalized tag index (20,000 notes / 50,000 cards default).
+
+Usage:
+    python benchmarks/bench_tags.py [--notes 20000] [--cards 50000]
+"""
+
+import random
+
+from _common import base_parser, load_app, time_calls, print_table
+
+SUBJECTS = ("torts", "contracts", "crim", "evidence", "civpro", "conlaw", "property", "tax")
+
+
+def seed(db, notes: int, cards: int, seed: int):
+    """Notes with 1-3 subject tags plus a long tail; cards split across them."""
+    rng = random.Random(seed)
+    tail = [f"week{i}" for i in range(1, 15)] + [f"case{i}" for i in range(500)]
+    note_ids = []
+    with db.transaction():
+        for i in range(notes):
+            tags = rng.sample(SUBJECTS, rng.randint(1, 3)) + rng.sample(tail, rng.randint(0, 2))
+            note_ids.append(db.add_note(f"Note {i}", "body", tags=", ".join(tags)))
+        batch = []
+        for i in range(cards):
+            batch.append({"front": f"Q{i}", "back": "A",
+                          "tags": rng.choice(("", "", "", "exam", "hard"))})
+            if len(batch) == 10:
+                db.add_flashcards_bulk(batch, note_id=rng.choice(note_ids))
+                batch = []
+        db.add_flashcards_bulk(batch, note_id=rng.choice(note_ids))
+
+
+def like_notes(db, *tags):
+    """The pre-index approach (and its false positives: 'tort' matches 'torts')."""
+    where = " AND ".join("tags LIKE ?" for _ in tags)
+    with db.get_connection() as conn:
+        return [dict(r) for r in conn.execute(
+            f"SELECT id, title FROM notes WHERE {where} ORDER BY updated_at DESC", [f"%{t}%" for t in tags])]
+
+
+def like_due_cards(db, tag):
+    with db.get_connection() as conn:
+        return [dict(r) for r in conn.execute(
+            "SELECT f.* FROM flashcards f LEFT JOIN notes n ON n.id = f.note_id "
+            "WHERE f.next_review <= date('now', 'localtime') AND (f.tags LIKE ? OR n.tags LIKE ?) "
+            "ORDER BY f.next_review", (f"%{tag}%", f"%{tag}%"))]
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[1])
+    parser.add_argument("--notes", type=int, default=20_000)
+    parser.add_argument("--cards", type=int, default=50_000)
+    parser.add_argument("--calls", type=int, default=20)
+    args = parser.parse_args()
+
+    db = load_app(args.app, args.db)
+    seed(db, args.notes, args.cards, args.seed)
+
+    cases = [
+        ("notes any_of=case7", lambda: like_notes(db, "case7"),
+         lambda: db.get_notes_by_tags(any_of=["case7"], columns=("title",))),
+        ("notes all_of=torts,crim", lambda: like_notes(db, "torts", "crim"),
+         lambda: db.get_notes_by_tags(all_of=["torts", "crim"], columns=("title",))),
+        ("due cards tags=week3", lambda: like_due_cards(db, "week3"),
+         lambda: db.get_due_cards(tags=["week3"])),
+        ("due cards tags=hard", lambda: like_due_cards(db, "hard"),
+         lambda: db.get_due_cards(tags=["hard"])),
+    ]
+    results = []
+    for label, like_fn, index_fn in cases:
+        like = time_calls(like_fn, args.calls)
+        index = time_calls(index_fn, args.calls)
+        results.append({
+            "query": label,
+            "like_rows": len(like_fn()),
+            "index_rows": len(index_fn()),
+            "like_ms": like["p50_us"] / 1000,
+            "index_ms": index["p50_us"] / 1000,
+        })
+    print_table(f"{args.app}: tag filters, {args.notes:,} notes / {args.cards:,} cards "
+                f"(p50 of {args.calls} calls; LIKE rows include substring false positives)", results)
+    db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+check_fsrs_retry.py — Fail if a same-day FSRS retry of a lapsed card is
+scheduled from the wrong elapsed time.
+
+The Flashcards tab requeues a failed card as {**card, **review_card(...)}.
+Anything review_card() leaves out of its result keeps the card's value
+from before the lapse, so a stale due_day would make the retry look like
+it came a whole interval after the lapse. A card is reviewed up to a long
+interval under FSRS, read back from the database, lapsed a few days
+overdue (so its old due_day is not the lapse day), requeued the way the
+UI does it and retried the same day, with load balancing off and on. The
+retry must be scheduled with 0 elapsed days, matching fsrs.next_state().
+
+Usage:
+    python benchmarks/check_fsrs_retry.py [--app study_app_v2]
+Exit status is non-zero when a retry is scheduled wrongly.
+"""
+
+import sys
+from datetime import datetime, timedelta
+
+from _common import base_parser, load_app
+
+RETRY_RATING = 4
+OVERDUE_DAYS = 10
+
+
+def check(db, srs_engine, fsrs, balanced: bool) -> list:
+    """Problems found for one lapse -> requeue -> retry run."""
+    srs_engine.set_load_balancing(balanced)
+    card_id = db.add_flashcard("Front", "Back")
+    card = {"id": card_id, "easiness_factor": 2.5, "interval": 0, "repetitions": 0,
+            "next_review": None, "stability": None, "difficulty": None}
+    now = datetime(2026, 1, 5, 9, 0)
+    while card["interval"] < 20:
+        card = {**card, **srs_engine.review_card(card, 5, now=now)}
+        now += timedelta(days=max(card["interval"], 1))
+    with db.get_connection() as conn:
+        # As the Flashcards tab loads it: a database row, due_day included
+        card = dict(conn.execute("SELECT * FROM flashcards WHERE id = ?", (card_id,)).fetchone())
+
+    now += timedelta(days=OVERDUE_DAYS)
+    lapsed = srs_engine.review_card(card, 1, now=now)
+    requeued = {**card, **lapsed}
+    retry = srs_engine.review_card(requeued, RETRY_RATING, now=now + timedelta(minutes=10))
+
+    weights = srs_engine.get_scheduler().weights
+    expected = fsrs.next_state(weights, lapsed["stability"], lapsed["difficulty"], 0,
+                               fsrs.grade(RETRY_RATING))
+    label = "balanced" if balanced else "unbalanced"
+    problems = []
+    if requeued.get("due_day") is not None and requeued["due_day"] != srs_engine.epoch_day(now.date()):
+        problems.append(f"{label}: requeued card keeps due_day {requeued['due_day']}, "
+                        f"not the lapse day {srs_engine.epoch_day(now.date())}")
+    if abs(retry["stability"] - expected[0]) > 1e-9 or abs(retry["difficulty"] - expected[1]) > 1e-9:
+        problems.append(f"{label}: retry stability/difficulty {retry['stability']:.4f}/{retry['difficulty']:.4f}, "
+                        f"expected {expected[0]:.4f}/{expected[1]:.4f} for 0 elapsed days")
+    print(f"{label:>10}: interval before lapse {card['interval']} d, "
+          f"retry stability {retry['stability']:.3f} (expected {expected[0]:.3f}), "
+          f"next interval {retry['interval']} d")
+    return problems
+
+
+def main():
+    args = base_parser(__doc__.splitlines()[1]).parse_args()
+    db = load_app(args.app, args.db)
+    import fsrs
+    import srs_engine
+
+    srs_engine.set_scheduler("fsrs")
+    problems = check(db, srs_engine, fsrs, balanced=False) + check(db, srs_engine, fsrs, balanced=True)
+    for problem in problems:
+        print("FAIL", problem)
+    if problems:
+        sys.exit(1)
+    print("OK: same-day retries are scheduled from the lapse")
+
+
+if __name__ == "__main__":
+    main()
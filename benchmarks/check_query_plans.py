@@ -0,0 +1,231 @@
+"""
+check_query_plans.py — Fail if any public query in database.py does a full
+table scan or sorts its whole result in a temp B-tree.
+
+Every public function in the chosen app's database.py is called against a
+seeded scratch database while a trace callback records the SQL it issues.
+Each recorded statement is then run through EXPLAIN QUERY PLAN. Foreign keys
+are also checked for a supporting child index, since ON DELETE cascades do
+not show up in any traced statement.
+
+New public functions must be added to `sample_calls()` (or INFRASTRUCTURE),
+otherwise the check fails so they cannot slip through unchecked.
+
+Usage:
+    python benchmarks/check_query_plans.py [--app study_app_v2]
+Exit status is non-zero when a regression is found.
+"""
+
+import inspect
+import re
+import sys
+
+from _common import base_parser, load_app, seed_flashcards
+
+# Functions that manage connections/schema rather than query data.
+INFRASTRUCTURE = {"get_connection", "transaction", "init_db", "close_all_connections",
+                  "set_performance_profile", "get_performance_profile", "run_maintenance", "archive_path"}
+
+# Functions whose scan is inherent to what they do, with the reason.
+ALLOWED_SCANS = {
+    "search_notes": "BM25 ranking sorts the matches; the LIKE fallback (no FTS5) must scan",
+    "rebuild_rollups": "recomputes every day's counters from the full logs by design",
+    "get_srs_states": "reads every card's scheduling state for batch rescheduling",
+    "get_all_review_history": "the FSRS optimizer fits to every review ever logged",
+}
+
+# (function, keyword argument) pairs whose calls may sort in a temp B-tree:
+# the filter drives the lookup through an index, so only the matching rows
+# are sorted. None means every call of that function.
+ALLOWED_SORTS = {
+    ("get_notes_by_tags", None): "tag links select the notes; only those are sorted",
+    ("get_due_cards", "tags"): "tag links select the cards; only those are sorted",
+    ("get_due_cards_with_topics", "tags"): "tag links select the cards; only those are sorted",
+    ("get_review_history", None): "one card's reviews from both tiers are merged and sorted",
+}
+
+STATEMENT_RE = re.compile(r"^\s*(SELECT|UPDATE|DELETE|WITH|INSERT\s+INTO\s+\w+\s*(\([^)]*\))?\s*SELECT)", re.I)
+FULL_SCAN_RE = re.compile(r"^SCAN (\w+)$")
+
+
+def seed(db):
+    """Populate every table with enough rows for the planner to care."""
+    seed_flashcards(db, 2000)
+    note_ids = [db.add_note(f"Note {i}", "body " * 50, tags="torts, contracts" if i % 2 else "torts")
+                for i in range(50)]
+    rubric_id = db.add_rubric("Rubric", "criteria")
+    for i in range(20):
+        db.add_flashcard(f"q{i}", f"a{i}", note_id=note_ids[i % 5])
+        db.add_hypothetical(f"H{i}", "scenario", note_id=note_ids[i % 5])
+        db.add_essay(f"E{i}", "prompt", note_id=note_ids[i % 5], rubric_id=rubric_id)
+        db.add_participation_question(f"Q{i}?", note_id=note_ids[i % 5])
+    return note_ids, rubric_id
+
+
+def sample_calls(db, note_ids, rubric_id):
+    """Ordered (function name, args, kwargs); deletes run last."""
+    card_id = db.get_flashcards_for_note(note_ids[0])[0]["id"]
+    hyp_id = db.get_all_hypotheticals()[0]["id"]
+    essay_id = db.get_all_essays()[0]["id"]
+    q_id = db.get_all_participation_questions()[0]["id"]
+    return [
+        ("add_note", ("T", "C"), {}),
+        ("get_all_notes", (), {}),
+        ("list_notes", (), {"limit": 20}),
+        ("list_notes", (), {"columns": ("title",), "limit": 20, "after": ("9999", 1 << 62)}),
+        ("get_note_titles", (), {}),
+        ("get_notes_by_tags", (), {"all_of": ["torts", "contracts"]}),
+        ("get_notes_by_tags", (), {"any_of": "contracts, crim", "columns": ("title",)}),
+        ("get_tag_counts", (), {}),
+        ("count_notes", (), {}),
+        ("get_note", (note_ids[1],), {}),
+        ("update_note", (note_ids[1],), {"title": "Renamed", "tags": "torts, evidence"}),
+        ("search_notes", ("body",), {}),
+        ("find_duplicates", ("notes", "body " * 50), {}),
+        ("find_duplicates", ("rubrics", "criteria"), {}),
+        ("add_flashcard", ("f", "b"), {"note_id": note_ids[1], "tags": "evidence"}),
+        ("add_flashcards_bulk", ([{"front": "f", "back": "b", "tags": "evidence"}] * 3,), {"note_id": note_ids[1]}),
+        ("get_due_cards", (), {}),
+        ("get_due_cards", (), {"limit": 20}),
+        ("get_due_cards", (), {"limit": 20, "tags": ["torts", "crim"]}),
+        ("get_due_cards_with_topics", (), {"limit": 20}),
+        ("get_due_cards_with_topics", (), {"tags": "contracts"}),
+        ("get_all_flashcards", (), {}),
+        ("get_flashcards_for_note", (note_ids[0],), {}),
+        ("update_flashcard_srs", (card_id, 2.6, 6, 2, "2030-01-01"), {}),
+        ("log_review", (card_id, 4), {}),
+        ("get_srs_states", (), {}),
+        ("get_all_review_history", (), {}),
+        ("update_flashcards_srs_bulk", ([(2.5, 3, 2, "2030-01-03", card_id)],), {}),
+        ("apply_reviews", ([{"id": card_id, "easiness_factor": 2.5, "interval": 1, "repetitions": 1,
+                             "next_review": "2030-01-02", "rating": 4,
+                             "reviewed_at": "2024-01-01T09:00:00"}],), {}),
+        ("log_pomodoro", ("work", 25, "2024-01-01T10:00:00", "2024-01-01T10:25:00"), {}),
+        ("get_today_stats", (), {}),
+        ("increment_daily_stat", ("quiz_questions_answered",), {}),
+        ("get_stats_range", (7,), {}),
+        ("get_streak", (), {}),
+        ("get_total_cards", (), {}),
+        ("get_dashboard_snapshot", (), {}),
+        ("get_dashboard_snapshot", (), {"forecast_days": 30}),
+        ("get_review_forecast", (), {}),
+        ("get_review_forecast", (365,), {}),
+        ("get_due_counts", (19000,), {}),
+        ("add_hypothetical", ("H", "S"), {"note_id": note_ids[2]}),
+        ("get_all_hypotheticals", (), {}),
+        ("get_hypothetical", (hyp_id,), {}),
+        ("update_hypothetical", (hyp_id,), {"response": "r"}),
+        ("add_essay", ("E", "P"), {"note_id": note_ids[2]}),
+        ("get_all_essays", (), {}),
+        ("get_essay", (essay_id,), {}),
+        ("update_essay", (essay_id,), {"content": "c"}),
+        ("add_rubric", ("R", "C"), {}),
+        ("get_all_rubrics", (), {}),
+        ("get_rubric", (rubric_id,), {}),
+        ("update_rubric", (rubric_id,), {"name": "R2", "content": "criteria, revised"}),
+        ("add_participation_question", ("Q?",), {}),
+        ("add_participation_questions_bulk", ([{"question": "Q?"}] * 3,), {"note_id": note_ids[2]}),
+        ("get_all_participation_questions", (), {}),
+        ("get_participation_questions_by_category", ("interesting",), {}),
+        ("update_participation_question", (q_id,), {"answer": "a"}),
+        ("delete_participation_question", (q_id,), {}),
+        ("delete_essay", (essay_id,), {}),
+        ("delete_hypothetical", (hyp_id,), {}),
+        ("delete_rubric", (rubric_id,), {}),
+        ("delete_flashcard", (card_id,), {}),
+        ("delete_note", (note_ids[3],), {}),
+        ("get_review_history", (card_id,), {}),
+        ("archive_reviews", (), {"older_than_days": 0}),
+        ("get_review_history", (card_id,), {}),
+        ("rebuild_rollups", (), {}),
+        ("get_change_seq", (), {}),
+        ("iter_changes", (), {}),
+        ("iter_changes", (), {"since": 100, "tables": ["notes", "flashcards"], "batch": 50}),
+        ("prune_changes", (), {"older_than_days": 0}),
+    ]
+
+
+def public_functions(db):
+    return {
+        name for name, fn in inspect.getmembers(db, inspect.isfunction)
+        if fn.__module__ == db.__name__ and not name.startswith("_")
+    } - INFRASTRUCTURE
+
+
+def plan_problems(conn, sql, allow_sort=False):
+    """Return the EXPLAIN QUERY PLAN lines that indicate a regression."""
+    problems = []
+    for row in conn.execute("EXPLAIN QUERY PLAN " + sql):
+        detail = row[-1]
+        scan = FULL_SCAN_RE.match(detail)
+        if scan and scan.group(1) != "sqlite_master":  # the schema catalogue: a few dozen rows
+            problems.append(detail)
+        elif detail.startswith("USE TEMP B-TREE FOR ORDER BY") and not allow_sort:
+            problems.append(detail)
+    return problems
+
+
+def unindexed_foreign_keys(conn):
+    """(table, column) pairs whose FK lookups would scan the child table."""
+    missing = []
+    tables = [r[0] for r in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'")]
+    for table in tables:
+        leading = {
+            conn.execute(f"PRAGMA index_info('{idx[1]}')").fetchone()[2]
+            for idx in conn.execute(f"PRAGMA index_list('{table}')")
+        }
+        pk = [c for c in conn.execute(f"PRAGMA table_info('{table}')") if c[5]]
+        if len(pk) == 1 and pk[0][2].upper() == "INTEGER":
+            leading.add(pk[0][1])  # rowid alias: the table itself is the index
+        for fk in conn.execute(f"PRAGMA foreign_key_list('{table}')"):
+            if fk[3] not in leading:
+                missing.append((table, fk[3]))
+    return missing
+
+
+def main():
+    args = base_parser(__doc__.splitlines()[1]).parse_args()
+    db = load_app(args.app, args.db)
+    note_ids, rubric_id = seed(db)
+
+    calls = [c for c in sample_calls(db, note_ids, rubric_id) if hasattr(db, c[0])]
+    failures = []
+
+    unchecked = public_functions(db) - {name for name, _, _ in calls} - set(ALLOWED_SCANS)
+    for name in sorted(unchecked):
+        failures.append(f"{name}: public function has no entry in sample_calls()")
+
+    conn = db._thread_connection()
+    for name, fn_args, fn_kwargs in calls:
+        statements = []
+        conn.set_trace_callback(statements.append)
+        try:
+            result = getattr(db, name)(*fn_args, **fn_kwargs)
+            if inspect.isgenerator(result):
+                list(result)
+        finally:
+            conn.set_trace_callback(None)
+        for sql in statements:
+            if not STATEMENT_RE.match(sql):
+                continue
+            allow_sort = any((name, key) in ALLOWED_SORTS for key in (None, *fn_kwargs))
+            problems = plan_problems(conn, sql, allow_sort)
+            if problems and name not in ALLOWED_SCANS:
+                short = " ".join(sql.split())[:90]
+                failures.append(f"{name}: {'; '.join(problems)}\n    {short}")
+
+    for table, column in unindexed_foreign_keys(conn):
+        failures.append(f"{table}.{column}: foreign key has no index (cascades will scan)")
+
+    db.close_all_connections()
+    if failures:
+        print(f"Query plan check FAILED for {args.app}:")
+        for f in failures:
+            print("  - " + f)
+        sys.exit(1)
+    print(f"Query plan check passed for {args.app}: {len(calls)} calls, no full scans.")
+
+
+if __name__ == "__main__":
+    main()
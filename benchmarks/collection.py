@@ -0,0 +1,228 @@
+"""
+collection.py — Seeded generator of realistic StudyForge collections, for
+the benchmark suite (suite.py) or for poking at by hand.
+
+A collection is built the way years of use would build it. Lectures (notes
+of real size, from bench_search's corpus generator) are imported on days
+spread over the history, each with a batch of cards tagged like its note.
+Then every day is replayed in order: the cards due that day are reviewed
+with SM-2 (the same arithmetic as srs_engine.review_card()), failing
+about one review in eight, with the odd day off that pushes the backlog
+to the next. So review_log is chronological and years long, intervals and
+easiness spread the way real ones do, streaks break, and today's due
+queue is a day's worth plus whatever was skipped. Each study day also gets
+a few pomodoro sessions.
+
+Rows go in with raw SQL, with the statistics and change-journal insert
+triggers off, and daily_stats / the streak cache are then recomputed with
+rebuild_rollups(), so the result is what the app would hold. Only the
+change journal starts empty, as after a fresh export. Reviews older than
+REVIEW_HOT_DAYS are archived, as idle maintenance would have done.
+
+Usage:
+    python benchmarks/collection.py --size 100k --db ~/studyforge-100k.db
+"""
+
+import os
+import random
+import time
+from datetime import date, datetime, timedelta
+
+from _common import base_parser, load_app
+from bench_search import make_corpus, LEGAL_TERMS
+
+# Bump when the generator's output changes, so cached collections are rebuilt
+GENERATOR_VERSION = 1
+
+SIZES = {
+    "10k": {"cards": 10_000, "notes": 200, "years": 1},
+    "50k": {"cards": 50_000, "notes": 800, "years": 2},
+    "100k": {"cards": 100_000, "notes": 1_500, "years": 3},
+    "1m": {"cards": 1_000_000, "notes": 4_000, "years": 5},
+}
+NOTE_KB = 30            # a typical lecture's extracted text
+UNLINKED_SHARE = 0.05   # cards typed in by hand, without a note
+DAY_OFF = 0.12          # chance of skipping a day's reviews
+FIRST_FAIL = 0.25       # chance of failing a card's first review
+FAIL = 0.12             # ... and any later one
+PASS_RATINGS = (3, 4, 4, 4, 5, 5)
+INSERT_BATCH = 50_000
+
+# Insert triggers kept off during the load; rebuild_rollups() redoes their work
+_LOAD_TRIGGERS = ("review_log_stats_ai", "flashcards_stats_ai", "pomodoro_stats_ai")
+
+
+def _card_text(rng, i):
+    front = f"Q{i}: " + " ".join(rng.choice(LEGAL_TERMS) for _ in range(rng.randint(6, 16))) + "?"
+    back = " ".join(rng.choice(LEGAL_TERMS) for _ in range(rng.randint(8, 60))).capitalize() + "."
+    return front, back
+
+
+def _sm2(ef, interval, reps, rating):
+    """srs_engine.review_card()'s update, without the database write."""
+    ef = max(1.3, ef + (0.1 - (5 - rating) * (0.08 + (5 - rating) * 0.02)))
+    if rating < 3:
+        return ef, 0, 0
+    interval = 1 if reps == 0 else 6 if reps == 1 else round(interval * ef)
+    return ef, interval, reps + 1
+
+
+def _stamp(day, rng, first_hour=8):
+    """ISO timestamp at a random time of `day` (epoch day number)."""
+    seconds = rng.randint(first_hour * 3600, 23 * 3600 + 3599)
+    return (datetime(1970, 1, 1) + timedelta(days=day, seconds=seconds)).isoformat()
+
+
+def _drop_load_triggers(conn):
+    rows = conn.execute(
+        "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND (name LIKE '%\\_changes\\_%' ESCAPE '\\' "
+        f"OR name IN ({','.join('?' * len(_LOAD_TRIGGERS))}))", _LOAD_TRIGGERS).fetchall()
+    for name, _ in rows:
+        conn.execute(f"DROP TRIGGER {name}")
+    return [sql for _, sql in rows]
+
+
+def generate(db, cards, notes, years, note_kb=NOTE_KB, seed=1234, archive=True, progress=print):
+    """
+    Fill the (empty, initialised) database behind `db` with a collection.
+
+    Args:
+        db: an app's database module, already pointed at the target file
+        cards, notes: how many of each
+        years: length of the review history
+        note_kb: note body size
+        seed: the same seed and arguments give the same collection
+        archive: move reviews older than REVIEW_HOT_DAYS to the archive file
+        progress: called with a status line per stage (None for quiet)
+
+    Returns:
+        Dict of row counts and build seconds.
+    """
+    say = progress or (lambda _msg: None)
+    rng = random.Random(seed)
+    today = date.today().toordinal() - db.EPOCH_ORDINAL
+    first_day = today - int(years * 365)
+    start = time.perf_counter()
+
+    with db.get_connection() as conn:
+        if conn.execute("SELECT EXISTS (SELECT 1 FROM flashcards) OR EXISTS (SELECT 1 FROM notes)").fetchone()[0]:
+            raise ValueError(f"{db.DB_PATH} already has data; generate into a new file")
+    with db.transaction() as conn:
+        triggers = _drop_load_triggers(conn)
+
+    # Notes through add_note(), so bodies, FTS, fingerprints and tags are the app's own
+    note_days = sorted(rng.randint(first_day, today - 1) for _ in range(notes))
+    with db.transaction() as conn:
+        note_tags = []
+        for day, (title, content, tags) in zip(note_days, make_corpus(notes, note_kb, seed)):
+            note_id = db.add_note(title, content, tags)
+            stamp = _stamp(day, rng)
+            conn.execute("UPDATE notes SET created_at = ?, updated_at = ? WHERE id = ?", (stamp, stamp, note_id))
+            note_tags.append((note_id, day, tags))
+    say(f"  {notes:,} notes ({notes * note_kb / 1024:,.0f} MB of text) in {time.perf_counter() - start:.0f}s")
+
+    # Cards in creation order: each note's batch on its import day, hand-made ones in between
+    created = []  # (day, note_id, tags)
+    per_note = max(1, round(cards * (1 - UNLINKED_SHARE) / max(notes, 1)))
+    for note_id, day, tags in note_tags:
+        created += [(day, note_id, tags)] * rng.randint(per_note // 2, per_note * 3 // 2)
+    created = created[:cards]
+    while len(created) < cards:
+        created.append((rng.randint(first_day, today), None, ""))
+    created.sort(key=lambda c: c[0])
+
+    # Replay every day: review what is due, reschedule, skip the odd day
+    n = len(created)
+    ef, interval, reps, due = [2.5] * n, [0] * n, [0] * n, [0] * n
+    queue = {}
+    for i, (day, _, _) in enumerate(created):
+        queue.setdefault(day, []).append(i)
+        due[i] = day
+    review_rows, pomodoro_rows, reviews = [], [], 0
+    load_start = time.perf_counter()
+    with db.transaction() as conn:
+        conn.execute("PRAGMA defer_foreign_keys = ON")  # cards are inserted once their final state is known
+        for day in range(first_day, today):
+            todays = queue.pop(day, None)
+            if not todays:
+                continue
+            if rng.random() < DAY_OFF:
+                queue.setdefault(day + 1, []).extend(todays)
+                continue
+            day_rows = []
+            for i in todays:
+                rating = rng.randint(0, 2) if rng.random() < (FIRST_FAIL if reps[i] == 0 else FAIL) \
+                    else rng.choice(PASS_RATINGS)
+                ef[i], interval[i], reps[i] = _sm2(ef[i], interval[i], reps[i], rating)
+                due[i] = day + max(interval[i], 1)
+                queue.setdefault(due[i], []).append(i)
+                day_rows.append((i + 1, rating, _stamp(day, rng)))
+            day_rows.sort(key=lambda r: r[2])
+            review_rows += day_rows
+            for _ in range(rng.randint(0, 6)):
+                begun = datetime.fromisoformat(_stamp(day, rng))
+                pomodoro_rows.append(("work", 25, begun.isoformat(), (begun + timedelta(minutes=25)).isoformat()))
+            if len(review_rows) >= INSERT_BATCH:
+                reviews += len(review_rows)
+                conn.executemany("INSERT INTO review_log (card_id, rating, reviewed_at) VALUES (?, ?, ?)", review_rows)
+                review_rows = []
+        reviews += len(review_rows)
+        conn.executemany("INSERT INTO review_log (card_id, rating, reviewed_at) VALUES (?, ?, ?)", review_rows)
+        conn.executemany("INSERT INTO pomodoro_sessions (session_type, duration_minutes, started_at, finished_at) "
+                         "VALUES (?, ?, ?, ?)", pomodoro_rows)
+
+        card_rows = []
+        for i, (day, note_id, tags) in enumerate(created):
+            front, back = _card_text(rng, i + 1)
+            next_review = (date(1970, 1, 1) + timedelta(days=max(due[i], day))).isoformat()
+            card_rows.append((i + 1, note_id, front, back, tags, round(ef[i], 2), interval[i], reps[i],
+                              next_review, _stamp(day, rng)))
+            if len(card_rows) >= INSERT_BATCH or i == n - 1:
+                conn.executemany(
+                    "INSERT INTO flashcards (id, note_id, front, back, tags, easiness_factor, interval, "
+                    "repetitions, next_review, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", card_rows)
+                card_rows = []
+        # Cards carry their note's tags
+        conn.execute("INSERT OR IGNORE INTO card_tags (card_id, tag_id) "
+                     "SELECT f.id, nt.tag_id FROM flashcards f JOIN note_tags nt ON nt.note_id = f.note_id")
+        for sql in triggers:
+            conn.execute(sql)
+    say(f"  {n:,} cards, {reviews:,} reviews over {years:g} years in {time.perf_counter() - load_start:.0f}s")
+
+    db.rebuild_rollups()
+    archived = 0
+    if archive:
+        t0 = time.perf_counter()
+        archived = db.archive_reviews(db.REVIEW_HOT_DAYS)
+        say(f"  archived {archived:,} reviews in {time.perf_counter() - t0:.0f}s")
+    with db.get_connection() as conn:
+        conn.execute("ANALYZE")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    return {"cards": n, "notes": notes, "reviews": reviews, "archived_reviews": archived,
+            "pomodoro_sessions": len(pomodoro_rows), "years": years,
+            "build_s": round(time.perf_counter() - start, 1)}
+
+
+def file_mb(db) -> float:
+    return sum(os.path.getsize(p) for p in (db.DB_PATH, db.archive_path()) if os.path.exists(p)) / 1e6
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[1])
+    parser.add_argument("--size", choices=SIZES, default="10k")
+    parser.add_argument("--years", type=float, default=None, help="Override the size's review history")
+    parser.add_argument("--no-archive", action="store_true", help="Keep every review in the main file")
+    args = parser.parse_args()
+    if args.db and os.path.exists(args.db):
+        parser.error(f"{args.db} already exists")
+
+    db = load_app(args.app, args.db)
+    spec = dict(SIZES[args.size], **({"years": args.years} if args.years else {}))
+    print(f"Generating a {args.size} collection into {db.DB_PATH}")
+    summary = generate(db, seed=args.seed, archive=not args.no_archive, **spec)
+    print(f"Done in {summary['build_s']:.0f}s: {file_mb(db):,.0f} MB")
+    db.close_all_connections()
+
+
+if __name__ == "__main__":
+    main()
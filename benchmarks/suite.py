@@ -0,0 +1,256 @@
+"""
+suite.py — The database benchmark suite: database.py and srs_engine.py
+driven through what the app does, on a generated collection (see
+collection.py), with the results written as JSON to compare across commits.
+
+Scenarios, run in this order on a fresh copy of the collection:
+  due_cards      the review queue: all due, the first 20, with note titles, one tag
+  dashboard      get_dashboard_snapshot(), the streak, the week's stats, 7/30/365-day forecasts
+  search         search_notes() for a common term, a rare one, a prefix, two words, a miss
+  listings       the Notes and Flashcards tabs' listings
+  review_session reviewing due cards one at a time, as the review screen does
+  bulk_import    a lecture import: duplicate check, add_note(), 100 generated cards
+  delete         delete_flashcard() of reviewed cards and delete_note() of lectures
+                 with cards (FK cascades, archive purge queue, FTS, tags)
+
+Collections are cached per app, size, seed, schema and generator version
+under <temp>/studyforge-bench, so only the first run of a size pays for
+building it (about 10 s for 10k, two minutes for 100k, half an hour
+for 1m).
+
+Every case reports calls, mean_us, p50_us and p95_us. Results go to
+benchmarks/results/<time>-<commit>-<app>-<size>.json; --compare prints
+the p50 ratio of each case against an earlier file.
+
+Usage:
+    python benchmarks/suite.py [--size 10k|50k|100k|1m] [--only search,delete] [--compare OLD.json]
+"""
+
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from _common import REPO_ROOT, base_parser, load_app, time_calls, print_table
+import collection
+
+SUITE_VERSION = 1
+RESULTS_DIR = os.path.join(REPO_ROOT, "benchmarks", "results")
+CACHE_DIR = os.path.join(tempfile.gettempdir(), "studyforge-bench")
+REGRESSION = 1.10  # --compare flags cases at least this much slower
+
+
+# ── Scenarios ────────────────────────────────────────────────────
+# Each takes (db, srs_engine, rng, calls) and returns {case: time_calls() dict}.
+
+def due_cards(db, srs_engine, rng, calls):
+    tag = db.get_tag_counts()[0]["name"]
+    return {
+        "all": time_calls(db.get_due_cards, calls),
+        "first_20": time_calls(lambda: db.get_due_cards(limit=20), calls),
+        "with_topics": time_calls(db.get_due_cards_with_topics, calls),
+        "one_tag": time_calls(lambda: db.get_due_cards(tags=[tag]), calls),
+    }
+
+
+def dashboard(db, srs_engine, rng, calls):
+    return {
+        "snapshot": time_calls(lambda: db.get_dashboard_snapshot(forecast_days=7), calls),
+        "streak": time_calls(db.get_streak, calls),
+        "week_stats": time_calls(lambda: db.get_stats_range(7), calls),
+        **{f"forecast_{days}": time_calls(lambda d=days: db.get_review_forecast(d), calls) for days in (7, 30, 365)},
+    }
+
+
+def search(db, srs_engine, rng, calls):
+    return {label: time_calls(lambda q=query: db.search_notes(q), calls)
+            for label, query in (("common", "negligence"), ("rare", "palsgraf"), ("prefix", "estop"),
+                                 ("two_words", "duty breach"), ("miss", "no-such-word"))}
+
+
+def listings(db, srs_engine, rng, calls):
+    return {
+        "list_notes": time_calls(db.list_notes, calls),
+        "note_titles": time_calls(db.get_note_titles, calls),
+        "tag_counts": time_calls(db.get_tag_counts, calls),
+        "all_flashcards": time_calls(db.get_all_flashcards, max(3, calls // 5)),
+    }
+
+
+def review_session(db, srs_engine, rng, calls):
+    reviews = calls * 10
+    queue = db.get_due_cards_with_topics(limit=reviews)
+    if len(queue) < reviews:  # a small collection's queue runs dry; keep reviewing older cards
+        with db.get_connection() as conn:
+            queue += [dict(r) for r in conn.execute("SELECT * FROM flashcards ORDER BY due_day LIMIT ?",
+                                                    (reviews - len(queue),))]
+    cards = iter(queue)
+    t0 = time.perf_counter()
+    result = time_calls(lambda: srs_engine.review_card(next(cards), rng.choice((1, 3, 4, 4, 5))), reviews)
+    result["reviews_per_s"] = reviews / (time.perf_counter() - t0)
+    return {"review_card": result}
+
+
+def bulk_import(db, srs_engine, rng, calls):
+    docs = iter(list(collection.make_corpus(calls, collection.NOTE_KB, rng.randrange(1 << 30))))
+
+    def import_lecture():
+        title, content, tags = next(docs)
+        db.find_duplicates("notes", content)
+        note_id = db.add_note(title, content, tags)
+        cards = [{"front": f"{title} Q{i}?", "back": "A " * rng.randint(10, 80), "tags": tags} for i in range(100)]
+        db.add_flashcards_bulk(cards, note_id=note_id)
+
+    lecture = time_calls(import_lecture, calls)
+    lecture["cards_per_s"] = 100 / (lecture["mean_us"] / 1e6)
+    existing = db.get_note(rng.choice(db.get_note_titles())["id"])["content"]
+    return {
+        "lecture_with_100_cards": lecture,
+        "find_duplicates_of_existing": time_calls(lambda: db.find_duplicates("notes", existing), calls),
+    }
+
+
+def delete(db, srs_engine, rng, calls):
+    with db.get_connection() as conn:
+        reviewed = [r[0] for r in conn.execute(
+            "SELECT id FROM flashcards WHERE repetitions > 0 ORDER BY random() LIMIT ?", (calls,))]
+        notes = [r[0] for r in conn.execute(
+            "SELECT DISTINCT note_id FROM flashcards WHERE note_id IS NOT NULL ORDER BY random() LIMIT ?", (calls,))]
+    cards, lectures = iter(reviewed), iter(notes)
+    return {
+        "flashcard_with_history": time_calls(lambda: db.delete_flashcard(next(cards)), len(reviewed)),
+        "note_with_cards": time_calls(lambda: db.delete_note(next(lectures)), len(notes)),
+    }
+
+
+SCENARIOS = {f.__name__: f for f in (due_cards, dashboard, search, listings, review_session, bulk_import, delete)}
+
+
+# ── Collections, results and comparison ──────────────────────────
+
+def prepare_collection(app, size, seed, rebuild=False):
+    """
+    Path of a fresh working copy of the cached collection, building the
+    collection first if there is none.
+
+    Returns:
+        (working copy path, the collection's generate() summary)
+    """
+    sys.path.insert(0, os.path.join(REPO_ROOT, app))
+    import migrations
+    cached = os.path.join(CACHE_DIR, f"{app}-{size}-s{seed}-v{migrations.SCHEMA_VERSION}-g{collection.GENERATOR_VERSION}")
+    if rebuild and os.path.isdir(cached):
+        shutil.rmtree(cached)
+    if not os.path.isdir(cached):
+        print(f"Building the {size} collection into {cached} ...")
+        building = cached + ".partial"
+        shutil.rmtree(building, ignore_errors=True)
+        db = load_app(app, os.path.join(building, "collection.db"))
+        summary = collection.generate(db, seed=seed, **collection.SIZES[size])
+        db.close_all_connections()
+        with open(os.path.join(building, "summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+        os.replace(building, cached)  # only a finished build is ever used
+    with open(os.path.join(cached, "summary.json")) as f:
+        summary = json.load(f)
+
+    workdir = tempfile.mkdtemp(prefix="studyforge-suite-")
+    for name in ("collection.db", "collection_archive.db"):
+        if os.path.exists(os.path.join(cached, name)):
+            shutil.copyfile(os.path.join(cached, name), os.path.join(workdir, name))
+    return os.path.join(workdir, "collection.db"), summary
+
+
+def git_state():
+    """(short commit, whether the tree has uncommitted changes), or (None, None) outside git."""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT,
+                                capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=REPO_ROOT,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def compare(old, new):
+    """One row per case present in both result files: p50 before and after, and their ratio."""
+    rows = []
+    for scenario, cases in new["results"].items():
+        for case, result in cases.items():
+            before = old["results"].get(scenario, {}).get(case)
+            if before is None:
+                continue
+            ratio = result["p50_us"] / max(before["p50_us"], 1e-9)
+            rows.append({"case": f"{scenario}.{case}", "old_p50_us": before["p50_us"],
+                         "new_p50_us": result["p50_us"], "ratio": f"{ratio:.2f}x",
+                         "change": "slower" if ratio >= REGRESSION else "faster" if ratio <= 1 / REGRESSION else ""})
+    return rows
+
+
+def main():
+    parser = base_parser(__doc__.splitlines()[1])
+    parser.add_argument("--size", choices=collection.SIZES, default="10k")
+    parser.add_argument("--calls", type=int, default=20, help="Calls per case (review_session does 10x)")
+    parser.add_argument("--only", default=None, help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--out", default=None, help="Result file (default: benchmarks/results/...)")
+    parser.add_argument("--compare", default=None, help="Earlier result file to compare against")
+    parser.add_argument("--rebuild", action="store_true", help="Regenerate the cached collection")
+    args = parser.parse_args()
+    requested = set(args.only.split(",")) if args.only else set(SCENARIOS)
+    if requested - set(SCENARIOS):
+        parser.error(f"unknown scenarios: {', '.join(sorted(requested - set(SCENARIOS)))}")
+    only = [name for name in SCENARIOS if name in requested]  # always in suite order
+    if args.db:
+        parser.error("the suite runs on its generated collection; use --size")
+
+    path, generated = prepare_collection(args.app, args.size, args.seed, args.rebuild)
+    db = load_app(args.app, path)
+    import srs_engine
+    commit, dirty = git_state()
+    report = {
+        "suite_version": SUITE_VERSION,
+        "app": args.app, "size": args.size, "seed": args.seed, "calls": args.calls,
+        "commit": commit, "dirty": dirty,
+        "started_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(), "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "collection": dict(generated, file_mb=round(collection.file_mb(db), 1)),
+        "results": {},
+    }
+    for name in only:
+        # Same seed per scenario, so a subset run makes the same calls as a full one
+        result = SCENARIOS[name](db, srs_engine, random.Random(f"{args.seed}-{name}"), args.calls)
+        report["results"][name] = result
+        extra = sorted({k for r in result.values() for k in r} - {"calls", "mean_us", "p50_us", "p95_us"})
+        print_table(f"{name} ({args.app}, {args.size})",
+                    [{"case": case, "mean_us": r["mean_us"], "p50_us": r["p50_us"], "p95_us": r["p95_us"],
+                      **{k: r.get(k, "") for k in extra}} for case, r in result.items()])
+    db.close_all_connections()
+    shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    out = args.out or os.path.join(
+        RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}-{commit or 'nogit'}{'-dirty' if dirty else ''}"
+                     f"-{args.app}-{args.size}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        if (old.get("app"), old.get("size"), old.get("seed")) != (args.app, args.size, args.seed):
+            print(f"Note: {args.compare} is {old.get('app')} / {old.get('size')} / seed {old.get('seed')}")
+        print_table(f"p50 vs. {old.get('commit')} ({os.path.basename(args.compare)})", compare(old, report))
+
+
+if __name__ == "__main__":
+    main()
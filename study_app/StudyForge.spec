@@ -36,7 +36,15 @@ hiddenimports = [
     # Core app modules
     "paths",
     "database",
+    "migrations",
     "srs_engine",
+    "fsrs",
+    "simulator",
+    "review_writer",
+    "maintenance",
+    "backup",
+    "instrumentation",
+    "dedupe",
     "claude_client",
     "ui",
     "ui.app",
@@ -105,7 +113,7 @@ a = Analysis(
     hooksconfig={},
     runtime_hooks=[],
     excludes=[
-        "matplotlib", "numpy", "scipy", "pandas",
+        "matplotlib", "scipy", "pandas",  # numpy ships: fsrs.fit() and simulator.py need it
         "pytest", "setuptools", "pip",
     ],
     win_no_prefer_redirects=False,
@@ -0,0 +1,242 @@
+"""
+backup.py — Online snapshots of the StudyForge database.
+
+create_snapshot() copies the live database (and the review archive) with
+SQLite's online backup API on a dedicated connection, `pages` at a time
+with a short pause between batches. In WAL mode that connection only ever
+reads, so the UI keeps committing while it runs. A commit from another
+connection between two batches makes SQLite restart the copy; after
+MAX_RESTARTS of those the rest is copied in one step, i.e. one read
+transaction, which in WAL mode still lets writers through. The copies are then deflated into one
+studyforge-YYYYmmdd-HHMMSS.zip in the backups folder, and only the newest
+`keep` snapshots are kept.
+
+The scheduler takes a snapshot on a worker thread whenever the newest one
+is older than `interval_hours`. restore_snapshot() puts a snapshot back; it
+replaces the files, so it must run before any connection is opened
+(`python main.py --restore <snapshot>`).
+"""
+
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import zipfile
+from datetime import datetime
+
+import database as db
+
+BACKUP_DIR_NAME = "backups"
+SNAPSHOT_RE = re.compile(r"^studyforge-(\d{8}-\d{6})(?:-(\d+))?\.zip$")
+MAX_RESTARTS = 3
+
+_active = None  # the running BackupScheduler, if scheduled backups are on
+
+
+def default_backup_dir():
+    return os.path.join(db.DB_DIR, BACKUP_DIR_NAME)
+
+
+class _Restarting(Exception):
+    """Raised from the progress callback to abandon a batched copy."""
+
+
+def _copy(source, dest, pages, pause):
+    """Backup-API copy of `source` into a new file `dest`. Returns step statistics."""
+    stats = {"steps": 0, "restarts": 0, "max_step_ms": 0.0}
+    remaining_before = None
+    step_start = time.perf_counter()
+
+    def progress(_status, remaining, _total):
+        nonlocal remaining_before, step_start
+        now = time.perf_counter()
+        stats["steps"] += 1
+        stats["max_step_ms"] = max(stats["max_step_ms"], (now - step_start - pause) * 1000)
+        if remaining_before is not None and remaining > remaining_before:
+            stats["restarts"] += 1
+            if stats["restarts"] > MAX_RESTARTS:
+                raise _Restarting()
+        remaining_before, step_start = remaining, now
+
+    src = sqlite3.connect(source)
+    dst = sqlite3.connect(dest)
+    try:
+        try:
+            src.backup(dst, pages=pages, progress=progress, sleep=pause)
+        except _Restarting:
+            step_start = time.perf_counter() + pause
+            src.backup(dst, pages=-1, progress=progress)
+    finally:
+        dst.close()
+        src.close()
+    return stats
+
+
+def create_snapshot(backup_dir=None, keep=7, pages=256, pause=0.005):
+    """
+    Snapshot the database and review archive into one compressed file.
+
+    Args:
+        backup_dir: where snapshots go (default: <data dir>/backups)
+        keep: how many snapshots to keep, newest first; 0 keeps all
+        pages: pages copied per backup step
+        pause: seconds between steps, letting writers in
+
+    Returns:
+        Dict with path, bytes (uncompressed), compressed_bytes, seconds,
+        copy_seconds, mb_per_s (copy throughput), steps, restarts and
+        max_step_ms (the longest single backup step).
+    """
+    backup_dir = backup_dir or default_backup_dir()
+    os.makedirs(backup_dir, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    # Several in one second (e.g. restore's undo snapshot) are numbered in order
+    same = [int(m.group(2) or 1) for m in map(SNAPSHOT_RE.match, os.listdir(backup_dir))
+            if m and m.group(1) == stamp]
+    path = os.path.join(backup_dir, f"studyforge-{stamp}{f'-{max(same) + 1}' if same else ''}.zip")
+    result = {"path": path, "bytes": 0, "steps": 0, "restarts": 0, "max_step_ms": 0.0}
+
+    start = time.perf_counter()
+    with tempfile.TemporaryDirectory(dir=backup_dir) as tmp:
+        copies = []
+        for source in (db.DB_PATH, db.archive_path()):
+            if not os.path.exists(source):
+                continue
+            dest = os.path.join(tmp, os.path.basename(source))
+            stats = _copy(source, dest, pages, pause)
+            result["steps"] += stats["steps"]
+            result["restarts"] += stats["restarts"]
+            result["max_step_ms"] = max(result["max_step_ms"], stats["max_step_ms"])
+            result["bytes"] += os.path.getsize(dest)
+            copies.append(dest)
+        result["copy_seconds"] = time.perf_counter() - start
+
+        partial = path + ".partial"
+        with zipfile.ZipFile(partial, "w", zipfile.ZIP_DEFLATED) as zf:
+            for dest in copies:
+                zf.write(dest, os.path.basename(dest))
+        os.replace(partial, path)
+
+    result["compressed_bytes"] = os.path.getsize(path)
+    result["seconds"] = time.perf_counter() - start
+    result["mb_per_s"] = result["bytes"] / 1e6 / max(result["copy_seconds"], 1e-9)
+    if keep:
+        for old in list_snapshots(backup_dir)[keep:]:
+            os.remove(old["path"])
+    return result
+
+
+def list_snapshots(backup_dir=None):
+    """Snapshots in `backup_dir`, newest first, as dicts with path, created and size."""
+    backup_dir = backup_dir or default_backup_dir()
+    if not os.path.isdir(backup_dir):
+        return []
+    snapshots = []
+    for name in os.listdir(backup_dir):
+        match = SNAPSHOT_RE.match(name)
+        if match:
+            path = os.path.join(backup_dir, name)
+            snapshots.append({"path": path, "size": os.path.getsize(path),
+                              "created": datetime.strptime(match.group(1), "%Y%m%d-%H%M%S"),
+                              "_n": int(match.group(2) or 1)})
+    snapshots.sort(key=lambda s: (s["created"], s.pop("_n")), reverse=True)
+    return snapshots
+
+
+def restore_snapshot(path):
+    """
+    Replace the database (and archive) with the contents of snapshot `path`.
+
+    Closes this process's pooled connections first; other processes must
+    not have the database open. The current files are snapshotted before
+    they are replaced, so a restore can itself be undone. Restoring an
+    older snapshot is fine: init_db() migrates it on the next start.
+
+    Returns:
+        Path of the snapshot taken of the replaced files.
+    """
+    with zipfile.ZipFile(path) as zf:
+        names = zf.namelist()
+        main_names = [n for n in names if not n.endswith("_archive.db")]
+        archive_names = [n for n in names if n.endswith("_archive.db")]
+        if (len(main_names) != 1 or len(archive_names) > 1
+                or any(not n.endswith(".db") or zf.open(n).read(16) != b"SQLite format 3\0" for n in names)):
+            raise ValueError(f"{path} is not a StudyForge snapshot")
+        db.close_all_connections()
+        undo = create_snapshot(keep=0)["path"]
+        with tempfile.TemporaryDirectory(dir=db.DB_DIR) as tmp:
+            for target, name in ((db.DB_PATH, main_names[0]),
+                                 (db.archive_path(), archive_names[0] if archive_names else None)):
+                # A leftover -wal would be replayed into the restored file; an
+                # archive newer than the snapshot goes too
+                for stale in (target + "-wal", target + "-shm") + (() if name else (target,)):
+                    if os.path.exists(stale):
+                        os.remove(stale)
+                if name:
+                    os.replace(zf.extract(name, tmp), target)
+    return undo
+
+
+class BackupScheduler:
+    def __init__(self, interval_hours=24, keep=7, backup_dir=None):
+        self.interval = max(0.01, float(interval_hours)) * 3600
+        self.keep = keep
+        self.backup_dir = backup_dir
+        self.last_result = None
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="db-backup", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the worker, letting a running snapshot finish."""
+        self._stopping.set()
+        self._thread.join()
+
+    def run_now(self):
+        """Take one snapshot on the calling thread and log it."""
+        try:
+            result = create_snapshot(self.backup_dir, self.keep)
+        except Exception as e:
+            print(f"[StudyForge] Backup failed, will retry later: {e}")
+            return None
+        self.last_result = result
+        print(f"[StudyForge] Backup {os.path.basename(result['path'])}: "
+              f"{result['bytes'] / 1e6:.1f} MB at {result['mb_per_s']:.1f} MB/s, "
+              f"longest step {result['max_step_ms']:.1f} ms, "
+              f"{result['compressed_bytes'] / 1e6:.1f} MB compressed")
+        return result
+
+    def _due(self) -> bool:
+        snapshots = list_snapshots(self.backup_dir)
+        return not snapshots or (datetime.now() - snapshots[0]["created"]).total_seconds() >= self.interval
+
+    # ── Worker thread ────────────────────────────────────────────
+
+    def _run(self):
+        # Let startup finish before the first check
+        while not self._stopping.wait(min(60, self.interval)):
+            if self._due():
+                self.run_now()
+
+
+def start(interval_hours=24, keep=7, backup_dir=None):
+    """Turn scheduled backups on."""
+    global _active
+    if _active is None:
+        _active = BackupScheduler(interval_hours, keep, backup_dir)
+    return _active
+
+
+def active():
+    """The running BackupScheduler, or None when scheduled backups are off."""
+    return _active
+
+
+def stop():
+    """Shut scheduled backups down."""
+    global _active
+    if _active is not None:
+        _active.stop()
+        _active = None
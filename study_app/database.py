@@ -1,14 +1,21 @@
 """
 database.py — SQLite database manager for StudyForge.
 Handles flashcards, notes, sessions, and stats.
-All connections use context managers to prevent leaks.
+All connections use context managers to prevent leaks; the underlying
+sqlite3 connections are pooled per thread and closed on app exit.
 """
 
 import sqlite3
 import os
-from datetime import datetime, date
+import re
+import threading
+import time
+import atexit
+from datetime import datetime, date, timedelta
 from contextlib import contextmanager
 from paths import get_db_dir, get_db_path
+import migrations
+import dedupe
 
 DB_DIR = get_db_dir()
 DB_PATH = get_db_path()
@@ -19,129 +26,618 @@ VALID_STAT_FIELDS = frozenset({
     "study_minutes", "quiz_questions_answered"
 })
 
-
-@contextmanager
-def get_connection():
-    """Context manager for safe database connections."""
+# flashcards.due_day / review_log.review_day are epoch days:
+# date.toordinal() - EPOCH_ORDINAL
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+# Markers wrapped around matched words in search_notes() snippets
+SNIPPET_START, SNIPPET_END = "«", "»"
+_FTS_TERM_RE = re.compile(r"\w+")
+
+# Columns list_notes() can return — everything except the note body
+NOTE_LIST_COLUMNS = ("id", "title", "tags", "source_file", "created_at", "updated_at")
+
+
+# ── Performance Profiles ─────────────────────────────────────────
+# Named pragma sets, picked with the "performance_profile" config key and
+# applied once when each pooled connection is opened. page_size only takes
+# effect when the database file is first created.
+
+PERFORMANCE_PROFILES = {
+    # fsync on every commit, small caches
+    "safe": {
+        "synchronous": "FULL", "mmap_size": 0, "cache_size": -2000,
+        "temp_store": "DEFAULT", "page_size": 4096, "wal_autocheckpoint": 1000,
+    },
+    # WAL + NORMAL never corrupts; a power cut may lose the last commits
+    "balanced": {
+        "synchronous": "NORMAL", "mmap_size": 64 * 1024 * 1024, "cache_size": -16000,
+        "temp_store": "MEMORY", "page_size": 4096, "wal_autocheckpoint": 1000,
+    },
+    # No fsync at all: an OS crash or power cut can lose or corrupt recent data
+    "fast": {
+        "synchronous": "OFF", "mmap_size": 256 * 1024 * 1024, "cache_size": -64000,
+        "temp_store": "MEMORY", "page_size": 8192, "wal_autocheckpoint": 4000,
+    },
+}
+DEFAULT_PROFILE = "balanced"
+_profile = DEFAULT_PROFILE
+
+
+def set_performance_profile(name):
+    """Select a PERFORMANCE_PROFILES entry; pooled connections reopen with it."""
+    global _profile
+    if name not in PERFORMANCE_PROFILES:
+        raise ValueError(f"Unknown performance profile: {name}. Must be one of: {tuple(PERFORMANCE_PROFILES)}")
+    if name != _profile:
+        _profile = name
+        close_all_connections()
+
+
+def get_performance_profile():
+    """Name of the PERFORMANCE_PROFILES entry in use."""
+    return _profile
+
+
+# ── Connection Management ────────────────────────────────────────
+# Each thread keeps one long-lived connection, opened lazily on first use.
+# Pragmas are applied once when the connection is opened instead of on
+# every call. Connections owned by worker threads that have since exited
+# are closed the next time a new connection is registered, so the pool
+# stays bounded by the number of live threads.
+
+_local = threading.local()
+_registry_lock = threading.Lock()
+_connections = {}  # threading.Thread -> sqlite3.Connection
+_generation = 0    # bumped by close_all_connections() to invalidate handles
+_connection_factory = sqlite3.Connection  # instrumentation.py swaps in its timing subclass
+
+
+def _open_connection():
+    """Open a new connection to DB_PATH and apply the active profile's pragmas."""
     os.makedirs(DB_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    profile = PERFORMANCE_PROFILES[_profile]
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, factory=_connection_factory)
     conn.row_factory = sqlite3.Row
+    migrations.register_functions(conn)  # body_text(), used by the LIKE search fallback
+    conn.execute(f"PRAGMA page_size={profile['page_size']}")  # must precede WAL on a new file
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")  # persists only on a new file
     conn.execute("PRAGMA journal_mode=WAL")
+    for pragma in ("synchronous", "mmap_size", "cache_size", "temp_store", "wal_autocheckpoint"):
+        conn.execute(f"PRAGMA {pragma}={profile[pragma]}")
     conn.execute("PRAGMA foreign_keys=ON")
+    if migrations.get_version(conn) == migrations.SCHEMA_VERSION:
+        _attach_archive(conn)  # otherwise init_db() attaches it after migrating
+    return conn
+
+
+# Old review_log rows live in a second file next to DB_PATH, attached to
+# every connection as `archive` (see archive_reviews()). These TEMP views
+# are per connection, since main-file objects can't refer to an attached
+# database:
+#   review_history  every review, hot and archived, with the same columns
+#                   as review_log (minus archived rows of deleted cards)
+#   review_days     (card_id, review_day, reviews, lapses, rating_sum):
+#                   hot rows grouped plus review_rollup; a day being
+#                   archived can appear in both halves, so always SUM()
+_TIER_SQL = """
+    CREATE TEMP VIEW IF NOT EXISTS review_history AS
+        SELECT id, card_id, rating, reviewed_at, reviewed_ts, review_day FROM main.review_log
+        UNION ALL
+        SELECT id, card_id, rating, reviewed_at, reviewed_ts, review_day FROM archive.review_log
+        WHERE id < (SELECT IFNULL(MIN(id), 9223372036854775807) FROM main.review_log)
+            AND card_id NOT IN (SELECT card_id FROM main.archive_purge);
+    CREATE TEMP VIEW IF NOT EXISTS review_days AS
+        SELECT card_id, review_day, COUNT(*) AS reviews, SUM(rating < 3) AS lapses, SUM(rating) AS rating_sum
+        FROM main.review_log GROUP BY card_id, review_day
+        UNION ALL
+        SELECT card_id, review_day, reviews, lapses, rating_sum FROM main.review_rollup;
+"""
+
+
+def archive_path():
+    """The review archive file, next to DB_PATH."""
+    return os.path.splitext(DB_PATH)[0] + "_archive.db"
+
+
+def _attach_archive(conn):
+    """Attach (creating or upgrading) the review archive and create _TIER_SQL."""
+    conn.execute("ATTACH DATABASE ? AS archive", (archive_path(),))
+    conn.execute("PRAGMA archive.auto_vacuum=INCREMENTAL")
+    conn.execute("PRAGMA archive.journal_mode=WAL")
+    conn.execute(f"PRAGMA archive.synchronous={PERFORMANCE_PROFILES[_profile]['synchronous']}")
+    migrations.migrate_archive(conn)
+    conn.executescript(_TIER_SQL)
+
+
+def _reap_dead_connections():
+    """Close connections whose owning thread has exited. Caller holds the lock."""
+    for thread in [t for t in _connections if not t.is_alive()]:
+        try:
+            _connections.pop(thread).close()
+        except sqlite3.Error:
+            pass
+
+
+def _thread_connection():
+    """Return the calling thread's connection, opening it if needed."""
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.generation == _generation and _local.path == DB_PATH:
+        return conn
+
+    thread = threading.current_thread()
+    with _registry_lock:
+        stale = _connections.pop(thread, None)
+        if stale is not None:
+            stale.close()
+        _reap_dead_connections()
+        conn = _open_connection()
+        _connections[thread] = conn
+        _local.conn = conn
+        _local.generation = _generation
+        _local.path = DB_PATH
+    return conn
+
+
+def close_all_connections():
+    """
+    Close every pooled connection. Called on app exit; also safe to call
+    after changing DB_PATH so the next call reopens against the new file.
+    """
+    global _generation
+    with _registry_lock:
+        for conn in _connections.values():
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _connections.clear()
+        _generation += 1
+    _local.conn = None
+
+
+atexit.register(close_all_connections)
+
+
+@contextmanager
+def get_connection():
+    """
+    Context manager yielding the calling thread's pooled connection.
+    Commits on success and rolls back on error; the connection itself
+    stays open for reuse by later calls on the same thread.
+
+    Nested use (including inside transaction()) joins the outermost
+    block: only the outermost exit commits or rolls back.
+    """
+    conn = _thread_connection()
+    depth = getattr(_local, "depth", 0)
+    _local.depth = depth + 1
     try:
         yield conn
-        conn.commit()
+        if depth == 0:
+            conn.commit()
     except Exception:
-        conn.rollback()
+        if depth == 0:
+            conn.rollback()
         raise
     finally:
-        conn.close()
+        _local.depth = depth
+
+
+@contextmanager
+def transaction():
+    """
+    Unit of work: every database call made inside the block runs in one
+    transaction and is committed once, atomically, at the end. Any
+    exception rolls the whole block back.
+
+        with transaction():
+            update_flashcard_srs(...)
+            log_review(...)
+
+    The write lock is taken up front (BEGIN IMMEDIATE), so the block can't
+    fail half-way with SQLITE_BUSY when upgrading from a read.
+    """
+    with get_connection() as conn:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        yield conn
 
 
 def init_db():
+    """Create the schema or upgrade an existing database in place."""
     with get_connection() as conn:
-        c = conn.cursor()
-
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS notes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL,
-                content TEXT NOT NULL,
-                tags TEXT DEFAULT '',
-                source_file TEXT DEFAULT '',
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL
-            )
-        """)
+        old, new = migrations.migrate(conn)
+        if "archive" not in {row[1] for row in conn.execute("PRAGMA database_list")}:
+            _attach_archive(conn)
+    if old != new:
+        print(f"[StudyForge] Database schema upgraded v{old} → v{new}")
 
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS flashcards (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                note_id INTEGER,
-                front TEXT NOT NULL,
-                back TEXT NOT NULL,
-                tags TEXT DEFAULT '',
-                easiness_factor REAL DEFAULT 2.5,
-                interval INTEGER DEFAULT 0,
-                repetitions INTEGER DEFAULT 0,
-                next_review TEXT NOT NULL,
-                created_at TEXT NOT NULL,
-                FOREIGN KEY (note_id) REFERENCES notes(id) ON DELETE SET NULL
-            )
-        """)
 
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS review_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                card_id INTEGER NOT NULL,
-                rating INTEGER NOT NULL,
-                reviewed_at TEXT NOT NULL,
-                FOREIGN KEY (card_id) REFERENCES flashcards(id) ON DELETE CASCADE
-            )
-        """)
+# ── Maintenance ──────────────────────────────────────────────────
 
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS pomodoro_sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_type TEXT NOT NULL,
-                duration_minutes INTEGER NOT NULL,
-                completed INTEGER DEFAULT 1,
-                started_at TEXT NOT NULL,
-                finished_at TEXT NOT NULL
-            )
-        """)
+VACUUM_CHUNK_PAGES = 256   # pages freed per incremental_vacuum step
+ANALYSIS_LIMIT = 1000      # rows ANALYZE samples per index, bounding its cost
 
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS daily_stats (
-                date TEXT PRIMARY KEY,
-                cards_reviewed INTEGER DEFAULT 0,
-                cards_added INTEGER DEFAULT 0,
-                pomodoro_sessions INTEGER DEFAULT 0,
-                study_minutes INTEGER DEFAULT 0,
-                quiz_questions_answered INTEGER DEFAULT 0
-            )
-        """)
 
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS hypotheticals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                note_id INTEGER, title TEXT NOT NULL, scenario TEXT NOT NULL,
-                response TEXT DEFAULT '', grade TEXT DEFAULT '',
-                feedback TEXT DEFAULT '', created_at TEXT NOT NULL,
-                FOREIGN KEY (note_id) REFERENCES notes(id) ON DELETE SET NULL
-            )
-        """)
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
 
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS essays (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                note_id INTEGER, title TEXT NOT NULL, prompt TEXT NOT NULL,
-                content TEXT DEFAULT '', rubric_id INTEGER,
-                grade TEXT DEFAULT '', feedback TEXT DEFAULT '',
-                created_at TEXT NOT NULL, updated_at TEXT NOT NULL,
-                FOREIGN KEY (note_id) REFERENCES notes(id) ON DELETE SET NULL,
-                FOREIGN KEY (rubric_id) REFERENCES rubrics(id) ON DELETE SET NULL
-            )
-        """)
 
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS rubrics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL, content TEXT NOT NULL,
-                source_file TEXT DEFAULT '', created_at TEXT NOT NULL
-            )
-        """)
+def run_maintenance(keep_going=lambda: True, archive_after_days=None, change_keep_days=None):
+    """
+    Archive old reviews, prune the change journal, hand free pages back to the filesystem, refresh
+    the query planner's statistics and checkpoint the WAL. Run by the
+    idle-time scheduler in maintenance.py, whose `keep_going` callback stops
+    the work between steps (and between batches and vacuum chunks) once the
+    user is active again.
+
+    Databases created before auto_vacuum=INCREMENTAL are converted with one
+    full VACUUM, but only once free pages make up a tenth of the file (and
+    at least 1 MB). The checkpoint always runs, last, so the frames written
+    by the other steps are moved into the database and the -wal file is
+    truncated to zero bytes when no reader is still using it.
+
+    Args:
+        archive_after_days: passed to archive_reviews() (default REVIEW_HOT_DAYS)
+        change_keep_days: passed to prune_changes() (default CHANGE_KEEP_DAYS)
+
+    Returns:
+        Dict with seconds, archived (reviews moved), changes_pruned, wal_bytes_freed and
+        file_bytes_freed (both files; archiving moves bytes rather than
+        freeing them), vacuum ("incremental", "full" or None), analyzed,
+        wal_truncated and completed (False when keep_going() stopped it).
+    """
+    start = time.perf_counter()
+    files = (DB_PATH, archive_path())
+    wal_before = sum(_file_size(f + "-wal") for f in files)
+    file_before = sum(_file_size(f) for f in files)
+    result = {"archived": 0, "changes_pruned": 0, "vacuum": None, "analyzed": False,
+              "wal_truncated": False, "completed": False}
+
+    if keep_going():
+        result["archived"] = archive_reviews(
+            REVIEW_HOT_DAYS if archive_after_days is None else archive_after_days, keep_going)
+    if keep_going():
+        result["changes_pruned"] = prune_changes(
+            CHANGE_KEEP_DAYS if change_keep_days is None else change_keep_days, keep_going)
+    with get_connection() as conn:
+        if keep_going():
+            auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+            page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+            free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            pages = conn.execute("PRAGMA page_count").fetchone()[0]
+            if auto_vacuum == 2:
+                while free and keep_going():
+                    conn.execute(f"PRAGMA incremental_vacuum({VACUUM_CHUNK_PAGES})").fetchall()
+                    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                result["vacuum"] = "incremental"
+            elif free * 10 >= pages and free * page_size >= 1 << 20:
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                conn.execute("VACUUM")
+                result["vacuum"] = "full"
+        if keep_going():
+            conn.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+            conn.execute("ANALYZE")
+            conn.execute("PRAGMA optimize")
+            result["analyzed"] = True
+        result["completed"] = keep_going()
+
+        # PASSIVE never waits on the UI's connections; TRUNCATE only runs
+        # once the whole log is in the database. Both cover the archive too.
+        busy, log, done = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        if not busy and log == done:
+            busy = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()[0]
+            result["wal_truncated"] = not busy
+
+    result["wal_bytes_freed"] = wal_before - sum(_file_size(f + "-wal") for f in files)
+    result["file_bytes_freed"] = file_before - sum(_file_size(f) for f in files)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+# ── Review Archive ───────────────────────────────────────────────
+
+REVIEW_HOT_DAYS = 180   # review_log rows younger than this stay in the main file
+ARCHIVE_BATCH = 20000   # rows moved per batch
+
+
+def archive_reviews(older_than_days=REVIEW_HOT_DAYS, keep_going=lambda: True):
+    """
+    Move review_log rows older than `older_than_days` to the archive file,
+    folding them into review_rollup's per-card/per-day counts on the way.
+
+    Each batch commits twice: the copy into the archive first (idempotent),
+    then the rollup and the delete from review_log together. Rows move in
+    id order, so archived ids are always below the main file's smallest,
+    which is how review_history hides the copies a crash between the two
+    commits would leave behind; the next run finishes that batch. Archived
+    rows of cards deleted since the last run (queued in archive_purge) are
+    deleted first.
+
+    Returns:
+        Number of reviews archived.
+    """
+    cutoff = date.today().toordinal() - EPOCH_ORDINAL - older_than_days
+    with transaction() as conn:
+        conn.execute("DELETE FROM archive.review_log WHERE card_id IN (SELECT card_id FROM main.archive_purge)")
+        conn.execute("DELETE FROM archive_purge")
+    with get_connection() as conn:
+        last = conn.execute("SELECT MAX(id) FROM review_log WHERE review_day < ?", (cutoff,)).fetchone()[0]
+    moved = 0
+    while last is not None and keep_going():
+        with get_connection() as conn:
+            row = conn.execute("SELECT id FROM review_log WHERE id <= ? ORDER BY id LIMIT 1 OFFSET ?",
+                               (last, ARCHIVE_BATCH - 1)).fetchone()
+        upto = row[0] if row else last
+        with transaction() as conn:
+            conn.execute("""
+                INSERT OR IGNORE INTO archive.review_log (id, card_id, rating, reviewed_at)
+                SELECT id, card_id, rating, reviewed_at FROM main.review_log WHERE id <= ?
+            """, (upto,))
+        with transaction() as conn:
+            conn.execute("""
+                INSERT INTO review_rollup (card_id, review_day, reviews, lapses, rating_sum)
+                SELECT card_id, review_day, COUNT(*), SUM(rating < 3), SUM(rating)
+                FROM main.review_log WHERE id <= ? GROUP BY card_id, review_day
+                ON CONFLICT(card_id, review_day) DO UPDATE SET
+                    reviews = reviews + excluded.reviews,
+                    lapses = lapses + excluded.lapses,
+                    rating_sum = rating_sum + excluded.rating_sum
+            """, (upto,))
+            moved += conn.execute("DELETE FROM main.review_log WHERE id <= ?", (upto,)).rowcount
+        if upto == last:
+            break
+    return moved
 
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS participation_questions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                note_id INTEGER, question TEXT NOT NULL,
-                category TEXT NOT NULL DEFAULT 'interesting',
-                answer TEXT DEFAULT '', notes TEXT DEFAULT '',
-                created_at TEXT NOT NULL,
-                FOREIGN KEY (note_id) REFERENCES notes(id) ON DELETE SET NULL
-            )
-        """)
+
+def get_review_history(card_id):
+    """Every review of a card, hot and archived, oldest first."""
+    with get_connection() as conn:
+        rows = conn.execute(
+            "SELECT * FROM review_history WHERE card_id = ? ORDER BY reviewed_ts, id", (card_id,)
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+
+def get_all_review_history():
+    """
+    (id, card_id, review_day, rating) of every review, hot and archived, in
+    no particular order: the input of fsrs.fit(), which sorts them itself.
+    Plain tuples, as a long history runs to millions of rows.
+    """
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.row_factory = None
+        return cur.execute("SELECT id, card_id, review_day, rating FROM review_history").fetchall()
+
+
+# ── Bodies ───────────────────────────────────────────────────────
+# Note, essay and rubric bodies and hypothetical feedback live in the
+# migrations.BODY_TABLES side tables, zlib-compressed once large. The
+# owner rows keep only metadata (the old body columns are left blank), so
+# listings never read a body; the single-row getters decode it.
+
+def _put_body(conn, owner, owner_id, text):
+    """
+    Store the body of row `owner_id` of table `owner`, compressing it if
+    large, and refresh its duplicate-detection fingerprints if it has any.
+    """
+    side, owner_col, field = migrations.BODY_TABLES[owner]
+    conn.execute(
+        f"INSERT INTO {side} ({owner_col}, {field}) VALUES (?, ?) "
+        f"ON CONFLICT({owner_col}) DO UPDATE SET {field} = excluded.{field}",
+        (owner_id, migrations.encode_body(text))
+    )
+    bands = migrations.DEDUPE_TABLES.get(owner)
+    if bands:
+        digest, minhash, keys = migrations.fingerprint(text)
+        conn.execute(f"UPDATE {side} SET content_hash = ?, minhash = ? WHERE {owner_col} = ?",
+                     (digest, minhash, owner_id))
+        conn.execute(f"DELETE FROM {bands} WHERE {owner_col} = ?", (owner_id,))
+        conn.executemany(f"INSERT OR IGNORE INTO {bands} (band_key, {owner_col}) VALUES (?, ?)",
+                         [(key, owner_id) for key in keys])
+
+
+def _get_with_body(conn, owner, owner_id):
+    """Row `owner_id` of table `owner` as a dict, with its body decoded in place."""
+    side, owner_col, field = migrations.BODY_TABLES[owner]
+    row = conn.execute(
+        f"SELECT o.*, b.{field} AS body FROM {owner} o LEFT JOIN {side} b ON b.{owner_col} = o.id "
+        f"WHERE o.id = ?",
+        (owner_id,)
+    ).fetchone()
+    if not row:
+        return None
+    item = dict(row)
+    item[field] = migrations.decode_body(item.pop("body"))
+    return item
+
+
+def _without_body(owner, rows):
+    """Rows of table `owner` as dicts, minus the blanked-out body column."""
+    field = migrations.BODY_TABLES[owner][2]
+    return [{k: r[k] for k in r.keys() if k != field} for r in rows]
+
+
+def find_duplicates(kind, content, threshold=dedupe.NEAR_DUPLICATE):
+    """
+    Stored notes or rubrics that `content` duplicates, for checking an
+    import before adding it.
+
+    Exact copies are found through the content_hash index, near-duplicates
+    through the MinHash band index (see dedupe.py); neither reads any body.
+
+    Args:
+        kind: "notes" or "rubrics"
+        content: text about to be imported
+        threshold: lowest estimated similarity (0-1) reported
+
+    Returns:
+        List of dicts (id, title, similarity, exact), most similar first;
+        exact copies have similarity 1.0.
+    """
+    if kind not in migrations.DEDUPE_TABLES:
+        raise ValueError(f"Invalid duplicate kind: {kind}. Must be one of: {sorted(migrations.DEDUPE_TABLES)}")
+    side, owner_col, _ = migrations.BODY_TABLES[kind]
+    bands = migrations.DEDUPE_TABLES[kind]
+    label = "title" if kind == "notes" else "name"
+    digest, minhash, keys = migrations.fingerprint(content)
+    with get_connection() as conn:
+        matches = {
+            r["id"]: {"id": r["id"], "title": r["title"], "similarity": 1.0, "exact": True}
+            for r in conn.execute(
+                f"SELECT o.id, o.{label} AS title FROM {side} b JOIN {kind} o ON o.id = b.{owner_col} "
+                f"WHERE b.content_hash = ?", (digest,))
+        }
+        if minhash is not None:
+            sig = dedupe.unpack(minhash)
+            marks = ", ".join("?" * len(keys))
+            rows = conn.execute(
+                f"""SELECT o.id, o.{label} AS title, b.minhash FROM {side} b
+                    JOIN {kind} o ON o.id = b.{owner_col}
+                    WHERE b.{owner_col} IN (SELECT {owner_col} FROM {bands} WHERE band_key IN ({marks}))""",
+                keys
+            ).fetchall()
+            for r in rows:
+                if r["id"] in matches or r["minhash"] is None:
+                    continue
+                score = dedupe.similarity(sig, dedupe.unpack(r["minhash"]))
+                if score >= threshold:
+                    matches[r["id"]] = {"id": r["id"], "title": r["title"], "similarity": score, "exact": False}
+    return sorted(matches.values(), key=lambda m: m["similarity"], reverse=True)
+
+
+# ── Change Journal ───────────────────────────────────────────────
+# Triggers journal every insert, update and delete of the
+# migrations.CHANGE_TABLES rows in `changes` (see the v11 migration), so
+# an export or another device only has to read what happened since the
+# last seq it saw. run_maintenance() prunes changes older than
+# CHANGE_KEEP_DAYS; a reader that falls further behind starts over.
+
+CHANGE_BATCH = 500          # changes read per query by iter_changes()
+CHANGE_KEEP_DAYS = 90       # prune_changes() deletes changes older than this
+CHANGE_PRUNE_BATCH = 20000  # changes deleted per transaction
+
+
+def get_change_seq():
+    """The newest change's seq (0 before any); pass it to iter_changes() later."""
+    with get_connection() as conn:
+        return conn.execute("SELECT IFNULL(MAX(seq), 0) FROM changes").fetchone()[0]
+
+
+def _current_rows(conn, changes):
+    """{(table, id): row dict, body included} for the rows `changes` inserted or updated."""
+    wanted = {}
+    for c in changes:
+        if c["op"] != "D":
+            wanted.setdefault(c["table_name"], set()).add(c["row_id"])
+    rows = {}
+    for table, ids in wanted.items():
+        marks = ", ".join("?" * len(ids))
+        found = conn.execute(f"SELECT * FROM {table} WHERE id IN ({marks})", list(ids)).fetchall()
+        if table in migrations.BODY_TABLES:
+            side, owner_col, field = migrations.BODY_TABLES[table]
+            bodies = dict(conn.execute(
+                f"SELECT {owner_col}, {field} FROM {side} WHERE {owner_col} IN ({marks})", list(ids)).fetchall())
+            for row in _without_body(table, found):
+                row[field] = migrations.decode_body(bodies.get(row["id"]))
+                rows[(table, row["id"])] = row
+        else:
+            rows.update(((table, r["id"]), dict(r)) for r in found)
+    return rows
+
+
+def iter_changes(since=0, tables=None, batch=CHANGE_BATCH):
+    """
+    Stream the journalled changes after seq `since`, oldest first.
+
+    Reads `batch` changes per query, each batch in its own short read, so
+    the caller may write to the database between items. The cost is
+    proportional to the number of changes, not to the size of the tables.
+
+    Args:
+        since: last seq already applied (0 for everything still journalled)
+        tables: only changes to these CHANGE_TABLES (None for all)
+        batch: changes fetched per query
+
+    Yields:
+        Dicts with seq, table, row_id, op ('I' insert, 'U' update, 'D'
+        delete tombstone), changed_ts (Unix seconds) and row: the row as it
+        is now, with its body, or None for a tombstone or a row deleted
+        since (its own tombstone follows). A row changed several times
+        appears once per change.
+
+    Raises:
+        ValueError: changes after `since` were pruned (see prune_changes()),
+            so the reader has to export everything again.
+    """
+    where, params = "seq > ?", []
+    if tables is not None:
+        tables = list(tables)
+        invalid = set(tables) - set(migrations.CHANGE_TABLES)
+        if invalid:
+            raise ValueError(f"Invalid change tables: {sorted(invalid)}. Must be from: {migrations.CHANGE_TABLES}")
+        where += f" AND table_name IN ({', '.join('?' * len(tables))})"
+        params = tables
+    while True:
+        with get_connection() as conn:
+            changes = conn.execute(
+                f"SELECT seq, table_name, row_id, op, changed_ts FROM changes WHERE {where} ORDER BY seq LIMIT ?",
+                [since, *params, batch]
+            ).fetchall()
+            _check_not_pruned(conn, since)
+            rows = _current_rows(conn, changes)
+        for c in changes:
+            yield {"seq": c["seq"], "table": c["table_name"], "row_id": c["row_id"], "op": c["op"],
+                   "changed_ts": c["changed_ts"],
+                   "row": None if c["op"] == "D" else rows.get((c["table_name"], c["row_id"]))}
+        if len(changes) < batch:
+            return
+        since = changes[-1]["seq"]
+
+
+def _check_not_pruned(conn, since):
+    """Raise ValueError if changes after seq `since` were pruned (seqs are contiguous until pruned)."""
+    oldest = conn.execute("SELECT MIN(seq) FROM changes").fetchone()[0]
+    if since and oldest is not None and since < oldest - 1:
+        raise ValueError(f"Changes after seq {since} have been pruned (the journal now starts at {oldest}); "
+                         f"export everything again and continue from get_change_seq()")
+
+
+def prune_changes(older_than_days=CHANGE_KEEP_DAYS, keep_going=lambda: True):
+    """
+    Delete journalled changes older than `older_than_days`, oldest first,
+    CHANGE_PRUNE_BATCH per transaction, until `keep_going()` says stop.
+
+    Only a leading run of old changes goes, so the journal stays one
+    contiguous range of seqs and iter_changes() can tell a reader that
+    its `since` now falls before it. The newest change is always kept,
+    so seq never goes back.
+
+    Returns:
+        Number of changes deleted.
+    """
+    cutoff = int(time.time()) - older_than_days * 86400
+    pruned = 0
+    while keep_going():
+        with transaction() as conn:
+            newest = conn.execute("SELECT IFNULL(MAX(seq), 0) FROM changes").fetchone()[0]
+            batch = conn.execute("SELECT seq, changed_ts FROM changes WHERE seq < ? ORDER BY seq LIMIT ?",
+                                 (newest, CHANGE_PRUNE_BATCH)).fetchall()
+            old = 0
+            for seq, changed_ts in batch:
+                if changed_ts >= cutoff:
+                    break
+                old += 1
+            if old:
+                pruned += conn.execute("DELETE FROM changes WHERE seq <= ?", (batch[old - 1][0],)).rowcount
+        if old < CHANGE_PRUNE_BATCH:
+            break
+    return pruned
 
 
 # ── Note Operations ──────────────────────────────────────────────
@@ -150,56 +646,316 @@ def add_note(title, content, tags="", source_file=""):
     now = datetime.now().isoformat()
     with get_connection() as conn:
         c = conn.execute(
-            "INSERT INTO notes (title, content, tags, source_file, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
-            (title, content, tags, source_file, now, now)
+            "INSERT INTO notes (title, content, tags, source_file, created_at, updated_at) VALUES (?, '', ?, ?, ?, ?)",
+            (title, tags, source_file, now, now)
         )
+        _put_body(conn, "notes", c.lastrowid, content)
+        _set_tags(conn, "note_tags", "note_id", c.lastrowid, tags)
+        _index_note(conn, c.lastrowid)
         return c.lastrowid
 
 
 def get_all_notes():
+    """Every note's metadata (no bodies; see get_note()), most recently updated first."""
     with get_connection() as conn:
         rows = conn.execute("SELECT * FROM notes ORDER BY updated_at DESC").fetchall()
+        return _without_body("notes", rows)
+
+
+def list_notes(columns=NOTE_LIST_COLUMNS, limit=None, after=None):
+    """
+    Note metadata without bodies, most recently updated first, served
+    entirely from the idx_notes_listing covering index.
+
+    Args:
+        columns: subset of NOTE_LIST_COLUMNS to return; "id" and
+                 "updated_at" are always included so results can be paged
+        limit: page size (None for every note)
+        after: (updated_at, id) of the last row of the previous page
+
+    Returns:
+        List of dicts.
+    """
+    invalid = set(columns) - set(NOTE_LIST_COLUMNS)
+    if invalid:
+        raise ValueError(f"Invalid note list columns: {sorted(invalid)}. Must be from: {NOTE_LIST_COLUMNS}")
+    cols = ", ".join(dict.fromkeys(("id", "updated_at") + tuple(columns)))
+    where, params = "", []
+    if after is not None:
+        where = "WHERE (updated_at, id) < (?, ?)"
+        params.extend(after)
+    params.append(limit or -1)
+    with get_connection() as conn:
+        rows = conn.execute(
+            f"SELECT {cols} FROM notes {where} ORDER BY updated_at DESC, id DESC LIMIT ?",
+            params
+        ).fetchall()
         return [dict(r) for r in rows]
 
 
+def get_note_titles():
+    """(id, title) of every note for selector widgets, newest first."""
+    return list_notes(columns=("id", "title"))
+
+
+def count_notes():
+    with get_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
+
 def get_note(note_id):
     with get_connection() as conn:
-        row = conn.execute("SELECT * FROM notes WHERE id = ?", (note_id,)).fetchone()
-        return dict(row) if row else None
+        return _get_with_body(conn, "notes", note_id)
 
 
-def update_note(note_id, title=None, content=None, tags=None):
+def update_note(note_id, title=None, content=None, tags=None, source_file=None):
     with get_connection() as conn:
-        note = conn.execute("SELECT * FROM notes WHERE id = ?", (note_id,)).fetchone()
+        note = conn.execute("SELECT title, tags, source_file FROM notes WHERE id = ?", (note_id,)).fetchone()
         if not note:
             return
-        note = dict(note)
+        _index_note(conn, note_id, delete=True)
         conn.execute(
-            "UPDATE notes SET title=?, content=?, tags=?, updated_at=? WHERE id=?",
+            "UPDATE notes SET title=?, tags=?, source_file=?, updated_at=? WHERE id=?",
             (
                 title if title is not None else note["title"],
-                content if content is not None else note["content"],
                 tags if tags is not None else note["tags"],
+                source_file if source_file is not None else note["source_file"],
                 datetime.now().isoformat(),
                 note_id
             )
         )
+        if content is not None:
+            _put_body(conn, "notes", note_id, content)
+        if tags is not None:
+            _set_tags(conn, "note_tags", "note_id", note_id, tags)
+        _index_note(conn, note_id)
 
 
 def delete_note(note_id):
     with get_connection() as conn:
+        _index_note(conn, note_id, delete=True)
         conn.execute("DELETE FROM notes WHERE id = ?", (note_id,))
 
 
-def search_notes(query):
+def _index_note(conn, note_id, delete=False):
+    """
+    Add note `note_id` to notes_fts as it is stored now, or with
+    delete=True remove it; call that before the note changes, since the
+    contentless index can only forget a row given the exact values it
+    indexed. Done here rather than in triggers so that the schema needs no
+    app-defined SQL function (see migrations._v13_fts_without_app_functions).
+    """
+    if not _has_notes_fts(conn):
+        return
+    row = conn.execute(
+        "SELECT n.title, n.tags, b.content FROM notes n JOIN note_bodies b ON b.note_id = n.id WHERE n.id = ?",
+        (note_id,)
+    ).fetchone()
+    if row is None:
+        return
+    conn.execute(
+        "INSERT INTO notes_fts(notes_fts, rowid, title, content, tags) VALUES ('delete', ?, ?, ?, ?)" if delete
+        else "INSERT INTO notes_fts(rowid, title, content, tags) VALUES (?, ?, ?, ?)",
+        (note_id, row["title"], migrations.decode_body(row["content"]), row["tags"])
+    )
+
+
+def _fts_match_expression(terms):
+    """Quote each word as an FTS5 prefix term; all terms must match."""
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _has_notes_fts(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='notes_fts'"
+    ).fetchone() is not None
+
+
+def _make_snippet(text, terms, width=120):
+    """
+    Excerpt of `text` around the first word starting with any of `terms`,
+    with every such word in the excerpt wrapped in SNIPPET_START/END.
+
+    Done in Python rather than with FTS5 snippet(), which re-tokenizes the
+    whole document and dominates query time on PDF-sized notes.
+    """
+    pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, terms)) + r")\w*", re.IGNORECASE)
+    match = pattern.search(text)
+    if not match:
+        return ""
+    start = max(0, match.start() - width // 3)
+    end = min(len(text), match.end() + width)
+    if start > 0:
+        start = text.find(" ", start, match.start()) + 1 or start
+    if end < len(text):
+        end = max(text.rfind(" ", match.end(), end), match.end())
+    excerpt = pattern.sub(lambda m: f"{SNIPPET_START}{m.group(0)}{SNIPPET_END}", text[start:end])
+    return ("…" if start > 0 else "") + excerpt + ("…" if end < len(text) else "")
+
+
+def search_notes(query, limit=100, columns=None):
+    """
+    Search notes by title, content and tags.
+
+    With FTS5, results are BM25-ranked (title and tag hits outweigh body
+    hits), each word matches as a prefix, and every row carries a `snippet`
+    of the body with matches wrapped in SNIPPET_START / SNIPPET_END.
+    Without FTS5, falls back to a substring LIKE scan, newest first.
+    At most `limit` rows are returned (None for all). Ranking runs on the
+    index alone; note bodies are only read (and decompressed) for the rows
+    that make the cut. The LIKE fallback has to decompress every body.
+    Pass `columns` (e.g. NOTE_LIST_COLUMNS) to drop the bodies from the
+    result once snippets are built.
+    """
+    terms = _FTS_TERM_RE.findall(query)
+    with get_connection() as conn:
+        if terms and _has_notes_fts(conn):
+            rows = conn.execute(
+                """WITH hits AS (
+                       SELECT rowid AS id, bm25(notes_fts, 10.0, 1.0, 5.0) AS score
+                       FROM notes_fts WHERE notes_fts MATCH ?
+                       ORDER BY score LIMIT ?
+                   )
+                   SELECT n.*, b.content AS body FROM hits
+                   JOIN notes n ON n.id = hits.id
+                   LEFT JOIN note_bodies b ON b.note_id = hits.id
+                   ORDER BY hits.score""",
+                (_fts_match_expression(terms), limit or -1)
+            ).fetchall()
+            results = [dict(r) for r in rows]
+            for note in results:
+                note["content"] = migrations.decode_body(note.pop("body"))
+                note["snippet"] = _make_snippet(note["content"], terms)
+        else:
+            rows = conn.execute(
+                """SELECT n.*, b.content AS body FROM notes n
+                   LEFT JOIN note_bodies b ON b.note_id = n.id
+                   WHERE n.title LIKE ? OR body_text(b.content) LIKE ? OR n.tags LIKE ?
+                   ORDER BY n.updated_at DESC LIMIT ?""",
+                (f"%{query}%", f"%{query}%", f"%{query}%", limit or -1)
+            ).fetchall()
+            results = [dict(r) for r in rows]
+            for note in results:
+                note["content"] = migrations.decode_body(note.pop("body"))
+    if columns is not None:
+        keep = set(columns) | {"id", "snippet"}
+        results = [{k: v for k, v in note.items() if k in keep} for note in results]
+    return results
+
+
+# ── Tags ─────────────────────────────────────────────────────────
+# notes.tags / flashcards.tags keep the comma string users type; the
+# normalized tags / note_tags / card_tags tables are what filters query.
+
+def _tag_names(tags):
+    """Comma string or list of names -> unique stripped names, first spelling wins."""
+    if not tags:
+        return []
+    if not isinstance(tags, str):
+        tags = ",".join(tags)
+    seen, names = set(), []
+    for name in (t.strip() for t in tags.split(",")):
+        if name and name.lower() not in seen:
+            seen.add(name.lower())
+            names.append(name)
+    return names
+
+
+def _set_tags(conn, link_table, owner_col, owner_id, tags):
+    """Replace one note's or card's tag links with those in `tags`."""
+    names = _tag_names(tags)
+    conn.execute(f"DELETE FROM {link_table} WHERE {owner_col} = ?", (owner_id,))
+    conn.executemany("INSERT OR IGNORE INTO tags (name) VALUES (?)", [(n,) for n in names])
+    conn.executemany(
+        f"INSERT OR IGNORE INTO {link_table} ({owner_col}, tag_id) SELECT ?, id FROM tags WHERE name = ?",
+        [(owner_id, n) for n in names]
+    )
+
+
+def _tag_ids(conn, names):
+    if not names:
+        return []
+    marks = ",".join("?" * len(names))
+    return [r[0] for r in conn.execute(f"SELECT id FROM tags WHERE name IN ({marks})", names)]
+
+
+def _card_tag_filter(conn, tags, alias):
+    """
+    SQL fragment restricting flashcards (`alias` e.g. "f.") to any of `tags`,
+    matched on the card's own tags or its note's.
+
+    Returns:
+        (sql, params); ("", []) when `tags` is empty, and (None, None) when
+        none of the tags exist so the caller can return nothing.
+    """
+    names = _tag_names(tags)
+    if not names:
+        return "", []
+    ids = _tag_ids(conn, names)
+    if not ids:
+        return None, None
+    marks = ",".join("?" * len(ids))
+    sql = (f"AND ({alias}id IN (SELECT card_id FROM card_tags WHERE tag_id IN ({marks}))"
+           f" OR {alias}note_id IN (SELECT note_id FROM note_tags WHERE tag_id IN ({marks})))")
+    return sql, ids + ids
+
+
+def get_notes_by_tags(all_of=None, any_of=None, columns=NOTE_LIST_COLUMNS):
+    """
+    Notes carrying every tag in `all_of` and at least one in `any_of`
+    (each a list or comma string; matching is exact and case-insensitive,
+    so "tort" does not match "torts"). Newest-updated first.
+
+    Returns:
+        List of dicts with `columns` (a subset of NOTE_LIST_COLUMNS).
+    """
+    invalid = set(columns) - set(NOTE_LIST_COLUMNS)
+    if invalid:
+        raise ValueError(f"Invalid note list columns: {sorted(invalid)}. Must be from: {NOTE_LIST_COLUMNS}")
+    cols = ", ".join(dict.fromkeys(("id",) + tuple(columns)))
+    where, params = [], []
     with get_connection() as conn:
+        all_names, any_names = _tag_names(all_of), _tag_names(any_of)
+        if all_names:
+            ids = _tag_ids(conn, all_names)
+            if len(ids) < len(all_names):
+                return []
+            marks = ",".join("?" * len(ids))
+            where.append(f"id IN (SELECT note_id FROM note_tags WHERE tag_id IN ({marks}) "
+                         f"GROUP BY note_id HAVING COUNT(*) = ?)")
+            params += ids + [len(ids)]
+        if any_names:
+            ids = _tag_ids(conn, any_names)
+            if not ids:
+                return []
+            where.append(f"id IN (SELECT note_id FROM note_tags WHERE tag_id IN ({','.join('?' * len(ids))}))")
+            params += ids
+        if not where:
+            return list_notes(columns)
         rows = conn.execute(
-            "SELECT * FROM notes WHERE title LIKE ? OR content LIKE ? OR tags LIKE ? ORDER BY updated_at DESC",
-            (f"%{query}%", f"%{query}%", f"%{query}%")
+            f"SELECT {cols} FROM notes WHERE {' AND '.join(where)} ORDER BY updated_at DESC, id DESC",
+            params
         ).fetchall()
         return [dict(r) for r in rows]
 
 
+def get_tag_counts():
+    """
+    Every tag in use with how many notes and cards carry it, by name.
+
+    Returns:
+        List of {"name", "notes", "cards"} dicts.
+    """
+    with get_connection() as conn:
+        rows = conn.execute("""
+            SELECT t.name,
+                   (SELECT COUNT(*) FROM note_tags WHERE tag_id = t.id) AS notes,
+                   (SELECT COUNT(*) FROM card_tags WHERE tag_id = t.id) AS cards
+            FROM tags t ORDER BY t.name
+        """).fetchall()
+    return [dict(r) for r in rows if r["notes"] or r["cards"]]
+
+
 # ── Flashcard Operations ─────────────────────────────────────────
 
 def add_flashcard(front, back, note_id=None, tags=""):
@@ -210,43 +966,75 @@ def add_flashcard(front, back, note_id=None, tags=""):
             "INSERT INTO flashcards (note_id, front, back, tags, next_review, created_at) VALUES (?, ?, ?, ?, ?, ?)",
             (note_id, front, back, tags, today, now)
         )
-        card_id = c.lastrowid
-    increment_daily_stat("cards_added")
-    return card_id
+        _set_tags(conn, "card_tags", "card_id", c.lastrowid, tags)
+        return c.lastrowid
+
 
+def add_flashcards_bulk(cards, note_id=None):
+    """
+    Insert many flashcards in a single transaction.
 
-def get_due_cards(limit=None):
+    Args:
+        cards: iterable of dicts with "front", "back" and optional "tags"
+        note_id: note to link every card to
+
+    Returns:
+        Number of cards inserted.
+    """
+    now = datetime.now().isoformat()
     today = date.today().isoformat()
-    with get_connection() as conn:
-        if limit:
-            rows = conn.execute(
-                "SELECT * FROM flashcards WHERE next_review <= ? ORDER BY next_review ASC LIMIT ?",
-                (today, limit)
-            ).fetchall()
+    rows = [(note_id, c["front"], c["back"], c.get("tags", ""), today, now) for c in cards]
+    if not rows:
+        return 0
+    sql = "INSERT INTO flashcards (note_id, front, back, tags, next_review, created_at) VALUES (?, ?, ?, ?, ?, ?)"
+    with transaction() as conn:
+        if not any(r[3] for r in rows):
+            conn.executemany(sql, rows)
         else:
-            rows = conn.execute(
-                "SELECT * FROM flashcards WHERE next_review <= ? ORDER BY next_review ASC",
-                (today,)
-            ).fetchall()
+            # One insert per card, so each card's tags go to its own lastrowid
+            for row in rows:
+                card_id = conn.execute(sql, row).lastrowid
+                _set_tags(conn, "card_tags", "card_id", card_id, row[3])
+    return len(rows)
+
+
+def get_due_cards(limit=None, tags=None):
+    """
+    Cards due today or earlier, most overdue first.
+
+    Args:
+        limit: maximum number of cards (None for all)
+        tags: only cards carrying any of these tags, directly or through
+              their parent note (list or comma string)
+    """
+    today = date.today().toordinal() - EPOCH_ORDINAL
+    with get_connection() as conn:
+        tag_sql, tag_params = _card_tag_filter(conn, tags, "")
+        if tag_sql is None:
+            return []
+        rows = conn.execute(
+            f"SELECT * FROM flashcards WHERE due_day <= ? {tag_sql} ORDER BY due_day ASC LIMIT ?",
+            (today, *tag_params, limit or -1)
+        ).fetchall()
         return [dict(r) for r in rows]
 
 
-def get_due_cards_with_topics(limit=None):
+def get_due_cards_with_topics(limit=None, tags=None):
     """Get due cards with their parent note title for interleaved review."""
-    today = date.today().isoformat()
+    today = date.today().toordinal() - EPOCH_ORDINAL
     with get_connection() as conn:
-        query = """
+        tag_sql, tag_params = _card_tag_filter(conn, tags, "f.")
+        if tag_sql is None:
+            return []
+        query = f"""
             SELECT f.*, COALESCE(n.title, 'Unlinked') as note_title
             FROM flashcards f
             LEFT JOIN notes n ON f.note_id = n.id
-            WHERE f.next_review <= ?
-            ORDER BY f.next_review ASC
+            WHERE f.due_day <= ? {tag_sql}
+            ORDER BY f.due_day ASC
+            LIMIT ?
         """
-        if limit:
-            query += f" LIMIT ?"
-            rows = conn.execute(query, (today, limit)).fetchall()
-        else:
-            rows = conn.execute(query, (today,)).fetchall()
+        rows = conn.execute(query, (today, *tag_params, limit or -1)).fetchall()
         return [dict(r) for r in rows]
 
 
@@ -264,21 +1052,89 @@ def get_flashcards_for_note(note_id):
         return [dict(r) for r in rows]
 
 
-def update_flashcard_srs(card_id, easiness_factor, interval, repetitions, next_review):
+def update_flashcard_srs(card_id, easiness_factor, interval, repetitions, next_review,
+                         stability=None, difficulty=None):
     with get_connection() as conn:
         conn.execute(
-            "UPDATE flashcards SET easiness_factor=?, interval=?, repetitions=?, next_review=? WHERE id=?",
-            (easiness_factor, interval, repetitions, next_review, card_id)
+            "UPDATE flashcards SET easiness_factor=?, interval=?, repetitions=?, next_review=?, "
+            "stability=?, difficulty=? WHERE id=?",
+            (easiness_factor, interval, repetitions, next_review, stability, difficulty, card_id)
         )
 
 
-def log_review(card_id, rating):
+def log_review(card_id, rating, reviewed_at=None):
     with get_connection() as conn:
         conn.execute(
             "INSERT INTO review_log (card_id, rating, reviewed_at) VALUES (?, ?, ?)",
-            (card_id, rating, datetime.now().isoformat())
+            (card_id, rating, reviewed_at or datetime.now().isoformat())
+        )
+
+
+def apply_reviews(reviews):
+    """
+    Persist a batch of already-scheduled reviews in one transaction.
+
+    Args:
+        reviews: dicts with id, easiness_factor, interval, repetitions,
+                 next_review, stability, difficulty (the card's new state;
+                 the last two may be missing), rating and reviewed_at
+
+    Reviews already present in review_log (same card and reviewed_at) or
+    for cards deleted since are skipped, so replaying a journal twice is
+    harmless.
+
+    Returns:
+        Number of reviews applied.
+    """
+    with transaction() as conn:
+        fresh, seen = [], set()
+        for r in reviews:
+            key = (r["id"], r["reviewed_at"])
+            if key in seen:
+                continue
+            seen.add(key)
+            if (conn.execute("SELECT 1 FROM flashcards WHERE id = ?", (r["id"],)).fetchone()
+                    and not conn.execute(
+                        "SELECT 1 FROM review_log WHERE card_id = ? AND reviewed_at = ?", key
+                    ).fetchone()):
+                fresh.append(r)
+        conn.executemany(
+            "UPDATE flashcards SET easiness_factor=?, interval=?, repetitions=?, next_review=?, "
+            "stability=?, difficulty=? WHERE id=?",
+            [(r["easiness_factor"], r["interval"], r["repetitions"], r["next_review"],
+              r.get("stability"), r.get("difficulty"), r["id"]) for r in fresh]
+        )
+        conn.executemany(
+            "INSERT INTO review_log (card_id, rating, reviewed_at) VALUES (?, ?, ?)",
+            [(r["id"], r["rating"], r["reviewed_at"]) for r in fresh]
         )
-    increment_daily_stat("cards_reviewed")
+    return len(fresh)
+
+
+def get_srs_states():
+    """id, easiness_factor, interval, repetitions and due_day of every card, in id order."""
+    with get_connection() as conn:
+        rows = conn.execute(
+            "SELECT id, easiness_factor, interval, repetitions, due_day FROM flashcards ORDER BY id"
+        ).fetchall()
+        return [dict(r) for r in rows]
+
+
+def update_flashcards_srs_bulk(rows):
+    """
+    Save many cards' scheduling state in one transaction, without logging
+    reviews (for rescheduling rather than reviewing).
+
+    Args:
+        rows: (easiness_factor, interval, repetitions, next_review, id) tuples
+
+    Returns:
+        Number of cards updated.
+    """
+    with transaction() as conn:
+        return conn.executemany(
+            "UPDATE flashcards SET easiness_factor=?, interval=?, repetitions=?, next_review=? WHERE id=?", rows
+        ).rowcount
 
 
 def delete_flashcard(card_id):
@@ -294,12 +1150,19 @@ def log_pomodoro(session_type, duration_minutes, started_at, finished_at, comple
             "INSERT INTO pomodoro_sessions (session_type, duration_minutes, completed, started_at, finished_at) VALUES (?, ?, ?, ?, ?)",
             (session_type, duration_minutes, int(completed), started_at, finished_at)
         )
-    if session_type == "work" and completed:
-        increment_daily_stat("pomodoro_sessions")
-        increment_daily_stat("study_minutes", duration_minutes)
 
 
 # ── Daily Stats ──────────────────────────────────────────────────
+# cards_reviewed, cards_added, pomodoro_sessions and study_minutes are
+# maintained by triggers on the log tables (see migrations._v5_rollup_triggers);
+# only quiz_questions_answered is bumped from Python.
+
+def _blank_day_stats(day):
+    return {
+        "date": day, "cards_reviewed": 0, "cards_added": 0,
+        "pomodoro_sessions": 0, "study_minutes": 0, "quiz_questions_answered": 0
+    }
+
 
 def get_today_stats():
     today = date.today().isoformat()
@@ -307,23 +1170,24 @@ def get_today_stats():
         row = conn.execute("SELECT * FROM daily_stats WHERE date = ?", (today,)).fetchone()
         if row:
             return dict(row)
-    return {
-        "date": today, "cards_reviewed": 0, "cards_added": 0,
-        "pomodoro_sessions": 0, "study_minutes": 0, "quiz_questions_answered": 0
-    }
+    return _blank_day_stats(today)
 
 
-def increment_daily_stat(field, amount=1):
+def _increment_daily_stat(conn, field, amount=1):
+    """Bump today's counter on an existing connection (joins its transaction)."""
     # Validate field against whitelist to prevent SQL injection
     if field not in VALID_STAT_FIELDS:
         raise ValueError(f"Invalid stat field: {field}. Must be one of: {VALID_STAT_FIELDS}")
-    today = date.today().isoformat()
+    conn.execute(
+        f"""INSERT INTO daily_stats (date, {field}) VALUES (?, ?)
+            ON CONFLICT(date) DO UPDATE SET {field} = {field} + ?""",
+        (date.today().isoformat(), amount, amount)
+    )
+
+
+def increment_daily_stat(field, amount=1):
     with get_connection() as conn:
-        conn.execute(
-            f"""INSERT INTO daily_stats (date, {field}) VALUES (?, ?)
-                ON CONFLICT(date) DO UPDATE SET {field} = {field} + ?""",
-            (today, amount, amount)
-        )
+        _increment_daily_stat(conn, field, amount)
 
 
 def get_stats_range(days=7):
@@ -334,23 +1198,103 @@ def get_stats_range(days=7):
         return [dict(r) for r in rows]
 
 
+def _scan_streaks(conn):
+    """Walk every review day; return (run_end, run_length, longest)."""
+    run_end, run_length, longest = None, 0, 0
+    for row in conn.execute(
+        "SELECT date FROM daily_stats WHERE cards_reviewed > 0 ORDER BY date"
+    ):
+        d = date.fromisoformat(row["date"])
+        if run_end is not None and d == run_end + timedelta(days=1):
+            run_length += 1
+        else:
+            run_length = 1
+        run_end = d
+        longest = max(longest, run_length)
+    return (run_end.isoformat() if run_end else None), run_length, longest
+
+
+def _streaks(conn):
+    """
+    Current and longest streak from the trigger-maintained streak_cache row.
+
+    Returns:
+        (current, longest, stale). When the cache is stale the values are
+        recomputed from daily_stats without writing; the caller should then
+        call _repair_streak_cache() outside any read snapshot.
+    """
+    row = conn.execute(
+        "SELECT run_end, run_length, longest, stale FROM streak_cache WHERE id = 1"
+    ).fetchone()
+    stale = row is None or bool(row["stale"])
+    if stale:
+        run_end, run_length, longest = _scan_streaks(conn)
+    else:
+        run_end, run_length, longest = row["run_end"], row["run_length"], row["longest"]
+    # A streak only counts while it reaches today
+    current = run_length if run_end == date.today().isoformat() else 0
+    return current, longest, stale
+
+
+def _repair_streak_cache():
+    with transaction() as conn:
+        run_end, run_length, longest = _scan_streaks(conn)
+        conn.execute(
+            "INSERT OR REPLACE INTO streak_cache (id, run_end, run_length, longest, stale) VALUES (1, ?, ?, ?, 0)",
+            (run_end, run_length, longest)
+        )
+
+
 def get_streak():
     with get_connection() as conn:
-        rows = conn.execute(
-            "SELECT date FROM daily_stats WHERE cards_reviewed > 0 ORDER BY date DESC"
-        ).fetchall()
-    if not rows:
-        return 0
-    streak = 0
-    expected = date.today()
-    for row in rows:
-        d = date.fromisoformat(row["date"])
-        if d == expected:
-            streak += 1
-            expected = date.fromordinal(expected.toordinal() - 1)
-        elif d < expected:
-            break
-    return streak
+        current, _, stale = _streaks(conn)
+    if stale:
+        _repair_streak_cache()
+    return current
+
+
+def rebuild_rollups():
+    """
+    Recompute daily_stats and the streak cache from the raw logs.
+
+    The log-derived counters (cards_reviewed, cards_added, pomodoro_sessions,
+    study_minutes) are replaced with fresh aggregates of review_log (with
+    its archived rollups, via review_days), flashcards and
+    pomodoro_sessions; quiz_questions_answered has no log and is kept. Counts for rows since deleted from the logs are dropped.
+    Run with `python main.py --rebuild-stats`.
+
+    Returns:
+        Dict with days (rows in daily_stats), current_streak, longest_streak.
+    """
+    with transaction() as conn:
+        conn.execute(
+            "UPDATE daily_stats SET cards_reviewed = 0, cards_added = 0, pomodoro_sessions = 0, study_minutes = 0"
+        )
+        conn.execute("""
+            INSERT INTO daily_stats (date, cards_reviewed)
+            SELECT date(review_day * 86400, 'unixepoch'), SUM(reviews) FROM review_days GROUP BY review_day
+            ON CONFLICT(date) DO UPDATE SET cards_reviewed = excluded.cards_reviewed
+        """)
+        conn.execute("""
+            INSERT INTO daily_stats (date, cards_added)
+            SELECT substr(created_at, 1, 10), COUNT(*) FROM flashcards GROUP BY 1
+            ON CONFLICT(date) DO UPDATE SET cards_added = excluded.cards_added
+        """)
+        conn.execute("""
+            INSERT INTO daily_stats (date, pomodoro_sessions, study_minutes)
+            SELECT substr(finished_at, 1, 10), COUNT(*), SUM(duration_minutes) FROM pomodoro_sessions
+            WHERE session_type = 'work' AND completed GROUP BY 1
+            ON CONFLICT(date) DO UPDATE SET
+                pomodoro_sessions = excluded.pomodoro_sessions, study_minutes = excluded.study_minutes
+        """)
+        conn.execute("""
+            DELETE FROM daily_stats WHERE cards_reviewed = 0 AND cards_added = 0
+                AND pomodoro_sessions = 0 AND study_minutes = 0 AND quiz_questions_answered = 0
+        """)
+        days = conn.execute("SELECT COUNT(*) FROM daily_stats").fetchone()[0]
+        _repair_streak_cache()
+        current, longest, _ = _streaks(conn)
+    return {"days": days, "current_streak": current, "longest_streak": longest}
 
 
 def get_total_cards():
@@ -359,6 +1303,120 @@ def get_total_cards():
         return row["cnt"]
 
 
+def _forecast_counts(conn, today_n, days):
+    """(cards due before today, [cards due on each of the `days` days from today]), from the due_day index."""
+    overdue = conn.execute("SELECT COUNT(*) FROM flashcards WHERE due_day < ?", (today_n,)).fetchone()[0]
+    counts = [0] * days
+    for day, count in conn.execute(
+        "SELECT due_day, COUNT(*) FROM flashcards WHERE due_day BETWEEN ? AND ? GROUP BY due_day",
+        (today_n, today_n + days - 1)
+    ):
+        counts[day - today_n] = count
+    return overdue, counts
+
+
+def get_review_forecast(days=30):
+    """
+    Cards coming due over the next `days` days, counted in SQL: one
+    GROUP BY over the due_day index, so the cost follows the number of
+    cards in the horizon, never the columns of every card.
+
+    Args:
+        days: horizon starting today, e.g. 7, 30 or 365
+
+    Returns:
+        Dict with keys:
+            overdue: cards due before today
+            days: one {"date", "due", "cumulative"} per day from today;
+                  due counts the cards due that day only, cumulative
+                  everything due up to and including it, overdue cards
+                  too (the backlog if nothing were reviewed)
+            total: cards due within the horizon, overdue included
+    """
+    if days < 1:
+        raise ValueError(f"Forecast horizon must be at least 1 day, got {days}")
+    today = date.today()
+    with get_connection() as conn:
+        # Overdue and the per-day counts from one snapshot
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        overdue, counts = _forecast_counts(conn, today.toordinal() - EPOCH_ORDINAL, days)
+    running = overdue
+    per_day = []
+    for offset, count in enumerate(counts):
+        running += count
+        per_day.append({"date": (today + timedelta(days=offset)).isoformat(), "due": count, "cumulative": running})
+    return {"overdue": overdue, "days": per_day, "total": running}
+
+
+def get_due_counts(first_day):
+    """
+    How many cards are due on each day from `first_day` (an epoch day)
+    on, as {due_day: count} for the days with any. One GROUP BY over the
+    due_day index; srs_engine's load balancer reads this once a day and
+    keeps it up to date itself.
+    """
+    with get_connection() as conn:
+        return {day: count for day, count in conn.execute(
+            "SELECT due_day, COUNT(*) FROM flashcards WHERE due_day >= ? GROUP BY due_day", (first_day,))}
+
+
+def get_dashboard_snapshot(forecast_days=7):
+    """
+    Everything the dashboard shows, read in one transaction so the numbers
+    are mutually consistent, with all counting done in SQL.
+
+    Args:
+        forecast_days: length of the review forecast, starting today
+
+    Returns:
+        Dict with keys:
+            today: today's daily_stats row (zeros if none yet)
+            streak: consecutive review days ending today
+            longest_streak: longest run of consecutive review days
+            due: cards due today or overdue
+            total_cards: cards in the collection
+            forecast: {date_str: count} for each forecast day; overdue
+                      cards are counted on today, as in forecast_reviews()
+            week: {"cards_reviewed", "study_minutes"} over the last 7 days
+    """
+    today = date.today()
+    today_s = today.isoformat()
+    today_n = today.toordinal() - EPOCH_ORDINAL
+    days = [(today + timedelta(days=i)).isoformat() for i in range(forecast_days)]
+    week_start = (today - timedelta(days=6)).isoformat()
+
+    with get_connection() as conn:
+        # A read transaction pins one snapshot for every query below
+        if not conn.in_transaction:
+            conn.execute("BEGIN")
+        row = conn.execute("SELECT * FROM daily_stats WHERE date = ?", (today_s,)).fetchone()
+        total = conn.execute("SELECT COUNT(*) FROM flashcards").fetchone()[0]
+        overdue, counts = _forecast_counts(conn, today_n, max(forecast_days, 1))
+        due = overdue + counts[0]
+        forecast = dict(zip(days, counts))
+        if days:
+            forecast[today_s] = due
+        week = conn.execute(
+            """SELECT COALESCE(SUM(cards_reviewed), 0), COALESCE(SUM(study_minutes), 0)
+               FROM daily_stats WHERE date BETWEEN ? AND ?""",
+            (week_start, today_s)
+        ).fetchone()
+        streak, longest, stale = _streaks(conn)
+    if stale:
+        _repair_streak_cache()
+
+    return {
+        "today": dict(row) if row else _blank_day_stats(today_s),
+        "streak": streak,
+        "longest_streak": longest,
+        "due": due,
+        "total_cards": total,
+        "forecast": forecast,
+        "week": {"cards_reviewed": week[0], "study_minutes": week[1]},
+    }
+
+
 # ── Hypotheticals ─────────────────────────────────────────────────
 
 def add_hypothetical(title, scenario, note_id=None):
@@ -367,28 +1425,29 @@ def add_hypothetical(title, scenario, note_id=None):
         c = conn.execute(
             "INSERT INTO hypotheticals (note_id,title,scenario,created_at) VALUES (?,?,?,?)",
             (note_id, title, scenario, now))
+        _put_body(conn, "hypotheticals", c.lastrowid, "")
         return c.lastrowid
 
 def get_all_hypotheticals():
+    """Hypotheticals without their feedback (see get_hypothetical()), newest first."""
     with get_connection() as conn:
         rows = conn.execute("SELECT * FROM hypotheticals ORDER BY created_at DESC").fetchall()
-        return [dict(r) for r in rows]
+        return _without_body("hypotheticals", rows)
 
 def get_hypothetical(hyp_id):
     with get_connection() as conn:
-        row = conn.execute("SELECT * FROM hypotheticals WHERE id=?", (hyp_id,)).fetchone()
-        return dict(row) if row else None
+        return _get_with_body(conn, "hypotheticals", hyp_id)
 
 def update_hypothetical(hyp_id, response=None, grade=None, feedback=None):
     with get_connection() as conn:
-        hyp = conn.execute("SELECT * FROM hypotheticals WHERE id=?", (hyp_id,)).fetchone()
+        hyp = conn.execute("SELECT response, grade FROM hypotheticals WHERE id=?", (hyp_id,)).fetchone()
         if not hyp:
             return
-        hyp = dict(hyp)
-        conn.execute("UPDATE hypotheticals SET response=?, grade=?, feedback=? WHERE id=?",
+        conn.execute("UPDATE hypotheticals SET response=?, grade=? WHERE id=?",
             (response if response is not None else hyp["response"],
-             grade if grade is not None else hyp["grade"],
-             feedback if feedback is not None else hyp["feedback"], hyp_id))
+             grade if grade is not None else hyp["grade"], hyp_id))
+        if feedback is not None:
+            _put_body(conn, "hypotheticals", hyp_id, feedback)
 
 def delete_hypothetical(hyp_id):
     with get_connection() as conn:
@@ -403,29 +1462,36 @@ def add_essay(title, prompt, note_id=None, rubric_id=None):
         c = conn.execute(
             "INSERT INTO essays (note_id,title,prompt,rubric_id,created_at,updated_at) VALUES (?,?,?,?,?,?)",
             (note_id, title, prompt, rubric_id, now, now))
+        _put_body(conn, "essays", c.lastrowid, "")
         return c.lastrowid
 
 def get_all_essays():
+    """
+    Essays without their text (see get_essay()), most recently updated
+    first. `has_content` says whether anything has been written yet.
+    """
     with get_connection() as conn:
-        rows = conn.execute("SELECT * FROM essays ORDER BY updated_at DESC").fetchall()
-        return [dict(r) for r in rows]
+        rows = conn.execute(
+            """SELECT e.*, IFNULL(length(b.content) > 0, 0) AS has_content FROM essays e
+               LEFT JOIN essay_bodies b ON b.essay_id = e.id
+               ORDER BY e.updated_at DESC""").fetchall()
+        return _without_body("essays", rows)
 
 def get_essay(essay_id):
     with get_connection() as conn:
-        row = conn.execute("SELECT * FROM essays WHERE id=?", (essay_id,)).fetchone()
-        return dict(row) if row else None
+        return _get_with_body(conn, "essays", essay_id)
 
 def update_essay(essay_id, content=None, grade=None, feedback=None):
     with get_connection() as conn:
-        essay = conn.execute("SELECT * FROM essays WHERE id=?", (essay_id,)).fetchone()
+        essay = conn.execute("SELECT grade, feedback FROM essays WHERE id=?", (essay_id,)).fetchone()
         if not essay:
             return
-        essay = dict(essay)
-        conn.execute("UPDATE essays SET content=?, grade=?, feedback=?, updated_at=? WHERE id=?",
-            (content if content is not None else essay["content"],
-             grade if grade is not None else essay["grade"],
+        conn.execute("UPDATE essays SET grade=?, feedback=?, updated_at=? WHERE id=?",
+            (grade if grade is not None else essay["grade"],
              feedback if feedback is not None else essay["feedback"],
              datetime.now().isoformat(), essay_id))
+        if content is not None:
+            _put_body(conn, "essays", essay_id, content)
 
 def delete_essay(essay_id):
     with get_connection() as conn:
@@ -438,19 +1504,31 @@ def add_rubric(name, content, source_file=""):
     now = datetime.now().isoformat()
     with get_connection() as conn:
         c = conn.execute(
-            "INSERT INTO rubrics (name,content,source_file,created_at) VALUES (?,?,?,?)",
-            (name, content, source_file, now))
+            "INSERT INTO rubrics (name,content,source_file,created_at) VALUES (?,'',?,?)",
+            (name, source_file, now))
+        _put_body(conn, "rubrics", c.lastrowid, content)
         return c.lastrowid
 
 def get_all_rubrics():
+    """Rubrics without their text (see get_rubric()), newest first."""
     with get_connection() as conn:
         rows = conn.execute("SELECT * FROM rubrics ORDER BY created_at DESC").fetchall()
-        return [dict(r) for r in rows]
+        return _without_body("rubrics", rows)
 
 def get_rubric(rubric_id):
     with get_connection() as conn:
-        row = conn.execute("SELECT * FROM rubrics WHERE id=?", (rubric_id,)).fetchone()
-        return dict(row) if row else None
+        return _get_with_body(conn, "rubrics", rubric_id)
+
+def update_rubric(rubric_id, name=None, content=None, source_file=None):
+    with get_connection() as conn:
+        rubric = conn.execute("SELECT name, source_file FROM rubrics WHERE id=?", (rubric_id,)).fetchone()
+        if not rubric:
+            return
+        conn.execute("UPDATE rubrics SET name=?, source_file=? WHERE id=?",
+            (name if name is not None else rubric["name"],
+             source_file if source_file is not None else rubric["source_file"], rubric_id))
+        if content is not None:
+            _put_body(conn, "rubrics", rubric_id, content)
 
 def delete_rubric(rubric_id):
     with get_connection() as conn:
@@ -467,6 +1545,28 @@ def add_participation_question(question, category="interesting", note_id=None, a
             (note_id, question, category, answer, notes, now))
         return c.lastrowid
 
+def add_participation_questions_bulk(questions, note_id=None):
+    """
+    Insert many participation questions in a single transaction.
+
+    Args:
+        questions: iterable of dicts with "question" and optional
+                   "category", "answer" and "notes"
+        note_id: note to link every question to
+
+    Returns:
+        Number of questions inserted.
+    """
+    now = datetime.now().isoformat()
+    rows = [(note_id, q["question"], q.get("category", "interesting"),
+             q.get("answer", ""), q.get("notes", ""), now) for q in questions]
+    if rows:
+        with get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO participation_questions (note_id,question,category,answer,notes,created_at) VALUES (?,?,?,?,?,?)",
+                rows)
+    return len(rows)
+
 def get_all_participation_questions():
     with get_connection() as conn:
         rows = conn.execute("SELECT * FROM participation_questions ORDER BY created_at DESC").fetchall()
@@ -0,0 +1,116 @@
+"""
+dedupe.py — Duplicate detection for imported notes and rubrics.
+
+Every stored note and rubric body carries two fingerprints, kept up to date
+by database.py and looked up through indexes, so checking an import costs
+the same however many documents there are:
+
+  content_hash  digest of the whitespace-normalised text; equal hashes mean
+                the same document (e.g. one PDF imported twice).
+  minhash       a MinHash signature of the text's word shingles. The share of
+                equal slots in two signatures estimates the Jaccard similarity
+                of their shingle sets, so re-exports, lightly edited copies
+                and a lecture's slides vs. its handout still match. Signatures
+                are cut into bands and each band hashed to a band key; two
+                documents sharing any band key are candidates (LSH), and only
+                candidates are compared slot by slot.
+
+The signature uses one-permutation hashing: each shingle is hashed once and
+lands in one of SLOTS bins, keeping the smallest value per bin, and empty bins
+borrow from the next filled one (rotation densification, Shrivastava & Li
+2014). That is SLOTS times cheaper than one hash per permutation and needs no
+numpy.
+
+This file is kept identical in study_app/ and study_app_v2/.
+"""
+
+import hashlib
+import re
+import struct
+
+SHINGLE_WORDS = 5       # words per shingle
+SLOTS = 64              # MinHash signature length
+BANDS = 16              # LSH bands of SLOTS // BANDS slots; ~50% similarity to become a candidate
+NEAR_DUPLICATE = 0.8    # estimated Jaccard similarity reported as a near-duplicate
+
+_WORD_RE = re.compile(r"\w+")
+_BIN_BITS = (SLOTS - 1).bit_length()
+_VALUE_BITS = 64 - _BIN_BITS
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+_SIGNATURE = struct.Struct(f"<{SLOTS}Q")
+
+
+def normalize(text) -> str:
+    """Collapse runs of whitespace, which PDF / DOCX extraction varies."""
+    return " ".join((text or "").split())
+
+
+def content_hash(text) -> str:
+    """Hex digest identifying the exact (whitespace-normalised) text."""
+    return hashlib.blake2b(normalize(text).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _shingles(text):
+    words = _WORD_RE.findall((text or "").lower())
+    if len(words) <= SHINGLE_WORDS:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(len(words) - SHINGLE_WORDS + 1)}
+
+
+def signature(text):
+    """SLOTS-value MinHash signature of `text`, or None if it has no words."""
+    shingles = _shingles(text)
+    if not shingles:
+        return None
+    slots = [None] * SLOTS
+    for shingle in shingles:
+        h = int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest(), "little")
+        slot, value = h >> _VALUE_BITS, h & _VALUE_MASK
+        if slots[slot] is None or value < slots[slot]:
+            slots[slot] = value
+    # An empty slot takes the value of the next filled one, offset by the
+    # distance, so two documents agree on it only if they agree there
+    filled = [i for i, v in enumerate(slots) if v is not None]
+    for i in range(SLOTS):
+        if slots[i] is None:
+            j = next((k for k in filled if k > i), filled[0])
+            distance = (j - i) % SLOTS
+            slots[i] = (slots[j] + distance * (_VALUE_MASK + 1)) & 0xFFFFFFFFFFFFFFFF
+    return slots
+
+
+def pack(sig) -> bytes:
+    return _SIGNATURE.pack(*sig)
+
+
+def unpack(blob):
+    return list(_SIGNATURE.unpack(blob))
+
+
+def band_keys(sig):
+    """One signed 64-bit key per band, for the indexed candidate lookup."""
+    rows = SLOTS // BANDS
+    keys = []
+    for band in range(BANDS):
+        data = struct.pack(f"<B{rows}Q", band, *sig[band * rows:(band + 1) * rows])
+        keys.append(int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little", signed=True))
+    return keys
+
+
+def similarity(sig_a, sig_b) -> float:
+    """Estimated Jaccard similarity of the two documents' shingle sets."""
+    return sum(a == b for a, b in zip(sig_a, sig_b)) / SLOTS
+
+
+def merge_text(existing, incoming) -> str:
+    """
+    `existing` followed by the paragraphs of `incoming` it does not already
+    contain (compared whitespace-normalised), for merging a near-duplicate
+    import into the stored document.
+    """
+    seen = {normalize(p) for p in re.split(r"\n\s*\n", existing or "")}
+    extra = [p.strip() for p in re.split(r"\n\s*\n", incoming or "")
+             if normalize(p) and normalize(p) not in seen]
+    if not extra:
+        return existing
+    return "\n\n".join([existing.rstrip()] + extra) if existing.strip() else "\n\n".join(extra)
@@ -0,0 +1,438 @@
+"""
+fsrs.py — The FSRS memory model and an optimizer that fits its weights to
+a collection's review history.
+
+FSRS (Free Spaced Repetition Scheduler, the v4.5 formulas) keeps two
+numbers per card instead of SM-2's easiness factor:
+
+  stability   days until recall probability falls to 90%
+  difficulty  1-10, how hard the card is to make stable
+
+Recall probability after `t` days is R = (1 + FACTOR * t / S) ** DECAY, and
+every review moves S and D by formulas with 17 weights. The defaults are
+fitted to a large pool of Anki users; fit() replaces them with weights
+fitted to this collection's own review history, by gradient descent
+(Adam, a step per batch of cards) on the log-loss of predicted recall
+against what actually happened. Gradients are carried forward through
+each card's review sequence alongside the state, and a batch's cards
+advance one review at a time as NumPy arrays, so five passes over 500k
+reviews take seconds.
+
+Ratings are the app's 0-5: below 3 is FSRS "again" (a lapse), 3 "hard",
+4 "good" and 5 "easy". Only the first review of a card on a day counts,
+as FSRS does not model same-day relearning.
+
+The model itself is plain Python; fit() and its *_batch() forms need NumPy. Optimizer runs a
+fit over the whole history on a worker thread.
+
+This file is kept identical in study_app/ and study_app_v2/.
+"""
+
+import math
+import threading
+import time
+
+import database as db
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+DEFAULT_WEIGHTS = (0.4872, 1.4003, 3.7145, 13.8206, 5.1618, 1.2298, 0.8975, 0.031, 1.6474, 0.1367,
+                   1.0461, 2.1072, 0.0793, 0.3246, 1.587, 0.2272, 2.8755)
+# (low, high) per weight; fit() keeps every weight inside its bounds
+WEIGHT_BOUNDS = ((0.1, 100), (0.1, 100), (0.1, 100), (0.1, 100), (1, 10), (0.1, 5), (0.1, 5), (0, 0.5),
+                 (0, 3), (0.1, 0.8), (0.01, 2.5), (0.5, 5), (0.01, 0.2), (0.01, 0.9), (0.01, 2), (0, 1),
+                 (1, 6))
+DECAY = -0.5
+FACTOR = 19 / 81            # so that R = 0.9 when t == S
+MIN_STABILITY = 0.01
+MAX_INTERVAL = 36500
+AGAIN, HARD, GOOD, EASY = 1, 2, 3, 4
+RMSE_BINS = 20
+MIN_BATCHES = 32            # gradient steps per epoch of fit(), however short the history
+
+
+# ── Model ────────────────────────────────────────────────────────
+
+def grade(rating: int) -> int:
+    """The app's 0-5 rating as an FSRS grade, AGAIN to EASY."""
+    return AGAIN if rating < 3 else min(rating, 5) - 1
+
+
+def retrievability(elapsed, stability) -> float:
+    """Probability of recall `elapsed` days after a review that left `stability`."""
+    return (1 + FACTOR * elapsed / stability) ** DECAY
+
+
+def next_interval(stability, retention=0.9, maximum=MAX_INTERVAL) -> int:
+    """Days until recall probability falls to `retention`."""
+    days = stability / FACTOR * (retention ** (1 / DECAY) - 1)
+    return max(1, min(maximum, round(days)))
+
+
+def _initial_difficulty(w, g):
+    return w[4] - (g - 3) * w[5]
+
+
+def initial_state(w, g) -> tuple:
+    """(stability, difficulty) after a card's first review, graded `g`."""
+    return w[g - 1], min(10.0, max(1.0, _initial_difficulty(w, g)))
+
+
+def next_state(w, stability, difficulty, elapsed, g) -> tuple:
+    """(stability, difficulty) after a review graded `g`, `elapsed` days after the last one."""
+    if elapsed <= 0:
+        return stability, difficulty
+    r = retrievability(elapsed, stability)
+    if g == AGAIN:
+        s = w[11] * difficulty ** -w[12] * ((stability + 1) ** w[13] - 1) * math.exp(w[14] * (1 - r))
+    else:
+        bonus = w[15] if g == HARD else w[16] if g == EASY else 1
+        s = stability * (1 + math.exp(w[8]) * (11 - difficulty) * stability ** -w[9]
+                         * (math.exp(w[10] * (1 - r)) - 1) * bonus)
+    # Difficulty moves with the grade and reverts towards a "good" first review's
+    d = w[7] * w[4] + (1 - w[7]) * (difficulty - w[6] * (g - 3))
+    return max(MIN_STABILITY, s), min(10.0, max(1.0, d))
+
+
+def replay(w, reviews):
+    """
+    A card's memory state from its review history.
+
+    Args:
+        w: the 17 weights
+        reviews: (epoch day, rating) pairs, oldest first
+
+    Returns:
+        (stability, difficulty, day of the last review), or None if there
+        are no reviews.
+    """
+    state, last = None, None
+    for day, rating in reviews:
+        if state is None:
+            state = initial_state(w, grade(rating))
+        elif day > last:
+            state = next_state(w, *state, day - last, grade(rating))
+        else:
+            continue  # same-day repeat
+        last = day
+    return None if state is None else (*state, last)
+
+
+# ── Many cards at once (NumPy) ───────────────────────────────────
+# The model above over arrays, one entry per card: for the simulator and
+# for rebuilding every card's memory state in one pass.
+
+def initial_state_batch(w, g, dtype="float64"):
+    """initial_state() of each grade in `g`: (stability, difficulty) arrays."""
+    w = np.asarray(w, dtype=dtype)
+    return w[g - 1], np.clip(w[4] - (g - 3) * w[5], 1, 10).astype(dtype)
+
+
+def next_state_batch(w, stability, difficulty, elapsed, g):
+    """
+    next_state() elementwise: (stability, difficulty) arrays. They keep
+    the dtype of `stability`, so float32 state (the simulator's) is
+    computed in float32; `elapsed` should be of that dtype too.
+    """
+    w = [float(x) for x in w]  # Python floats never widen float32 arrays
+    s, d = stability, difficulty
+    r = retrievability(np.maximum(elapsed, 0), s)
+    bonus = np.asarray((1, 1, w[15], 1, w[16]), dtype=s.dtype)[g]  # by grade: HARD w15, EASY w16
+    new_s = s * (1 + math.exp(w[8]) * (11 - d) * s ** -w[9] * (np.exp(w[10] * (1 - r)) - 1) * bonus)
+    lapse = np.flatnonzero(g == AGAIN)
+    if len(lapse):
+        s_l, d_l, r_l = s[lapse], d[lapse], r[lapse]
+        new_s[lapse] = w[11] * d_l ** -w[12] * ((s_l + 1) ** w[13] - 1) * np.exp(w[14] * (1 - r_l))
+    new_s = np.maximum(new_s, MIN_STABILITY)
+    new_d = np.clip(w[7] * w[4] + (1 - w[7]) * (d - w[6] * (g - 3).astype(d.dtype)), 1, 10)
+    same_day = elapsed <= 0
+    return np.where(same_day, s, new_s), np.where(same_day, d, new_d)
+
+
+def next_interval_batch(stability, retention=0.9, maximum=MAX_INTERVAL):
+    """next_interval() elementwise, as int64 (np.rint rounds halves to even, like round())."""
+    days = stability / FACTOR * (retention ** (1 / DECAY) - 1)
+    return np.clip(np.rint(days), 1, maximum).astype(np.int64)
+
+
+# ── Fitting ──────────────────────────────────────────────────────
+
+def prepare(rows):
+    """
+    Arrange reviews for fit() and evaluate().
+
+    Args:
+        rows: (review id, card_id, epoch day, rating) tuples in any order
+              (database.get_all_review_history()); ids order a card's
+              reviews on the same day
+
+    Returns:
+        Dict of NumPy arrays laid out step-major: the first review of
+        every card, then the second of every card that has one, and so on,
+        with cards ordered longest history first so that each step's cards
+        are a prefix of the previous step's. card_ids and last_day (epoch
+        day of the last review) are per card, in that order.
+    """
+    data = np.asarray(rows, dtype=np.int64).reshape(-1, 4)
+    data = data[np.lexsort((data[:, 0], data[:, 2], data[:, 1]))]
+    card, day, rating = data[:, 1], data[:, 2], data[:, 3]
+    new_card = np.ones(len(card), dtype=bool)
+    new_card[1:] = card[1:] != card[:-1]
+    keep = new_card.copy()
+    keep[1:] |= day[1:] != day[:-1]
+    card, day, rating, new_card = card[keep], day[keep], rating[keep], new_card[keep]
+
+    starts = np.flatnonzero(new_card)
+    lengths = np.diff(np.append(starts, len(card)))
+    position = np.arange(len(card)) - np.repeat(starts, lengths)
+    elapsed = np.zeros(len(card), dtype=np.int64)
+    elapsed[1:] = day[1:] - day[:-1]
+    rank = np.empty(len(lengths), dtype=np.int64)
+    rank[np.argsort(-lengths, kind="stable")] = np.arange(len(lengths))
+    order = np.lexsort((np.repeat(rank, lengths), position))
+    per_step = np.bincount(position)
+    by_rank = np.argsort(rank)
+    return {
+        "rating": rating[order],
+        "grade": np.where(rating[order] < 3, AGAIN, np.minimum(rating[order], 5) - 1),
+        "elapsed": elapsed[order].astype(np.float64),
+        "offsets": np.concatenate(([0], np.cumsum(per_step))),
+        "cards": len(lengths),
+        "reviews": int(len(card) - len(lengths)),  # the first review of a card predicts nothing
+        # per card, in step order
+        "card_ids": card[starts][by_rank],
+        "last_day": day[starts + lengths - 1][by_rank],
+    }
+
+
+def memory_states(w, data):
+    """
+    Every card's (stability, difficulty) after its last review, from
+    prepare()d reviews: arrays in the order of data["card_ids"].
+    """
+    grades, elapsed, offsets = data["grade"], data["elapsed"], data["offsets"]
+    if not data["cards"]:
+        return np.zeros(0), np.zeros(0)
+    s, d = initial_state_batch(w, grades[:offsets[1]])
+    for k in range(1, len(offsets) - 1):
+        lo, hi = offsets[k], offsets[k + 1]
+        n = hi - lo
+        s[:n], d[:n] = next_state_batch(w, s[:n], d[:n], elapsed[lo:hi], grades[lo:hi])
+    return s, d
+
+
+def _forward(w, data, with_grad):
+    """
+    Predicted recall of every review after a card's first, whether it was
+    recalled, and (with_grad) the gradient of the summed log-loss.
+
+    The gradient is carried forward: ds[j] is d(stability)/d(w[j]) of each
+    card so far, dd[j] d(difficulty)/d(w[4 + j]), the only weights
+    difficulty depends on.
+    """
+    w = np.asarray(w, dtype=np.float64)
+    grades, elapsed, offsets = data["grade"], data["elapsed"], data["offsets"]
+    g = grades[:offsets[1]]
+    s = w[g - 1]
+    d_pre = w[4] - (g - 3) * w[5]
+    d = np.clip(d_pre, 1, 10)
+    grad = None
+    if with_grad:
+        ds = np.zeros((len(w), len(g)))
+        ds[g - 1, np.arange(len(g))] = 1
+        inside = (d_pre > 1) & (d_pre < 10)
+        dd = np.stack([inside * 1.0, -(g - 3) * inside, np.zeros(len(g)), np.zeros(len(g))])
+        grad = np.zeros(len(w))
+    predicted, outcome = [], []
+
+    for k in range(1, len(offsets) - 1):
+        lo, hi = offsets[k], offsets[k + 1]
+        n = hi - lo
+        g, t = grades[lo:hi], elapsed[lo:hi]
+        s, d = s[:n], d[:n]
+        base = 1 + FACTOR * t / s
+        r = base ** DECAY
+        y = g > AGAIN
+        predicted.append(r)
+        outcome.append(y)
+
+        lapse = g == AGAIN
+        e = np.exp(w[10] * (1 - r))
+        bonus = np.where(g == HARD, w[15], np.where(g == EASY, w[16], 1.0))
+        grow = math.exp(w[8]) * (11 - d) * s ** -w[9]
+        a = grow * (e - 1) * bonus
+        power = (s + 1) ** w[13]
+        forget = np.exp(w[14] * (1 - r))
+        s_lapse = w[11] * d ** -w[12] * (power - 1) * forget
+        s_new = np.where(lapse, s_lapse, s * (1 + a))
+        shift = d - w[6] * (g - 3)
+        d_pre = w[7] * w[4] + (1 - w[7]) * shift
+
+        if with_grad:
+            ds, dd = ds[:, :n], dd[:, :n]
+            r_c = np.clip(r, 1e-6, 1 - 1e-6)
+            dr_ds = DECAY * base ** (DECAY - 1) * (-FACTOR * t / (s * s))
+            grad += ds @ (np.where(y, -1 / r_c, 1 / (1 - r_c)) * dr_ds)
+
+            # stability after the review, through the state and directly
+            coef_s = np.where(lapse, s_lapse * (w[13] * (s + 1) ** (w[13] - 1) / (power - 1) - w[14] * dr_ds),
+                              1 + a + s * (-w[9] * a / s - grow * bonus * e * w[10] * dr_ds))
+            coef_d = np.where(lapse, -w[12] * s_lapse / d, -s * a / (11 - d))
+            ds = ds * coef_s
+            ds[4:8] += dd * coef_d
+            passed, s_a, s_grow = ~lapse, s * a, s * grow
+            ds[8] += passed * s_a
+            ds[9] -= passed * s_a * np.log(s)
+            ds[10] += passed * s_grow * bonus * e * (1 - r)
+            ds[11] += lapse * s_lapse / w[11]
+            ds[12] -= lapse * s_lapse * np.log(d)
+            ds[13] += lapse * w[11] * d ** -w[12] * power * np.log(s + 1) * forget
+            ds[14] += lapse * s_lapse * (1 - r)
+            ds[15] += (g == HARD) * s_grow * (e - 1)
+            ds[16] += (g == EASY) * s_grow * (e - 1)
+            ds *= s_new > MIN_STABILITY
+
+            dd = dd * (1 - w[7])
+            dd[0] += w[7]
+            dd[2] -= (1 - w[7]) * (g - 3)
+            dd[3] += w[4] - shift
+            dd *= (d_pre > 1) & (d_pre < 10)
+        s, d = np.maximum(s_new, MIN_STABILITY), np.clip(d_pre, 1, 10)
+
+    predicted = np.concatenate(predicted) if predicted else np.zeros(0)
+    outcome = np.concatenate(outcome) if outcome else np.zeros(0, dtype=bool)
+    return predicted, outcome, grad
+
+
+def _metrics(predicted, outcome) -> dict:
+    """Log-loss, and RMSE between mean predicted and actual recall over RMSE_BINS bins of prediction."""
+    if not len(predicted):
+        return {"log_loss": None, "rmse": None}
+    p = np.clip(predicted, 1e-6, 1 - 1e-6)
+    log_loss = -np.mean(np.where(outcome, np.log(p), np.log(1 - p)))
+    bins = np.minimum((predicted * RMSE_BINS).astype(np.int64), RMSE_BINS - 1)
+    counts = np.bincount(bins, minlength=RMSE_BINS)
+    filled = counts > 0
+    mean_p = np.bincount(bins, predicted, RMSE_BINS)[filled] / counts[filled]
+    mean_y = np.bincount(bins, outcome.astype(np.float64), RMSE_BINS)[filled] / counts[filled]
+    rmse = math.sqrt(np.sum(counts[filled] * (mean_p - mean_y) ** 2) / len(predicted))
+    return {"log_loss": float(log_loss), "rmse": rmse}
+
+
+def evaluate(weights, batches) -> dict:
+    """log_loss and rmse of `weights` on prepare()d reviews (one dataset or a list of them)."""
+    runs = [_forward(weights, data, with_grad=False) for data in
+            (batches if isinstance(batches, list) else [batches])]
+    return _metrics(np.concatenate([p for p, _, _ in runs]), np.concatenate([y for _, y, _ in runs]))
+
+
+def fit(rows, weights=DEFAULT_WEIGHTS, epochs=5, batch_cards=1024, learning_rate=0.02, seed=0,
+        progress=None, should_stop=None) -> dict:
+    """
+    Fit FSRS weights to a review history.
+
+    Cards are dealt into batches of about `batch_cards`, and each epoch
+    takes one Adam step per batch, in a shuffled order, with the step size
+    falling along a cosine from `learning_rate` to zero over the whole fit.
+
+    Args:
+        rows: (review id, card_id, epoch day, rating) tuples as for prepare()
+        weights: starting point (default: DEFAULT_WEIGHTS)
+        epochs: passes over the history
+        batch_cards: cards per gradient step, fewer when that would make
+            fewer than MIN_BATCHES steps per epoch
+        learning_rate: largest step, as a share of each weight's bounds
+        seed: seeds the batch order
+        progress: called with (epoch, mean log-loss over the epoch)
+        should_stop: callable; fitting stops after the current batch when
+            it returns True
+
+    Returns:
+        Dict with weights (a list of 17), reviews and cards used, epochs
+        and seconds taken, and log_loss / rmse of the starting weights
+        (log_loss_before, rmse_before) and the fitted ones. If fitting made
+        log-loss worse, the starting weights are returned.
+    """
+    start = time.perf_counter()
+    if np is None:
+        raise RuntimeError("Fitting FSRS weights needs NumPy (pip install numpy)")
+    rows = np.asarray(rows, dtype=np.int64).reshape(-1, 4)
+    cards = len(np.unique(rows[:, 1]))
+    count = max(1, min(cards, max(MIN_BATCHES, cards // max(1, batch_cards))))
+    batches = [prepare(rows[rows[:, 1] % count == i]) for i in range(count)]
+    batches = [b for b in batches if b["reviews"]]
+    low, high = (np.array(bound, dtype=np.float64) for bound in zip(*WEIGHT_BOUNDS))
+    w = np.clip(np.asarray(weights, dtype=np.float64), low, high)
+    before = evaluate(w, batches) if batches else _metrics([], [])
+
+    rng = np.random.default_rng(seed)
+    m, v = np.zeros_like(w), np.zeros_like(w)
+    total, taken, epoch, stopped = epochs * len(batches), 0, 0, False
+    for epoch in range(1, epochs + 1):
+        loss_sum = 0.0
+        for i in rng.permutation(len(batches)):
+            predicted, outcome, grad = _forward(w, batches[i], with_grad=True)
+            p = np.clip(predicted, 1e-6, 1 - 1e-6)
+            loss_sum -= np.sum(np.where(outcome, np.log(p), np.log(1 - p)))
+            grad /= batches[i]["reviews"]
+            taken += 1
+            m = 0.9 * m + 0.1 * grad
+            v = 0.999 * v + 0.001 * grad * grad
+            rate = learning_rate * 0.5 * (1 + math.cos(math.pi * (taken - 1) / total))
+            w = np.clip(w - rate * (high - low) * (m / (1 - 0.9 ** taken))
+                        / (np.sqrt(v / (1 - 0.999 ** taken)) + 1e-12), low, high)
+            stopped = bool(should_stop and should_stop())
+            if stopped:
+                break
+        if progress:
+            # the epoch's mean loss, each batch's taken before its step
+            progress(epoch, loss_sum / max(1, sum(b["reviews"] for b in batches)))
+        if stopped:
+            break
+
+    after = evaluate(w, batches) if batches else before
+    if batches and after["log_loss"] > before["log_loss"]:
+        w, after = np.clip(np.asarray(weights, dtype=np.float64), low, high), before  # never hand back worse
+    return {
+        "weights": [round(float(x), 4) for x in w],
+        "reviews": sum(b["reviews"] for b in batches), "cards": sum(b["cards"] for b in batches),
+        "epochs": epoch, "seconds": round(time.perf_counter() - start, 2),
+        "log_loss_before": before["log_loss"], "rmse_before": before["rmse"],
+        "log_loss": after["log_loss"], "rmse": after["rmse"],
+    }
+
+
+class Optimizer:
+    """
+    fit() over the whole review history, on a worker thread.
+
+    on_done is called on the worker thread with fit()'s result, or with
+    {"error": message}; a UI must hand it to its own thread (Tk: after()).
+    """
+
+    def __init__(self, on_done, weights=DEFAULT_WEIGHTS, on_progress=None):
+        self.result = None
+        self._on_done = on_done
+        self._weights = weights
+        self._on_progress = on_progress
+        self._cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="fsrs-optimizer", daemon=True)
+        self._thread.start()
+
+    def running(self) -> bool:
+        return self._thread.is_alive()
+
+    def cancel(self):
+        """Stop after the current batch; the result has the weights fitted so far."""
+        self._cancel.set()
+
+    def _run(self):
+        try:
+            self.result = fit(db.get_all_review_history(), self._weights, progress=self._on_progress,
+                              should_stop=self._cancel.is_set)
+        except Exception as e:
+            self.result = {"error": str(e)}
+        self._on_done(self.result)
@@ -0,0 +1,363 @@
+"""
+instrumentation.py — Opt-in timing of everything database.py does.
+
+start() swaps two things in, so the rest of the app needs no changes:
+
+  * every public function of database.py is wrapped to count its calls,
+    time them and count the rows it returns (generators are timed only
+    while they run, not while the caller consumes them);
+  * pooled connections are reopened as InstrumentedConnection, whose
+    cursors time each statement from execute() to its last fetch and
+    count the rows and bytes it materialised. Opening a connection is
+    timed too.
+
+A statement slower than `slow_ms` is appended to the slow-query log
+(<data dir>/slow_queries.log) with its parameters, the database function
+that ran it and its EXPLAIN QUERY PLAN. summary() / format_summary() give
+the totals, slowest first, and dump() writes them to
+<data dir>/db_profile.txt. Turn it on with the "db_instrumentation" config
+key or `python main.py --instrument`; the summary is printed and dumped on
+exit, and Ctrl+Shift+D dumps it from the running app.
+
+Modules that imported functions by name (`from database import ...`,
+e.g. srs_engine) have those names swapped too.
+
+This file is kept identical in study_app/ and study_app_v2/.
+"""
+
+import atexit
+import functools
+import inspect
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+import database as db
+
+SLOW_LOG_NAME = "slow_queries.log"
+SUMMARY_NAME = "db_profile.txt"
+NUMBER_BYTES = 8  # what an INTEGER / REAL cell counts as
+# Context managers and pool plumbing, not queries
+UNWRAPPED = frozenset({"get_connection", "transaction", "close_all_connections", "set_performance_profile"})
+_EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE", "REPLACE")
+
+_active = None  # the running Instrumentation, if instrumentation is on
+
+
+def _row_bytes(row) -> int:
+    return sum(len(v) if isinstance(v, (str, bytes)) else NUMBER_BYTES for v in row if v is not None)
+
+
+def _result_rows(result) -> int:
+    if result is None:
+        return 0
+    if isinstance(result, (list, tuple, set)):
+        return len(result)
+    return 1
+
+
+class InstrumentedCursor(sqlite3.Cursor):
+    """Times a statement from execute() until its rows are exhausted or the next statement starts."""
+
+    _sql = None
+
+    def _begin(self, sql, parameters):
+        self._finish()
+        self._sql, self._parameters = sql, parameters
+        self._seconds, self._rows, self._bytes = 0.0, 0, 0
+
+    def _finish(self):
+        if self._sql is not None and _active is not None:
+            _active.record_statement(self, self._sql, self._parameters, self._seconds, self._rows, self._bytes)
+        self._sql = None
+
+    def _timed(self, method, *args):
+        t0 = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            self._seconds += time.perf_counter() - t0
+
+    def execute(self, sql, parameters=()):
+        self._begin(sql, parameters)
+        self._timed(super().execute, sql, parameters)
+        if self.description is None:  # nothing to fetch
+            self._finish()
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._begin(sql, None)
+        self._timed(super().executemany, sql, seq_of_parameters)
+        self._finish()
+        return self
+
+    def executescript(self, sql_script):
+        self._begin(sql_script, None)
+        self._timed(super().executescript, sql_script)
+        self._finish()
+        return self
+
+    def _count(self, rows):
+        self._rows += len(rows)
+        self._bytes += sum(_row_bytes(row) for row in rows)
+
+    def fetchone(self):
+        row = self._timed(super().fetchone)
+        if row is None:
+            self._finish()
+        else:
+            self._count((row,))
+        return row
+
+    def fetchmany(self, size=None):
+        rows = self._timed(super().fetchmany, self.arraysize if size is None else size)
+        self._count(rows)
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        rows = self._timed(super().fetchall)
+        self._count(rows)
+        self._finish()
+        return rows
+
+    def __next__(self):
+        try:
+            row = self._timed(super().__next__)
+        except StopIteration:
+            self._finish()
+            raise
+        self._count((row,))
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+    def __del__(self):
+        # `conn.execute(...).fetchone()` never exhausts its cursor
+        self._finish()
+
+
+class InstrumentedConnection(sqlite3.Connection):
+    """A sqlite3.Connection whose statements all run on InstrumentedCursors."""
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+
+class Instrumentation:
+    def __init__(self, slow_ms=100, log_path=None):
+        self.slow_seconds = max(0.0, float(slow_ms)) / 1000
+        self.log_path = log_path or os.path.join(db.DB_DIR, SLOW_LOG_NAME)
+        self.started = datetime.now()
+        self.slow_count = 0
+        self._lock = threading.Lock()
+        self._stats = {}  # (kind, name) -> [calls, seconds, max_seconds, rows, bytes]
+        self._calls = threading.local()  # .stack: [name, bytes] of the database functions running
+        self._originals = {}  # database function -> its wrapper
+
+    # ── Recording ────────────────────────────────────────────────
+
+    def record(self, kind, name, seconds, rows=0, nbytes=0):
+        with self._lock:
+            entry = self._stats.get((kind, name))
+            if entry is None:
+                entry = self._stats[(kind, name)] = [0, 0.0, 0.0, 0, 0]
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+            entry[3] += rows
+            entry[4] += nbytes
+
+    def _stack(self):
+        stack = getattr(self._calls, "stack", None)
+        if stack is None:
+            stack = self._calls.stack = []
+        return stack
+
+    def record_statement(self, cursor, sql, parameters, seconds, rows, nbytes):
+        stack = self._stack()
+        for frame in stack:  # bytes count towards every function the statement ran under
+            frame[1] += nbytes
+        self.record("sql", " ".join(sql.split()), seconds, rows, nbytes)
+        if seconds >= self.slow_seconds:
+            self._log_slow(cursor.connection, sql, parameters, seconds, rows,
+                           stack[-1][0] if stack else None)
+
+    def _log_slow(self, conn, sql, parameters, seconds, rows, caller):
+        plan = []
+        if sql.lstrip().upper().startswith(_EXPLAINABLE) and parameters is not None:
+            try:
+                # A plain cursor, so the EXPLAIN itself isn't recorded
+                plan = [r[-1] for r in sqlite3.Cursor(conn).execute("EXPLAIN QUERY PLAN " + sql, parameters)]
+            except sqlite3.Error as e:
+                plan = [f"(no plan: {e})"]
+        lines = [f"{datetime.now():%Y-%m-%d %H:%M:%S}  {seconds * 1000:.1f} ms  {rows} rows"
+                 f"{f'  in {caller}()' if caller else ''}",
+                 "    " + " ".join(sql.split())]
+        if parameters:
+            lines.append(f"    parameters: {parameters!r}"[:500])
+        lines += [f"    plan: {step}" for step in plan]
+        with self._lock:
+            self.slow_count += 1
+            try:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write("\n".join(lines) + "\n\n")
+            except OSError as e:
+                print(f"[StudyForge] Could not write the slow-query log: {e}")
+
+    # ── Wrapping database.py ─────────────────────────────────────
+
+    def _wrap(self, name, fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def generator_wrapper(*args, **kwargs):
+                gen = fn(*args, **kwargs)
+                seconds, rows, frame = 0.0, 0, [name, 0]
+                stack = self._stack()
+                try:
+                    while True:
+                        stack.append(frame)
+                        t0 = time.perf_counter()
+                        try:
+                            item = next(gen)
+                        except StopIteration:
+                            break
+                        finally:
+                            seconds += time.perf_counter() - t0
+                            stack.pop()
+                        rows += 1
+                        yield item
+                finally:
+                    gen.close()
+                    self.record("call", name, seconds, rows, frame[1])
+            return generator_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            frame = [name, 0]
+            stack = self._stack()
+            stack.append(frame)
+            t0 = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - t0
+                stack.pop()
+            self.record("call", name, seconds, _result_rows(result), frame[1])
+            return result
+        return wrapper
+
+    def _timed_open(self, open_connection):
+        @functools.wraps(open_connection)
+        def wrapper():
+            t0 = time.perf_counter()
+            conn = open_connection()
+            self.record("connect", "open connection", time.perf_counter() - t0)
+            return conn
+        return wrapper
+
+    @staticmethod
+    def _swap(replacements):
+        """Rebind each function in `replacements` (old -> new) in database.py and every module that imported it by name."""
+        for module in list(sys.modules.values()):
+            namespace = getattr(module, "__dict__", {})
+            for name, value in list(namespace.items()):
+                if inspect.isfunction(value) and value in replacements:
+                    setattr(module, name, replacements[value])
+
+    def install(self):
+        for name, fn in list(vars(db).items()):
+            if (inspect.isfunction(fn) and fn.__module__ == db.__name__
+                    and not name.startswith("_") and name not in UNWRAPPED):
+                self._originals[fn] = self._wrap(name, fn)
+        self._originals[db._open_connection] = self._timed_open(db._open_connection)
+        self._swap(self._originals)
+        db._connection_factory = InstrumentedConnection
+        db.close_all_connections()  # reopen through the factory
+
+    def uninstall(self):
+        self._swap({wrapped: fn for fn, wrapped in self._originals.items()})
+        self._originals.clear()
+        db._connection_factory = sqlite3.Connection
+        db.close_all_connections()
+
+    # ── Reporting ────────────────────────────────────────────────
+
+    def summary(self):
+        """One dict per function / statement / connect: calls, total_ms, mean_ms, max_ms, rows, bytes."""
+        with self._lock:
+            items = [(key, list(entry)) for key, entry in self._stats.items()]
+        rows = [{"kind": kind, "name": name, "calls": calls, "total_ms": seconds * 1000,
+                 "mean_ms": seconds * 1000 / calls, "max_ms": max_seconds * 1000,
+                 "rows": nrows, "bytes": nbytes}
+                for (kind, name), (calls, seconds, max_seconds, nrows, nbytes) in items]
+        rows.sort(key=lambda r: r["total_ms"], reverse=True)
+        return rows
+
+    def format_summary(self, limit=None, width=72) -> str:
+        rows = self.summary()
+        shown = rows[:limit] if limit else rows
+        header = f"{'kind':<8}{'name':<{width}}{'calls':>9}{'total ms':>11}{'mean ms':>10}" \
+                 f"{'max ms':>10}{'rows':>11}{'KB':>11}"
+        lines = [f"StudyForge database profile since {self.started:%Y-%m-%d %H:%M:%S} "
+                 f"({self.slow_count} statements over {self.slow_seconds * 1000:g} ms, see {self.log_path})",
+                 header, "-" * len(header)]
+        for r in shown:
+            name = r["name"] if len(r["name"]) <= width - 2 else r["name"][:width - 5] + "..."
+            lines.append(f"{r['kind']:<8}{name:<{width}}{r['calls']:>9,}{r['total_ms']:>11,.1f}"
+                         f"{r['mean_ms']:>10,.2f}{r['max_ms']:>10,.1f}{r['rows']:>11,}{r['bytes'] / 1024:>11,.1f}")
+        if len(shown) < len(rows):
+            lines.append(f"... {len(rows) - len(shown)} more")
+        return "\n".join(lines)
+
+    def dump(self, path=None) -> str:
+        """Write format_summary() to `path` (default: <data dir>/db_profile.txt); returns the path."""
+        path = path or os.path.join(db.DB_DIR, SUMMARY_NAME)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.format_summary() + "\n")
+        return path
+
+
+def _report_at_exit():
+    if _active is not None:
+        print(_active.format_summary(limit=25))
+        print(f"[StudyForge] Database profile written to {_active.dump()}")
+
+
+def start(slow_ms=100, log_path=None, report_at_exit=True):
+    """Turn instrumentation on; with `report_at_exit` the summary is printed and dumped on exit."""
+    global _active
+    if _active is None:
+        _active = Instrumentation(slow_ms, log_path)
+        _active.install()
+        if report_at_exit:
+            atexit.register(_report_at_exit)  # runs before database's close_all_connections
+    return _active
+
+
+def active():
+    """The running Instrumentation, or None when instrumentation is off."""
+    return _active
+
+
+def stop():
+    """Turn instrumentation off, restoring database.py's own functions and connections."""
+    global _active
+    if _active is not None:
+        _active.uninstall()
+        _active = None
@@ -4,11 +4,25 @@ main.py — Entry point for StudyForge.
 Works both as:
   python main.py       (development)
   StudyForge.exe       (frozen PyInstaller build)
+
+  python main.py --rebuild-stats   recompute daily stats and streaks from
+                                   the review/pomodoro logs, then exit
+  python main.py --backup          take a database snapshot now, then exit
+  python main.py --restore FILE    put a snapshot back (the current data is
+                                   snapshotted first), then exit
+  python main.py --instrument      time every database call and statement;
+                                   the summary is printed and written to
+                                   <data dir>/db_profile.txt on exit
+  python main.py --simulate [DAYS] project the daily review load DAYS (365)
+                                   ahead with the configured scheduler and
+                                   daily_new_cards_limit (--new-cards N to
+                                   try another, --runs N, default 1000)
 """
 
 import json
 import os
 import sys
+import zipfile
 
 # ── Path setup ────────────────────────────────────────────────────
 # Must happen before any local imports so modules resolve correctly.
@@ -20,7 +34,13 @@ else:
     sys.path.insert(0, PROJECT_DIR)
 
 from paths import get_config_path, ensure_config_exists, get_user_data_dir, DEFAULT_CONFIG
-from database import init_db
+from database import init_db, close_all_connections, rebuild_rollups, set_performance_profile
+import srs_engine
+import review_writer
+import maintenance
+import backup
+import instrumentation
+import simulator
 from claude_client import ClaudeStudyClient, detect_provider_from_key
 from ui.app import StudyForgeApp
 
@@ -46,6 +66,18 @@ def load_config() -> dict:
     return default_config
 
 
+def argument_after(flag: str, default=None, kind=int):
+    """
+    The value given after `flag` on the command line, converted with
+    `kind`, or `default` if there is none: for int only digits count, for
+    anything else any argument that is not itself a --flag.
+    """
+    i = sys.argv.index(flag) + 1 if flag in sys.argv else len(sys.argv)
+    if i < len(sys.argv) and (sys.argv[i].isdigit() if kind is int else not sys.argv[i].startswith("--")):
+        return kind(sys.argv[i])
+    return default
+
+
 def init_claude_client(config: dict):
     """Initialize the configured AI client if a valid key is present."""
     api_key = config.get("claude_api_key", "")
@@ -74,15 +106,93 @@ def main():
     print("  StudyForge — All-in-One Study Companion")
     print("=" * 50)
 
-    # Initialize database
-    print("[StudyForge] Initializing database...")
-    init_db()
-
-    # Load config
+    # Load config (the performance profile must be set before any connection opens)
     print("[StudyForge] Loading configuration...")
     config = load_config()
     print(f"[StudyForge] Data directory: {config['_data_dir']}")
     print(f"[StudyForge] Config file:    {config['_config_path']}")
+    try:
+        set_performance_profile(config.get("performance_profile", "balanced"))
+    except ValueError as e:
+        print(f"Warning: {e}; using 'balanced'")
+
+    # Restore replaces the database files, so it runs before anything opens them
+    if "--restore" in sys.argv:
+        snapshot = argument_after("--restore", kind=str)
+        if snapshot is None:
+            print("[StudyForge] Can't restore: give the snapshot file after --restore")
+            return
+        try:
+            undo = backup.restore_snapshot(snapshot)
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            print(f"[StudyForge] Can't restore: {e}")
+            return
+        print(f"[StudyForge] Restored {snapshot} (previous data saved as {undo})")
+        return
+
+    # Opt-in per-query timing and slow-query log (see instrumentation.py)
+    if config.get("db_instrumentation") or "--instrument" in sys.argv:
+        profile = instrumentation.start(slow_ms=config.get("slow_query_ms", 100))
+        print(f"[StudyForge] Database instrumentation on, slow queries logged to {profile.log_path}")
+
+    # Initialize database
+    print("[StudyForge] Initializing database...")
+    init_db()
+
+    if "--backup" in sys.argv:
+        result = backup.create_snapshot(keep=config.get("backup_keep", 7))
+        print(f"[StudyForge] Snapshot {result['path']}: {result['bytes'] / 1e6:.1f} MB "
+              f"at {result['mb_per_s']:.1f} MB/s")
+        close_all_connections()
+        return
+
+    if "--rebuild-stats" in sys.argv:
+        summary = rebuild_rollups()
+        print(f"[StudyForge] Rebuilt stats for {summary['days']} days · "
+              f"streak {summary['current_streak']} (longest {summary['longest_streak']})")
+        close_all_connections()
+        return
+
+    # SM-2, or FSRS with the weights last fitted in Settings; due dates load-balanced unless turned off
+    try:
+        srs_engine.set_scheduler(config.get("scheduler", "sm2"), weights=config.get("fsrs_weights"),
+                                 desired_retention=config.get("desired_retention", 0.9))
+    except ValueError as e:
+        print(f"Warning: {e}; using 'sm2'")
+    srs_engine.set_load_balancing(config.get("load_balancing", True))
+
+    if "--simulate" in sys.argv:
+        try:
+            result = simulator.simulate(
+                days=argument_after("--simulate", 365), runs=argument_after("--runs", 1000),
+                new_per_day=argument_after("--new-cards", config.get("daily_new_cards_limit", 20)))
+            print(simulator.format_report(result))
+        except (RuntimeError, ValueError) as e:
+            print(f"[StudyForge] Can't simulate: {e}")
+        close_all_connections()
+        return
+
+    # Optional write-behind review journal (also replays it after a crash)
+    if config.get("write_behind_reviews"):
+        review_writer.start(
+            flush_every=config.get("write_behind_flush_every", 20),
+            flush_interval_ms=config.get("write_behind_flush_ms", 1000))
+        print("[StudyForge] Write-behind review mode enabled")
+    else:
+        review_writer.replay_journal(review_writer.default_journal_path())
+
+    # Checkpoint / vacuum / ANALYZE on a worker thread while the UI is idle
+    if config.get("idle_maintenance", True):
+        maintenance.start(
+            idle_seconds=config.get("maintenance_idle_seconds", 120),
+            interval_minutes=config.get("maintenance_interval_minutes", 60),
+            archive_after_days=config.get("review_archive_days", 180),
+            change_keep_days=config.get("change_journal_days", 90))
+
+    # Scheduled online snapshots into <data dir>/backups
+    if config.get("backups_enabled", True):
+        backup.start(interval_hours=config.get("backup_interval_hours", 24),
+                     keep=config.get("backup_keep", 7))
 
     # Initialize AI client
     print("[StudyForge] Connecting to AI API...")
@@ -91,7 +201,13 @@ def main():
     # Launch the app
     print("[StudyForge] Launching application...")
     app = StudyForgeApp(config, claude_client)
-    app.mainloop()
+    try:
+        app.mainloop()
+    finally:
+        backup.stop()
+        maintenance.stop()
+        review_writer.stop()
+        close_all_connections()
 
 
 if __name__ == "__main__":
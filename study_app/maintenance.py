@@ -0,0 +1,104 @@
+"""
+maintenance.py — Idle-time database housekeeping.
+
+In WAL mode the -wal file only shrinks when a checkpoint truncates it, free
+pages left by large deletes (delete_note cascading to cards and logs) are
+never handed back, and nothing refreshes the query planner's statistics.
+The scheduler runs database.run_maintenance() on a worker thread once the
+UI has had no input for `idle_seconds`, at most once every
+`interval_minutes`, and logs the time spent and the bytes reclaimed. Each
+pass first moves reviews older than `archive_after_days` to the review
+archive (database.archive_reviews()) and drops change-journal entries older
+than `change_keep_days` (database.prune_changes()).
+
+The UI calls touch() on every key press, click and mouse move;
+run_maintenance() checks between steps and stops as soon as the user is
+back, so a long vacuum never holds the write lock under their feet.
+"""
+
+import threading
+import time
+
+import database as db
+
+_active = None  # the running MaintenanceScheduler, if idle maintenance is on
+
+
+class MaintenanceScheduler:
+    def __init__(self, idle_seconds=120, interval_minutes=60, archive_after_days=None, change_keep_days=None):
+        self.idle_seconds = max(1, float(idle_seconds))
+        self.interval = max(1, float(interval_minutes)) * 60
+        self.archive_after_days = archive_after_days  # None: database.REVIEW_HOT_DAYS
+        self.change_keep_days = change_keep_days      # None: database.CHANGE_KEEP_DAYS
+        self.last_result = None
+        self._last_input = time.monotonic()
+        self._last_run = None    # None: run at the first idle spell
+        self._stopping = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="db-maintenance", daemon=True)
+        self._thread.start()
+
+    def touch(self):
+        """Record user input (called from the UI thread; just a timestamp)."""
+        self._last_input = time.monotonic()
+
+    def idle(self) -> bool:
+        return time.monotonic() - self._last_input >= self.idle_seconds
+
+    def stop(self):
+        """Stop the worker, cutting a running pass short at its next step."""
+        self._stopping.set()
+        self._thread.join()
+
+    def run_now(self):
+        """Run one maintenance pass on the calling thread and log it."""
+        self._last_run = time.monotonic()
+        try:
+            result = db.run_maintenance(lambda: self.idle() and not self._stopping.is_set(),
+                                        self.archive_after_days, self.change_keep_days)
+        except Exception as e:
+            print(f"[StudyForge] Database maintenance failed, will retry later: {e}")
+            return None
+        self.last_result = result
+        freed = result["wal_bytes_freed"] + result["file_bytes_freed"]
+        print(f"[StudyForge] Database maintenance{'' if result['completed'] else ' (interrupted)'}: "
+              f"{result['seconds']:.2f} s, {result['archived']} reviews archived, "
+              f"{result['changes_pruned']} journal entries pruned, "
+              f"reclaimed {freed / 1e6:.1f} MB "
+              f"(WAL {result['wal_bytes_freed'] / 1e6:.1f} MB, file {result['file_bytes_freed'] / 1e6:.1f} MB)")
+        return result
+
+    # ── Worker thread ────────────────────────────────────────────
+
+    def _run(self):
+        poll = min(self.idle_seconds, 30)
+        while not self._stopping.wait(poll):
+            due = self._last_run is None or time.monotonic() - self._last_run >= self.interval
+            if due and self.idle():
+                self.run_now()
+
+
+def start(idle_seconds=120, interval_minutes=60, archive_after_days=None, change_keep_days=None):
+    """Turn idle-time maintenance on."""
+    global _active
+    if _active is None:
+        _active = MaintenanceScheduler(idle_seconds, interval_minutes, archive_after_days, change_keep_days)
+    return _active
+
+
+def active():
+    """The running MaintenanceScheduler, or None when idle maintenance is off."""
+    return _active
+
+
+def touch():
+    """Note user activity (no-op when idle maintenance is off)."""
+    if _active is not None:
+        _active.touch()
+
+
+def stop():
+    """Shut idle maintenance down."""
+    global _active
+    if _active is not None:
+        _active.stop()
+        _active = None
@@ -0,0 +1,191 @@
+"""
+review_writer.py — Optional write-behind mode for flashcard reviews.
+
+When enabled, review_card() still computes the new card state immediately,
+but instead of committing to SQLite on the UI thread it appends the review
+to a small append-only journal and hands it to a background writer thread.
+The writer persists queued reviews with database.apply_reviews() in one
+transaction every `flush_every` reviews or `flush_interval_ms`, whichever
+comes first, then drops them from the journal.
+
+Callers must flush() before reading review-dependent data from the
+database (the app does this on every tab switch) and stop() on exit. On
+the next start, any reviews left in the journal by a crash are replayed;
+apply_reviews() skips those that were already committed, so a replay is
+safe even if the crash came between the commit and the journal rewrite.
+
+Each journalled review is fsynced before submit() returns, so it survives
+an OS crash or power cut as well as an app crash. That costs one fsync per
+rating (a millisecond or so on an SSD, more on a spinning disk). The
+"fast" performance profile, which already gives up fsync for the database
+(synchronous=OFF), gives it up for the journal too; there a power cut can
+lose the last reviews, as it can lose the last commits.
+"""
+
+import json
+import os
+import threading
+import time
+
+import database as db
+
+JOURNAL_NAME = "review_journal.jsonl"
+
+_active = None  # the running ReviewWriter, if write-behind mode is on
+
+
+class ReviewWriter:
+    def __init__(self, journal_path, flush_every=20, flush_interval_ms=1000, durable=None):
+        self.journal_path = journal_path
+        if durable is None:
+            durable = db.PERFORMANCE_PROFILES[db.get_performance_profile()]["synchronous"] != "OFF"
+        self.durable = durable   # fsync the journal on every write
+        self.flush_every = max(1, int(flush_every))
+        self.flush_interval = max(10, int(flush_interval_ms)) / 1000
+        self._cond = threading.Condition()
+        self._pending = []       # queued, not yet handed to the writer
+        self._submitted = 0      # reviews ever queued
+        self._applied = 0        # reviews ever committed (or given up on)
+        self._flush_now = False
+        self._stopping = False
+        self._journal = open(journal_path, "a", encoding="utf-8")
+        self._thread = threading.Thread(target=self._run, name="review-writer", daemon=True)
+        self._thread.start()
+
+    # ── Producer side (UI thread) ────────────────────────────────
+
+    def submit(self, review: dict):
+        """Journal a scheduled review and queue it for the writer thread."""
+        with self._cond:
+            self._journal.write(json.dumps(review) + "\n")
+            self._journal.flush()
+            if self.durable:
+                os.fsync(self._journal.fileno())
+            self._pending.append(review)
+            self._submitted += 1
+            if len(self._pending) >= self.flush_every:
+                self._cond.notify_all()
+
+    def flush(self, timeout=5.0) -> bool:
+        """
+        Block until every review submitted so far is committed.
+        Returns False if that did not happen within `timeout` seconds, or
+        if the writer thread has died (the reviews stay journaled).
+        """
+        with self._cond:
+            target = self._submitted
+            self._flush_now = True
+            self._cond.notify_all()
+            self._cond.wait_for(
+                lambda: self._applied >= target or not self._thread.is_alive(), timeout)
+            if self._applied < target and not self._thread.is_alive():
+                print(f"[StudyForge] Review writer stopped with {target - self._applied} "
+                      f"review(s) uncommitted; they stay in the journal")
+            return self._applied >= target
+
+    def stop(self):
+        """Flush everything, stop the writer thread and close the journal."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        self._thread.join()
+        self._journal.close()
+
+    # ── Writer thread ────────────────────────────────────────────
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: self._stopping or self._flush_now or len(self._pending) >= self.flush_every,
+                    self.flush_interval)
+                self._flush_now = False
+                batch, self._pending = self._pending, []
+                stopping = self._stopping
+            if batch:
+                if not self._write_batch(batch):
+                    if stopping:
+                        return  # unwritten reviews stay journaled for the next start
+                    time.sleep(self.flush_interval)
+            elif stopping:
+                return
+
+    def _write_batch(self, batch) -> bool:
+        try:
+            db.apply_reviews(batch)
+        except Exception as e:
+            print(f"[StudyForge] Review write-behind failed, will retry: {e}")
+            with self._cond:
+                self._pending[:0] = batch  # keep order; entries are still journaled
+            return False
+        with self._cond:
+            self._applied += len(batch)
+            self._rewrite_journal()
+            self._cond.notify_all()
+        return True
+
+    def _rewrite_journal(self):
+        """Replace the journal with only the still-pending reviews. Caller holds the lock."""
+        self._journal.close()
+        tmp = self.journal_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for review in self._pending:
+                f.write(json.dumps(review) + "\n")
+            if self.durable:
+                # The replacement must be on disk before it takes the old journal's place
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp, self.journal_path)
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+
+
+def replay_journal(journal_path) -> int:
+    """Commit reviews left behind by a crash. Returns how many were new."""
+    if not os.path.exists(journal_path):
+        return 0
+    reviews = []
+    with open(journal_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                reviews.append(json.loads(line))
+            except ValueError:
+                break  # torn final line from the crash
+    applied = db.apply_reviews(reviews) if reviews else 0
+    os.remove(journal_path)
+    if applied:
+        print(f"[StudyForge] Recovered {applied} review(s) from the write-behind journal")
+    return applied
+
+
+def default_journal_path():
+    return os.path.join(db.DB_DIR, JOURNAL_NAME)
+
+
+def start(journal_path=None, flush_every=20, flush_interval_ms=1000):
+    """Replay any crash journal, then turn write-behind mode on."""
+    global _active
+    if _active is not None:
+        return _active
+    journal_path = journal_path or default_journal_path()
+    replay_journal(journal_path)
+    _active = ReviewWriter(journal_path, flush_every, flush_interval_ms)
+    return _active
+
+
+def active():
+    """The running ReviewWriter, or None when reviews are written synchronously."""
+    return _active
+
+
+def flush():
+    """Commit all queued reviews (no-op when write-behind mode is off)."""
+    if _active is not None:
+        _active.flush()
+
+
+def stop():
+    """Flush and shut down write-behind mode."""
+    global _active
+    if _active is not None:
+        _active.stop()
+        _active = None
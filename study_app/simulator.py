@@ -0,0 +1,279 @@
+"""
+simulator.py — Monte Carlo projection of the review workload: how many
+reviews, new cards and minutes a day the collection will ask for over the
+next N days, with the active scheduler and a given new-card limit.
+
+Each run starts from the collection as it is: every card's scheduling
+state and due day, and its memory state (FSRS stability and difficulty)
+rebuilt from its review history. Then each day, every card due is
+reviewed: whether it is recalled is drawn from the FSRS forgetting curve,
+the rating from how this collection's own reviews were rated (first
+reviews, recalled and forgotten ones apart), and the card is rescheduled
+with the same arithmetic as srs_engine.review_card(). A forgotten card is
+retried the same day, as the review screen does. New cards (never
+reviewed) are introduced `new_per_day` a day, oldest first. Due dates are
+not load-balanced (srs_engine.balance()), so the projected peaks are what
+the unfuzzed schedule would ask for, an upper bound on the app's own.
+
+Runs are simulated side by side. The card-runs due on a day form a block,
+a float32 array with a column per card-run holding its run, memory and
+SM-2 state; the day's block is updated with array arithmetic, then sorted
+by next due day and cut into the blocks of the days ahead. So a day costs
+what its reviews cost, with no pass over (or random access into) the
+whole collection. Runs are taken in chunks of about CHUNK_CELLS card-runs
+to bound memory (28 bytes each).
+
+Needs NumPy.
+
+This file is kept identical in study_app/ and study_app_v2/.
+"""
+
+import time
+from datetime import date, timedelta
+
+import database as db
+import fsrs
+import srs_engine
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Seconds a review takes, by kind; "new" and "lapse" include the same-day retry
+SECONDS = {"new": 25.0, "review": 8.0, "lapse": 20.0}
+# Chance of each rating 0-5, for a collection with no reviews of that kind yet
+DEFAULT_RATINGS = {
+    "first": (0.08, 0.08, 0.09, 0.15, 0.40, 0.20),
+    "recalled": (0, 0, 0, 0.15, 0.60, 0.25),
+    "forgot": (0.40, 0.35, 0.25, 0, 0, 0),
+}
+RETRY_RATING = 4            # how a forgotten card's same-day retry is rated
+CHUNK_CELLS = 8_000_000     # card-runs simulated at once
+MAX_DAYS = 3650
+# Rows of a block of card-runs: one column per card in one run
+RUN, STABILITY, DIFFICULTY, LAST, EASINESS, INTERVAL, REPS = range(7)
+
+
+def _rating_odds(ratings, default):
+    counts = np.bincount(ratings, minlength=6)[:6].astype(np.float64)
+    return counts / counts.sum() if counts.sum() else np.asarray(default, dtype=np.float64)
+
+
+def load_collection(weights=fsrs.DEFAULT_WEIGHTS) -> dict:
+    """
+    The collection's state as simulate() starts from it.
+
+    Args:
+        weights: FSRS weights to rebuild memory states with
+
+    Returns:
+        Dict of per-card NumPy arrays in id order (id, easiness, interval,
+        repetitions, due_day, stability, difficulty, last_day; stability
+        is NaN for cards never reviewed), and ratings: the observed odds
+        of each rating 0-5 for first reviews, recalled and forgotten ones.
+    """
+    if np is None:
+        raise RuntimeError("Simulating the workload needs NumPy (pip install numpy)")
+    states = db.get_srs_states()
+    ids = np.array([s["id"] for s in states], dtype=np.int64)
+    interval = np.array([s["interval"] for s in states], dtype=np.int64)
+    repetitions = np.array([s["repetitions"] for s in states], dtype=np.int64)
+    due_day = np.array([s["due_day"] for s in states], dtype=np.int64)
+    stability = np.full(len(ids), np.nan)
+    difficulty = np.full(len(ids), np.nan)
+    last_day = due_day - interval
+
+    rows = db.get_all_review_history()
+    ratings = dict(DEFAULT_RATINGS)
+    if rows:
+        data = fsrs.prepare(rows)
+        s, d = fsrs.memory_states(weights, data)
+        pos = np.minimum(np.searchsorted(ids, data["card_ids"]), max(len(ids) - 1, 0))
+        known = ids[pos] == data["card_ids"] if len(ids) else np.zeros(len(pos), dtype=bool)
+        stability[pos[known]] = s[known]
+        difficulty[pos[known]] = d[known]
+        last_day[pos[known]] = data["last_day"][known]
+        first, later = data["rating"][:data["offsets"][1]], data["rating"][data["offsets"][1]:]
+        ratings = {"first": _rating_odds(first, DEFAULT_RATINGS["first"]),
+                   "recalled": _rating_odds(later[later >= srs_engine.PASSING_RATING], DEFAULT_RATINGS["recalled"]),
+                   "forgot": _rating_odds(later[later < srs_engine.PASSING_RATING], DEFAULT_RATINGS["forgot"])}
+
+    # Scheduled but with no history (imported, or its reviews deleted): the
+    # interval stands in for stability, as FSRS would have set it at 90%
+    guessed = np.isnan(stability) & ((repetitions > 0) | (interval > 0))
+    stability[guessed] = np.maximum(interval[guessed], 1)
+    difficulty[guessed] = weights[4]
+    return {
+        "id": ids,
+        "easiness": np.array([s["easiness_factor"] for s in states], dtype=np.float64),
+        "interval": interval, "repetitions": repetitions, "due_day": due_day,
+        "stability": stability, "difficulty": difficulty, "last_day": last_day,
+        "ratings": {kind: np.asarray(odds, dtype=np.float64) for kind, odds in ratings.items()},
+    }
+
+
+def simulate(days=365, runs=1000, new_per_day=20, scheduler=None, weights=None, collection=None,
+             seconds=SECONDS, seed=0, progress=None) -> dict:
+    """
+    Project the daily workload `days` days ahead, `runs` times.
+
+    Args:
+        days: horizon, starting today
+        runs: independent runs to draw
+        new_per_day: new cards introduced a day (daily_new_cards_limit)
+        scheduler: an srs_engine scheduler (default: the active one)
+        weights: FSRS weights of the memory model that decides recall
+            (default: the scheduler's if it is FSRS, else the defaults)
+        collection: load_collection()'s result, to simulate several
+            settings from one read of the database
+        seconds: SECONDS or a variant of it
+        seed: the same seed and arguments give the same result
+        progress: called with (runs done, runs) after each chunk
+
+    Returns:
+        Dict with days (one {"date", "reviews", "reviews_p10",
+        "reviews_p90", "new", "minutes", "minutes_p90"} per day; means
+        over the runs unless marked), per-run means and peaks
+        (reviews_per_day, minutes_per_day, peak_reviews: the mean of each
+        run's busiest day), retention (share of non-new reviews
+        recalled), the cards and new cards simulated, and the seconds it
+        took.
+    """
+    if np is None:
+        raise RuntimeError("Simulating the workload needs NumPy (pip install numpy)")
+    if not 1 <= days <= MAX_DAYS:
+        raise ValueError(f"days must be 1-{MAX_DAYS}, got {days}")
+    start = time.perf_counter()
+    scheduler = scheduler or srs_engine.get_scheduler()
+    is_fsrs = isinstance(scheduler, srs_engine.FSRSScheduler)
+    weights = tuple(weights or (scheduler.weights if is_fsrs else fsrs.DEFAULT_WEIGHTS))
+    col = collection or load_collection(weights)
+    cards = len(col["id"])
+    today = date.today()
+    today_n = today.toordinal() - db.EPOCH_ORDINAL
+
+    # Day (from today) each card first comes up: overdue cards today, new
+    # cards in id order at new_per_day a day, the rest on their due day
+    fresh = np.isnan(col["stability"])
+    first = np.clip(col["due_day"] - today_n, 0, None)
+    first[fresh] = np.arange(fresh.sum()) // new_per_day if new_per_day > 0 else days
+    order = np.argsort(first, kind="stable")
+    bounds = np.searchsorted(first[order], np.arange(days + 1))
+    state = np.stack([np.zeros(cards), col["stability"], col["difficulty"], col["last_day"] - today_n,
+                      col["easiness"], col["interval"], col["repetitions"]]).astype(np.float32)
+    starting = [state[:, order[bounds[day]:bounds[day + 1]]] for day in range(days)]
+    # A rating is drawn as the number of steps of the three cumulative
+    # distributions laid end to end, each shifted up by its kind (0
+    # recalled, 1 forgot, 2 new), at or below u + kind, less 6 * kind: a
+    # searchsorted() by hand, as 18 comparisons beat its binary search
+    kinds = ("recalled", "forgot", "first")
+    cdf = np.concatenate([np.cumsum(col["ratings"][k] / col["ratings"][k].sum()) + i
+                          for i, k in enumerate(kinds)]).astype(np.float32)
+    cost = np.array([seconds["review"], seconds["lapse"], seconds["new"]], dtype=np.float32)
+
+    reviews = np.zeros((runs, days), dtype=np.int32)
+    introduced = np.zeros((runs, days), dtype=np.int32)
+    spent = np.zeros((runs, days), dtype=np.float32)
+    recalled_total = forgot_total = 0
+    chunk = max(1, min(runs, CHUNK_CELLS // max(cards, 1)))
+    for lo in range(0, runs, chunk):
+        n_runs = min(chunk, runs - lo)
+        rng = np.random.default_rng([seed, lo])
+        pending = [[] for _ in range(days)]  # per day, blocks of the card-runs due then
+
+        for day in range(days):
+            due, pending[day] = pending[day], None
+            if starting[day].shape[1]:
+                block = np.tile(starting[day], n_runs)
+                block[RUN] = np.repeat(np.arange(n_runs), starting[day].shape[1])
+                due.append(block)
+            if not due:
+                continue
+            block = np.concatenate(due, axis=1) if len(due) > 1 else due[0]
+            run = block[RUN].astype(np.intp)
+            s_i, d_i = block[STABILITY], block[DIFFICULTY]
+            new = np.isnan(s_i)
+            elapsed = day - block[LAST]
+            u = rng.random((2, len(run)), dtype=np.float32)
+            recalled = u[0] < fsrs.retrievability(elapsed, s_i)  # NaN for new cards: False
+            kind = np.where(new, np.int8(2), ~recalled)
+            drawn = u[1] + kind
+            rating = kind * np.int8(-6)
+            for step in cdf:
+                rating += drawn >= step
+            np.minimum(rating, 5, out=rating)
+            lapsed = rating < srs_engine.PASSING_RATING
+
+            # Memory, then the schedule (a lapse is retried today, which FSRS ignores)
+            g = np.where(lapsed, fsrs.AGAIN, rating - 1)
+            s_new, d_new = fsrs.next_state_batch(weights, s_i, d_i, elapsed, g)
+            if new.any():
+                s_new[new], d_new[new] = fsrs.initial_state_batch(weights, g[new], np.float32)
+            block[STABILITY], block[DIFFICULTY], block[LAST] = s_new, d_new, day
+            if is_fsrs:
+                next_day = day + fsrs.next_interval_batch(s_new, scheduler.desired_retention,
+                                                          scheduler.maximum_interval)
+            else:
+                ef, interval, reps, next_day = srs_engine.schedule_batch(
+                    block[EASINESS], block[INTERVAL], block[REPS], rating, day, scheduler.params)
+                if lapsed.any():
+                    retry = np.flatnonzero(lapsed)
+                    ef[retry], interval[retry], reps[retry], next_day[retry] = srs_engine.schedule_batch(
+                        ef[retry], interval[retry], reps[retry], np.full(len(retry), RETRY_RATING), day,
+                        scheduler.params)
+                block[EASINESS], block[INTERVAL], block[REPS] = ef, interval, reps
+
+            kind = np.where(new, 2, lapsed)
+            reviews[lo:lo + n_runs, day] = (np.bincount(run, minlength=n_runs)
+                                            + np.bincount(run[lapsed], minlength=n_runs))
+            introduced[lo:lo + n_runs, day] = np.bincount(run[new], minlength=n_runs)
+            spent[lo:lo + n_runs, day] = np.bincount(run, cost[kind], minlength=n_runs)
+            recalled_total += int(np.count_nonzero(recalled))
+            forgot_total += int(np.count_nonzero(~(recalled | new)))
+
+            # Into the buckets of the days they come due, within the horizon
+            # (int16 days, which argsort() radix-sorts)
+            ahead = np.flatnonzero(next_day < days)
+            next_day = next_day[ahead].astype(np.int16)
+            by_day = np.argsort(next_day, kind="stable")
+            next_day, block = next_day[by_day], np.take(block, ahead[by_day], axis=1)
+            cut = np.flatnonzero(np.diff(next_day)) + 1
+            for a, b in zip(np.append(0, cut), np.append(cut, len(next_day)) if len(next_day) else ()):
+                pending[next_day[a]].append(block[:, a:b].copy())  # a view would keep all of `block` alive
+        if progress:
+            progress(lo + n_runs, runs)
+
+    minutes = spent / 60
+    review_p10, review_p90 = np.percentile(reviews, (10, 90), axis=0)
+    minute_p90 = np.percentile(minutes, 90, axis=0)
+    return {
+        "days": [{"date": (today + timedelta(days=i)).isoformat(),
+                  "reviews": float(reviews[:, i].mean()), "reviews_p10": float(review_p10[i]),
+                  "reviews_p90": float(review_p90[i]), "new": float(introduced[:, i].mean()),
+                  "minutes": float(minutes[:, i].mean()), "minutes_p90": float(minute_p90[i])}
+                 for i in range(days)],
+        "runs": runs, "cards": cards, "new_cards": int(fresh.sum()), "new_per_day": new_per_day,
+        "scheduler": scheduler.name,
+        "reviews_per_day": float(reviews.mean()), "minutes_per_day": float(minutes.mean()),
+        "peak_reviews": float(reviews.max(axis=1).mean()),
+        "retention": recalled_total / max(1, recalled_total + forgot_total),
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def format_report(result, every=7) -> str:
+    """simulate()'s result as a text table, a row per `every` days."""
+    lines = [f"{result['scheduler'].upper()}, {result['new_per_day']} new cards a day "
+             f"({result['new_cards']:,} waiting), {result['cards']:,} cards, {result['runs']:,} runs "
+             f"in {result['seconds']:.1f}s",
+             f"{'from':<12}{'reviews/day':>12}{'p10-p90':>14}{'new/day':>9}{'min/day':>9}{'p90':>7}"]
+    for i in range(0, len(result["days"]), every):
+        span = result["days"][i:i + every]
+        mean = lambda key: sum(day[key] for day in span) / len(span)
+        spread = f"{mean('reviews_p10'):.0f}-{mean('reviews_p90'):.0f}"
+        lines.append(f"{span[0]['date']:<12}{mean('reviews'):>12.0f}{spread:>14}"
+                     f"{mean('new'):>9.1f}{mean('minutes'):>9.0f}{mean('minutes_p90'):>7.0f}")
+    lines.append(f"Mean {result['reviews_per_day']:.0f} reviews ({result['minutes_per_day']:.0f} min) a day, "
+                 f"busiest day {result['peak_reviews']:.0f} on average, {result['retention']:.1%} recalled")
+    return "\n".join(lines)
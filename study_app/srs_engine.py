@@ -1,7 +1,10 @@
 """
-srs_engine.py — SM-2 Spaced Repetition Algorithm for StudyForge.
+srs_engine.py — Spaced repetition scheduling for StudyForge.
 
-Implements the SuperMemo 2 algorithm used by Anki.
+Implements the SuperMemo 2 algorithm used by Anki, and FSRS (see fsrs.py)
+as an alternative behind the same scheduler interface. Either way the due
+date can be moved within a small fuzz window to the least busy day, so
+cards added together do not keep coming due together (load balancing).
 Rating scale: 0-5
   0 - Complete blackout
   1 - Incorrect; answer remembered upon seeing it
@@ -11,59 +14,416 @@ Rating scale: 0-5
   5 - Perfect recall
 """
 
-from datetime import date, timedelta
-from database import update_flashcard_srs, log_review
+from datetime import date, datetime, timedelta
+from database import (update_flashcard_srs, log_review, transaction, get_srs_states,
+                      update_flashcards_srs_bulk, get_review_history, get_due_counts, EPOCH_ORDINAL)
+import fsrs
+import review_writer
 
+# NumPy makes schedule_batch() / rescale_batch() vectorised; without it
+# they loop in Python and return lists
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-def review_card(card: dict, rating: int) -> dict:
+# SM-2's constants; schedule() and schedule_batch() take a dict like this
+SM2_PARAMS = {
+    "min_easiness": 1.3,     # easiness never drops below this
+    "first_interval": 1,     # days after the first successful review
+    "second_interval": 6,    # ... and the second
+}
+PASSING_RATING = 3           # ratings below this reset the card
+
+# How far load balancing may move a due date: 1 day, plus 15% of the part
+# of the interval between 2.5 and 7 days, 10% of 7-20 and 5% beyond
+# (Anki's fuzz ranges). Intervals under 2.5 days are never moved.
+FUZZ_RANGES = ((2.5, 7.0, 0.15), (7.0, 20.0, 0.10), (20.0, float("inf"), 0.05))
+
+
+# ── Scheduling core ──────────────────────────────────────────────
+# Pure functions of card state, rating and the day: no database, no clock,
+# so they serve simulation, batch rescheduling and tests as well as reviews.
+
+def epoch_day(day) -> int:
+    """A date (or an epoch day number, passed through) as an epoch day number."""
+    return day if isinstance(day, int) else day.toordinal() - EPOCH_ORDINAL
+
+
+def _due_day(card):
+    """The card's due day: its due_day column if read from the database, else from next_review (None if neither)."""
+    due = card.get("due_day")
+    if due is None and card.get("next_review"):
+        due = epoch_day(date.fromisoformat(card["next_review"][:10]))
+    return due
+
+
+def _next_state(ef, interval, reps, rating, params):
+    """One SM-2 step: (easiness, interval, repetitions, days until due)."""
+    ef = max(params["min_easiness"], ef + (0.1 - (5 - rating) * (0.08 + (5 - rating) * 0.02)))
+    if rating < PASSING_RATING:
+        # Failed — reset and show again today
+        return ef, 0, 0, 0
+    # Passed — advance interval
+    if reps == 0:
+        interval = params["first_interval"]
+    elif reps == 1:
+        interval = params["second_interval"]
+    else:
+        interval = round(interval * ef)
+    return ef, interval, reps + 1, max(interval, 1)
+
+
+def schedule(card: dict, rating: int, today, params=SM2_PARAMS) -> dict:
     """
-    Apply SM-2 algorithm to a flashcard after review.
-    
+    Apply SM-2 to one card's state.
+
     Args:
-        card: dict with keys easiness_factor, interval, repetitions, id
-        rating: int 0-5
-    
+        card: dict with easiness_factor, interval and repetitions
+        rating: int 0-5 (clamped)
+        today: the day of the review, a date or epoch day number
+        params: SM2_PARAMS or a variant of it
+
     Returns:
-        Updated card dict with new SRS parameters.
+        Dict with the new easiness_factor, interval, repetitions,
+        next_review (ISO date) and due_day (epoch day).
     """
     rating = max(0, min(5, rating))
+    ef, interval, reps, wait = _next_state(card["easiness_factor"], card["interval"], card["repetitions"],
+                                           rating, params)
+    due_day = epoch_day(today) + wait
+    return {
+        "easiness_factor": ef,
+        "interval": interval,
+        "repetitions": reps,
+        "next_review": date.fromordinal(due_day + EPOCH_ORDINAL).isoformat(),
+        "due_day": due_day,
+    }
+
 
-    ef = card["easiness_factor"]
-    interval = card["interval"]
-    reps = card["repetitions"]
+def schedule_batch(easiness, intervals, repetitions, ratings, today, params=SM2_PARAMS):
+    """
+    schedule() for many cards at once, reviewed on the same day.
 
-    # Update easiness factor
-    ef = ef + (0.1 - (5 - rating) * (0.08 + (5 - rating) * 0.02))
-    ef = max(1.3, ef)  # Minimum EF is 1.3
+    Args:
+        easiness, intervals, repetitions, ratings: equal-length sequences
+            (or NumPy arrays), one entry per card
+        today: the day of the reviews, a date or epoch day number
+        params: SM2_PARAMS or a variant of it
 
-    if rating < 3:
-        # Failed — reset and show again today
-        reps = 0
-        interval = 0
-        next_review = date.today().isoformat()
-    else:
-        # Passed — advance interval
-        if reps == 0:
-            interval = 1
-        elif reps == 1:
-            interval = 6
+    Returns:
+        (easiness, intervals, repetitions, due_days): NumPy arrays when
+        NumPy is installed, lists otherwise; identical values either way.
+    """
+    today_n = epoch_day(today)
+    if np is None:
+        out = ([], [], [], [])
+        for ef, interval, reps, rating in zip(easiness, intervals, repetitions, ratings):
+            ef, interval, reps, wait = _next_state(ef, interval, reps, max(0, min(5, rating)), params)
+            out[0].append(ef)
+            out[1].append(interval)
+            out[2].append(reps)
+            out[3].append(today_n + wait)
+        return out
+
+    ef = np.asarray(easiness, dtype=np.float64)
+    interval = np.asarray(intervals, dtype=np.int64)
+    reps = np.asarray(repetitions, dtype=np.int64)
+    miss = 5 - np.clip(np.asarray(ratings, dtype=np.int64), 0, 5)
+    ef = np.maximum(params["min_easiness"], ef + (0.1 - miss * (0.08 + miss * 0.02)))
+    passed = miss <= 5 - PASSING_RATING
+    # np.rint rounds halves to even, like round()
+    grown = np.where(reps == 0, params["first_interval"],
+                     np.where(reps == 1, params["second_interval"], np.rint(interval * ef).astype(np.int64)))
+    interval = np.where(passed, grown, 0)
+    reps = np.where(passed, reps + 1, 0)
+    due = today_n + np.where(passed, np.maximum(interval, 1), 0)
+    return ef, interval, reps, due
+
+
+def rescale_batch(intervals, due_days, factor):
+    """
+    Scale learned cards' intervals by `factor`, keeping the day each was
+    last scheduled on (due_day - interval); cards with no interval yet are
+    left alone.
+
+    Returns:
+        (intervals, due_days), NumPy arrays or lists as in schedule_batch().
+    """
+    if np is None:
+        out = ([], [])
+        for interval, due in zip(intervals, due_days):
+            if interval > 0:
+                scaled = max(1, round(interval * factor))
+                interval, due = scaled, due - interval + scaled
+            out[0].append(interval)
+            out[1].append(due)
+        return out
+    interval = np.asarray(intervals, dtype=np.int64)
+    due = np.asarray(due_days, dtype=np.int64)
+    scaled = np.maximum(1, np.rint(interval * factor).astype(np.int64))
+    learned = interval > 0
+    return np.where(learned, scaled, interval), np.where(learned, due - interval + scaled, due)
+
+
+def fuzz_window(interval) -> tuple:
+    """(shortest, longest) interval a card scheduled `interval` days out may be given instead (FUZZ_RANGES)."""
+    if interval < FUZZ_RANGES[0][0]:
+        return interval, interval
+    delta = 1.0 + sum(share * max(0.0, min(interval, end) - start) for start, end, share in FUZZ_RANGES)
+    return max(2, round(interval - delta)), round(interval + delta)
+
+
+def balance(interval, today, due_counts) -> int:
+    """
+    The interval within fuzz_window(interval) whose due day has the
+    fewest cards, the nearest to `interval` on a tie. Costs one lookup
+    per day of the window, whatever the size of the collection.
+
+    Args:
+        interval: the scheduler's interval, in days
+        today: the day of the review, a date or epoch day number
+        due_counts: {epoch day: cards due that day}
+
+    Returns:
+        The interval to use instead.
+    """
+    today_n = epoch_day(today)
+    low, high = fuzz_window(interval)
+    return min(range(low, high + 1), key=lambda i: (due_counts.get(today_n + i, 0), abs(i - interval), i))
+
+
+# ── Schedulers ───────────────────────────────────────────────────
+# review_card() goes through the active scheduler. A scheduler's
+# schedule(card, rating, today, history) is pure like schedule() above and
+# returns the same keys plus stability and difficulty; needs_history(card)
+# tells the caller to pass the card's (epoch day, rating) review history.
+
+class SM2Scheduler:
+    """SM-2 as above. Clears the FSRS memory state, which its reviews leave stale."""
+    name = "sm2"
+
+    def __init__(self, params=SM2_PARAMS):
+        self.params = params
+
+    def needs_history(self, card) -> bool:
+        return False
+
+    def schedule(self, card: dict, rating: int, today, history=None) -> dict:
+        return {**schedule(card, rating, today, self.params), "stability": None, "difficulty": None}
+
+
+class FSRSScheduler:
+    """
+    FSRS: a card is due when its predicted recall falls to
+    desired_retention. Cards last reviewed under SM-2 have no memory state
+    yet; it is rebuilt from their review history on their next review.
+    The easiness factor is left as it is, so switching back to SM-2 picks
+    up where it left off.
+    """
+    name = "fsrs"
+
+    def __init__(self, weights=None, desired_retention=0.9, maximum_interval=fsrs.MAX_INTERVAL):
+        if weights is not None and len(weights) != len(fsrs.DEFAULT_WEIGHTS):
+            print(f"[StudyForge] Ignoring FSRS weights: expected {len(fsrs.DEFAULT_WEIGHTS)}, got {len(weights)}")
+            weights = None
+        self.weights = tuple(weights or fsrs.DEFAULT_WEIGHTS)
+        self.desired_retention = min(0.99, max(0.7, desired_retention))
+        self.maximum_interval = maximum_interval
+
+    def needs_history(self, card) -> bool:
+        return card.get("stability") is None and card.get("id") is not None
+
+    def schedule(self, card: dict, rating: int, today, history=None) -> dict:
+        rating = max(0, min(5, rating))
+        today_n = epoch_day(today)
+        if card.get("stability") is not None:
+            # The last review was the day the current interval was counted from
+            state = (card["stability"], card["difficulty"], _due_day(card) - card["interval"])
+        else:
+            state = fsrs.replay(self.weights, history or ())
+        g = fsrs.grade(rating)
+        if state is None:
+            stability, difficulty = fsrs.initial_state(self.weights, g)
         else:
-            interval = round(interval * ef)
-        reps += 1
-        next_review = (date.today() + timedelta(days=max(interval, 1))).isoformat()
+            stability, difficulty = fsrs.next_state(self.weights, state[0], state[1], today_n - state[2], g)
 
-    # Persist to database
-    update_flashcard_srs(card["id"], ef, interval, reps, next_review)
-    log_review(card["id"], rating)
+        if g == fsrs.AGAIN:
+            # Lapsed — due again today, like SM-2
+            interval, reps = 0, 0
+        else:
+            interval = fsrs.next_interval(stability, self.desired_retention, self.maximum_interval)
+            reps = card.get("repetitions", 0) + 1
+        return {
+            "easiness_factor": card.get("easiness_factor", 2.5),
+            "interval": interval,
+            "repetitions": reps,
+            "next_review": date.fromordinal(today_n + interval + EPOCH_ORDINAL).isoformat(),
+            "due_day": today_n + interval,
+            "stability": stability,
+            "difficulty": difficulty,
+        }
 
-    return {
+
+SCHEDULERS = {cls.name: cls for cls in (SM2Scheduler, FSRSScheduler)}
+
+_scheduler = SM2Scheduler()
+
+
+def set_scheduler(name="sm2", weights=None, desired_retention=0.9):
+    """
+    Make review_card() schedule with SCHEDULERS[name]. weights and
+    desired_retention only apply to FSRS (weights None: fsrs.DEFAULT_WEIGHTS).
+
+    Returns:
+        The new scheduler.
+    """
+    global _scheduler
+    if name not in SCHEDULERS:
+        raise ValueError(f"Unknown scheduler: {name}. Must be one of: {tuple(SCHEDULERS)}")
+    _scheduler = FSRSScheduler(weights, desired_retention) if name == "fsrs" else SM2Scheduler()
+    return _scheduler
+
+
+def get_scheduler():
+    """The scheduler review_card() uses."""
+    return _scheduler
+
+
+# ── Load balancing ───────────────────────────────────────────────
+
+class LoadBalancer:
+    """
+    Moves each review's due date to the least busy day of its fuzz window
+    (see balance()). The per-day due counts are read with
+    get_due_counts() on the first review of each day and then kept up to
+    date here as cards move, so a review costs O(window), never a scan.
+    Cards added or deleted in between are picked up the next day.
+    """
+
+    def __init__(self):
+        self.counts = {}   # {epoch day: cards due}, from `day` on
+        self.day = None
+
+    def place(self, card: dict, state: dict, today_n: int) -> dict:
+        """
+        Balance a scheduler's result for `card`, reviewed on epoch day
+        today_n, and count the card on its new due day.
+
+        Returns:
+            `state`, with interval, next_review and due_day moved if a
+            quieter day was found. The interval moves with the due date,
+            so due_day - interval stays the day of the review.
+        """
+        if self.day != today_n:
+            self.counts, self.day = get_due_counts(today_n), today_n
+        old = _due_day(card)
+        if self.counts.get(old):
+            self.counts[old] -= 1
+        interval = balance(state["interval"], today_n, self.counts) if state["interval"] > 0 else 0
+        due = today_n + interval if interval > 0 else state["due_day"]
+        self.counts[due] = self.counts.get(due, 0) + 1
+        if due == state["due_day"]:
+            return state
+        return {**state, "interval": interval, "due_day": due,
+                "next_review": date.fromordinal(due + EPOCH_ORDINAL).isoformat()}
+
+    def reset(self):
+        """Re-read the due counts on the next review (after cards were rescheduled in bulk)."""
+        self.day = None
+
+
+_balancer = LoadBalancer()
+
+
+def set_load_balancing(enabled: bool = True):
+    """
+    Turn load balancing of review_card()'s due dates on or off.
+
+    Returns:
+        The LoadBalancer in use, or None when off.
+    """
+    global _balancer
+    _balancer = LoadBalancer() if enabled else None
+    return _balancer
+
+
+# ── Persistence ──────────────────────────────────────────────────
+
+def review_card(card: dict, rating: int, now=None) -> dict:
+    """
+    Schedule a flashcard after review with the active scheduler, move its
+    due date to a quiet day if load balancing is on, and save it.
+
+    Args:
+        card: dict with keys easiness_factor, interval, repetitions, id
+              (and next_review or due_day for load balancing and FSRS,
+              stability, difficulty for FSRS)
+        rating: int 0-5
+        now: time of the review (default: the current time)
+
+    Returns:
+        Updated card dict with new SRS parameters, including due_day so
+        that merging it over the old card (to requeue a failed card)
+        leaves nothing stale for a same-day retry.
+    """
+    now = now or datetime.now()
+    rating = max(0, min(5, rating))
+    scheduler = _scheduler
+    history = None
+    if scheduler.needs_history(card):
+        history = [(r["review_day"], r["rating"]) for r in get_review_history(card["id"])]
+    state = scheduler.schedule(card, rating, now.date(), history)
+    if _balancer is not None:
+        state = _balancer.place(card, state, epoch_day(now.date()))
+    updated = {
         "id": card["id"],
-        "easiness_factor": ef,
-        "interval": interval,
-        "repetitions": reps,
-        "next_review": next_review
+        "easiness_factor": state["easiness_factor"],
+        "interval": state["interval"],
+        "repetitions": state["repetitions"],
+        "next_review": state["next_review"],
+        "due_day": state["due_day"],
+        "stability": state["stability"],
+        "difficulty": state["difficulty"],
     }
 
+    writer = review_writer.active()
+    if writer is not None:
+        # Write-behind mode: journal now, commit later on the writer thread
+        writer.submit({**updated, "rating": rating, "reviewed_at": now.isoformat()})
+    else:
+        # Persist to database — card state, log row and daily stat in one commit
+        with transaction():
+            update_flashcard_srs(card["id"], updated["easiness_factor"], updated["interval"],
+                                 updated["repetitions"], updated["next_review"],
+                                 updated["stability"], updated["difficulty"])
+            log_review(card["id"], rating, reviewed_at=now.isoformat())
+
+    return updated
+
+
+def reschedule_all(interval_modifier: float) -> int:
+    """
+    Scale every learned card's interval by `interval_modifier` (below 1
+    for more reviews and better retention, above for fewer) and move its
+    due date to match. One read, one pass of rescale_batch(), one
+    transaction.
+
+    Returns:
+        Number of cards rescheduled.
+    """
+    states = get_srs_states()
+    intervals, due_days = rescale_batch([s["interval"] for s in states], [s["due_day"] for s in states],
+                                        interval_modifier)
+    rows = [(s["easiness_factor"], int(interval), s["repetitions"],
+             date.fromordinal(int(due) + EPOCH_ORDINAL).isoformat(), s["id"])
+            for s, interval, due in zip(states, intervals, due_days)
+            if interval != s["interval"] or due != s["due_day"]]
+    changed = update_flashcards_srs_bulk(rows)
+    if _balancer is not None:
+        _balancer.reset()
+    return changed
+
 
 def get_rating_labels():
     """Return human-readable labels for each rating level."""
@@ -81,19 +441,25 @@ def forecast_reviews(cards: list, days_ahead: int = 30) -> dict:
     """
     Forecast how many cards are due each day for the next N days.
     Returns dict: {date_str: count}
+
+    This is for a list of cards already in memory; for the whole
+    collection use database.get_review_forecast(), which counts in SQL.
     """
-    forecast = {}
     today = date.today()
-    for i in range(days_ahead):
-        d = (today + timedelta(days=i)).isoformat()
-        forecast[d] = 0
+    today_n = today.toordinal() - EPOCH_ORDINAL
+    counts = [0] * days_ahead
 
     for card in cards:
-        nr = card.get("next_review", "")
-        if nr in forecast:
-            forecast[nr] += 1
-        elif nr and nr < today.isoformat():
-            # Overdue cards count as today
-            forecast[today.isoformat()] = forecast.get(today.isoformat(), 0) + 1
-
-    return forecast
+        # Rows read from the database carry the integer due_day already
+        day = card.get("due_day")
+        if day is None:
+            try:
+                day = date.fromisoformat(card.get("next_review", "")[:10]).toordinal() - EPOCH_ORDINAL
+            except ValueError:
+                continue
+        # Overdue cards count as today
+        offset = max(day - today_n, 0)
+        if offset < days_ahead:
+            counts[offset] += 1
+
+    return {(today + timedelta(days=i)).isoformat(): counts[i] for i in range(days_ahead)}
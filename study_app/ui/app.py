@@ -7,6 +7,9 @@ import customtkinter as ctk
 import os
 import sys
 import subprocess
+import review_writer
+import maintenance
+import instrumentation
 from ui.styles import COLORS, FONTS, PADDING, BUTTON_VARIANTS
 from ui.dashboard import DashboardTab
 from ui.pomodoro import PomodoroTab
@@ -208,6 +211,17 @@ class StudyForgeApp(ctk.CTk):
             self.bind(f"<Alt-Key-{index}>", lambda _e, l=label: self.select_tab(l))
         self.bind("<Control-Tab>", lambda _e: self._cycle_tab(1))
         self.bind("<Control-Shift-Tab>", lambda _e: self._cycle_tab(-1))
+        # Any input postpones idle-time database maintenance
+        for event in ("<KeyPress>", "<ButtonPress>", "<Motion>", "<MouseWheel>"):
+            self.bind_all(event, lambda _e: maintenance.touch(), add="+")
+        # Write the database profile (only with instrumentation on)
+        self.bind("<Control-Shift-D>", lambda _e: self._dump_db_profile())
+
+    def _dump_db_profile(self):
+        """Write the instrumentation summary to <data dir>/db_profile.txt."""
+        profile = instrumentation.active()
+        if profile is not None:
+            print(f"[StudyForge] Database profile written to {profile.dump()}")
 
     def _cycle_tab(self, direction: int):
         """Move to next/previous sidebar tab."""
@@ -219,6 +233,9 @@ class StudyForgeApp(ctk.CTk):
 
     def select_tab(self, tab_name: str):
         """Switch to the specified tab."""
+        # Commit any write-behind reviews so the next tab reads fresh data
+        review_writer.flush()
+
         # Hide current
         if self.current_tab and self.current_tab in self.tabs:
             self.tabs[self.current_tab].grid_forget()
@@ -54,10 +54,11 @@ class DashboardTab(ctk.CTkFrame):
 
     def refresh(self):
         """Refresh all dashboard data."""
-        stats = db.get_today_stats()
-        streak = db.get_streak()
-        due = len(db.get_due_cards())
-        total = db.get_total_cards()
+        snapshot = db.get_dashboard_snapshot(forecast_days=30)
+        stats = snapshot["today"]
+        streak = snapshot["streak"]
+        due = snapshot["due"]
+        total = snapshot["total_cards"]
 
         # Clear and rebuild stat cards
         for w in self.stats_frame.winfo_children():
@@ -115,6 +116,7 @@ class DashboardTab(ctk.CTkFrame):
 
         # Status summary
         summary_text = f"\n📦 Total flashcards in collection: {total}"
+        summary_text += f"\n🏆 Longest streak: {snapshot['longest_streak']} days"
         if due > 0:
             summary_text += f"\n⚠️ You have {due} card{'s' if due != 1 else ''} due for review!"
         else:
@@ -135,12 +137,11 @@ class DashboardTab(ctk.CTkFrame):
             font=FONTS["subheading"], text_color=COLORS["text_primary"]
         ).pack(padx=PADDING["section"], pady=(PADDING["section"], 10), anchor="w")
 
-        from srs_engine import forecast_reviews
-        all_cards = db.get_all_flashcards()
-        forecast = forecast_reviews(all_cards, days_ahead=7)
+        forecast = snapshot["forecast"]
 
         from datetime import timedelta
         today = date.today()
+        week = [forecast.get((today + timedelta(days=i)).isoformat(), 0) for i in range(7)]
         for i in range(7):
             d = today + timedelta(days=i)
             d_str = d.isoformat()
@@ -160,7 +161,7 @@ class DashboardTab(ctk.CTkFrame):
             bar_frame.pack(side="left", fill="x", expand=True, padx=8)
             bar_frame.pack_propagate(False)
 
-            max_count = max(forecast.values()) if forecast.values() and max(forecast.values()) > 0 else 1
+            max_count = max(week) if max(week) > 0 else 1
             bar_width = max(0.02, count / max_count)
             color = COLORS["accent"] if count > 0 else COLORS["bg_secondary"]
             bar_fill = ctk.CTkFrame(bar_frame, fg_color=color, corner_radius=4)
@@ -173,10 +174,36 @@ class DashboardTab(ctk.CTkFrame):
                 width=40, anchor="e"
             ).pack(side="right")
 
+        # Load over the next 30 days, from tomorrow (today also holds the backlog),
+        # one thin bar per day so a spike stands out against a flattened week
+        ahead = [forecast.get((today + timedelta(days=i)).isoformat(), 0) for i in range(1, 30)]
+        ctk.CTkLabel(
+            self.forecast_frame, text="Next 30 days",
+            font=FONTS["small"], text_color=COLORS["text_muted"]
+        ).pack(padx=PADDING["section"], pady=(12, 2), anchor="w")
+
+        strip = ctk.CTkFrame(self.forecast_frame, fg_color=COLORS["bg_secondary"], height=48, corner_radius=4)
+        strip.pack(fill="x", padx=PADDING["section"])
+        strip.pack_propagate(False)
+        peak = max(ahead) if max(ahead) > 0 else 1
+        for i, count in enumerate(ahead):
+            if count:
+                height = max(0.04, count / peak)
+                ctk.CTkFrame(strip, fg_color=COLORS["accent"], corner_radius=2).place(
+                    relx=i / len(ahead), rely=1 - height, relwidth=0.8 / len(ahead), relheight=height)
+
+        load_text = f"Busiest day {max(ahead)} cards · average {sum(ahead) / len(ahead):.0f} a day"
+        if self.app.config.get("load_balancing", True):
+            load_text += "\nLoad balancing moves due dates to quieter days nearby"
+        ctk.CTkLabel(
+            self.forecast_frame, text=load_text,
+            font=FONTS["small"], text_color=COLORS["text_secondary"],
+            wraplength=300, justify="left"
+        ).pack(padx=PADDING["section"], pady=(4, 0), anchor="w")
+
         # Weekly stats
-        week_stats = db.get_stats_range(7)
-        total_reviewed = sum(s.get("cards_reviewed", 0) for s in week_stats)
-        total_study = sum(s.get("study_minutes", 0) for s in week_stats)
+        total_reviewed = snapshot["week"]["cards_reviewed"]
+        total_study = snapshot["week"]["study_minutes"]
 
         summary = f"\n📈 This week: {total_reviewed} cards reviewed, {total_study} min studied"
         ctk.CTkLabel(
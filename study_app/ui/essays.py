@@ -7,6 +7,8 @@ import threading
 from tkinter import filedialog
 from ui.styles import COLORS, FONTS, PADDING, BUTTON_VARIANTS
 import database as db
+import dedupe
+from ui.notes import ask_duplicate_action
 
 DEFAULT_HEIGHT_RATIO = 0.35
 ESSAY_HEIGHT_RATIO = 0.4
@@ -169,7 +171,18 @@ class EssaysTab(ctk.CTkFrame):
         fn = os.path.basename(fp)
         content = extract_rubric_text(fp)
         name = os.path.splitext(fn)[0]
-        db.add_rubric(name, content, source_file=fn)
+        duplicates = db.find_duplicates("rubrics", content)
+        action = ask_duplicate_action(self, name, duplicates[0]) if duplicates else "keep"
+        if action == "skip":
+            self.status.configure(text=f"Rubric '{name}' already uploaded — skipped", text_color=COLORS["text_secondary"])
+            return
+        if action == "keep":
+            db.add_rubric(name, content, source_file=fn)
+        elif action == "replace":
+            db.update_rubric(duplicates[0]["id"], content=content, source_file=fn)
+        else:
+            existing = db.get_rubric(duplicates[0]["id"])
+            db.update_rubric(existing["id"], content=dedupe.merge_text(existing["content"], content))
         self._refresh_rubrics()
         self.status.configure(text=f"✅ Rubric '{name}' uploaded!", text_color=COLORS["success"])
 
@@ -246,7 +259,7 @@ class EssaysTab(ctk.CTkFrame):
             grade_txt = f"  ·  Grade: {e['grade']}" if e.get("grade") else ""
             ctk.CTkLabel(item, text=f"📜 {title}{grade_txt}", font=FONTS["body_bold"],
                 text_color=COLORS["text_primary"], anchor="w").pack(padx=12, pady=(8, 0), anchor="w")
-            has_content = "Written" if e.get("content") else "Not started"
+            has_content = "Written" if e.get("has_content") else "Not started"
             meta = f"{e['created_at'][:10]}  ·  {has_content}"
             ctk.CTkLabel(item, text=meta, font=FONTS["small"],
                 text_color=COLORS["text_muted"], anchor="w").pack(padx=12, pady=(0, 6), anchor="w")
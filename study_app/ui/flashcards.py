@@ -8,8 +8,11 @@ import threading
 import random
 from ui.styles import COLORS, FONTS, PADDING, BUTTON_VARIANTS
 import database as db
+import review_writer
 from srs_engine import review_card, get_rating_labels
 
+ALL_TAGS = "🏷️ All tags"
+
 
 class FlashcardsTab(ctk.CTkFrame):
     def __init__(self, parent, app_ref):
@@ -36,6 +39,16 @@ class FlashcardsTab(ctk.CTkFrame):
         btn_row = ctk.CTkFrame(header, fg_color="transparent")
         btn_row.pack(side="right")
 
+        # Limits review sessions to cards tagged (directly or via their note)
+        self.tag_var = ctk.StringVar(value=ALL_TAGS)
+        self.tag_menu = ctk.CTkOptionMenu(
+            btn_row, variable=self.tag_var, values=[ALL_TAGS], width=140, height=34,
+            fg_color=COLORS["bg_input"], button_color=COLORS["accent"],
+            font=FONTS["body"], corner_radius=8,
+            command=lambda _: self._restart_review()
+        )
+        self.tag_menu.pack(side="left", padx=4)
+
         self.review_btn = ctk.CTkButton(
             btn_row, text="📖 Review Due", width=120, height=34,
             font=FONTS["body"], corner_radius=8,
@@ -91,16 +104,34 @@ class FlashcardsTab(ctk.CTkFrame):
 
     # ── Review Mode ───────────────────────────────────────────────
 
+    def _review_tags(self):
+        """Refresh the tag menu and return the selected tag filter (None for all)."""
+        names = [t["name"] for t in db.get_tag_counts()]
+        self.tag_menu.configure(values=[ALL_TAGS] + names)
+        tag = self.tag_var.get()
+        if tag == ALL_TAGS or tag not in names:
+            self.tag_var.set(ALL_TAGS)
+            return None
+        return [tag]
+
+    def _restart_review(self):
+        if self.is_interleaved:
+            self.start_interleaved_review()
+        else:
+            self.start_review()
+
     def start_review(self):
         self._clear_content()
         self.mode = "review"
         self.is_interleaved = False
-        self.current_cards = db.get_due_cards()
+        tags = self._review_tags()
+        self.current_cards = db.get_due_cards(tags=tags)
         self.card_index = 0
         self.showing_answer = False
 
         due_count = len(self.current_cards)
-        self.status_label.configure(text=f"📋 {due_count} card{'s' if due_count != 1 else ''} due for review")
+        scope = f"  ·  🏷️ {tags[0]}" if tags else ""
+        self.status_label.configure(text=f"📋 {due_count} card{'s' if due_count != 1 else ''} due for review{scope}")
         self.review_btn.configure(fg_color=COLORS["accent"])
         self.interleave_btn.configure(fg_color=COLORS["accent_alt"])
 
@@ -114,7 +145,7 @@ class FlashcardsTab(ctk.CTkFrame):
         self._clear_content()
         self.mode = "interleaved"
         self.is_interleaved = True
-        self.current_cards = db.get_due_cards_with_topics()
+        self.current_cards = db.get_due_cards_with_topics(tags=self._review_tags())
         random.shuffle(self.current_cards)
         self.card_index = 0
         self.showing_answer = False
@@ -300,17 +331,12 @@ class FlashcardsTab(ctk.CTkFrame):
 
     def _rate_card(self, rating):
         card = self.current_cards[self.card_index]
-        review_card(card, rating)
+        updated = review_card(card, rating)
 
-        # If failed, re-add to end of queue
+        # If failed, re-add to end of queue with its new SRS state
+        # (failed cards are due again today)
         if rating < 3:
-            if self.is_interleaved:
-                refreshed = db.get_due_cards_with_topics()
-            else:
-                refreshed = db.get_due_cards()
-            failed = [c for c in refreshed if c["id"] == card["id"]]
-            if failed:
-                self.current_cards.append(failed[0])
+            self.current_cards.append({**card, **updated})
 
         self.card_index += 1
         self.showing_answer = False
@@ -329,6 +355,7 @@ class FlashcardsTab(ctk.CTkFrame):
             font=FONTS["subheading"], text_color=COLORS["success"]
         ).pack()
 
+        review_writer.flush()
         stats = db.get_today_stats()
         ctk.CTkLabel(
             frame, text=f"Cards reviewed today: {stats['cards_reviewed']}",
@@ -492,7 +519,7 @@ class FlashcardsTab(ctk.CTkFrame):
             font=FONTS["body"], text_color=COLORS["text_secondary"]
         ).pack(padx=PADDING["section"], anchor="w")
 
-        notes = db.get_all_notes()
+        notes = db.get_note_titles()
         if not notes:
             ctk.CTkLabel(
                 frame, text="⚠️ No notes found. Import notes first in the Notes tab.",
@@ -575,6 +602,7 @@ class FlashcardsTab(ctk.CTkFrame):
 
         note_key = self.note_var.get()
         note = self._notes_lookup.get(note_key)
+        note = db.get_note(note["id"]) if note else None
         if not note:
             return
 
@@ -637,10 +665,7 @@ class FlashcardsTab(ctk.CTkFrame):
             ).pack(padx=10, pady=(0, 8), anchor="w")
 
     def _save_all_generated(self, cards, note_id):
-        count = 0
-        for card in cards:
-            db.add_flashcard(card["front"], card["back"], note_id=note_id)
-            count += 1
+        count = db.add_flashcards_bulk(cards, note_id=note_id)
         self.gen_status.configure(
             text=f"✅ Saved {count} cards to your collection!",
             text_color=COLORS["success"]
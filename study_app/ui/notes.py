@@ -12,6 +12,9 @@ import re
 from tkinter import filedialog
 from ui.styles import COLORS, FONTS, PADDING, BUTTON_VARIANTS
 import database as db
+import dedupe
+
+NOTES_PAGE_SIZE = 50  # Sidebar rows fetched per "Load more"
 
 
 def extract_text_from_file(filepath: str) -> str:
@@ -45,12 +48,64 @@ def extract_text_from_file(filepath: str) -> str:
         return f"[Unsupported file format: {ext}]"
 
 
+def ask_duplicate_action(parent, name, match):
+    """
+    Ask what to do with an import that duplicates a stored note or rubric.
+
+    Args:
+        parent: widget the modal dialog belongs to
+        name: title of the file being imported
+        match: best find_duplicates() result
+
+    Returns:
+        "skip", "merge", "replace" or "keep" (import as a new copy).
+    """
+    choice = {"action": "skip"}
+    dialog = ctk.CTkToplevel(parent)
+    dialog.title("Duplicate Import")
+    dialog.geometry("460x170")
+    dialog.configure(fg_color=COLORS["bg_primary"])
+    dialog.attributes("-topmost", True)
+    dialog.grab_set()
+
+    how = "is identical to" if match["exact"] else f"is {match['similarity']:.0%} similar to"
+    ctk.CTkLabel(
+        dialog, text=f"⚠️ '{name}' {how}\n'{match['title']}', which you already have.",
+        font=FONTS["body"], text_color=COLORS["text_primary"], justify="center", wraplength=420
+    ).pack(pady=(20, 15))
+
+    btn_row = ctk.CTkFrame(dialog, fg_color="transparent")
+    btn_row.pack()
+
+    def choose(action):
+        choice["action"] = action
+        dialog.destroy()
+
+    buttons = [("Skip", "skip", "secondary"), ("Replace", "replace", "destructive"),
+               ("Keep Both", "keep", "secondary")]
+    if not match["exact"]:
+        buttons.insert(1, ("Merge", "merge", "primary"))
+    for label, action, variant in buttons:
+        ctk.CTkButton(
+            btn_row, text=label, width=90, height=34,
+            font=FONTS["body"],
+            fg_color=BUTTON_VARIANTS[variant]["fg_color"],
+            corner_radius=8, command=lambda a=action: choose(a)
+        ).pack(side="left", padx=5)
+
+    dialog.wait_window()
+    return choice["action"]
+
+
 class NotesTab(ctk.CTkFrame):
     def __init__(self, parent, app_ref):
         super().__init__(parent, fg_color="transparent")
         self.app = app_ref
         self.selected_note_id = None
         self._ai_request_id = 0  # Guard against race conditions in async AI calls
+        self._notes_shown = 0  # Sidebar rows loaded so far (kept across refreshes)
+        self._last_note_key = None  # (updated_at, id) of the last sidebar row
+        self._more_btn = None
         self.preview_visible = False
         self.nav_visible = False
         self.build_ui()
@@ -164,10 +219,17 @@ class NotesTab(ctk.CTkFrame):
         for w in self.list_frame.winfo_children():
             w.destroy()
 
+        self._more_btn = None
         query = self.search_var.get().strip()
-        notes = db.search_notes(query) if query else db.get_all_notes()
+        if query:
+            notes = db.search_notes(query, columns=db.NOTE_LIST_COLUMNS)
+        else:
+            # Keep however many rows were already loaded so selecting a
+            # note doesn't collapse the list back to the first page
+            notes = db.list_notes(limit=max(self._notes_shown, NOTES_PAGE_SIZE))
 
         if not notes:
+            self._notes_shown = 0
             ctk.CTkLabel(
                 self.list_frame, text="No notes yet.\nImport or paste a note to start.",
                 font=FONTS["body"], text_color=COLORS["text_muted"],
@@ -178,6 +240,37 @@ class NotesTab(ctk.CTkFrame):
         for note in notes:
             self._create_note_item(note)
 
+        if not query:
+            self._notes_shown = len(notes)
+            self._last_note_key = (notes[-1]["updated_at"], notes[-1]["id"])
+            self._show_load_more()
+
+    def _show_load_more(self):
+        """Add a "Load more" button under the list if notes remain unloaded."""
+        remaining = db.count_notes() - self._notes_shown
+        if remaining <= 0:
+            self._more_btn = None
+            return
+        self._more_btn = ctk.CTkButton(
+            self.list_frame, text=f"Load more ({remaining} remaining)", height=30,
+            font=FONTS["small"], fg_color=COLORS["bg_secondary"],
+            hover_color=COLORS["accent_hover"], corner_radius=8,
+            command=self._load_more_notes
+        )
+        self._more_btn.pack(fill="x", padx=6, pady=(6, 3))
+
+    def _load_more_notes(self):
+        """Append the next keyset page of notes to the sidebar."""
+        if self._more_btn is not None:
+            self._more_btn.destroy()
+        notes = db.list_notes(limit=NOTES_PAGE_SIZE, after=self._last_note_key)
+        for note in notes:
+            self._create_note_item(note)
+        if notes:
+            self._notes_shown += len(notes)
+            self._last_note_key = (notes[-1]["updated_at"], notes[-1]["id"])
+        self._show_load_more()
+
     def _create_note_item(self, note):
         is_selected = note["id"] == self.selected_note_id
         bg = COLORS["accent"] if is_selected else COLORS["bg_secondary"]
@@ -197,6 +290,14 @@ class NotesTab(ctk.CTkFrame):
             text_color=COLORS["text_muted"], anchor="w"
         ).pack(padx=10, pady=(0, 6), anchor="w")
 
+        # Search hit context (only present on FTS search results)
+        if note.get("snippet"):
+            ctk.CTkLabel(
+                item, text=" ".join(note["snippet"].split()), font=FONTS["small"],
+                text_color=COLORS["text_secondary"], anchor="w", justify="left",
+                wraplength=220
+            ).pack(padx=10, pady=(0, 6), anchor="w")
+
         # Bind click
         for widget in [item] + item.winfo_children():
             widget.bind("<Button-1>", lambda e, nid=note["id"]: self.view_note(nid))
@@ -1168,7 +1269,17 @@ class NotesTab(ctk.CTkFrame):
             filename = os.path.basename(fp)
             title = os.path.splitext(filename)[0]
             content = extract_text_from_file(fp)
-            db.add_note(title, content, source_file=filename)
+            # Re-importing a file would otherwise duplicate the note (and
+            # any AI generation run on it later)
+            duplicates = db.find_duplicates("notes", content)
+            action = ask_duplicate_action(self, title, duplicates[0]) if duplicates else "keep"
+            if action == "keep":
+                db.add_note(title, content, source_file=filename)
+            elif action == "replace":
+                db.update_note(duplicates[0]["id"], title=title, content=content, source_file=filename)
+            elif action == "merge":
+                existing = db.get_note(duplicates[0]["id"])
+                db.update_note(existing["id"], content=dedupe.merge_text(existing["content"], content))
 
         if filepaths:
             self.refresh_list()
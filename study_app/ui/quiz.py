@@ -44,7 +44,7 @@ class QuizTab(ctk.CTkFrame):
 
     def _build_setup_content(self):
         """Build the setup controls inside self.setup_frame."""
-        self.notes = db.get_all_notes()
+        self.notes = db.get_note_titles()
 
         # Mode toggle row
         mode_frame = ctk.CTkFrame(self.setup_frame, fg_color="transparent")
@@ -184,6 +184,17 @@ class QuizTab(ctk.CTkFrame):
                 command=lambda: self._toggle_all_notes(False)
             ).pack(side="left")
 
+            # Select exactly the notes carrying a tag
+            note_tags = [t["name"] for t in db.get_tag_counts() if t["notes"]]
+            if note_tags:
+                ctk.CTkOptionMenu(
+                    ctrl_row, values=note_tags, width=140, height=26,
+                    variable=ctk.StringVar(value="🏷️ Select by tag"),
+                    fg_color=BUTTON_VARIANTS["secondary"]["fg_color"],
+                    button_color=COLORS["accent_alt"], font=FONTS["small"], corner_radius=6,
+                    command=self._select_notes_by_tag
+                ).pack(side="left", padx=(4, 0))
+
             # Scrollable checkbox area
             check_frame = ctk.CTkScrollableFrame(
                 self.note_select_frame, fg_color=COLORS["bg_secondary"],
@@ -211,6 +222,11 @@ class QuizTab(ctk.CTkFrame):
         for var in self.note_checkboxes.values():
             var.set(state)
 
+    def _select_notes_by_tag(self, tag: str):
+        tagged = {n["id"] for n in db.get_notes_by_tags(any_of=[tag], columns=("id",))}
+        for note_id, var in self.note_checkboxes.items():
+            var.set(note_id in tagged)
+
     def _set_quiz_mode(self, interleaved: bool):
         """Switch between single-note and interleaved quiz modes."""
         self.is_interleaved = interleaved
@@ -282,10 +298,11 @@ class QuizTab(ctk.CTkFrame):
             )
             return
 
-        # Gather the selected notes
+        # Gather the selected notes (bodies are only loaded for the picked ids)
         selected_notes = []
-        for note in self.notes:
-            if note["id"] in selected_ids:
+        for note_id in selected_ids:
+            note = db.get_note(note_id)
+            if note:
                 selected_notes.append({"title": note["title"], "content": note["content"]})
 
         self.gen_btn.configure(state="disabled", text="⏳ Generating interleaved quiz...")
@@ -1,12 +1,15 @@
 """
 settings.py — In-app settings panel for StudyForge.
-Handles API key entry, connection testing, model selection, and Pomodoro config.
+Handles API key entry, connection testing, model selection, Pomodoro config,
+and the review scheduler (SM-2 or FSRS, with FSRS weights fitted to the user's reviews).
 """
 
 import customtkinter as ctk
 import json
 import os
 import threading
+import fsrs
+import srs_engine
 from ui.styles import COLORS, FONTS, PADDING, BUTTON_VARIANTS
 from claude_client import (
     ClaudeStudyClient,
@@ -218,6 +221,85 @@ class SettingsTab(ctk.CTkFrame):
             corner_radius=8, command=self._save_pomodoro_settings
         ).pack(padx=PADDING["section"], pady=(0, PADDING["section"]))
 
+        # ── Review Scheduler ──────────────────────────────────────
+        srs_card = ctk.CTkFrame(scroll, fg_color=COLORS["bg_card"], corner_radius=12)
+        srs_card.pack(fill="x", pady=(0, 12))
+
+        ctk.CTkLabel(srs_card, text="🧠 Review Scheduler", font=FONTS["subheading"],
+                      text_color=COLORS["text_primary"]).pack(padx=PADDING["section"], pady=(PADDING["section"], 4), anchor="w")
+        ctk.CTkLabel(srs_card,
+            text="FSRS predicts when you would forget each card and can be fitted to your own review history.",
+            font=FONTS["small"], text_color=COLORS["text_muted"]).pack(padx=PADDING["section"], anchor="w")
+
+        srs_grid = ctk.CTkFrame(srs_card, fg_color="transparent")
+        srs_grid.pack(fill="x", padx=PADDING["section"], pady=(10, 4))
+        srs_grid.grid_columnconfigure(1, weight=1)
+
+        ctk.CTkLabel(srs_grid, text="Algorithm:", font=FONTS["body"],
+                      text_color=COLORS["text_secondary"]).grid(row=0, column=0, sticky="w", pady=4)
+        self._scheduler_names = {"SM-2": "sm2", "FSRS": "fsrs"}
+        current = config.get("scheduler", "sm2")
+        self.scheduler_var = ctk.StringVar(
+            value=next((label for label, name in self._scheduler_names.items() if name == current), "SM-2"))
+        ctk.CTkOptionMenu(
+            srs_grid, variable=self.scheduler_var, values=list(self._scheduler_names),
+            fg_color=COLORS["bg_input"], button_color=COLORS["accent"],
+            font=FONTS["body"], corner_radius=8, width=160
+        ).grid(row=0, column=1, sticky="w", padx=(8, 0), pady=4)
+
+        ctk.CTkLabel(srs_grid, text="Desired retention (FSRS):", font=FONTS["body"],
+                      text_color=COLORS["text_secondary"]).grid(row=1, column=0, sticky="w", pady=4)
+        retention = config.get("desired_retention", 0.9)
+        self.retention_var = ctk.DoubleVar(value=retention)
+        retention_label = ctk.CTkLabel(srs_grid, text=f"{retention:.0%}", font=FONTS["body_bold"],
+                                        text_color=COLORS["accent_light"], width=40)
+        retention_label.grid(row=1, column=2, padx=8)
+        retention_slider = ctk.CTkSlider(
+            srs_grid, from_=0.70, to=0.97, number_of_steps=27,
+            fg_color=COLORS["bg_secondary"], progress_color=COLORS["accent"],
+            button_color=COLORS["accent"], button_hover_color=COLORS["accent_hover"],
+            command=lambda v: (self.retention_var.set(round(v, 2)), retention_label.configure(text=f"{v:.0%}"))
+        )
+        retention_slider.set(retention)
+        retention_slider.grid(row=1, column=1, sticky="ew", padx=(8, 0), pady=4)
+
+        self.load_balancing_var = ctk.BooleanVar(value=config.get("load_balancing", True))
+        ctk.CTkCheckBox(
+            srs_grid, text="Spread due dates over quieter days (load balancing)",
+            variable=self.load_balancing_var, font=FONTS["body"]
+        ).grid(row=2, column=0, columnspan=3, sticky="w", pady=4)
+
+        self._fsrs_weights = config.get("fsrs_weights")
+        self._optimizer = None
+        srs_btns = ctk.CTkFrame(srs_card, fg_color="transparent")
+        srs_btns.pack(fill="x", padx=PADDING["section"], pady=(8, 4))
+
+        self.optimize_btn = ctk.CTkButton(
+            srs_btns, text="🧮 Fit FSRS to My Reviews", width=200, height=36,
+            font=FONTS["body_bold"], corner_radius=8,
+            **BUTTON_VARIANTS["primary"],
+            command=self._optimize_fsrs
+        )
+        self.optimize_btn.pack(side="left", padx=(0, 8))
+
+        ctk.CTkButton(
+            srs_btns, text="💾 Save Scheduler Settings", height=36,
+            font=FONTS["body_bold"], fg_color=COLORS["success"],
+            hover_color=COLORS["success_hover"], corner_radius=8,
+            command=self._save_scheduler_settings
+        ).pack(side="left")
+
+        self.srs_status = ctk.CTkLabel(
+            srs_card, text="Using fitted FSRS weights" if self._fsrs_weights else "Using default FSRS weights",
+            font=FONTS["small"], text_color=COLORS["text_muted"], justify="left"
+        )
+        self.srs_status.pack(padx=PADDING["section"], pady=(2, PADDING["section"]), anchor="w")
+        if fsrs.np is None:
+            # fsrs.fit() needs NumPy; FSRS itself schedules fine without it
+            self.optimize_btn.configure(state="disabled")
+            self.srs_status.configure(text=self.srs_status.cget("text") +
+                                      "\nFitting weights needs NumPy, which isn't installed (pip install numpy)")
+
         # ── About ─────────────────────────────────────────────────
         about_card = ctk.CTkFrame(scroll, fg_color=COLORS["bg_card"], corner_radius=12)
         about_card.pack(fill="x", pady=(0, 12))
@@ -225,7 +307,7 @@ class SettingsTab(ctk.CTkFrame):
         ctk.CTkLabel(about_card, text="🎓 StudyForge", font=FONTS["subheading"],
                       text_color=COLORS["text_primary"]).pack(padx=PADDING["section"], pady=(PADDING["section"], 4), anchor="w")
         ctk.CTkLabel(about_card,
-            text="Pomodoro · Spaced Repetition (SM-2) · Active Recall · AI-Powered Study\n"
+            text="Pomodoro · Spaced Repetition (SM-2 / FSRS) · Active Recall · AI-Powered Study\n"
                  f"Config: {self._config_path}",
             font=FONTS["small"], text_color=COLORS["text_muted"], justify="left"
         ).pack(padx=PADDING["section"], pady=(0, PADDING["section"]), anchor="w")
@@ -344,3 +426,48 @@ class SettingsTab(ctk.CTkFrame):
             self.app.config[key] = var.get()
         _save_config(self._config_path, config)
         self.api_status.configure(text="✅ Pomodoro settings saved (takes effect on next session)", text_color=COLORS["success"])
+
+    def _optimize_fsrs(self):
+        if self._optimizer is not None and self._optimizer.running():
+            self._optimizer.cancel()
+            return
+        self.optimize_btn.configure(text="⏹ Stop Fitting")
+        self.srs_status.configure(text="Fitting FSRS to your review history...", text_color=COLORS["text_secondary"])
+
+        def on_progress(epoch, loss):
+            self.after(0, lambda: self.srs_status.configure(text=f"Fitting... pass {epoch}, log-loss {loss:.4f}"))
+
+        def on_done(result):
+            self.after(0, lambda: self._show_fit_result(result))
+
+        self._optimizer = fsrs.Optimizer(on_done, weights=self._fsrs_weights or fsrs.DEFAULT_WEIGHTS,
+                                         on_progress=on_progress)
+
+    def _show_fit_result(self, result):
+        self.optimize_btn.configure(text="🧮 Fit FSRS to My Reviews")
+        if "error" in result:
+            self.srs_status.configure(text=f"🔴 {result['error']}", text_color=COLORS["danger"])
+        elif not result["reviews"]:
+            self.srs_status.configure(text="⚠️ No repeat reviews to fit yet — keep studying", text_color=COLORS["warning"])
+        else:
+            self._fsrs_weights = result["weights"]
+            self.srs_status.configure(
+                text=f"✅ Fitted on {result['reviews']:,} reviews of {result['cards']:,} cards in {result['seconds']:.1f} s\n"
+                     f"Log-loss {result['log_loss_before']:.4f} → {result['log_loss']:.4f}  ·  "
+                     f"RMSE {result['rmse_before']:.1%} → {result['rmse']:.1%}  (save to use)",
+                text_color=COLORS["success"])
+
+    def _save_scheduler_settings(self):
+        scheduler = self._scheduler_names[self.scheduler_var.get()]
+        retention = self.retention_var.get()
+        load_balancing = self.load_balancing_var.get()
+        config = _load_config(self._config_path)
+        for key, value in (("scheduler", scheduler), ("desired_retention", retention),
+                           ("fsrs_weights", self._fsrs_weights), ("load_balancing", load_balancing)):
+            config[key] = value
+            self.app.config[key] = value
+        _save_config(self._config_path, config)
+        srs_engine.set_scheduler(scheduler, weights=self._fsrs_weights, desired_retention=retention)
+        srs_engine.set_load_balancing(load_balancing)
+        self.srs_status.configure(text=f"✅ Reviews now scheduled with {self.scheduler_var.get()}",
+                                  text_color=COLORS["success"])
@@ -34,7 +34,15 @@ hiddenimports = [
     # Core app modules
     "config_manager",
     "database",
+    "migrations",
     "srs_engine",
+    "fsrs",
+    "simulator",
+    "review_writer",
+    "maintenance",
+    "backup",
+    "instrumentation",
+    "dedupe",
     "claude_client",
     "ui",
     "ui.app",
@@ -107,7 +115,7 @@ a = Analysis(
     hooksconfig={},
     runtime_hooks=[],
     excludes=[
-        "matplotlib", "numpy", "scipy", "pandas",
+        "matplotlib", "scipy", "pandas",  # numpy ships: fsrs.fit() and simulator.py need it
         "pytest", "setuptools", "pip",
     ],
     win_no_prefer_redirects=False,
@@ -38,6 +38,24 @@ DEFAULTS = {
     "pomodoro_sessions_before_long_break": 4,
     "daily_new_cards_limit": 20,
     "theme": "dark",
+    "write_behind_reviews": False,
+    "write_behind_flush_every": 20,
+    "write_behind_flush_ms": 1000,
+    "performance_profile": "balanced",
+    "idle_maintenance": True,
+    "maintenance_idle_seconds": 120,
+    "maintenance_interval_minutes": 60,
+    "review_archive_days": 180,
+    "change_journal_days": 90,
+    "backups_enabled": True,
+    "backup_interval_hours": 24,
+    "backup_keep": 7,
+    "db_instrumentation": False,
+    "slow_query_ms": 100,
+    "scheduler": "sm2",
+    "desired_retention": 0.9,
+    "fsrs_weights": None,
+    "load_balancing": True,
     "first_run": True,
 }
 
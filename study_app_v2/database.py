@@ -1,13 +1,20 @@
 """
 database.py — SQLite database manager for StudyForge.
-All connections use context managers to prevent leaks.
+All connections use context managers to prevent leaks; the underlying
+sqlite3 connections are pooled per thread and closed on app exit.
 """
 
 import sqlite3
 import os
+import re
+import threading
+import time
+import atexit
 import sys
-from datetime import datetime, date
+from datetime import datetime, date, timedelta
 from contextlib import contextmanager
+import migrations
+import dedupe
 
 
 def _get_data_dir() -> str:
@@ -31,96 +38,442 @@ VALID_STAT_FIELDS = frozenset({
     "study_minutes", "quiz_questions_answered"
 })
 
+# Epoch days (flashcards.due_day, review_log.review_day) = date.toordinal() - EPOCH_ORDINAL
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
 
-@contextmanager
-def get_connection():
-    """Context manager for safe database connections."""
+# Markers wrapped around matched words in search_notes() snippets
+SNIPPET_START, SNIPPET_END = "«", "»"
+_FTS_TERM_RE = re.compile(r"\w+")
+
+# Columns list_notes() can return — everything except the note body
+NOTE_LIST_COLUMNS = ("id", "title", "tags", "source_file", "created_at", "updated_at")
+
+
+# ── Performance profiles ──────────────────────────────────────────
+# Pragma sets picked by the "performance_profile" config key, applied once
+# per connection. page_size only takes effect when the file is created.
+
+PERFORMANCE_PROFILES = {
+    "safe": {  # fsync on every commit, small caches
+        "synchronous": "FULL", "mmap_size": 0, "cache_size": -2000,
+        "temp_store": "DEFAULT", "page_size": 4096, "wal_autocheckpoint": 1000,
+    },
+    "balanced": {  # WAL + NORMAL: a power cut may lose the last commits
+        "synchronous": "NORMAL", "mmap_size": 64 * 1024 * 1024, "cache_size": -16000,
+        "temp_store": "MEMORY", "page_size": 4096, "wal_autocheckpoint": 1000,
+    },
+    "fast": {  # no fsync: an OS crash can lose or corrupt recent data
+        "synchronous": "OFF", "mmap_size": 256 * 1024 * 1024, "cache_size": -64000,
+        "temp_store": "MEMORY", "page_size": 8192, "wal_autocheckpoint": 4000,
+    },
+}
+DEFAULT_PROFILE = "balanced"
+_profile = DEFAULT_PROFILE
+
+
+def set_performance_profile(name):
+    global _profile
+    if name not in PERFORMANCE_PROFILES:
+        raise ValueError(f"Unknown performance profile: {name}")
+    if name != _profile:
+        _profile = name
+        close_all_connections()
+
+
+def get_performance_profile():
+    return _profile
+
+
+# ── Connections ───────────────────────────────────────────────────
+# One long-lived connection per thread; pragmas run once at open time.
+# Connections of exited worker threads are reaped when a new one is opened.
+
+_local = threading.local()
+_registry_lock = threading.Lock()
+_connections = {}  # threading.Thread -> sqlite3.Connection
+_generation = 0    # bumped by close_all_connections() to invalidate handles
+_connection_factory = sqlite3.Connection  # replaced by instrumentation.py
+
+
+def _open_connection():
     os.makedirs(DB_DIR, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
+    profile = PERFORMANCE_PROFILES[_profile]
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, factory=_connection_factory)
     conn.row_factory = sqlite3.Row
+    migrations.register_functions(conn)  # body_text() for the LIKE search fallback
+    conn.execute(f"PRAGMA page_size={profile['page_size']}")  # before WAL on a new file
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL")  # persists only on a new file
     conn.execute("PRAGMA journal_mode=WAL")
+    for pragma in ("synchronous", "mmap_size", "cache_size", "temp_store", "wal_autocheckpoint"):
+        conn.execute(f"PRAGMA {pragma}={profile[pragma]}")
     conn.execute("PRAGMA foreign_keys=ON")
+    if migrations.get_version(conn) == migrations.SCHEMA_VERSION:
+        _attach_archive(conn)  # else init_db() attaches after migrating
+    return conn
+
+
+# Archived reviews live in <db>_archive.db, attached as `archive`. TEMP
+# views (per connection; main-file ones can't see attached files):
+#   review_history  hot + archived review_log rows (not of deleted cards)
+#   review_days     (card_id, review_day, reviews, lapses, rating_sum) from hot
+#                   rows + review_rollup; a day may appear twice, so SUM()
+_TIER_SQL = """
+    CREATE TEMP VIEW IF NOT EXISTS review_history AS
+        SELECT id, card_id, rating, reviewed_at, reviewed_ts, review_day FROM main.review_log
+        UNION ALL
+        SELECT id, card_id, rating, reviewed_at, reviewed_ts, review_day FROM archive.review_log
+        WHERE id < (SELECT IFNULL(MIN(id), 9223372036854775807) FROM main.review_log)
+            AND card_id NOT IN (SELECT card_id FROM main.archive_purge);
+    CREATE TEMP VIEW IF NOT EXISTS review_days AS
+        SELECT card_id, review_day, COUNT(*) AS reviews, SUM(rating < 3) AS lapses, SUM(rating) AS rating_sum
+        FROM main.review_log GROUP BY card_id, review_day
+        UNION ALL
+        SELECT card_id, review_day, reviews, lapses, rating_sum FROM main.review_rollup;
+"""
+
+
+def archive_path():
+    """The review archive file, next to DB_PATH."""
+    return os.path.splitext(DB_PATH)[0] + "_archive.db"
+
+
+def _attach_archive(conn):
+    conn.execute("ATTACH DATABASE ? AS archive", (archive_path(),))
+    conn.execute("PRAGMA archive.auto_vacuum=INCREMENTAL")
+    conn.execute("PRAGMA archive.journal_mode=WAL")
+    conn.execute(f"PRAGMA archive.synchronous={PERFORMANCE_PROFILES[_profile]['synchronous']}")
+    migrations.migrate_archive(conn)
+    conn.executescript(_TIER_SQL)
+
+
+def _reap_dead_connections():
+    """Close connections whose owning thread has exited. Caller holds the lock."""
+    for thread in [t for t in _connections if not t.is_alive()]:
+        try: _connections.pop(thread).close()
+        except sqlite3.Error: pass
+
+
+def _thread_connection():
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.generation == _generation and _local.path == DB_PATH:
+        return conn
+    thread = threading.current_thread()
+    with _registry_lock:
+        stale = _connections.pop(thread, None)
+        if stale is not None: stale.close()
+        _reap_dead_connections()
+        conn = _open_connection()
+        _connections[thread] = conn
+        _local.conn, _local.generation, _local.path = conn, _generation, DB_PATH
+    return conn
+
+
+def close_all_connections():
+    """Close every pooled connection (app exit, or after changing DB_PATH)."""
+    global _generation
+    with _registry_lock:
+        for conn in _connections.values():
+            try: conn.close()
+            except sqlite3.Error: pass
+        _connections.clear()
+        _generation += 1
+    _local.conn = None
+
+
+atexit.register(close_all_connections)
+
+
+@contextmanager
+def get_connection():
+    """Yield this thread's pooled connection; commit on success, rollback on error.
+    Nested use joins the outermost block, which alone commits or rolls back."""
+    conn = _thread_connection()
+    depth = getattr(_local, "depth", 0)
+    _local.depth = depth + 1
     try:
         yield conn
-        conn.commit()
+        if depth == 0: conn.commit()
     except Exception:
-        conn.rollback()
+        if depth == 0: conn.rollback()
         raise
     finally:
-        conn.close()
+        _local.depth = depth
+
+
+@contextmanager
+def transaction():
+    """Unit of work: all database calls in the block commit once, atomically.
+    Takes the write lock up front (BEGIN IMMEDIATE)."""
+    with get_connection() as conn:
+        if not conn.in_transaction:
+            conn.execute("BEGIN IMMEDIATE")
+        yield conn
 
 
 def init_db():
+    """Create the schema or upgrade an existing database in place."""
+    with get_connection() as conn:
+        old, new = migrations.migrate(conn)
+        if "archive" not in {row[1] for row in conn.execute("PRAGMA database_list")}:
+            _attach_archive(conn)
+    if old != new:
+        print(f"[StudyForge] Database schema upgraded v{old} → v{new}")
+
+
+# ── Maintenance ───────────────────────────────────────────────────
+
+VACUUM_CHUNK_PAGES = 256   # pages freed per incremental_vacuum step
+ANALYSIS_LIMIT = 1000      # rows ANALYZE samples per index
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def run_maintenance(keep_going=lambda: True, archive_after_days=None, change_keep_days=None):
+    """archive_reviews(), prune_changes(), incremental vacuum, ANALYZE + optimize, then a WAL
+    checkpoint that truncates the -wal files. `keep_going()` is checked
+    between steps so the idle scheduler (maintenance.py) can stop early.
+    Pre-existing databases get one full VACUUM to switch to
+    auto_vacuum=INCREMENTAL once a tenth of the file (and >= 1 MB) is free
+    pages. Byte counts cover both files (archiving moves bytes, not frees)."""
+    start = time.perf_counter()
+    files = (DB_PATH, archive_path())
+    wal_before = sum(_file_size(f + "-wal") for f in files)
+    file_before = sum(_file_size(f) for f in files)
+    result = {"archived": 0, "changes_pruned": 0, "vacuum": None, "analyzed": False,
+              "wal_truncated": False, "completed": False}
+    if keep_going():
+        result["archived"] = archive_reviews(
+            REVIEW_HOT_DAYS if archive_after_days is None else archive_after_days, keep_going)
+    if keep_going():
+        result["changes_pruned"] = prune_changes(
+            CHANGE_KEEP_DAYS if change_keep_days is None else change_keep_days, keep_going)
+    with get_connection() as conn:
+        if keep_going():
+            auto_vacuum, page_size, free, pages = (
+                conn.execute(f"PRAGMA {p}").fetchone()[0]
+                for p in ("auto_vacuum", "page_size", "freelist_count", "page_count"))
+            if auto_vacuum == 2:
+                while free and keep_going():
+                    conn.execute(f"PRAGMA incremental_vacuum({VACUUM_CHUNK_PAGES})").fetchall()
+                    free = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                result["vacuum"] = "incremental"
+            elif free * 10 >= pages and free * page_size >= 1 << 20:
+                conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+                conn.execute("VACUUM")
+                result["vacuum"] = "full"
+        if keep_going():
+            conn.execute(f"PRAGMA analysis_limit={ANALYSIS_LIMIT}")
+            conn.execute("ANALYZE")
+            conn.execute("PRAGMA optimize")
+            result["analyzed"] = True
+        result["completed"] = keep_going()
+        # PASSIVE never waits on other connections; TRUNCATE once it all fit
+        busy, log, done = conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchone()
+        if not busy and log == done:
+            result["wal_truncated"] = not conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()[0]
+    result["wal_bytes_freed"] = wal_before - sum(_file_size(f + "-wal") for f in files)
+    result["file_bytes_freed"] = file_before - sum(_file_size(f) for f in files)
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+# ── Review archive ────────────────────────────────────────────────
+
+REVIEW_HOT_DAYS = 180   # younger review_log rows stay in the main file
+ARCHIVE_BATCH = 20000
+
+
+def archive_reviews(older_than_days=REVIEW_HOT_DAYS, keep_going=lambda: True):
+    """Move review_log rows older than `older_than_days` into the archive file and
+    fold them into review_rollup. Per batch: archive copy commits first (idempotent),
+    then rollup + delete. Rows move in id order, so archived ids stay below the main
+    file's smallest and review_history can hide copies a crash left in both.
+    Archived rows of cards queued in archive_purge (deleted) go first."""
+    cutoff = date.today().toordinal() - EPOCH_ORDINAL - older_than_days
+    with transaction() as conn:
+        conn.execute("DELETE FROM archive.review_log WHERE card_id IN (SELECT card_id FROM main.archive_purge)")
+        conn.execute("DELETE FROM archive_purge")
+    with get_connection() as conn:
+        last = conn.execute("SELECT MAX(id) FROM review_log WHERE review_day < ?", (cutoff,)).fetchone()[0]
+    moved = 0
+    while last is not None and keep_going():
+        with get_connection() as conn:
+            row = conn.execute("SELECT id FROM review_log WHERE id <= ? ORDER BY id LIMIT 1 OFFSET ?",
+                               (last, ARCHIVE_BATCH - 1)).fetchone()
+        upto = row[0] if row else last
+        with transaction() as conn:
+            conn.execute("""INSERT OR IGNORE INTO archive.review_log (id, card_id, rating, reviewed_at)
+                SELECT id, card_id, rating, reviewed_at FROM main.review_log WHERE id <= ?""", (upto,))
+        with transaction() as conn:
+            conn.execute("""INSERT INTO review_rollup (card_id, review_day, reviews, lapses, rating_sum)
+                SELECT card_id, review_day, COUNT(*), SUM(rating < 3), SUM(rating)
+                FROM main.review_log WHERE id <= ? GROUP BY card_id, review_day
+                ON CONFLICT(card_id, review_day) DO UPDATE SET reviews=reviews+excluded.reviews,
+                    lapses=lapses+excluded.lapses, rating_sum=rating_sum+excluded.rating_sum""", (upto,))
+            moved += conn.execute("DELETE FROM main.review_log WHERE id <= ?", (upto,)).rowcount
+        if upto == last:
+            break
+    return moved
+
+
+def get_review_history(card_id):
+    """All reviews of a card, hot and archived, oldest first."""
+    with get_connection() as conn:
+        return [dict(r) for r in conn.execute(
+            "SELECT * FROM review_history WHERE card_id=? ORDER BY reviewed_ts, id", (card_id,))]
+
+def get_all_review_history():
+    """(id, card_id, review_day, rating) of every review, hot and archived, unordered,
+    as plain tuples: fsrs.fit()'s input."""
+    with get_connection() as conn:
+        cur = conn.cursor()
+        cur.row_factory = None
+        return cur.execute("SELECT id, card_id, review_day, rating FROM review_history").fetchall()
+
+
+# ── Bodies ────────────────────────────────────────────────────────
+# Note/essay/rubric bodies and hypothetical feedback live in the
+# migrations.BODY_TABLES side tables, compressed once large; only the
+# single-row getters read and decode them.
+
+def _put_body(conn, owner, owner_id, text):
+    side, owner_col, field = migrations.BODY_TABLES[owner]
+    conn.execute(f"INSERT INTO {side} ({owner_col}, {field}) VALUES (?,?) "
+                 f"ON CONFLICT({owner_col}) DO UPDATE SET {field}=excluded.{field}",
+                 (owner_id, migrations.encode_body(text)))
+    bands = migrations.DEDUPE_TABLES.get(owner)
+    if bands:  # duplicate-detection fingerprints, see dedupe.py
+        digest, minhash, keys = migrations.fingerprint(text)
+        conn.execute(f"UPDATE {side} SET content_hash=?, minhash=? WHERE {owner_col}=?",
+                     (digest, minhash, owner_id))
+        conn.execute(f"DELETE FROM {bands} WHERE {owner_col}=?", (owner_id,))
+        conn.executemany(f"INSERT OR IGNORE INTO {bands} (band_key, {owner_col}) VALUES (?,?)",
+                         [(key, owner_id) for key in keys])
+
+def _get_with_body(conn, owner, owner_id):
+    side, owner_col, field = migrations.BODY_TABLES[owner]
+    row = conn.execute(f"SELECT o.*, b.{field} AS body FROM {owner} o "
+                       f"LEFT JOIN {side} b ON b.{owner_col}=o.id WHERE o.id=?", (owner_id,)).fetchone()
+    if not row: return None
+    item = dict(row)
+    item[field] = migrations.decode_body(item.pop("body"))
+    return item
+
+def _without_body(owner, rows):
+    field = migrations.BODY_TABLES[owner][2]
+    return [{k: r[k] for k in r.keys() if k != field} for r in rows]
+
+def find_duplicates(kind, content, threshold=dedupe.NEAR_DUPLICATE):
+    """Stored "notes"/"rubrics" that `content` copies exactly (content_hash index) or
+    nearly (MinHash band index), as (id, title, similarity, exact) dicts, best first."""
+    if kind not in migrations.DEDUPE_TABLES:
+        raise ValueError(f"Invalid duplicate kind: {kind}")
+    side, owner_col, _ = migrations.BODY_TABLES[kind]
+    bands = migrations.DEDUPE_TABLES[kind]
+    label = "title" if kind == "notes" else "name"
+    digest, minhash, keys = migrations.fingerprint(content)
     with get_connection() as conn:
-        c = conn.cursor()
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS notes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                title TEXT NOT NULL, content TEXT NOT NULL,
-                tags TEXT DEFAULT '', source_file TEXT DEFAULT '',
-                created_at TEXT NOT NULL, updated_at TEXT NOT NULL
-            )""")
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS flashcards (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                note_id INTEGER, front TEXT NOT NULL, back TEXT NOT NULL,
-                tags TEXT DEFAULT '', easiness_factor REAL DEFAULT 2.5,
-                interval INTEGER DEFAULT 0, repetitions INTEGER DEFAULT 0,
-                next_review TEXT NOT NULL, created_at TEXT NOT NULL,
-                FOREIGN KEY (note_id) REFERENCES notes(id) ON DELETE SET NULL
-            )""")
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS review_log (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                card_id INTEGER NOT NULL, rating INTEGER NOT NULL,
-                reviewed_at TEXT NOT NULL,
-                FOREIGN KEY (card_id) REFERENCES flashcards(id) ON DELETE CASCADE
-            )""")
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS pomodoro_sessions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                session_type TEXT NOT NULL, duration_minutes INTEGER NOT NULL,
-                completed INTEGER DEFAULT 1, started_at TEXT NOT NULL, finished_at TEXT NOT NULL
-            )""")
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS daily_stats (
-                date TEXT PRIMARY KEY, cards_reviewed INTEGER DEFAULT 0,
-                cards_added INTEGER DEFAULT 0, pomodoro_sessions INTEGER DEFAULT 0,
-                study_minutes INTEGER DEFAULT 0, quiz_questions_answered INTEGER DEFAULT 0
-            )""")
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS hypotheticals (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                note_id INTEGER, title TEXT NOT NULL, scenario TEXT NOT NULL,
-                response TEXT DEFAULT '', grade TEXT DEFAULT '',
-                feedback TEXT DEFAULT '', created_at TEXT NOT NULL,
-                FOREIGN KEY (note_id) REFERENCES notes(id) ON DELETE SET NULL
-            )""")
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS essays (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                note_id INTEGER, title TEXT NOT NULL, prompt TEXT NOT NULL,
-                content TEXT DEFAULT '', rubric_id INTEGER,
-                grade TEXT DEFAULT '', feedback TEXT DEFAULT '',
-                created_at TEXT NOT NULL, updated_at TEXT NOT NULL,
-                FOREIGN KEY (note_id) REFERENCES notes(id) ON DELETE SET NULL,
-                FOREIGN KEY (rubric_id) REFERENCES rubrics(id) ON DELETE SET NULL
-            )""")
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS rubrics (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL, content TEXT NOT NULL,
-                source_file TEXT DEFAULT '', created_at TEXT NOT NULL
-            )""")
-        c.execute("""
-            CREATE TABLE IF NOT EXISTS participation_questions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                note_id INTEGER, question TEXT NOT NULL,
-                category TEXT NOT NULL DEFAULT 'interesting',
-                answer TEXT DEFAULT '', notes TEXT DEFAULT '',
-                created_at TEXT NOT NULL,
-                FOREIGN KEY (note_id) REFERENCES notes(id) ON DELETE SET NULL
-            )""")
+        matches = {r["id"]: {"id": r["id"], "title": r["title"], "similarity": 1.0, "exact": True}
+                   for r in conn.execute(
+                       f"SELECT o.id, o.{label} AS title FROM {side} b JOIN {kind} o ON o.id=b.{owner_col} "
+                       f"WHERE b.content_hash=?", (digest,))}
+        if minhash is not None:
+            sig = dedupe.unpack(minhash)
+            rows = conn.execute(
+                f"SELECT o.id, o.{label} AS title, b.minhash FROM {side} b JOIN {kind} o ON o.id=b.{owner_col} "
+                f"WHERE b.{owner_col} IN (SELECT {owner_col} FROM {bands} "
+                f"WHERE band_key IN ({', '.join('?' * len(keys))}))", keys).fetchall()
+            for r in rows:
+                if r["id"] in matches or r["minhash"] is None: continue
+                score = dedupe.similarity(sig, dedupe.unpack(r["minhash"]))
+                if score >= threshold:
+                    matches[r["id"]] = {"id": r["id"], "title": r["title"], "similarity": score, "exact": False}
+    return sorted(matches.values(), key=lambda m: m["similarity"], reverse=True)
+
+
+# ── Change journal ────────────────────────────────────────────────
+# `changes` (migration v11) gets a row per insert/update/delete of the
+# migrations.CHANGE_TABLES via triggers; export and sync read the delta.
+# run_maintenance() prunes changes older than CHANGE_KEEP_DAYS.
+
+CHANGE_BATCH = 500
+CHANGE_KEEP_DAYS = 90
+CHANGE_PRUNE_BATCH = 20000
+
+def get_change_seq():
+    with get_connection() as conn:
+        return conn.execute("SELECT IFNULL(MAX(seq), 0) FROM changes").fetchone()[0]
+
+def _current_rows(conn, changes):
+    wanted = {}
+    for c in changes:
+        if c["op"] != "D": wanted.setdefault(c["table_name"], set()).add(c["row_id"])
+    rows = {}
+    for table, ids in wanted.items():
+        marks = ", ".join("?" * len(ids))
+        found = conn.execute(f"SELECT * FROM {table} WHERE id IN ({marks})", list(ids)).fetchall()
+        if table in migrations.BODY_TABLES:
+            side, owner_col, field = migrations.BODY_TABLES[table]
+            bodies = dict(conn.execute(f"SELECT {owner_col}, {field} FROM {side} WHERE {owner_col} IN ({marks})",
+                                       list(ids)).fetchall())
+            for row in _without_body(table, found):
+                row[field] = migrations.decode_body(bodies.get(row["id"]))
+                rows[(table, row["id"])] = row
+        else:
+            rows.update(((table, r["id"]), dict(r)) for r in found)
+    return rows
+
+def iter_changes(since=0, tables=None, batch=CHANGE_BATCH):
+    """Yield changes after seq `since`, oldest first, `batch` per short read: dicts of seq, table,
+    row_id, op ('I'/'U'/'D' tombstone), changed_ts and row (current row with body; None if deleted).
+    Raises ValueError if changes after `since` were pruned: the reader must export everything again."""
+    where, params = "seq > ?", []
+    if tables is not None:
+        tables = list(tables)
+        invalid = set(tables) - set(migrations.CHANGE_TABLES)
+        if invalid: raise ValueError(f"Invalid change tables: {', '.join(sorted(invalid))}")
+        where += f" AND table_name IN ({', '.join('?' * len(tables))})"; params = tables
+    while True:
+        with get_connection() as conn:
+            changes = conn.execute(f"SELECT seq, table_name, row_id, op, changed_ts FROM changes "
+                                   f"WHERE {where} ORDER BY seq LIMIT ?", [since, *params, batch]).fetchall()
+            _check_not_pruned(conn, since)
+            rows = _current_rows(conn, changes)
+        for c in changes:
+            yield {"seq": c["seq"], "table": c["table_name"], "row_id": c["row_id"], "op": c["op"],
+                   "changed_ts": c["changed_ts"],
+                   "row": None if c["op"] == "D" else rows.get((c["table_name"], c["row_id"]))}
+        if len(changes) < batch: return
+        since = changes[-1]["seq"]
+
+def _check_not_pruned(conn, since):
+    oldest = conn.execute("SELECT MIN(seq) FROM changes").fetchone()[0]  # seqs are contiguous until pruned
+    if since and oldest is not None and since < oldest - 1:
+        raise ValueError(f"Changes after seq {since} have been pruned (the journal now starts at {oldest}); "
+                         f"export everything again and continue from get_change_seq()")
+
+def prune_changes(older_than_days=CHANGE_KEEP_DAYS, keep_going=lambda: True):
+    """Delete changes older than `older_than_days`, oldest first, CHANGE_PRUNE_BATCH per transaction.
+    Only a leading run goes (seqs stay contiguous, so iter_changes() can spot a reader left behind)
+    and never the newest change (seq never goes back). Returns the number deleted."""
+    cutoff, pruned = int(time.time()) - older_than_days * 86400, 0
+    while keep_going():
+        with transaction() as conn:
+            newest = conn.execute("SELECT IFNULL(MAX(seq), 0) FROM changes").fetchone()[0]
+            batch = conn.execute("SELECT seq, changed_ts FROM changes WHERE seq < ? ORDER BY seq LIMIT ?",
+                                 (newest, CHANGE_PRUNE_BATCH)).fetchall()
+            old = 0
+            for seq, changed_ts in batch:
+                if changed_ts >= cutoff: break
+                old += 1
+            if old: pruned += conn.execute("DELETE FROM changes WHERE seq <= ?", (batch[old - 1][0],)).rowcount
+        if old < CHANGE_PRUNE_BATCH: break
+    return pruned
 
 
 # ── Notes ─────────────────────────────────────────────────────────
@@ -129,42 +482,203 @@ def add_note(title, content, tags="", source_file=""):
     now = datetime.now().isoformat()
     with get_connection() as conn:
         c = conn.execute(
-            "INSERT INTO notes (title, content, tags, source_file, created_at, updated_at) VALUES (?,?,?,?,?,?)",
-            (title, content, tags, source_file, now, now))
+            "INSERT INTO notes (title, content, tags, source_file, created_at, updated_at) VALUES (?,'',?,?,?,?)",
+            (title, tags, source_file, now, now))
+        _put_body(conn, "notes", c.lastrowid, content)
+        _set_tags(conn, "note_tags", "note_id", c.lastrowid, tags)
+        _index_note(conn, c.lastrowid)
         return c.lastrowid
 
 def get_all_notes():
+    """Every note's metadata, no bodies (see get_note())."""
     with get_connection() as conn:
         rows = conn.execute("SELECT * FROM notes ORDER BY updated_at DESC").fetchall()
+        return _without_body("notes", rows)
+
+def list_notes(columns=NOTE_LIST_COLUMNS, limit=None, after=None):
+    """Note metadata (no bodies), newest-updated first, from the covering index.
+    Keyset-paged: pass the last row's (updated_at, id) as `after`."""
+    invalid = set(columns) - set(NOTE_LIST_COLUMNS)
+    if invalid:
+        raise ValueError(f"Invalid note list columns: {', '.join(sorted(invalid))}")
+    cols = ", ".join(dict.fromkeys(("id", "updated_at") + tuple(columns)))
+    where, params = "", []
+    if after is not None:
+        where = "WHERE (updated_at, id) < (?, ?)"; params.extend(after)
+    params.append(limit or -1)
+    with get_connection() as conn:
+        rows = conn.execute(f"SELECT {cols} FROM notes {where} ORDER BY updated_at DESC, id DESC LIMIT ?",
+                            params).fetchall()
         return [dict(r) for r in rows]
 
+def get_note_titles():
+    return list_notes(columns=("id", "title"))
+
+def count_notes():
+    with get_connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0]
+
 def get_note(note_id):
     with get_connection() as conn:
-        row = conn.execute("SELECT * FROM notes WHERE id=?", (note_id,)).fetchone()
-        return dict(row) if row else None
+        return _get_with_body(conn, "notes", note_id)
 
-def update_note(note_id, title=None, content=None, tags=None):
+def update_note(note_id, title=None, content=None, tags=None, source_file=None):
     with get_connection() as conn:
-        note = conn.execute("SELECT * FROM notes WHERE id=?", (note_id,)).fetchone()
+        note = conn.execute("SELECT title, tags, source_file FROM notes WHERE id=?", (note_id,)).fetchone()
         if not note: return
-        note = dict(note)
-        conn.execute("UPDATE notes SET title=?, content=?, tags=?, updated_at=? WHERE id=?",
+        _index_note(conn, note_id, delete=True)
+        conn.execute("UPDATE notes SET title=?, tags=?, source_file=?, updated_at=? WHERE id=?",
             (title if title is not None else note["title"],
-             content if content is not None else note["content"],
              tags if tags is not None else note["tags"],
+             source_file if source_file is not None else note["source_file"],
              datetime.now().isoformat(), note_id))
+        if content is not None: _put_body(conn, "notes", note_id, content)
+        if tags is not None: _set_tags(conn, "note_tags", "note_id", note_id, tags)
+        _index_note(conn, note_id)
 
 def delete_note(note_id):
     with get_connection() as conn:
+        _index_note(conn, note_id, delete=True)
         conn.execute("DELETE FROM notes WHERE id=?", (note_id,))
 
-def search_notes(query):
+def _index_note(conn, note_id, delete=False):
+    """Add the note to notes_fts as stored now, or remove it (delete=True, before it changes:
+    a contentless index forgets a row only given the values it indexed). Kept out of triggers
+    so the schema needs no app-defined SQL function."""
+    if not _has_notes_fts(conn): return
+    row = conn.execute("SELECT n.title, n.tags, b.content FROM notes n JOIN note_bodies b ON b.note_id=n.id "
+                       "WHERE n.id=?", (note_id,)).fetchone()
+    if row is None: return
+    conn.execute("INSERT INTO notes_fts(notes_fts, rowid, title, content, tags) VALUES ('delete',?,?,?,?)" if delete
+                 else "INSERT INTO notes_fts(rowid, title, content, tags) VALUES (?,?,?,?)",
+                 (note_id, row["title"], migrations.decode_body(row["content"]), row["tags"]))
+
+def _fts_match_expression(terms):
+    """Quote each word as an FTS5 prefix term; all terms must match."""
+    return " ".join(f'"{term}"*' for term in terms)
+
+def _has_notes_fts(conn):
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name='notes_fts'").fetchone() is not None
+
+def _make_snippet(text, terms, width=120):
+    """Excerpt around the first prefix match with matches wrapped in SNIPPET_START/END.
+    Cheaper than FTS5 snippet(), which re-tokenizes the whole document."""
+    pattern = re.compile(r"\b(?:" + "|".join(map(re.escape, terms)) + r")\w*", re.IGNORECASE)
+    match = pattern.search(text)
+    if not match: return ""
+    start = max(0, match.start() - width // 3)
+    end = min(len(text), match.end() + width)
+    if start > 0:
+        start = text.find(" ", start, match.start()) + 1 or start
+    if end < len(text):
+        end = max(text.rfind(" ", match.end(), end), match.end())
+    excerpt = pattern.sub(lambda m: f"{SNIPPET_START}{m.group(0)}{SNIPPET_END}", text[start:end])
+    return ("…" if start > 0 else "") + excerpt + ("…" if end < len(text) else "")
+
+def search_notes(query, limit=100, columns=None):
+    """Top `limit` BM25-ranked prefix matches via FTS5, each with a `snippet`; LIKE fallback
+    (which decompresses every body). Only the hits' bodies are read; `columns`
+    (e.g. NOTE_LIST_COLUMNS) drops them once snippets are built."""
+    terms = _FTS_TERM_RE.findall(query)
     with get_connection() as conn:
-        rows = conn.execute(
-            "SELECT * FROM notes WHERE title LIKE ? OR content LIKE ? OR tags LIKE ? ORDER BY updated_at DESC",
-            (f"%{query}%", f"%{query}%", f"%{query}%")).fetchall()
+        if terms and _has_notes_fts(conn):
+            rows = conn.execute(
+                """WITH hits AS (
+                       SELECT rowid AS id, bm25(notes_fts, 10.0, 1.0, 5.0) AS score
+                       FROM notes_fts WHERE notes_fts MATCH ? ORDER BY score LIMIT ?)
+                   SELECT n.*, b.content AS body FROM hits JOIN notes n ON n.id=hits.id
+                   LEFT JOIN note_bodies b ON b.note_id=hits.id ORDER BY hits.score""",
+                (_fts_match_expression(terms), limit or -1)).fetchall()
+            results = [dict(r) for r in rows]
+            for note in results:
+                note["content"] = migrations.decode_body(note.pop("body"))
+                note["snippet"] = _make_snippet(note["content"], terms)
+        else:
+            rows = conn.execute(
+                "SELECT n.*, b.content AS body FROM notes n LEFT JOIN note_bodies b ON b.note_id=n.id "
+                "WHERE n.title LIKE ? OR body_text(b.content) LIKE ? OR n.tags LIKE ? "
+                "ORDER BY n.updated_at DESC LIMIT ?",
+                (f"%{query}%", f"%{query}%", f"%{query}%", limit or -1)).fetchall()
+            results = [dict(r) for r in rows]
+            for note in results:
+                note["content"] = migrations.decode_body(note.pop("body"))
+    if columns is not None:
+        keep = set(columns) | {"id", "snippet"}
+        results = [{k: v for k, v in n.items() if k in keep} for n in results]
+    return results
+
+
+# ── Tags ──────────────────────────────────────────────────────────
+# The comma strings in notes.tags / flashcards.tags are for display; filters
+# query the normalized tags / note_tags / card_tags tables.
+
+def _tag_names(tags):
+    """Comma string or list -> unique stripped names (case-insensitive, first spelling wins)."""
+    if not tags: return []
+    if not isinstance(tags, str): tags = ",".join(tags)
+    seen, names = set(), []
+    for n in (t.strip() for t in tags.split(",")):
+        if n and n.lower() not in seen: seen.add(n.lower()); names.append(n)
+    return names
+
+def _set_tags(conn, link_table, owner_col, owner_id, tags):
+    names = _tag_names(tags)
+    conn.execute(f"DELETE FROM {link_table} WHERE {owner_col}=?", (owner_id,))
+    conn.executemany("INSERT OR IGNORE INTO tags (name) VALUES (?)", [(n,) for n in names])
+    conn.executemany(f"INSERT OR IGNORE INTO {link_table} ({owner_col}, tag_id) SELECT ?, id FROM tags WHERE name=?",
+                     [(owner_id, n) for n in names])
+
+def _tag_ids(conn, names):
+    if not names: return []
+    return [r[0] for r in conn.execute(f"SELECT id FROM tags WHERE name IN ({','.join('?'*len(names))})", names)]
+
+def _card_tag_filter(conn, tags, alias=""):
+    """SQL restricting cards to any of `tags` (own or note's): ("", []) for no filter,
+    (None, None) when no such tag exists."""
+    names = _tag_names(tags)
+    if not names: return "", []
+    ids = _tag_ids(conn, names)
+    if not ids: return None, None
+    m = ",".join("?" * len(ids))
+    return (f"AND ({alias}id IN (SELECT card_id FROM card_tags WHERE tag_id IN ({m}))"
+            f" OR {alias}note_id IN (SELECT note_id FROM note_tags WHERE tag_id IN ({m})))"), ids + ids
+
+def get_notes_by_tags(all_of=None, any_of=None, columns=NOTE_LIST_COLUMNS):
+    """Notes with every tag in `all_of` and any in `any_of` (lists or comma strings; exact,
+    case-insensitive — "tort" doesn't match "torts"), newest-updated first, no bodies."""
+    invalid = set(columns) - set(NOTE_LIST_COLUMNS)
+    if invalid:
+        raise ValueError(f"Invalid note list columns: {', '.join(sorted(invalid))}")
+    cols = ", ".join(dict.fromkeys(("id",) + tuple(columns)))
+    where, params = [], []
+    with get_connection() as conn:
+        all_names, any_names = _tag_names(all_of), _tag_names(any_of)
+        if all_names:
+            ids = _tag_ids(conn, all_names)
+            if len(ids) < len(all_names): return []
+            where.append(f"id IN (SELECT note_id FROM note_tags WHERE tag_id IN ({','.join('?'*len(ids))}) "
+                         "GROUP BY note_id HAVING COUNT(*)=?)")
+            params += ids + [len(ids)]
+        if any_names:
+            ids = _tag_ids(conn, any_names)
+            if not ids: return []
+            where.append(f"id IN (SELECT note_id FROM note_tags WHERE tag_id IN ({','.join('?'*len(ids))}))")
+            params += ids
+        if not where: return list_notes(columns)
+        rows = conn.execute(f"SELECT {cols} FROM notes WHERE {' AND '.join(where)} "
+                            "ORDER BY updated_at DESC, id DESC", params).fetchall()
         return [dict(r) for r in rows]
 
+def get_tag_counts():
+    """[{name, notes, cards}] for every tag in use, by name."""
+    with get_connection() as conn:
+        rows = conn.execute("""SELECT t.name,
+                (SELECT COUNT(*) FROM note_tags WHERE tag_id=t.id) AS notes,
+                (SELECT COUNT(*) FROM card_tags WHERE tag_id=t.id) AS cards
+            FROM tags t ORDER BY t.name""").fetchall()
+    return [dict(r) for r in rows if r["notes"] or r["cards"]]
+
 
 # ── Flashcards ────────────────────────────────────────────────────
 
@@ -175,21 +689,31 @@ def add_flashcard(front, back, note_id=None, tags=""):
         c = conn.execute(
             "INSERT INTO flashcards (note_id,front,back,tags,next_review,created_at) VALUES (?,?,?,?,?,?)",
             (note_id, front, back, tags, today, now))
-        cid = c.lastrowid
-    increment_daily_stat("cards_added")
-    return cid
+        _set_tags(conn, "card_tags", "card_id", c.lastrowid, tags)
+        return c.lastrowid
 
-def get_due_cards(limit=None):
+def add_flashcards_bulk(cards, note_id=None):
+    """Insert dicts with front/back[/tags] in one transaction; returns the count."""
+    now = datetime.now().isoformat()
     today = date.today().isoformat()
+    rows = [(note_id, c["front"], c["back"], c.get("tags", ""), today, now) for c in cards]
+    if not rows: return 0
+    sql = "INSERT INTO flashcards (note_id,front,back,tags,next_review,created_at) VALUES (?,?,?,?,?,?)"
+    with transaction() as conn:
+        if not any(r[3] for r in rows): conn.executemany(sql, rows)
+        else:  # one insert per card, so its tags go to its own lastrowid
+            for r in rows: _set_tags(conn, "card_tags", "card_id", conn.execute(sql, r).lastrowid, r[3])
+    return len(rows)
+
+def get_due_cards(limit=None, tags=None):
+    """Due cards, most overdue first; `tags` keeps cards tagged (or whose note is tagged) with any of them."""
+    today = date.today().toordinal() - EPOCH_ORDINAL
     with get_connection() as conn:
-        if limit:
-            rows = conn.execute(
-                "SELECT * FROM flashcards WHERE next_review<=? ORDER BY next_review ASC LIMIT ?",
-                (today, int(limit))).fetchall()
-        else:
-            rows = conn.execute(
-                "SELECT * FROM flashcards WHERE next_review<=? ORDER BY next_review ASC",
-                (today,)).fetchall()
+        tag_sql, tag_params = _card_tag_filter(conn, tags)
+        if tag_sql is None: return []
+        rows = conn.execute(
+            f"SELECT * FROM flashcards WHERE due_day<=? {tag_sql} ORDER BY due_day ASC LIMIT ?",
+            (today, *tag_params, int(limit or -1))).fetchall()
         return [dict(r) for r in rows]
 
 def get_all_flashcards():
@@ -202,16 +726,50 @@ def get_flashcards_for_note(note_id):
         rows = conn.execute("SELECT * FROM flashcards WHERE note_id=? ORDER BY created_at DESC", (note_id,)).fetchall()
         return [dict(r) for r in rows]
 
-def update_flashcard_srs(card_id, easiness_factor, interval, repetitions, next_review):
+def update_flashcard_srs(card_id, easiness_factor, interval, repetitions, next_review,
+                         stability=None, difficulty=None):
     with get_connection() as conn:
-        conn.execute("UPDATE flashcards SET easiness_factor=?,interval=?,repetitions=?,next_review=? WHERE id=?",
-            (easiness_factor, interval, repetitions, next_review, card_id))
+        conn.execute("UPDATE flashcards SET easiness_factor=?,interval=?,repetitions=?,next_review=?,"
+            "stability=?,difficulty=? WHERE id=?",
+            (easiness_factor, interval, repetitions, next_review, stability, difficulty, card_id))
 
-def log_review(card_id, rating):
+def log_review(card_id, rating, reviewed_at=None):
     with get_connection() as conn:
         conn.execute("INSERT INTO review_log (card_id,rating,reviewed_at) VALUES (?,?,?)",
-            (card_id, rating, datetime.now().isoformat()))
-    increment_daily_stat("cards_reviewed")
+            (card_id, rating, reviewed_at or datetime.now().isoformat()))
+
+def apply_reviews(reviews):
+    """Persist already-scheduled reviews (card state + rating + reviewed_at) in one
+    transaction. Skips reviews already logged or for deleted cards; returns the count."""
+    with transaction() as conn:
+        fresh, seen = [], set()
+        for r in reviews:
+            key = (r["id"], r["reviewed_at"])
+            if key in seen: continue
+            seen.add(key)
+            if (conn.execute("SELECT 1 FROM flashcards WHERE id=?", (r["id"],)).fetchone()
+                    and not conn.execute("SELECT 1 FROM review_log WHERE card_id=? AND reviewed_at=?", key).fetchone()):
+                fresh.append(r)
+        conn.executemany("UPDATE flashcards SET easiness_factor=?,interval=?,repetitions=?,next_review=?,"
+            "stability=?,difficulty=? WHERE id=?",
+            [(r["easiness_factor"], r["interval"], r["repetitions"], r["next_review"],
+              r.get("stability"), r.get("difficulty"), r["id"]) for r in fresh])
+        conn.executemany("INSERT INTO review_log (card_id,rating,reviewed_at) VALUES (?,?,?)",
+            [(r["id"], r["rating"], r["reviewed_at"]) for r in fresh])
+    return len(fresh)
+
+def get_srs_states():
+    """id, easiness_factor, interval, repetitions, due_day of every card, by id."""
+    with get_connection() as conn:
+        return [dict(r) for r in conn.execute(
+            "SELECT id, easiness_factor, interval, repetitions, due_day FROM flashcards ORDER BY id")]
+
+def update_flashcards_srs_bulk(rows):
+    """Save (easiness_factor, interval, repetitions, next_review, id) rows in one transaction,
+    without logging reviews. Returns the number updated."""
+    with transaction() as conn:
+        return conn.executemany("UPDATE flashcards SET easiness_factor=?,interval=?,repetitions=?,next_review=? WHERE id=?",
+            rows).rowcount
 
 def delete_flashcard(card_id):
     with get_connection() as conn:
@@ -225,51 +783,153 @@ def log_pomodoro(session_type, duration_minutes, started_at, finished_at, comple
         conn.execute(
             "INSERT INTO pomodoro_sessions (session_type,duration_minutes,completed,started_at,finished_at) VALUES (?,?,?,?,?)",
             (session_type, duration_minutes, int(completed), started_at, finished_at))
-    if session_type == "work" and completed:
-        increment_daily_stat("pomodoro_sessions")
-        increment_daily_stat("study_minutes", duration_minutes)
 
 
 # ── Daily Stats ───────────────────────────────────────────────────
+# Log-derived counters are kept by triggers (migrations._v5_rollup_triggers);
+# only quiz_questions_answered is bumped from Python.
+
+def _blank_day_stats(day):
+    return {"date": day, "cards_reviewed": 0, "cards_added": 0,
+            "pomodoro_sessions": 0, "study_minutes": 0, "quiz_questions_answered": 0}
 
 def get_today_stats():
     today = date.today().isoformat()
     with get_connection() as conn:
         row = conn.execute("SELECT * FROM daily_stats WHERE date=?", (today,)).fetchone()
         if row: return dict(row)
-    return {"date": today, "cards_reviewed": 0, "cards_added": 0,
-            "pomodoro_sessions": 0, "study_minutes": 0, "quiz_questions_answered": 0}
+    return _blank_day_stats(today)
 
-def increment_daily_stat(field, amount=1):
+def _increment_daily_stat(conn, field, amount=1):
+    """Bump today's counter on an existing connection (joins its transaction)."""
     # Validate field against whitelist to prevent SQL injection
     if field not in VALID_STAT_FIELDS:
         raise ValueError(f"Invalid stat field: {field}. Must be one of: {', '.join(sorted(VALID_STAT_FIELDS))}")
+    conn.execute(f"""INSERT INTO daily_stats (date, {field}) VALUES (?, ?)
+        ON CONFLICT(date) DO UPDATE SET {field} = {field} + ?""", (date.today().isoformat(), amount, amount))
+
+def increment_daily_stat(field, amount=1):
     with get_connection() as conn:
-        today = date.today().isoformat()
-        conn.execute(f"""INSERT INTO daily_stats (date, {field}) VALUES (?, ?)
-            ON CONFLICT(date) DO UPDATE SET {field} = {field} + ?""", (today, amount, amount))
+        _increment_daily_stat(conn, field, amount)
 
 def get_stats_range(days=7):
     with get_connection() as conn:
         rows = conn.execute("SELECT * FROM daily_stats ORDER BY date DESC LIMIT ?", (days,)).fetchall()
         return [dict(r) for r in rows]
 
+def _scan_streaks(conn):
+    """Walk every review day -> (run_end, run_length, longest)."""
+    run_end, run_length, longest = None, 0, 0
+    for row in conn.execute("SELECT date FROM daily_stats WHERE cards_reviewed>0 ORDER BY date"):
+        d = date.fromisoformat(row["date"])
+        run_length = run_length + 1 if run_end is not None and d == run_end + timedelta(days=1) else 1
+        run_end = d; longest = max(longest, run_length)
+    return (run_end.isoformat() if run_end else None), run_length, longest
+
+def _streaks(conn):
+    """(current, longest, stale) from the trigger-maintained streak_cache row. A stale
+    cache is recomputed without writing; callers then _repair_streak_cache() outside the read."""
+    row = conn.execute("SELECT run_end, run_length, longest, stale FROM streak_cache WHERE id=1").fetchone()
+    stale = row is None or bool(row["stale"])
+    run_end, run_length, longest = _scan_streaks(conn) if stale else (row["run_end"], row["run_length"], row["longest"])
+    return (run_length if run_end == date.today().isoformat() else 0), longest, stale
+
+def _repair_streak_cache():
+    with transaction() as conn:
+        conn.execute("INSERT OR REPLACE INTO streak_cache (id,run_end,run_length,longest,stale) VALUES (1,?,?,?,0)",
+                     _scan_streaks(conn))
+
 def get_streak():
     with get_connection() as conn:
-        rows = conn.execute("SELECT date FROM daily_stats WHERE cards_reviewed>0 ORDER BY date DESC").fetchall()
-    if not rows: return 0
-    streak = 0; expected = date.today()
-    for row in rows:
-        d = date.fromisoformat(row["date"])
-        if d == expected: streak += 1; expected = date.fromordinal(expected.toordinal()-1)
-        elif d < expected: break
-    return streak
+        current, _, stale = _streaks(conn)
+    if stale: _repair_streak_cache()
+    return current
+
+def rebuild_rollups():
+    """Recompute daily_stats' log-derived counters and the streak cache from review_log
+    (+ archived rollups, via review_days), flashcards and pomodoro_sessions (quiz_questions_answered is kept). `main.py --rebuild-stats`."""
+    with transaction() as conn:
+        conn.execute("UPDATE daily_stats SET cards_reviewed=0, cards_added=0, pomodoro_sessions=0, study_minutes=0")
+        conn.execute("""INSERT INTO daily_stats (date, cards_reviewed)
+            SELECT date(review_day*86400,'unixepoch'), SUM(reviews) FROM review_days GROUP BY review_day
+            ON CONFLICT(date) DO UPDATE SET cards_reviewed=excluded.cards_reviewed""")
+        conn.execute("""INSERT INTO daily_stats (date, cards_added)
+            SELECT substr(created_at,1,10), COUNT(*) FROM flashcards GROUP BY 1
+            ON CONFLICT(date) DO UPDATE SET cards_added=excluded.cards_added""")
+        conn.execute("""INSERT INTO daily_stats (date, pomodoro_sessions, study_minutes)
+            SELECT substr(finished_at,1,10), COUNT(*), SUM(duration_minutes) FROM pomodoro_sessions
+            WHERE session_type='work' AND completed GROUP BY 1
+            ON CONFLICT(date) DO UPDATE SET pomodoro_sessions=excluded.pomodoro_sessions,
+                study_minutes=excluded.study_minutes""")
+        conn.execute("""DELETE FROM daily_stats WHERE cards_reviewed=0 AND cards_added=0
+            AND pomodoro_sessions=0 AND study_minutes=0 AND quiz_questions_answered=0""")
+        days = conn.execute("SELECT COUNT(*) FROM daily_stats").fetchone()[0]
+        _repair_streak_cache()
+        current, longest, _ = _streaks(conn)
+    return {"days": days, "current_streak": current, "longest_streak": longest}
 
 def get_total_cards():
     with get_connection() as conn:
         row = conn.execute("SELECT COUNT(*) as cnt FROM flashcards").fetchone()
         return row["cnt"]
 
+def _forecast_counts(conn, today_n, days):
+    """(overdue, [due on each of the `days` days from today]) via the due_day index."""
+    overdue = conn.execute("SELECT COUNT(*) FROM flashcards WHERE due_day < ?", (today_n,)).fetchone()[0]
+    counts = [0] * days
+    for day, count in conn.execute("""SELECT due_day, COUNT(*) FROM flashcards
+            WHERE due_day BETWEEN ? AND ? GROUP BY due_day""", (today_n, today_n + days - 1)):
+        counts[day - today_n] = count
+    return overdue, counts
+
+
+def get_review_forecast(days=30):
+    """Cards due over the next `days` days (7 / 30 / 365...), one GROUP BY on the due_day index.
+    Returns {overdue, days: [{date, due, cumulative}], total}; cumulative includes overdue cards."""
+    if days < 1:
+        raise ValueError(f"Forecast horizon must be at least 1 day, got {days}")
+    today = date.today()
+    with get_connection() as conn:
+        if not conn.in_transaction: conn.execute("BEGIN")  # one snapshot
+        overdue, counts = _forecast_counts(conn, today.toordinal() - EPOCH_ORDINAL, days)
+    running, per_day = overdue, []
+    for offset, count in enumerate(counts):
+        running += count
+        per_day.append({"date": (today + timedelta(days=offset)).isoformat(), "due": count, "cumulative": running})
+    return {"overdue": overdue, "days": per_day, "total": running}
+
+
+def get_due_counts(first_day):
+    """{due_day: cards due} from epoch day `first_day` on, via the due_day index (the load balancer's histogram)."""
+    with get_connection() as conn:
+        return {day: count for day, count in conn.execute(
+            "SELECT due_day, COUNT(*) FROM flashcards WHERE due_day >= ? GROUP BY due_day", (first_day,))}
+
+
+def get_dashboard_snapshot(forecast_days=7):
+    """All dashboard numbers from one read transaction, counted in SQL.
+    Keys: today, streak, longest_streak, due, total_cards, forecast {date: count} (overdue folded
+    into today, like forecast_reviews), week {cards_reviewed, study_minutes}."""
+    today = date.today(); today_s = today.isoformat(); today_n = today.toordinal() - EPOCH_ORDINAL
+    days = [(today + timedelta(days=i)).isoformat() for i in range(forecast_days)]
+    with get_connection() as conn:
+        if not conn.in_transaction: conn.execute("BEGIN")  # one snapshot for every query
+        row = conn.execute("SELECT * FROM daily_stats WHERE date=?", (today_s,)).fetchone()
+        total = conn.execute("SELECT COUNT(*) FROM flashcards").fetchone()[0]
+        overdue, counts = _forecast_counts(conn, today_n, max(forecast_days, 1))
+        due = overdue + counts[0]
+        forecast = dict(zip(days, counts))
+        if days: forecast[today_s] = due
+        week = conn.execute("""SELECT COALESCE(SUM(cards_reviewed),0), COALESCE(SUM(study_minutes),0)
+            FROM daily_stats WHERE date BETWEEN ? AND ?""",
+            ((today - timedelta(days=6)).isoformat(), today_s)).fetchone()
+        streak, longest, stale = _streaks(conn)
+    if stale: _repair_streak_cache()
+    return {"today": dict(row) if row else _blank_day_stats(today_s), "streak": streak,
+            "longest_streak": longest, "due": due,
+            "total_cards": total, "forecast": forecast,
+            "week": {"cards_reviewed": week[0], "study_minutes": week[1]}}
+
 
 # ── Hypotheticals ─────────────────────────────────────────────────
 
@@ -279,27 +939,27 @@ def add_hypothetical(title, scenario, note_id=None):
         c = conn.execute(
             "INSERT INTO hypotheticals (note_id,title,scenario,created_at) VALUES (?,?,?,?)",
             (note_id, title, scenario, now))
+        _put_body(conn, "hypotheticals", c.lastrowid, "")
         return c.lastrowid
 
 def get_all_hypotheticals():
+    """Without feedback (see get_hypothetical())."""
     with get_connection() as conn:
         rows = conn.execute("SELECT * FROM hypotheticals ORDER BY created_at DESC").fetchall()
-        return [dict(r) for r in rows]
+        return _without_body("hypotheticals", rows)
 
 def get_hypothetical(hyp_id):
     with get_connection() as conn:
-        row = conn.execute("SELECT * FROM hypotheticals WHERE id=?", (hyp_id,)).fetchone()
-        return dict(row) if row else None
+        return _get_with_body(conn, "hypotheticals", hyp_id)
 
 def update_hypothetical(hyp_id, response=None, grade=None, feedback=None):
     with get_connection() as conn:
-        hyp = conn.execute("SELECT * FROM hypotheticals WHERE id=?", (hyp_id,)).fetchone()
+        hyp = conn.execute("SELECT response, grade FROM hypotheticals WHERE id=?", (hyp_id,)).fetchone()
         if not hyp: return
-        hyp = dict(hyp)
-        conn.execute("UPDATE hypotheticals SET response=?, grade=?, feedback=? WHERE id=?",
+        conn.execute("UPDATE hypotheticals SET response=?, grade=? WHERE id=?",
             (response if response is not None else hyp["response"],
-             grade if grade is not None else hyp["grade"],
-             feedback if feedback is not None else hyp["feedback"], hyp_id))
+             grade if grade is not None else hyp["grade"], hyp_id))
+        if feedback is not None: _put_body(conn, "hypotheticals", hyp_id, feedback)
 
 def delete_hypothetical(hyp_id):
     with get_connection() as conn:
@@ -314,28 +974,30 @@ def add_essay(title, prompt, note_id=None, rubric_id=None):
         c = conn.execute(
             "INSERT INTO essays (note_id,title,prompt,rubric_id,created_at,updated_at) VALUES (?,?,?,?,?,?)",
             (note_id, title, prompt, rubric_id, now, now))
+        _put_body(conn, "essays", c.lastrowid, "")
         return c.lastrowid
 
 def get_all_essays():
+    """Without the essay text (see get_essay()); `has_content` flags written ones."""
     with get_connection() as conn:
-        rows = conn.execute("SELECT * FROM essays ORDER BY updated_at DESC").fetchall()
-        return [dict(r) for r in rows]
+        rows = conn.execute(
+            "SELECT e.*, IFNULL(length(b.content) > 0, 0) AS has_content FROM essays e "
+            "LEFT JOIN essay_bodies b ON b.essay_id=e.id ORDER BY e.updated_at DESC").fetchall()
+        return _without_body("essays", rows)
 
 def get_essay(essay_id):
     with get_connection() as conn:
-        row = conn.execute("SELECT * FROM essays WHERE id=?", (essay_id,)).fetchone()
-        return dict(row) if row else None
+        return _get_with_body(conn, "essays", essay_id)
 
 def update_essay(essay_id, content=None, grade=None, feedback=None):
     with get_connection() as conn:
-        essay = conn.execute("SELECT * FROM essays WHERE id=?", (essay_id,)).fetchone()
+        essay = conn.execute("SELECT grade, feedback FROM essays WHERE id=?", (essay_id,)).fetchone()
         if not essay: return
-        essay = dict(essay)
-        conn.execute("UPDATE essays SET content=?, grade=?, feedback=?, updated_at=? WHERE id=?",
-            (content if content is not None else essay["content"],
-             grade if grade is not None else essay["grade"],
+        conn.execute("UPDATE essays SET grade=?, feedback=?, updated_at=? WHERE id=?",
+            (grade if grade is not None else essay["grade"],
              feedback if feedback is not None else essay["feedback"],
              datetime.now().isoformat(), essay_id))
+        if content is not None: _put_body(conn, "essays", essay_id, content)
 
 def delete_essay(essay_id):
     with get_connection() as conn:
@@ -348,19 +1010,29 @@ def add_rubric(name, content, source_file=""):
     now = datetime.now().isoformat()
     with get_connection() as conn:
         c = conn.execute(
-            "INSERT INTO rubrics (name,content,source_file,created_at) VALUES (?,?,?,?)",
-            (name, content, source_file, now))
+            "INSERT INTO rubrics (name,content,source_file,created_at) VALUES (?,'',?,?)",
+            (name, source_file, now))
+        _put_body(conn, "rubrics", c.lastrowid, content)
         return c.lastrowid
 
 def get_all_rubrics():
+    """Without the rubric text (see get_rubric())."""
     with get_connection() as conn:
         rows = conn.execute("SELECT * FROM rubrics ORDER BY created_at DESC").fetchall()
-        return [dict(r) for r in rows]
+        return _without_body("rubrics", rows)
 
 def get_rubric(rubric_id):
     with get_connection() as conn:
-        row = conn.execute("SELECT * FROM rubrics WHERE id=?", (rubric_id,)).fetchone()
-        return dict(row) if row else None
+        return _get_with_body(conn, "rubrics", rubric_id)
+
+def update_rubric(rubric_id, name=None, content=None, source_file=None):
+    with get_connection() as conn:
+        rubric = conn.execute("SELECT name, source_file FROM rubrics WHERE id=?", (rubric_id,)).fetchone()
+        if not rubric: return
+        conn.execute("UPDATE rubrics SET name=?, source_file=? WHERE id=?",
+            (name if name is not None else rubric["name"],
+             source_file if source_file is not None else rubric["source_file"], rubric_id))
+        if content is not None: _put_body(conn, "rubrics", rubric_id, content)
 
 def delete_rubric(rubric_id):
     with get_connection() as conn:
@@ -377,6 +1049,18 @@ def add_participation_question(question, category="interesting", note_id=None, a
             (note_id, question, category, answer, notes, now))
         return c.lastrowid
 
+def add_participation_questions_bulk(questions, note_id=None):
+    """Insert dicts with question[/category/answer/notes] in one transaction; returns the count."""
+    now = datetime.now().isoformat()
+    rows = [(note_id, q["question"], q.get("category", "interesting"),
+             q.get("answer", ""), q.get("notes", ""), now) for q in questions]
+    if rows:
+        with get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO participation_questions (note_id,question,category,answer,notes,created_at) VALUES (?,?,?,?,?,?)",
+                rows)
+    return len(rows)
+
 def get_all_participation_questions():
     with get_connection() as conn:
         rows = conn.execute("SELECT * FROM participation_questions ORDER BY created_at DESC").fetchall()
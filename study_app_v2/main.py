@@ -4,10 +4,21 @@ main.py — Entry point for StudyForge.
 Works both as:
   python main.py       (development / bat launcher)
   StudyForge.exe       (frozen PyInstaller build)
+
+  python main.py --rebuild-stats   recompute daily stats and streaks from
+                                   the review/pomodoro logs, then exit
+  python main.py --backup          take a database snapshot now, then exit
+  python main.py --restore FILE    put a snapshot back (the current data is
+                                   snapshotted first), then exit
+  python main.py --instrument      time every database call and statement;
+                                   the summary goes to data/db_profile.txt on exit
+  python main.py --simulate [DAYS] project the daily review load (365 days,
+                                   1000 runs; --new-cards N, --runs N)
 """
 
 import os
 import sys
+import zipfile
 
 # ── Path setup ────────────────────────────────────────────────────
 # Must happen before any local imports so modules resolve correctly.
@@ -18,12 +29,26 @@ else:
     PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
     sys.path.insert(0, PROJECT_DIR)
 
-from database import init_db
+from database import init_db, close_all_connections, rebuild_rollups, set_performance_profile
+import srs_engine
+import review_writer
+import maintenance
+import backup
+import instrumentation
+import simulator
 from config_manager import load_config, is_first_run
 from claude_client import ClaudeStudyClient, detect_provider_from_key
 from ui.app import StudyForgeApp
 
 
+def _arg(flag: str, default=None, kind=int):
+    """Value after `flag` as `kind` (int: digits only; else anything but a --flag), or `default`."""
+    i = sys.argv.index(flag) + 1 if flag in sys.argv else len(sys.argv)
+    if i < len(sys.argv) and (sys.argv[i].isdigit() if kind is int else not sys.argv[i].startswith("--")):
+        return kind(sys.argv[i])
+    return default
+
+
 def try_connect_claude(config: dict):
     """Attempt to connect to configured AI API. Returns client or None."""
     key = config.get("claude_api_key", "")
@@ -50,8 +75,58 @@ def main():
     print("  🎓 StudyForge — All-in-One Study Companion")
     print("=" * 50)
 
-    init_db()
     config = load_config()
+    try:
+        set_performance_profile(config.get("performance_profile", "balanced"))
+    except ValueError as e:
+        print(f"[StudyForge] {e} — using 'balanced'")
+    if "--restore" in sys.argv:  # replaces the files, so before init_db() opens them
+        snapshot = _arg("--restore", kind=str)
+        if snapshot is None:
+            print("[StudyForge] Can't restore: give the snapshot file after --restore"); return
+        try:
+            undo = backup.restore_snapshot(snapshot)
+        except (OSError, ValueError, zipfile.BadZipFile) as e:
+            print(f"[StudyForge] Can't restore: {e}"); return
+        print(f"[StudyForge] Restored {snapshot} (previous data saved as {undo})"); return
+    if config.get("db_instrumentation") or "--instrument" in sys.argv:
+        instrumentation.start(slow_ms=config.get("slow_query_ms", 100))
+    init_db()
+    if "--backup" in sys.argv:
+        r = backup.create_snapshot(keep=config.get("backup_keep", 7))
+        print(f"[StudyForge] Snapshot {r['path']}: {r['bytes'] / 1e6:.1f} MB at {r['mb_per_s']:.1f} MB/s")
+        close_all_connections(); return
+    if "--rebuild-stats" in sys.argv:
+        s = rebuild_rollups()
+        print(f"[StudyForge] Rebuilt stats for {s['days']} days  ·  "
+              f"streak {s['current_streak']} (longest {s['longest_streak']})")
+        close_all_connections(); return
+    try:
+        srs_engine.set_scheduler(config.get("scheduler", "sm2"), weights=config.get("fsrs_weights"),
+                                 desired_retention=config.get("desired_retention", 0.9))
+    except ValueError as e:
+        print(f"[StudyForge] {e} — using 'sm2'")
+    srs_engine.set_load_balancing(config.get("load_balancing", True))
+    if "--simulate" in sys.argv:
+        try:
+            print(simulator.format_report(simulator.simulate(
+                days=_arg("--simulate", 365), runs=_arg("--runs", 1000),
+                new_per_day=_arg("--new-cards", config.get("daily_new_cards_limit", 20)))))
+        except (RuntimeError, ValueError) as e:
+            print(f"[StudyForge] Can't simulate: {e}")
+        close_all_connections(); return
+    if config.get("write_behind_reviews"):
+        review_writer.start(flush_every=config.get("write_behind_flush_every", 20),
+                            flush_interval_ms=config.get("write_behind_flush_ms", 1000))
+    else:
+        review_writer.replay_journal(review_writer.default_journal_path())
+    if config.get("idle_maintenance", True):
+        maintenance.start(idle_seconds=config.get("maintenance_idle_seconds", 120),
+                          interval_minutes=config.get("maintenance_interval_minutes", 60),
+                          archive_after_days=config.get("review_archive_days", 180),
+                          change_keep_days=config.get("change_journal_days", 90))
+    if config.get("backups_enabled", True):
+        backup.start(interval_hours=config.get("backup_interval_hours", 24), keep=config.get("backup_keep", 7))
 
     show_wizard = is_first_run()
 
@@ -62,7 +137,13 @@ def main():
 
     print("[StudyForge] Launching...")
     app = StudyForgeApp(config, claude_client, show_wizard=show_wizard)
-    app.mainloop()
+    try:
+        app.mainloop()
+    finally:
+        backup.stop()
+        maintenance.stop()
+        review_writer.stop()
+        close_all_connections()
 
 
 if __name__ == "__main__":
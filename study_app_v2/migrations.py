@@ -0,0 +1,733 @@
+"""
+migrations.py — Versioned schema migrations for StudyForge.
+
+The schema version lives in SQLite's `PRAGMA user_version`. Each function in
+MIGRATIONS upgrades the database by exactly one version, and `migrate()`
+applies every step the file has not seen yet, one transaction per step, so
+existing user databases are upgraded in place on startup.
+
+The review archive (a second file attached as `archive`, see
+database.archive_reviews()) is versioned the same way by ARCHIVE_MIGRATIONS
+and `migrate_archive()`, in its own `user_version`.
+
+This file is kept identical in study_app/ and study_app_v2/ so both apps
+read and write the same schema. Append new steps; never edit old ones.
+"""
+
+import zlib
+
+import dedupe
+
+
+def _v1_base_schema(conn):
+    """Original tables. IF NOT EXISTS so pre-versioning databases adopt v1."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS notes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            content TEXT NOT NULL,
+            tags TEXT DEFAULT '',
+            source_file TEXT DEFAULT '',
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS flashcards (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            note_id INTEGER,
+            front TEXT NOT NULL,
+            back TEXT NOT NULL,
+            tags TEXT DEFAULT '',
+            easiness_factor REAL DEFAULT 2.5,
+            interval INTEGER DEFAULT 0,
+            repetitions INTEGER DEFAULT 0,
+            next_review TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (note_id) REFERENCES notes(id) ON DELETE SET NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS review_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            card_id INTEGER NOT NULL,
+            rating INTEGER NOT NULL,
+            reviewed_at TEXT NOT NULL,
+            FOREIGN KEY (card_id) REFERENCES flashcards(id) ON DELETE CASCADE
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS pomodoro_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_type TEXT NOT NULL,
+            duration_minutes INTEGER NOT NULL,
+            completed INTEGER DEFAULT 1,
+            started_at TEXT NOT NULL,
+            finished_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_stats (
+            date TEXT PRIMARY KEY,
+            cards_reviewed INTEGER DEFAULT 0,
+            cards_added INTEGER DEFAULT 0,
+            pomodoro_sessions INTEGER DEFAULT 0,
+            study_minutes INTEGER DEFAULT 0,
+            quiz_questions_answered INTEGER DEFAULT 0
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS hypotheticals (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            note_id INTEGER, title TEXT NOT NULL, scenario TEXT NOT NULL,
+            response TEXT DEFAULT '', grade TEXT DEFAULT '',
+            feedback TEXT DEFAULT '', created_at TEXT NOT NULL,
+            FOREIGN KEY (note_id) REFERENCES notes(id) ON DELETE SET NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS essays (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            note_id INTEGER, title TEXT NOT NULL, prompt TEXT NOT NULL,
+            content TEXT DEFAULT '', rubric_id INTEGER,
+            grade TEXT DEFAULT '', feedback TEXT DEFAULT '',
+            created_at TEXT NOT NULL, updated_at TEXT NOT NULL,
+            FOREIGN KEY (note_id) REFERENCES notes(id) ON DELETE SET NULL,
+            FOREIGN KEY (rubric_id) REFERENCES rubrics(id) ON DELETE SET NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS rubrics (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL, content TEXT NOT NULL,
+            source_file TEXT DEFAULT '', created_at TEXT NOT NULL
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS participation_questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            note_id INTEGER, question TEXT NOT NULL,
+            category TEXT NOT NULL DEFAULT 'interesting',
+            answer TEXT DEFAULT '', notes TEXT DEFAULT '',
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (note_id) REFERENCES notes(id) ON DELETE SET NULL
+        )
+    """)
+
+
+def _v2_hot_path_indexes(conn):
+    """Secondary indexes for due-card lookups, FK cascades and sorted listings."""
+    statements = [
+        # Scheduler: WHERE next_review <= ? ORDER BY next_review
+        "CREATE INDEX IF NOT EXISTS idx_flashcards_next_review ON flashcards(next_review)",
+        # get_flashcards_for_note: WHERE note_id = ? ORDER BY created_at DESC
+        "CREATE INDEX IF NOT EXISTS idx_flashcards_note_created ON flashcards(note_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_flashcards_created ON flashcards(created_at)",
+        # ON DELETE CASCADE from flashcards, per-card history
+        "CREATE INDEX IF NOT EXISTS idx_review_log_card ON review_log(card_id)",
+        "CREATE INDEX IF NOT EXISTS idx_review_log_reviewed_at ON review_log(reviewed_at)",
+        # Sorted listings
+        "CREATE INDEX IF NOT EXISTS idx_notes_updated ON notes(updated_at)",
+        "CREATE INDEX IF NOT EXISTS idx_essays_updated ON essays(updated_at)",
+        "CREATE INDEX IF NOT EXISTS idx_hypotheticals_created ON hypotheticals(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_rubrics_created ON rubrics(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_participation_created ON participation_questions(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_participation_category "
+        "ON participation_questions(category, created_at)",
+        # ON DELETE SET NULL children of notes / rubrics
+        "CREATE INDEX IF NOT EXISTS idx_hypotheticals_note ON hypotheticals(note_id)",
+        "CREATE INDEX IF NOT EXISTS idx_essays_note ON essays(note_id)",
+        "CREATE INDEX IF NOT EXISTS idx_essays_rubric ON essays(rubric_id)",
+        "CREATE INDEX IF NOT EXISTS idx_participation_note ON participation_questions(note_id)",
+    ]
+    for sql in statements:
+        conn.execute(sql)
+    conn.execute("ANALYZE")
+
+
+def fts5_available(conn) -> bool:
+    """True if this SQLite build was compiled with the FTS5 extension."""
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp._fts5_probe USING fts5(x)")
+        conn.execute("DROP TABLE temp._fts5_probe")
+        return True
+    except Exception:
+        return False
+
+
+def _v3_notes_fts(conn):
+    """
+    External-content FTS5 index over notes, kept in sync by triggers.
+    Skipped on SQLite builds without FTS5; search_notes() then uses LIKE.
+    """
+    if not fts5_available(conn):
+        return
+    conn.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts USING fts5(
+            title, content, tags,
+            content='notes', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS notes_fts_ai AFTER INSERT ON notes BEGIN
+            INSERT INTO notes_fts(rowid, title, content, tags)
+            VALUES (new.id, new.title, new.content, new.tags);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS notes_fts_ad AFTER DELETE ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, title, content, tags)
+            VALUES ('delete', old.id, old.title, old.content, old.tags);
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS notes_fts_au AFTER UPDATE OF title, content, tags ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, title, content, tags)
+            VALUES ('delete', old.id, old.title, old.content, old.tags);
+            INSERT INTO notes_fts(rowid, title, content, tags)
+            VALUES (new.id, new.title, new.content, new.tags);
+        END
+    """)
+    conn.execute("INSERT INTO notes_fts(notes_fts) VALUES ('rebuild')")
+
+
+def _v4_notes_listing_index(conn):
+    """
+    Covering index for note listings, in (updated_at, id) keyset order.
+    Listing columns sit after the large `content` column in each row, so
+    reading them from the table would walk every body's overflow pages.
+    """
+    conn.execute("""
+        CREATE INDEX IF NOT EXISTS idx_notes_listing
+        ON notes(updated_at, id, title, tags, created_at, source_file)
+    """)
+    conn.execute("DROP INDEX IF EXISTS idx_notes_updated")
+
+
+def _v5_rollup_triggers(conn):
+    """
+    Keep daily_stats and the streak in step with the raw logs in SQLite.
+
+    Inserts into review_log, flashcards and pomodoro_sessions bump the
+    matching daily_stats counters. Rows later removed from the logs (deleted
+    cards, archived reviews) do not decrement them: daily_stats is the
+    durable history.
+
+    streak_cache holds the latest run of review days (its last day and
+    length) and the longest run. A new review day extends or restarts the
+    run; anything the trigger can't update incrementally (a back-dated day,
+    a day losing its reviews) sets `stale`, and database.py recomputes the
+    row from daily_stats on next read.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS streak_cache (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            run_end TEXT,
+            run_length INTEGER NOT NULL DEFAULT 0,
+            longest INTEGER NOT NULL DEFAULT 0,
+            stale INTEGER NOT NULL DEFAULT 1
+        )
+    """)
+    conn.execute("INSERT OR IGNORE INTO streak_cache (id) VALUES (1)")
+
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS review_log_stats_ai AFTER INSERT ON review_log
+        BEGIN
+            INSERT INTO daily_stats (date, cards_reviewed) VALUES (substr(NEW.reviewed_at, 1, 10), 1)
+            ON CONFLICT(date) DO UPDATE SET cards_reviewed = cards_reviewed + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS flashcards_stats_ai AFTER INSERT ON flashcards
+        BEGIN
+            INSERT INTO daily_stats (date, cards_added) VALUES (substr(NEW.created_at, 1, 10), 1)
+            ON CONFLICT(date) DO UPDATE SET cards_added = cards_added + 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS pomodoro_stats_ai AFTER INSERT ON pomodoro_sessions
+        WHEN NEW.session_type = 'work' AND NEW.completed
+        BEGIN
+            INSERT INTO daily_stats (date, pomodoro_sessions, study_minutes)
+            VALUES (substr(NEW.finished_at, 1, 10), 1, NEW.duration_minutes)
+            ON CONFLICT(date) DO UPDATE SET
+                pomodoro_sessions = pomodoro_sessions + 1,
+                study_minutes = study_minutes + excluded.study_minutes;
+        END
+    """)
+
+    # A day gaining its first review extends the current run (the day after
+    # run_end), starts a new one (a later day), or invalidates the cache
+    # (an earlier day). SET expressions all see the row's old values.
+    advance = """
+        UPDATE streak_cache SET stale = 1
+        WHERE id = 1 AND run_end IS NOT NULL AND NEW.date < run_end;
+        UPDATE streak_cache SET
+            run_length = CASE WHEN run_end = date(NEW.date, '-1 day') THEN run_length + 1 ELSE 1 END,
+            longest = MAX(longest, CASE WHEN run_end = date(NEW.date, '-1 day') THEN run_length + 1 ELSE 1 END),
+            run_end = NEW.date
+        WHERE id = 1 AND stale = 0 AND (run_end IS NULL OR NEW.date > run_end);
+    """
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS daily_stats_streak_ai AFTER INSERT ON daily_stats
+        WHEN NEW.cards_reviewed > 0
+        BEGIN {advance} END
+    """)
+    conn.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS daily_stats_streak_au AFTER UPDATE OF cards_reviewed ON daily_stats
+        WHEN NEW.cards_reviewed > 0 AND OLD.cards_reviewed <= 0
+        BEGIN {advance} END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS daily_stats_streak_lost AFTER UPDATE OF cards_reviewed ON daily_stats
+        WHEN NEW.cards_reviewed <= 0 AND OLD.cards_reviewed > 0
+        BEGIN
+            UPDATE streak_cache SET stale = 1 WHERE id = 1;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS daily_stats_streak_ad AFTER DELETE ON daily_stats
+        WHEN OLD.cards_reviewed > 0
+        BEGIN
+            UPDATE streak_cache SET stale = 1 WHERE id = 1;
+        END
+    """)
+
+
+
+def _v6_normalized_tags(conn):
+    """
+    Normalized tags: one `tags` row per name (case-insensitive) and link
+    tables for notes and flashcards, indexed both ways. The comma strings in
+    notes.tags / flashcards.tags stay as the display copy; database.py keeps
+    the links in step when they are written. Existing strings are split here.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE COLLATE NOCASE
+        )
+    """)
+    for link, owner, parent in (("note_tags", "note_id", "notes"), ("card_tags", "card_id", "flashcards")):
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {link} (
+                {owner} INTEGER NOT NULL REFERENCES {parent}(id) ON DELETE CASCADE,
+                tag_id INTEGER NOT NULL REFERENCES tags(id) ON DELETE CASCADE,
+                PRIMARY KEY ({owner}, tag_id)
+            ) WITHOUT ROWID
+        """)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{link}_tag ON {link}(tag_id, {owner})")
+
+        rows = conn.execute(f"SELECT id, tags FROM {parent} WHERE tags != ''").fetchall()
+        for row_id, tags in rows:
+            names = [t.strip() for t in tags.split(",") if t.strip()]
+            conn.executemany("INSERT OR IGNORE INTO tags (name) VALUES (?)", [(n,) for n in names])
+            conn.executemany(
+                f"INSERT OR IGNORE INTO {link} ({owner}, tag_id) SELECT ?, id FROM tags WHERE name = ?",
+                [(row_id, n) for n in names])
+
+
+def _v7_integer_day_columns(conn):
+    """
+    Integer day/second columns for scheduling and time-range queries.
+
+    They are VIRTUAL generated columns derived from the ISO strings, so
+    every writer (including raw SQL) keeps them right and existing rows
+    need no backfill; only their indexes are stored. Days count from
+    1970-01-01 and seconds are wall-clock (the strings carry no zone).
+
+        flashcards.due_day      next_review as an epoch day
+        review_log.reviewed_ts  reviewed_at as epoch seconds
+        review_log.review_day   reviewed_ts // 86400
+
+    The string indexes they replace are dropped.
+    """
+    conn.execute("""
+        ALTER TABLE flashcards ADD COLUMN due_day INTEGER
+        GENERATED ALWAYS AS (CAST(julianday(substr(next_review, 1, 10)) - 2440587.5 AS INTEGER)) VIRTUAL
+    """)
+    conn.execute("""
+        ALTER TABLE review_log ADD COLUMN reviewed_ts INTEGER
+        GENERATED ALWAYS AS (CAST(strftime('%s', reviewed_at) AS INTEGER)) VIRTUAL
+    """)
+    conn.execute("""
+        ALTER TABLE review_log ADD COLUMN review_day INTEGER
+        GENERATED ALWAYS AS (reviewed_ts / 86400) VIRTUAL
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_flashcards_due_day ON flashcards(due_day)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_review_log_day ON review_log(review_day)")
+    conn.execute("DROP INDEX IF EXISTS idx_flashcards_next_review")
+    conn.execute("DROP INDEX IF EXISTS idx_review_log_reviewed_at")
+
+
+def _v8_review_rollup(conn):
+    """
+    Per-card, per-day aggregates of reviews archived out of review_log.
+
+    database.archive_reviews() moves old review_log rows to the archive file
+    and folds them into this table in the same transaction as the delete,
+    so the TEMP view `review_days` (hot rows grouped, plus these) counts
+    every review exactly once. It stays in the main file so deleting a card
+    cascades to it.
+
+    No foreign key or trigger can reach into another file, so deleted cards
+    are queued in archive_purge instead; review_history hides their
+    archived rows until archive_reviews() deletes them.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS review_rollup (
+            card_id INTEGER NOT NULL REFERENCES flashcards(id) ON DELETE CASCADE,
+            review_day INTEGER NOT NULL,
+            reviews INTEGER NOT NULL,
+            lapses INTEGER NOT NULL,
+            rating_sum INTEGER NOT NULL,
+            PRIMARY KEY (card_id, review_day)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_review_rollup_day ON review_rollup(review_day)")
+    conn.execute("CREATE TABLE IF NOT EXISTS archive_purge (card_id INTEGER PRIMARY KEY)")
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS flashcards_archive_purge_ad AFTER DELETE ON flashcards
+        BEGIN
+            INSERT OR IGNORE INTO archive_purge (card_id) VALUES (old.id);
+        END
+    """)
+
+
+# Large bodies live in side tables, one row per owner, so scans of the
+# metadata tables never touch their overflow pages:
+#   owner table -> (side table, owner id column, body column)
+BODY_TABLES = {
+    "notes": ("note_bodies", "note_id", "content"),
+    "essays": ("essay_bodies", "essay_id", "content"),
+    "rubrics": ("rubric_bodies", "rubric_id", "content"),
+    "hypotheticals": ("hypothetical_bodies", "hypothetical_id", "feedback"),
+}
+
+BODY_COMPRESS_MIN = 1024  # UTF-8 bytes; shorter bodies are stored as plain TEXT
+BODY_ZLIB = b"z"          # format tag of a zlib-compressed body BLOB
+
+
+def encode_body(text) -> object:
+    """
+    Storage form of a body: TEXT as-is when short or incompressible,
+    otherwise a BLOB of BODY_ZLIB + zlib-compressed UTF-8.
+    """
+    text = text or ""
+    data = text.encode("utf-8")
+    if len(data) < BODY_COMPRESS_MIN:
+        return text
+    packed = BODY_ZLIB + zlib.compress(data, 6)
+    return packed if len(packed) < len(data) else text
+
+
+def decode_body(value) -> str:
+    """Inverse of encode_body(); NULL (no body row) reads as ''."""
+    if value is None:
+        return ""
+    if isinstance(value, bytes):
+        if value[:1] != BODY_ZLIB:
+            raise ValueError(f"Unknown body format {value[:1]!r}")
+        return zlib.decompress(value[1:]).decode("utf-8")
+    return value
+
+
+def register_functions(conn):
+    """
+    SQL functions the app's own queries use (body_text() decodes a stored
+    body). The schema must not depend on them: since v13 no trigger calls
+    one, so any SQLite client can write to the database.
+    """
+    conn.create_function("body_text", 1, decode_body, deterministic=True)
+
+
+def _v9_body_side_tables(conn):
+    """
+    Move note, essay and rubric bodies and hypothetical feedback into the
+    BODY_TABLES side tables, compressed with encode_body(). The old columns
+    stay, blanked to '', as older app versions still name them.
+
+    notes_fts becomes contentless (content=''), since the bodies it indexed
+    are now compressed; its triggers decode them with the body_text() SQL
+    function (register_functions()).
+    """
+    register_functions(conn)
+    for trigger in ("notes_fts_ai", "notes_fts_ad", "notes_fts_au"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    conn.execute("DROP TABLE IF EXISTS notes_fts")
+
+    for owner, (side, owner_col, field) in BODY_TABLES.items():
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {side} (
+                {owner_col} INTEGER PRIMARY KEY REFERENCES {owner}(id) ON DELETE CASCADE,
+                {field} BLOB NOT NULL DEFAULT ''
+            )
+        """)
+        ids = [r[0] for r in conn.execute(f"SELECT id FROM {owner}")]
+        for row_id in ids:
+            body = conn.execute(f"SELECT {field} FROM {owner} WHERE id = ?", (row_id,)).fetchone()[0]
+            conn.execute(f"INSERT OR REPLACE INTO {side} ({owner_col}, {field}) VALUES (?, ?)",
+                         (row_id, encode_body(body)))
+        conn.execute(f"UPDATE {owner} SET {field} = '' WHERE {field} != ''")
+
+    if not fts5_available(conn):
+        return
+    conn.execute("""
+        CREATE VIRTUAL TABLE notes_fts USING fts5(
+            title, content, tags,
+            content='',
+            tokenize='unicode61 remove_diacritics 2',
+            prefix='2 3'
+        )
+    """)
+    # A contentless index can only forget a row given the exact values it
+    # indexed, so every 'delete' re-reads them from notes and note_bodies.
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS note_bodies_fts_ai AFTER INSERT ON note_bodies BEGIN
+            INSERT INTO notes_fts(rowid, title, content, tags)
+            SELECT id, title, body_text(new.content), tags FROM notes WHERE id = new.note_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS note_bodies_fts_au AFTER UPDATE OF content ON note_bodies BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, title, content, tags)
+            SELECT 'delete', id, title, body_text(old.content), tags FROM notes WHERE id = old.note_id;
+            INSERT INTO notes_fts(rowid, title, content, tags)
+            SELECT id, title, body_text(new.content), tags FROM notes WHERE id = new.note_id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS notes_fts_au AFTER UPDATE OF title, tags ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, title, content, tags)
+            SELECT 'delete', old.id, old.title, body_text(content), old.tags
+            FROM note_bodies WHERE note_id = old.id;
+            INSERT INTO notes_fts(rowid, title, content, tags)
+            SELECT new.id, new.title, body_text(content), new.tags
+            FROM note_bodies WHERE note_id = new.id;
+        END
+    """)
+    conn.execute("""
+        CREATE TRIGGER IF NOT EXISTS notes_fts_bd BEFORE DELETE ON notes BEGIN
+            INSERT INTO notes_fts(notes_fts, rowid, title, content, tags)
+            SELECT 'delete', old.id, old.title, body_text(content), old.tags
+            FROM note_bodies WHERE note_id = old.id;
+        END
+    """)
+    conn.execute("""
+        INSERT INTO notes_fts(rowid, title, content, tags)
+        SELECT n.id, n.title, body_text(b.content), n.tags
+        FROM notes n JOIN note_bodies b ON b.note_id = n.id
+    """)
+
+
+# Bodies fingerprinted for duplicate detection on import (see dedupe.py):
+#   owner table -> LSH band table
+DEDUPE_TABLES = {
+    "notes": "note_minhash",
+    "rubrics": "rubric_minhash",
+}
+
+
+def fingerprint(text) -> tuple:
+    """(content_hash, packed minhash or None, band keys) of a body, as stored."""
+    sig = dedupe.signature(text)
+    if sig is None:
+        return dedupe.content_hash(text), None, []
+    return dedupe.content_hash(text), dedupe.pack(sig), dedupe.band_keys(sig)
+
+
+def _v10_body_fingerprints(conn):
+    """
+    content_hash and minhash columns on the note and rubric body tables,
+    and a (band_key, owner) table per owner for the LSH candidate lookup,
+    filled in for the bodies already stored.
+    """
+    for owner, bands in DEDUPE_TABLES.items():
+        side, owner_col, field = BODY_TABLES[owner]
+        conn.execute(f"ALTER TABLE {side} ADD COLUMN content_hash TEXT")
+        conn.execute(f"ALTER TABLE {side} ADD COLUMN minhash BLOB")
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{side}_hash ON {side}(content_hash)")
+        conn.execute(f"""
+            CREATE TABLE IF NOT EXISTS {bands} (
+                band_key INTEGER NOT NULL,
+                {owner_col} INTEGER NOT NULL REFERENCES {owner}(id) ON DELETE CASCADE,
+                PRIMARY KEY (band_key, {owner_col})
+            ) WITHOUT ROWID
+        """)
+        conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{bands}_owner ON {bands}({owner_col})")
+
+        ids = [r[0] for r in conn.execute(f"SELECT {owner_col} FROM {side}")]
+        for row_id in ids:
+            body = conn.execute(f"SELECT {field} FROM {side} WHERE {owner_col} = ?", (row_id,)).fetchone()[0]
+            digest, minhash, keys = fingerprint(decode_body(body))
+            conn.execute(f"UPDATE {side} SET content_hash = ?, minhash = ? WHERE {owner_col} = ?",
+                         (digest, minhash, row_id))
+            conn.executemany(f"INSERT OR IGNORE INTO {bands} (band_key, {owner_col}) VALUES (?, ?)",
+                             [(key, row_id) for key in keys])
+
+
+# Tables whose row changes are journalled in `changes`
+CHANGE_TABLES = ("notes", "flashcards", "review_log", "essays", "hypotheticals", "rubrics",
+                 "participation_questions")
+
+
+def _v11_change_journal(conn):
+    """
+    Append-only change journal for incremental export and sync.
+
+    Triggers add one `changes` row per inserted ('I'), updated ('U') or
+    deleted ('D', the tombstone) row of CHANGE_TABLES. seq is the rowid,
+    i.e. one more than the largest so far; as the newest row is never
+    deleted, seq only grows (AUTOINCREMENT would guarantee the same at the
+    price of a sqlite_sequence write per change, halving review
+    throughput). SQLite has one writer at a time, so seq order is commit
+    order: a reader that remembers the last seq it applied never misses a
+    change. A body rewrite in a BODY_TABLES side table is journalled as an
+    update of its owner.
+
+    review_log deletes are not journalled: reviews are only removed by
+    archive_reviews() (still part of the history) or with their card,
+    whose own tombstone covers them.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS changes (
+            seq INTEGER PRIMARY KEY,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL CHECK (op IN ('I', 'U', 'D')),
+            changed_ts INTEGER NOT NULL DEFAULT (CAST(strftime('%s', 'now') AS INTEGER))
+        )
+    """)
+    for table in CHANGE_TABLES:
+        events = [("ai", "INSERT", "new", "I"), ("au", "UPDATE", "new", "U")]
+        if table != "review_log":
+            events.append(("ad", "DELETE", "old", "D"))
+        for suffix, event, ref, op in events:
+            conn.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_changes_{suffix} AFTER {event} ON {table}
+                BEGIN
+                    INSERT INTO changes (table_name, row_id, op) VALUES ('{table}', {ref}.id, '{op}');
+                END
+            """)
+    for owner, (side, owner_col, field) in BODY_TABLES.items():
+        conn.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS {side}_changes_au AFTER UPDATE OF {field} ON {side}
+            BEGIN
+                INSERT INTO changes (table_name, row_id, op) VALUES ('{owner}', new.{owner_col}, 'U');
+            END
+        """)
+
+
+def _v12_memory_state(conn):
+    """
+    FSRS memory state per card (see fsrs.py): stability in days and
+    difficulty 1-10, as left by the card's last review. Both are NULL
+    until a review under the FSRS scheduler, and set back to NULL by an
+    SM-2 review; srs_engine rebuilds them from review_history when needed.
+    """
+    conn.execute("ALTER TABLE flashcards ADD COLUMN stability REAL")
+    conn.execute("ALTER TABLE flashcards ADD COLUMN difficulty REAL")
+
+
+def _v13_fts_without_app_functions(conn):
+    """
+    Drop the notes_fts triggers of v9. They called body_text(), which only
+    exists on the app's own connections, so any other client (the sqlite3
+    shell, a DB browser, a restored snapshot opened by hand) failed on
+    every note insert, update or delete with "no such function". The
+    index is now kept up to date by database.py, in the same transaction
+    as the note write; the rows already indexed stay valid.
+    """
+    for trigger in ("note_bodies_fts_ai", "note_bodies_fts_au", "notes_fts_au", "notes_fts_bd"):
+        conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+
+def _archive_v1_review_log(conn):
+    """
+    Cold review_log rows, same columns and ids as in the main file. Rows
+    of deleted cards are removed via the main file's archive_purge queue.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archive.review_log (
+            id INTEGER PRIMARY KEY,
+            card_id INTEGER NOT NULL,
+            rating INTEGER NOT NULL,
+            reviewed_at TEXT NOT NULL,
+            reviewed_ts INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', reviewed_at) AS INTEGER)) VIRTUAL,
+            review_day INTEGER GENERATED ALWAYS AS (reviewed_ts / 86400) VIRTUAL
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_review_log_card ON review_log(card_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS archive.idx_review_log_day ON review_log(review_day)")
+
+
+# Index i upgrades the database from version i to version i + 1.
+MIGRATIONS = [
+    _v1_base_schema,
+    _v2_hot_path_indexes,
+    _v3_notes_fts,
+    _v4_notes_listing_index,
+    _v5_rollup_triggers,
+    _v6_normalized_tags,
+    _v7_integer_day_columns,
+    _v8_review_rollup,
+    _v9_body_side_tables,
+    _v10_body_fingerprints,
+    _v11_change_journal,
+    _v12_memory_state,
+    _v13_fts_without_app_functions,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# The same for the attached review archive.
+ARCHIVE_MIGRATIONS = [
+    _archive_v1_review_log,
+]
+
+ARCHIVE_VERSION = len(ARCHIVE_MIGRATIONS)
+
+
+def get_version(conn, schema="main") -> int:
+    """Return the schema version recorded in the given database file."""
+    return conn.execute(f"PRAGMA {schema}.user_version").fetchone()[0]
+
+
+def migrate(conn) -> tuple:
+    """
+    Bring the database up to SCHEMA_VERSION.
+
+    Each step runs in its own transaction together with the user_version
+    bump, so an interrupted upgrade resumes from the last completed step.
+
+    Returns:
+        (old_version, new_version)
+    """
+    return _apply(conn, MIGRATIONS, "main")
+
+
+def migrate_archive(conn) -> tuple:
+    """Bring the attached `archive` database up to ARCHIVE_VERSION, like migrate()."""
+    return _apply(conn, ARCHIVE_MIGRATIONS, "archive")
+
+
+def _apply(conn, steps, schema):
+    start = get_version(conn, schema)
+    if start > len(steps):
+        raise RuntimeError(
+            f"Database schema v{start} is newer than this app supports (v{len(steps)}). "
+            f"Please update StudyForge.")
+
+    conn.commit()  # DDL below must not join a caller's open transaction
+    for version in range(start, len(steps)):
+        try:
+            conn.execute("BEGIN")
+            steps[version](conn)
+            conn.execute(f"PRAGMA {schema}.user_version = {version + 1}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return start, len(steps)
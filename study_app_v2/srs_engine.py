@@ -1,40 +1,268 @@
 """
-srs_engine.py — SM-2 Spaced Repetition Algorithm.
+srs_engine.py — SM-2 Spaced Repetition Algorithm, with FSRS (fsrs.py) behind the same interface,
+and load balancing: due dates fuzzed to the quietest day nearby so batches don't come due together.
 """
 
-from datetime import date, timedelta
-from database import update_flashcard_srs, log_review
+from datetime import date, datetime, timedelta
+from database import (update_flashcard_srs, log_review, transaction, get_srs_states,
+                      update_flashcards_srs_bulk, get_review_history, get_due_counts, EPOCH_ORDINAL)
+import fsrs
+import review_writer
 
+try:  # optional: vectorises schedule_batch() / rescale_batch()
+    import numpy as np
+except ImportError:
+    np = None
 
-def review_card(card: dict, rating: int) -> dict:
+SM2_PARAMS = {"min_easiness": 1.3, "first_interval": 1, "second_interval": 6}
+PASSING_RATING = 3
+# Load balancing moves a due date by up to 1 day + 15% of the interval's 2.5-7 day part,
+# 10% of 7-20 and 5% beyond (Anki's fuzz); intervals under 2.5 days stay put
+FUZZ_RANGES = ((2.5, 7.0, 0.15), (7.0, 20.0, 0.10), (20.0, float("inf"), 0.05))
+
+
+# ── Scheduling core (pure: no database, no clock) ─────────────────
+
+def epoch_day(day) -> int:
+    return day if isinstance(day, int) else day.toordinal() - EPOCH_ORDINAL
+
+
+def _due_day(card):
+    """due_day if read from the database, else from next_review (None if neither)."""
+    due = card.get("due_day")
+    if due is None and card.get("next_review"):
+        due = epoch_day(date.fromisoformat(card["next_review"][:10]))
+    return due
+
+
+def _next_state(ef, interval, reps, rating, params):
+    """One SM-2 step -> (easiness, interval, repetitions, days until due)."""
+    ef = max(params["min_easiness"], ef + (0.1 - (5 - rating) * (0.08 + (5 - rating) * 0.02)))
+    if rating < PASSING_RATING:
+        return ef, 0, 0, 0  # failed: reset, due again today
+    if reps == 0: interval = params["first_interval"]
+    elif reps == 1: interval = params["second_interval"]
+    else: interval = round(interval * ef)
+    return ef, interval, reps + 1, max(interval, 1)
+
+
+def schedule(card: dict, rating: int, today, params=SM2_PARAMS) -> dict:
+    """New easiness_factor, interval, repetitions, next_review, due_day of `card` rated on `today`."""
+    ef, interval, reps, wait = _next_state(card["easiness_factor"], card["interval"], card["repetitions"],
+                                           max(0, min(5, rating)), params)
+    due_day = epoch_day(today) + wait
+    return {"easiness_factor": ef, "interval": interval, "repetitions": reps,
+            "next_review": date.fromordinal(due_day + EPOCH_ORDINAL).isoformat(), "due_day": due_day}
+
+
+def schedule_batch(easiness, intervals, repetitions, ratings, today, params=SM2_PARAMS):
+    """schedule() over equal-length sequences, all reviewed on `today`.
+    Returns (easiness, intervals, repetitions, due_days): NumPy arrays if installed, else lists."""
+    today_n = epoch_day(today)
+    if np is None:
+        out = ([], [], [], [])
+        for ef, interval, reps, rating in zip(easiness, intervals, repetitions, ratings):
+            ef, interval, reps, wait = _next_state(ef, interval, reps, max(0, min(5, rating)), params)
+            out[0].append(ef); out[1].append(interval); out[2].append(reps); out[3].append(today_n + wait)
+        return out
+    ef = np.asarray(easiness, dtype=np.float64)
+    interval = np.asarray(intervals, dtype=np.int64)
+    reps = np.asarray(repetitions, dtype=np.int64)
+    miss = 5 - np.clip(np.asarray(ratings, dtype=np.int64), 0, 5)
+    ef = np.maximum(params["min_easiness"], ef + (0.1 - miss * (0.08 + miss * 0.02)))
+    passed = miss <= 5 - PASSING_RATING
+    grown = np.where(reps == 0, params["first_interval"],  # np.rint rounds halves to even, like round()
+                     np.where(reps == 1, params["second_interval"], np.rint(interval * ef).astype(np.int64)))
+    interval = np.where(passed, grown, 0)
+    return ef, interval, np.where(passed, reps + 1, 0), today_n + np.where(passed, np.maximum(interval, 1), 0)
+
+
+def rescale_batch(intervals, due_days, factor):
+    """Scale learned cards' intervals by `factor` from the day they were last scheduled
+    (due_day - interval). Returns (intervals, due_days) like schedule_batch()."""
+    if np is None:
+        out = ([], [])
+        for interval, due in zip(intervals, due_days):
+            if interval > 0:
+                scaled = max(1, round(interval * factor))
+                interval, due = scaled, due - interval + scaled
+            out[0].append(interval); out[1].append(due)
+        return out
+    interval = np.asarray(intervals, dtype=np.int64)
+    due = np.asarray(due_days, dtype=np.int64)
+    scaled = np.maximum(1, np.rint(interval * factor).astype(np.int64))
+    learned = interval > 0
+    return np.where(learned, scaled, interval), np.where(learned, due - interval + scaled, due)
+
+
+def fuzz_window(interval) -> tuple:
+    """(shortest, longest) interval load balancing may give instead of `interval`."""
+    if interval < FUZZ_RANGES[0][0]:
+        return interval, interval
+    delta = 1.0 + sum(share * max(0.0, min(interval, end) - start) for start, end, share in FUZZ_RANGES)
+    return max(2, round(interval - delta)), round(interval + delta)
+
+
+def balance(interval, today, due_counts) -> int:
+    """The interval in fuzz_window(interval) whose due day has the fewest cards in
+    due_counts {epoch day: count}, nearest `interval` on a tie. O(window)."""
+    today_n = epoch_day(today)
+    low, high = fuzz_window(interval)
+    return min(range(low, high + 1), key=lambda i: (due_counts.get(today_n + i, 0), abs(i - interval), i))
+
+
+# ── Schedulers ────────────────────────────────────────────────────
+# schedule(card, rating, today, history) is pure and returns schedule()'s keys plus stability
+# and difficulty; needs_history(card) asks for the card's (epoch day, rating) history.
+
+class SM2Scheduler:
+    name = "sm2"
+
+    def __init__(self, params=SM2_PARAMS):
+        self.params = params
+
+    def needs_history(self, card) -> bool:
+        return False
+
+    def schedule(self, card: dict, rating: int, today, history=None) -> dict:
+        # SM-2 reviews leave the FSRS memory state stale, so clear it
+        return {**schedule(card, rating, today, self.params), "stability": None, "difficulty": None}
+
+
+class FSRSScheduler:
+    """Due when predicted recall falls to desired_retention. A card last reviewed under SM-2
+    gets its memory state replayed from its history; its easiness factor is left alone."""
+    name = "fsrs"
+
+    def __init__(self, weights=None, desired_retention=0.9, maximum_interval=fsrs.MAX_INTERVAL):
+        if weights is not None and len(weights) != len(fsrs.DEFAULT_WEIGHTS):
+            print(f"[StudyForge] Ignoring FSRS weights: expected {len(fsrs.DEFAULT_WEIGHTS)}, got {len(weights)}")
+            weights = None
+        self.weights = tuple(weights or fsrs.DEFAULT_WEIGHTS)
+        self.desired_retention = min(0.99, max(0.7, desired_retention))
+        self.maximum_interval = maximum_interval
+
+    def needs_history(self, card) -> bool:
+        return card.get("stability") is None and card.get("id") is not None
+
+    def schedule(self, card: dict, rating: int, today, history=None) -> dict:
+        rating, today_n = max(0, min(5, rating)), epoch_day(today)
+        if card.get("stability") is not None:
+            state = (card["stability"], card["difficulty"], _due_day(card) - card["interval"])  # last review's day
+        else:
+            state = fsrs.replay(self.weights, history or ())
+        g = fsrs.grade(rating)
+        if state is None:
+            stability, difficulty = fsrs.initial_state(self.weights, g)
+        else:
+            stability, difficulty = fsrs.next_state(self.weights, state[0], state[1], today_n - state[2], g)
+        if g == fsrs.AGAIN:
+            interval, reps = 0, 0  # lapsed: due again today, like SM-2
+        else:
+            interval = fsrs.next_interval(stability, self.desired_retention, self.maximum_interval)
+            reps = card.get("repetitions", 0) + 1
+        return {"easiness_factor": card.get("easiness_factor", 2.5), "interval": interval, "repetitions": reps,
+                "next_review": date.fromordinal(today_n + interval + EPOCH_ORDINAL).isoformat(),
+                "due_day": today_n + interval, "stability": stability, "difficulty": difficulty}
+
+
+SCHEDULERS = {cls.name: cls for cls in (SM2Scheduler, FSRSScheduler)}
+_scheduler = SM2Scheduler()
+
+
+def set_scheduler(name="sm2", weights=None, desired_retention=0.9):
+    """Make review_card() use SCHEDULERS[name]; weights / desired_retention are FSRS-only."""
+    global _scheduler
+    if name not in SCHEDULERS:
+        raise ValueError(f"Unknown scheduler: {name}. Must be one of: {tuple(SCHEDULERS)}")
+    _scheduler = FSRSScheduler(weights, desired_retention) if name == "fsrs" else SM2Scheduler()
+    return _scheduler
+
+
+def get_scheduler():
+    return _scheduler
+
+
+# ── Load balancing ────────────────────────────────────────────────
+
+class LoadBalancer:
+    """Per-day due counts, read with get_due_counts() on each day's first review and then
+    kept up to date as cards move, so balancing a review is O(window), not a scan.
+    Cards added or deleted in between are picked up the next day."""
+
+    def __init__(self):
+        self.counts, self.day = {}, None  # {epoch day: cards due} from `day` on
+
+    def place(self, card: dict, state: dict, today_n: int) -> dict:
+        """`state` (the scheduler's result for `card`) moved to the quietest day of its window,
+        interval included so due_day - interval stays the review day; the move is counted."""
+        if self.day != today_n:
+            self.counts, self.day = get_due_counts(today_n), today_n
+        old = _due_day(card)
+        if self.counts.get(old): self.counts[old] -= 1
+        interval = balance(state["interval"], today_n, self.counts) if state["interval"] > 0 else 0
+        due = today_n + interval if interval > 0 else state["due_day"]
+        self.counts[due] = self.counts.get(due, 0) + 1
+        if due == state["due_day"]:
+            return state
+        return {**state, "interval": interval, "due_day": due,
+                "next_review": date.fromordinal(due + EPOCH_ORDINAL).isoformat()}
+
+    def reset(self):
+        self.day = None  # re-read the counts on the next review
+
+
+_balancer = LoadBalancer()
+
+
+def set_load_balancing(enabled: bool = True):
+    """Turn review_card()'s load balancing on or off; returns the LoadBalancer or None."""
+    global _balancer
+    _balancer = LoadBalancer() if enabled else None
+    return _balancer
+
+
+# ── Persistence ───────────────────────────────────────────────────
+
+def review_card(card: dict, rating: int, now=None) -> dict:
+    """Schedule `card` with the active scheduler, load-balance its due date (if on) and save it
+    (or queue it in write-behind mode). The result includes due_day, so {**card, **result} is current."""
+    now = now or datetime.now()
     rating = max(0, min(5, rating))
-    ef = card["easiness_factor"]
-    interval = card["interval"]
-    reps = card["repetitions"]
-
-    ef = ef + (0.1 - (5 - rating) * (0.08 + (5 - rating) * 0.02))
-    ef = max(1.3, ef)
-
-    if rating < 3:
-        # Failed — reset and show again today
-        reps = 0
-        interval = 0
-        next_review = date.today().isoformat()
+    history = None
+    if _scheduler.needs_history(card):
+        history = [(r["review_day"], r["rating"]) for r in get_review_history(card["id"])]
+    state = _scheduler.schedule(card, rating, now.date(), history)
+    if _balancer is not None:
+        state = _balancer.place(card, state, epoch_day(now.date()))
+    updated = {"id": card["id"], **{k: state[k] for k in ("easiness_factor", "interval", "repetitions",
+                                                          "next_review", "due_day", "stability", "difficulty")}}
+    writer = review_writer.active()
+    if writer is not None:
+        # Write-behind mode: journal now, commit later on the writer thread
+        writer.submit({**updated, "rating": rating, "reviewed_at": now.isoformat()})
     else:
-        # Passed — advance interval
-        if reps == 0:
-            interval = 1
-        elif reps == 1:
-            interval = 6
-        else:
-            interval = round(interval * ef)
-        reps += 1
-        next_review = (date.today() + timedelta(days=max(interval, 1))).isoformat()
+        with transaction():
+            update_flashcard_srs(card["id"], updated["easiness_factor"], updated["interval"],
+                                 updated["repetitions"], updated["next_review"],
+                                 updated["stability"], updated["difficulty"])
+            log_review(card["id"], rating, reviewed_at=now.isoformat())
+    return updated
+
 
-    update_flashcard_srs(card["id"], ef, interval, reps, next_review)
-    log_review(card["id"], rating)
-    return {"id": card["id"], "easiness_factor": ef, "interval": interval,
-            "repetitions": reps, "next_review": next_review}
+def reschedule_all(interval_modifier: float) -> int:
+    """Scale every learned card's interval by `interval_modifier` and move its due date to
+    match: one read, one rescale_batch() pass, one transaction. Returns cards changed."""
+    states = get_srs_states()
+    intervals, due_days = rescale_batch([s["interval"] for s in states], [s["due_day"] for s in states],
+                                        interval_modifier)
+    rows = [(s["easiness_factor"], int(interval), s["repetitions"],
+             date.fromordinal(int(due) + EPOCH_ORDINAL).isoformat(), s["id"])
+            for s, interval, due in zip(states, intervals, due_days)
+            if interval != s["interval"] or due != s["due_day"]]
+    changed = update_flashcards_srs_bulk(rows)
+    if _balancer is not None: _balancer.reset()
+    return changed
 
 
 def get_rating_labels():
@@ -46,13 +274,14 @@ def get_rating_labels():
 
 
 def forecast_reviews(cards: list, days_ahead: int = 30) -> dict:
-    forecast = {}
-    today = date.today()
-    for i in range(days_ahead):
-        forecast[(today + timedelta(days=i)).isoformat()] = 0
+    """Per-day due counts of cards in memory; the collection's is database.get_review_forecast()."""
+    today = date.today(); today_n = today.toordinal() - EPOCH_ORDINAL
+    counts = [0] * days_ahead
     for card in cards:
-        nr = card.get("next_review", "")
-        if nr in forecast: forecast[nr] += 1
-        elif nr and nr < today.isoformat():
-            forecast[today.isoformat()] = forecast.get(today.isoformat(), 0) + 1
-    return forecast
+        day = card.get("due_day")  # present on rows read from the database
+        if day is None:
+            try: day = date.fromisoformat(card.get("next_review", "")[:10]).toordinal() - EPOCH_ORDINAL
+            except ValueError: continue
+        offset = max(day - today_n, 0)  # overdue counts as today
+        if offset < days_ahead: counts[offset] += 1
+    return {(today + timedelta(days=i)).isoformat(): counts[i] for i in range(days_ahead)}
@@ -1,6 +1,9 @@
 """app.py — Main application window for StudyForge."""
 
 import customtkinter as ctk
+import review_writer
+import maintenance
+import instrumentation
 from ui.styles import COLORS, FONTS, PAD, BUTTON_VARIANTS
 from ui.dashboard import DashboardTab
 from ui.pomodoro import PomodoroTab
@@ -193,6 +196,15 @@ class StudyForgeApp(ctk.CTk):
             self.bind(f"<Alt-Key-{index}>", lambda _e, l=label: self.select_tab(l))
         self.bind("<Control-Tab>", lambda _e: self._cycle_tab(1))
         self.bind("<Control-Shift-Tab>", lambda _e: self._cycle_tab(-1))
+        # Any input postpones idle-time database maintenance
+        for event in ("<KeyPress>", "<ButtonPress>", "<Motion>", "<MouseWheel>"):
+            self.bind_all(event, lambda _e: maintenance.touch(), add="+")
+        # Write the database profile (only with instrumentation on)
+        self.bind("<Control-Shift-D>", lambda _e: self._dump_db_profile())
+
+    def _dump_db_profile(self):
+        if instrumentation.active() is not None:
+            print(f"[StudyForge] Database profile written to {instrumentation.active().dump()}")
 
     def _cycle_tab(self, direction: int):
         """Move to next/previous sidebar tab."""
@@ -203,6 +215,7 @@ class StudyForgeApp(ctk.CTk):
         self.select_tab(self.nav_order[next_index])
 
     def select_tab(self, tab_name: str):
+        review_writer.flush()  # next tab must see write-behind reviews
         if self.current_tab and self.current_tab in self.tabs:
             self.tabs[self.current_tab].grid_forget()
 
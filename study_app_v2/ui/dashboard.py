@@ -37,10 +37,8 @@ class DashboardTab(ctk.CTkFrame):
         self.refresh()
 
     def refresh(self):
-        stats = db.get_today_stats()
-        streak = db.get_streak()
-        due = len(db.get_due_cards())
-        total = db.get_total_cards()
+        snap = db.get_dashboard_snapshot(30)
+        stats, streak, due, total = snap["today"], snap["streak"], snap["due"], snap["total_cards"]
 
         for w in self.stats_frame.winfo_children(): w.destroy()
         self.stats_frame.grid_columnconfigure((0,1,2,3,4), weight=1)
@@ -77,7 +75,7 @@ class DashboardTab(ctk.CTkFrame):
                 hover_color=BUTTON_VARIANTS["primary"]["hover_color"], font=FONTS["body_bold"], height=42,
                 anchor="w", corner_radius=8).pack(fill="x", padx=PAD["section"], pady=3)
 
-        info = f"\n📦 Total cards: {total}"
+        info = f"\n📦 Total cards: {total}\n🏆 Longest streak: {snap['longest_streak']} days"
         info += f"\n⚠️ {due} card{'s' if due!=1 else ''} due!" if due else "\n✨ All caught up!"
         ctk.CTkLabel(self.actions_frame, text=info, font=FONTS["small"],
             text_color=COLORS["text_secondary"], justify="left", wraplength=300
@@ -88,11 +86,10 @@ class DashboardTab(ctk.CTkFrame):
         ctk.CTkLabel(self.forecast_frame, text="📅 Upcoming Reviews (7 days)", font=FONTS["subheading"],
             text_color=COLORS["text_primary"]).pack(padx=PAD["section"], pady=(PAD["section"], 10), anchor="w")
 
-        from srs_engine import forecast_reviews
-        all_cards = db.get_all_flashcards()
-        forecast = forecast_reviews(all_cards, 7)
+        forecast = snap["forecast"]
         today = date.today()
-        max_c = max(forecast.values()) if forecast.values() and max(forecast.values()) > 0 else 1
+        counts = [forecast.get((today + timedelta(days=i)).isoformat(), 0) for i in range(30)]
+        max_c = max(counts[:7]) or 1
 
         for i in range(7):
             d = today + timedelta(days=i)
@@ -115,9 +112,25 @@ class DashboardTab(ctk.CTkFrame):
                 text_color=COLORS["warning"] if count > 10 else COLORS["text_primary"],
                 width=40, anchor="e").pack(side="right")
 
-        week = db.get_stats_range(7)
-        tr = sum(s.get("cards_reviewed", 0) for s in week)
-        ts = sum(s.get("study_minutes", 0) for s in week)
+        # Next 30 days from tomorrow (today holds the backlog): one thin bar per day
+        ahead = counts[1:]
+        ctk.CTkLabel(self.forecast_frame, text="Next 30 days", font=FONTS["small"],
+            text_color=COLORS["text_muted"]).pack(padx=PAD["section"], pady=(12, 2), anchor="w")
+        strip = ctk.CTkFrame(self.forecast_frame, fg_color=COLORS["bg_secondary"], height=48, corner_radius=4)
+        strip.pack(fill="x", padx=PAD["section"]); strip.pack_propagate(False)
+        peak = max(ahead) or 1
+        for i, count in enumerate(ahead):
+            if count:
+                h = max(0.04, count / peak)
+                ctk.CTkFrame(strip, fg_color=COLORS["accent"], corner_radius=2).place(
+                    relx=i / len(ahead), rely=1 - h, relwidth=0.8 / len(ahead), relheight=h)
+        load = f"Busiest day {max(ahead)} cards · average {sum(ahead) / len(ahead):.0f} a day"
+        if self.app.config.get("load_balancing", True):
+            load += "\nLoad balancing moves due dates to quieter days nearby"
+        ctk.CTkLabel(self.forecast_frame, text=load, font=FONTS["small"], text_color=COLORS["text_secondary"],
+            wraplength=300, justify="left").pack(padx=PAD["section"], pady=(4, 0), anchor="w")
+
+        tr, ts = snap["week"]["cards_reviewed"], snap["week"]["study_minutes"]
         ctk.CTkLabel(self.forecast_frame, text=f"\n📈 This week: {tr} reviewed, {ts} min studied",
             font=FONTS["small"], text_color=COLORS["text_secondary"], wraplength=300, justify="left"
         ).pack(padx=PAD["section"], pady=(10, PAD["section"]), anchor="w")
@@ -6,6 +6,8 @@ import os
 from tkinter import filedialog
 from ui.styles import COLORS, FONTS, PAD, BUTTON_VARIANTS
 import database as db
+import dedupe
+from ui.notes import ask_duplicate_action
 import config_manager as cfg
 
 DEFAULT_HEIGHT_RATIO = 0.35
@@ -153,7 +155,16 @@ class EssaysTab(ctk.CTkFrame):
         fn = os.path.basename(fp)
         content = extract_rubric_text(fp)
         name = os.path.splitext(fn)[0]
-        db.add_rubric(name, content, source_file=fn)
+        dupes = db.find_duplicates("rubrics", content)
+        action = ask_duplicate_action(self, name, dupes[0]) if dupes else "keep"
+        if action == "skip":
+            self.status.configure(text=f"Rubric '{name}' already uploaded — skipped", text_color=COLORS["text_secondary"])
+            return
+        if action == "keep": db.add_rubric(name, content, source_file=fn)
+        elif action == "replace": db.update_rubric(dupes[0]["id"], content=content, source_file=fn)
+        else:
+            old = db.get_rubric(dupes[0]["id"])
+            db.update_rubric(old["id"], content=dedupe.merge_text(old["content"], content))
         self._refresh_rubrics()
         self.status.configure(text=f"✅ Rubric '{name}' uploaded!", text_color=COLORS["success"])
 
@@ -231,7 +242,7 @@ class EssaysTab(ctk.CTkFrame):
             grade_txt = f"  ·  Grade: {e['grade']}" if e.get("grade") else ""
             ctk.CTkLabel(item, text=f"📜 {title}{grade_txt}", font=FONTS["body_bold"],
                 text_color=COLORS["text_primary"], anchor="w").pack(padx=12, pady=(8, 0), anchor="w")
-            has_content = "Written" if e.get("content") else "Not started"
+            has_content = "Written" if e.get("has_content") else "Not started"
             meta = f"{e['created_at'][:10]}  ·  {has_content}"
             ctk.CTkLabel(item, text=meta, font=FONTS["small"],
                 text_color=COLORS["text_muted"], anchor="w").pack(padx=12, pady=(0, 6), anchor="w")
@@ -4,8 +4,11 @@ import customtkinter as ctk
 import threading
 from ui.styles import COLORS, FONTS, PAD, BUTTON_VARIANTS
 import database as db
+import review_writer
 from srs_engine import review_card, get_rating_labels
 
+ALL_TAGS = "🏷️ All tags"
+
 
 class FlashcardsTab(ctk.CTkFrame):
     def __init__(self, parent, app_ref):
@@ -24,6 +27,11 @@ class FlashcardsTab(ctk.CTkFrame):
 
         br = ctk.CTkFrame(header, fg_color="transparent")
         br.pack(side="right")
+        self.tag_var = ctk.StringVar(value=ALL_TAGS)  # scopes review to a tag (card's or its note's)
+        self.tag_menu = ctk.CTkOptionMenu(br, variable=self.tag_var, values=[ALL_TAGS], width=140, height=34,
+            fg_color=COLORS["bg_input"], button_color=COLORS["accent"], font=FONTS["body"],
+            corner_radius=8, command=lambda _: self.start_review())
+        self.tag_menu.pack(side="left", padx=4)
         self.review_btn = ctk.CTkButton(br, text="📖 Review Due", width=120, height=34,
             font=FONTS["body"], **BUTTON_VARIANTS["primary"],
             corner_radius=8, command=self.start_review)
@@ -47,10 +55,14 @@ class FlashcardsTab(ctk.CTkFrame):
 
     def start_review(self):
         self._clear()
-        self.current_cards = db.get_due_cards()
+        names = [t["name"] for t in db.get_tag_counts()]
+        self.tag_menu.configure(values=[ALL_TAGS] + names)
+        if self.tag_var.get() not in names: self.tag_var.set(ALL_TAGS)
+        tag = None if self.tag_var.get() == ALL_TAGS else self.tag_var.get()
+        self.current_cards = db.get_due_cards(tags=[tag] if tag else None)
         self.card_index = 0; self.showing_answer = False
         n = len(self.current_cards)
-        self.status.configure(text=f"📋 {n} card{'s' if n!=1 else ''} due")
+        self.status.configure(text=f"📋 {n} card{'s' if n!=1 else ''} due" + (f"  ·  🏷️ {tag}" if tag else ""))
         if n == 0: self._empty()
         else: self._show_card()
 
@@ -119,11 +131,9 @@ class FlashcardsTab(ctk.CTkFrame):
 
     def _rate(self, rating):
         card = self.current_cards[self.card_index]
-        review_card(card, rating)
-        if rating < 3:
-            refreshed = db.get_due_cards()
-            failed = [c for c in refreshed if c["id"] == card["id"]]
-            if failed: self.current_cards.append(failed[0])
+        updated = review_card(card, rating)
+        # Failed cards are due again today; requeue with their new SRS state
+        if rating < 3: self.current_cards.append({**card, **updated})
         self.card_index += 1; self.showing_answer = False; self._show_card()
 
     def _done(self):
@@ -133,6 +143,7 @@ class FlashcardsTab(ctk.CTkFrame):
         ctk.CTkLabel(f, text="🎉", font=("Segoe UI", 48)).pack(pady=(30,5))
         ctk.CTkLabel(f, text="Session complete!", font=FONTS["subheading"],
             text_color=COLORS["success"]).pack()
+        review_writer.flush()
         s = db.get_today_stats()
         ctk.CTkLabel(f, text=f"Reviewed today: {s['cards_reviewed']}", font=FONTS["body"],
             text_color=COLORS["text_secondary"]).pack(pady=(5,20))
@@ -198,7 +209,7 @@ class FlashcardsTab(ctk.CTkFrame):
         ctk.CTkLabel(f, text="🤖 AI-Generate Flashcards", font=FONTS["subheading"],
             text_color=COLORS["text_primary"]).pack(padx=PAD["section"], pady=(PAD["section"],10), anchor="w")
 
-        notes = db.get_all_notes()
+        notes = db.get_note_titles()
         if not notes:
             ctk.CTkLabel(f, text="⚠️ No notes. Import notes first in the Notes tab.",
                 font=FONTS["body"], text_color=COLORS["warning"]).pack(padx=PAD["section"], pady=20)
@@ -247,6 +258,7 @@ class FlashcardsTab(ctk.CTkFrame):
                 text_color=COLORS["danger"]); return
 
         note = self._notes_map.get(self.note_var.get())
+        note = db.get_note(note["id"]) if note else None
         if not note: return
         count = int(self.cnt_var.get())
         self.gen_btn.configure(state="disabled", text="⏳ Generating...")
@@ -287,5 +299,5 @@ class FlashcardsTab(ctk.CTkFrame):
             ).pack(padx=10, pady=(0,8), anchor="w")
 
     def _save_all(self, cards, note_id):
-        for c in cards: db.add_flashcard(c["front"], c["back"], note_id=note_id)
+        db.add_flashcards_bulk(cards, note_id=note_id)
         self.gen_st.configure(text=f"✅ Saved {len(cards)} cards!", text_color=COLORS["success"])
@@ -105,7 +105,7 @@ class HypotheticalsTab(ctk.CTkFrame):
         of = ctk.CTkFrame(gen_card, fg_color="transparent")
         of.pack(fill="x", padx=PAD["section"], pady=(0, 5))
 
-        self.notes = db.get_all_notes()
+        self.notes = db.get_note_titles()
         nt = [f"{n['id']}: {n['title'][:50]}" for n in self.notes] if self.notes else ["No notes"]
         self.nv = ctk.StringVar(value=nt[0] if nt else "")
         ctk.CTkLabel(of, text="Note:", font=FONTS["body"],
@@ -439,4 +439,4 @@ class HypotheticalsTab(ctk.CTkFrame):
         self._show_history()
 
     def refresh_notes(self):
-        self.notes = db.get_all_notes()
+        self.notes = db.get_note_titles()
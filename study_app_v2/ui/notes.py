@@ -9,6 +9,9 @@ import threading, os, re
 from tkinter import filedialog
 from ui.styles import COLORS, FONTS, PAD, BUTTON_VARIANTS
 import database as db
+import dedupe
+
+PAGE_SIZE = 50  # sidebar rows per "Load more"
 
 
 def extract_text(filepath: str) -> str:
@@ -30,11 +33,34 @@ def extract_text(filepath: str) -> str:
     return f"[Unsupported: {ext}]"
 
 
+def ask_duplicate_action(parent, name, match):
+    """Modal prompt for an import matching a stored note/rubric (a find_duplicates() row).
+    Returns "skip", "merge", "replace" or "keep" (add a new copy)."""
+    choice = {"action": "skip"}
+    d = ctk.CTkToplevel(parent); d.title("Duplicate Import"); d.geometry("460x170")
+    d.configure(fg_color=COLORS["bg_primary"]); d.attributes("-topmost", True); d.grab_set()
+    how = "is identical to" if match["exact"] else f"is {match['similarity']:.0%} similar to"
+    ctk.CTkLabel(d, text=f"⚠️ '{name}' {how}\n'{match['title']}', which you already have.",
+        font=FONTS["body"], text_color=COLORS["text_primary"], justify="center",
+        wraplength=420).pack(pady=(20,15))
+    row = ctk.CTkFrame(d, fg_color="transparent"); row.pack()
+    def choose(action): choice["action"] = action; d.destroy()
+    buttons = [("Skip","skip","secondary"), ("Replace","replace","destructive"), ("Keep Both","keep","secondary")]
+    if not match["exact"]: buttons.insert(1, ("Merge","merge","primary"))
+    for label, action, variant in buttons:
+        ctk.CTkButton(row, text=label, width=90, height=34, font=FONTS["body"],
+            fg_color=BUTTON_VARIANTS[variant]["fg_color"], corner_radius=8,
+            command=lambda a=action: choose(a)).pack(side="left", padx=5)
+    d.wait_window()
+    return choice["action"]
+
+
 class NotesTab(ctk.CTkFrame):
     def __init__(self, parent, app_ref):
         super().__init__(parent, fg_color="transparent")
         self.app = app_ref
         self.sel_id = None
+        self._shown, self._last_key = 0, None  # keyset paging state for the sidebar
         self.preview_visible = False
         self.nav_visible = False
         self.build_ui()
@@ -103,11 +129,37 @@ class NotesTab(ctk.CTkFrame):
     def refresh(self):
         for w in self.list_f.winfo_children(): w.destroy()
         q = self.search_var.get().strip()
-        notes = db.search_notes(q) if q else db.get_all_notes()
+        # Reload as many rows as were already shown so selecting doesn't collapse the list
+        notes = (db.search_notes(q, columns=db.NOTE_LIST_COLUMNS) if q
+                 else db.list_notes(limit=max(self._shown, PAGE_SIZE)))
         if not notes:
+            self._shown = 0
             ctk.CTkLabel(self.list_f, text="No notes yet.", font=FONTS["body"],
                 text_color=COLORS["text_muted"]).pack(pady=40)
             return
+        self._add_items(notes)
+        if not q:
+            self._shown = 0
+            self._page_loaded(notes)
+
+    def _page_loaded(self, notes):
+        self._shown += len(notes)
+        if notes: self._last_key = (notes[-1]["updated_at"], notes[-1]["id"])
+        remaining = db.count_notes() - self._shown
+        if remaining > 0:
+            btn = ctk.CTkButton(self.list_f, text=f"Load more ({remaining} remaining)", height=30,
+                font=FONTS["small"], fg_color=COLORS["bg_secondary"], hover_color=COLORS["accent_hover"],
+                corner_radius=8)
+            btn.configure(command=lambda: self._load_more(btn))
+            btn.pack(fill="x", padx=6, pady=(6,3))
+
+    def _load_more(self, btn):
+        btn.destroy()
+        notes = db.list_notes(limit=PAGE_SIZE, after=self._last_key)
+        self._add_items(notes)
+        self._page_loaded(notes)
+
+    def _add_items(self, notes):
         for n in notes:
             sel = n["id"] == self.sel_id
             bg = COLORS["accent"] if sel else COLORS["bg_secondary"]
@@ -119,6 +171,10 @@ class NotesTab(ctk.CTkFrame):
             meta = f"{n.get('tags','') or 'No tags'}  ·  {n['created_at'][:10]}"
             ctk.CTkLabel(item, text=meta, font=FONTS["small"],
                 text_color=COLORS["text_muted"], anchor="w").pack(padx=10, pady=(0,6), anchor="w")
+            if n.get("snippet"):
+                ctk.CTkLabel(item, text=" ".join(n["snippet"].split()), font=FONTS["small"],
+                    text_color=COLORS["text_secondary"], anchor="w", justify="left",
+                    wraplength=220).pack(padx=10, pady=(0,6), anchor="w")
             for w in [item] + item.winfo_children():
                 w.bind("<Button-1>", lambda e, nid=n["id"]: self.view_note(nid))
 
@@ -754,8 +810,14 @@ class NotesTab(ctk.CTkFrame):
             filetypes=[("All Supported","*.txt *.md *.pdf *.docx"),("Text","*.txt"),
                        ("Markdown","*.md"),("PDF","*.pdf"),("Word","*.docx")])
         for fp in fps:
-            fn = os.path.basename(fp)
-            db.add_note(os.path.splitext(fn)[0], extract_text(fp), source_file=fn)
+            fn = os.path.basename(fp); title, text = os.path.splitext(fn)[0], extract_text(fp)
+            dupes = db.find_duplicates("notes", text)
+            action = ask_duplicate_action(self, title, dupes[0]) if dupes else "keep"
+            if action == "keep": db.add_note(title, text, source_file=fn)
+            elif action == "replace": db.update_note(dupes[0]["id"], title=title, content=text, source_file=fn)
+            elif action == "merge":
+                old = db.get_note(dupes[0]["id"])
+                db.update_note(old["id"], content=dedupe.merge_text(old["content"], text))
         if fps: self.refresh()
 
     def paste_dlg(self):
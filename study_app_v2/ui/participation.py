@@ -47,7 +47,7 @@ class ParticipationTab(ctk.CTkFrame):
         of = ctk.CTkFrame(gen_card, fg_color="transparent")
         of.pack(fill="x", padx=PAD["section"], pady=(0, 5))
 
-        self.notes = db.get_all_notes()
+        self.notes = db.get_note_titles()
         nt = [f"{n['id']}: {n['title'][:50]}" for n in self.notes] if self.notes else ["No notes"]
         self.nv = ctk.StringVar(value=nt[0] if nt else "")
         ctk.CTkLabel(of, text="Note:", font=FONTS["body"],
@@ -142,16 +142,15 @@ class ParticipationTab(ctk.CTkFrame):
                 result = self.app.claude_client.generate_participation_questions(
                     note["content"], self.topic_var.get(),
                     model_override=self._get_model_override())
-                count = 0
+                questions = []
                 for category in ["interesting", "unanswered", "key_questions"]:
                     for q in result.get(category, []):
                         question_text = q.get("question", "") if isinstance(q, dict) else str(q)
                         why = q.get("why_it_matters", "") if isinstance(q, dict) else ""
                         if question_text:
-                            db.add_participation_question(
-                                question_text, category=category,
-                                note_id=nid, notes=why)
-                            count += 1
+                            questions.append(
+                                {"question": question_text, "category": category, "notes": why})
+                count = db.add_participation_questions_bulk(questions, note_id=nid)
                 self.after(0, lambda: self._on_generated(count))
             except Exception as e:
                 self.after(0, lambda: self.status.configure(
@@ -300,4 +299,4 @@ class ParticipationTab(ctk.CTkFrame):
         self._show_questions()
 
     def refresh_notes(self):
-        self.notes = db.get_all_notes()
+        self.notes = db.get_note_titles()
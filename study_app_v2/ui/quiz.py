@@ -5,6 +5,8 @@ import threading
 from ui.styles import COLORS, FONTS, PAD, BUTTON_VARIANTS
 import database as db
 
+ALL_TAGS = "🏷️ All tags"
+
 
 class QuizTab(ctk.CTkFrame):
     def __init__(self, parent, app_ref):
@@ -27,12 +29,18 @@ class QuizTab(ctk.CTkFrame):
         of = ctk.CTkFrame(self.setup, fg_color="transparent")
         of.pack(fill="x", padx=PAD["section"], pady=(0,5))
 
-        self.notes = db.get_all_notes()
+        self.notes = db.get_note_titles()
         nt = [f"{n['id']}: {n['title'][:50]}" for n in self.notes] if self.notes else ["No notes"]
         self.nv = ctk.StringVar(value=nt[0] if nt else "")
+        note_tags = [t["name"] for t in db.get_tag_counts() if t["notes"]]
+        if note_tags:  # narrows the note list to one tag
+            ctk.CTkOptionMenu(of, values=[ALL_TAGS] + note_tags, variable=ctk.StringVar(value=ALL_TAGS),
+                fg_color=COLORS["bg_input"], button_color=COLORS["accent"], font=FONTS["body"],
+                corner_radius=8, width=130, command=self._filter_notes).pack(side="left", padx=(0,8))
         ctk.CTkLabel(of, text="Note:", font=FONTS["body"], text_color=COLORS["text_secondary"]).pack(side="left")
-        ctk.CTkOptionMenu(of, values=nt, variable=self.nv, fg_color=COLORS["bg_input"],
-            button_color=COLORS["accent"], font=FONTS["body"], corner_radius=8, width=300).pack(side="left", padx=8)
+        self.note_menu = ctk.CTkOptionMenu(of, values=nt, variable=self.nv, fg_color=COLORS["bg_input"],
+            button_color=COLORS["accent"], font=FONTS["body"], corner_radius=8, width=300)
+        self.note_menu.pack(side="left", padx=8)
 
         ctk.CTkLabel(of, text="Difficulty:", font=FONTS["body"],
             text_color=COLORS["text_secondary"]).pack(side="left", padx=(12,0))
@@ -61,6 +69,12 @@ class QuizTab(ctk.CTkFrame):
         self.qf = ctk.CTkFrame(self, fg_color="transparent")
         self.qf.pack(fill="both", expand=True, padx=PAD["page"], pady=(0, PAD["page"]))
 
+    def _filter_notes(self, tag):
+        self.notes = (db.get_note_titles() if tag == ALL_TAGS
+                      else db.get_notes_by_tags(any_of=[tag], columns=("title",)))
+        nt = [f"{n['id']}: {n['title'][:50]}" for n in self.notes] or ["No notes"]
+        self.note_menu.configure(values=nt); self.nv.set(nt[0])
+
     def gen_quiz(self):
         if not self.app.claude_client:
             self.st.configure(text="⚠️ AI not connected. Go to Settings.", text_color=COLORS["danger"]); return
@@ -174,4 +188,4 @@ class QuizTab(ctk.CTkFrame):
             command=lambda: self.app.select_tab("Dashboard")).pack(side="left", padx=6)
 
     def refresh_notes(self):
-        self.notes = db.get_all_notes()
+        self.notes = db.get_note_titles()
@@ -1,12 +1,14 @@
 """
 settings.py — In-app settings panel for StudyForge.
-Handles API key entry, connection testing, Pomodoro config, and preferences.
+Handles API key entry, connection testing, Pomodoro config, preferences, and the review scheduler.
 """
 
 import customtkinter as ctk
 import threading
 from ui.styles import COLORS, FONTS, PAD, BUTTON_VARIANTS
 import config_manager as cfg
+import fsrs
+import srs_engine
 from claude_client import (
     ClaudeStudyClient,
     detect_provider_from_key,
@@ -217,6 +219,45 @@ class SettingsTab(ctk.CTkFrame):
             font=FONTS["body"], corner_radius=6
         ).pack(side="left", padx=8)
 
+        # ── Review Scheduler ──────────────────────────────────────
+        srs_card = ctk.CTkFrame(scroll, fg_color=COLORS["bg_card"], corner_radius=12)
+        srs_card.pack(fill="x", pady=(0, 12))
+        ctk.CTkLabel(srs_card, text="🧠 Review Scheduler", font=FONTS["subheading"],
+                      text_color=COLORS["text_primary"]).pack(padx=PAD["section"], pady=(PAD["section"], 8), anchor="w")
+
+        srs_row = ctk.CTkFrame(srs_card, fg_color="transparent")
+        srs_row.pack(fill="x", padx=PAD["section"], pady=(0, 4))
+        self._scheduler_names = {"SM-2": "sm2", "FSRS": "fsrs"}
+        self.scheduler_var = ctk.StringVar(value="FSRS" if config.get("scheduler") == "fsrs" else "SM-2")
+        ctk.CTkOptionMenu(srs_row, variable=self.scheduler_var, values=list(self._scheduler_names),
+                          fg_color=COLORS["bg_input"], button_color=COLORS["accent"], font=FONTS["body"],
+                          corner_radius=8, width=110).pack(side="left")
+        ctk.CTkLabel(srs_row, text="Desired retention (FSRS):", font=FONTS["body"],
+                      text_color=COLORS["text_secondary"]).pack(side="left", padx=(12, 4))
+        self.retention_var = ctk.DoubleVar(value=config.get("desired_retention", 0.9))
+        ctk.CTkEntry(srs_row, textvariable=self.retention_var, width=60, fg_color=COLORS["bg_input"],
+                     text_color=COLORS["text_primary"], font=FONTS["body"], corner_radius=6).pack(side="left")
+        self.load_balancing_var = ctk.BooleanVar(value=config.get("load_balancing", True))
+        ctk.CTkCheckBox(srs_card, text="Spread due dates over quieter days (load balancing)",
+                        variable=self.load_balancing_var, font=FONTS["body"]).pack(padx=PAD["section"], pady=4, anchor="w")
+
+        srs_btns = ctk.CTkFrame(srs_card, fg_color="transparent")
+        srs_btns.pack(fill="x", padx=PAD["section"], pady=(4, 4))
+        self._fsrs_weights, self._optimizer = config.get("fsrs_weights"), None
+        self.optimize_btn = ctk.CTkButton(srs_btns, text="🧮 Fit FSRS to My Reviews", width=200, height=36,
+                                          font=FONTS["body_bold"], corner_radius=8, **BUTTON_VARIANTS["primary"],
+                                          command=self._optimize_fsrs)
+        self.optimize_btn.pack(side="left", padx=(0, 8))
+        ctk.CTkButton(srs_btns, text="💾 Save", height=36, font=FONTS["body_bold"], fg_color=COLORS["success"],
+                      corner_radius=8, command=self._save_scheduler_settings).pack(side="left")
+        self.srs_status = ctk.CTkLabel(
+            srs_card, text="Using fitted FSRS weights" if self._fsrs_weights else "Using default FSRS weights",
+            font=FONTS["small"], text_color=COLORS["text_muted"], justify="left")
+        self.srs_status.pack(padx=PAD["section"], pady=(2, PAD["section"]), anchor="w")
+        if fsrs.np is None:  # fit() needs NumPy; scheduling with FSRS doesn't
+            self.optimize_btn.configure(state="disabled")
+            self.srs_status.configure(text=self.srs_status.cget("text") + "\nFitting needs NumPy (pip install numpy)")
+
         # ── About ─────────────────────────────────────────────────
         about_card = ctk.CTkFrame(scroll, fg_color=COLORS["bg_card"], corner_radius=12)
         about_card.pack(fill="x", pady=(0, 12))
@@ -224,7 +265,7 @@ class SettingsTab(ctk.CTkFrame):
         ctk.CTkLabel(about_card, text="🎓 StudyForge", font=FONTS["subheading"],
                       text_color=COLORS["text_primary"]).pack(padx=PAD["section"], pady=(PAD["section"], 4), anchor="w")
         ctk.CTkLabel(about_card,
-            text="Pomodoro · Spaced Repetition (SM-2) · Active Recall · AI-Powered Study\n"
+            text="Pomodoro · Spaced Repetition (SM-2 / FSRS) · Active Recall · AI-Powered Study\n"
                  "All data stored locally in data/studyforge.db",
             font=FONTS["small"], text_color=COLORS["text_muted"], justify="left"
         ).pack(padx=PAD["section"], pady=(0, PAD["section"]), anchor="w")
@@ -327,3 +368,43 @@ class SettingsTab(ctk.CTkFrame):
         # Reload config into app
         self.app.config = cfg.load_config()
         self.api_status.configure(text="✅ Pomodoro settings saved (takes effect on next session)", text_color=COLORS["success"])
+
+    def _optimize_fsrs(self):
+        if self._optimizer is not None and self._optimizer.running():
+            self._optimizer.cancel(); return
+        self.optimize_btn.configure(text="⏹ Stop Fitting")
+        self.srs_status.configure(text="Fitting FSRS to your review history...", text_color=COLORS["text_secondary"])
+        self._optimizer = fsrs.Optimizer(
+            lambda result: self.after(0, lambda: self._show_fit_result(result)),
+            weights=self._fsrs_weights or fsrs.DEFAULT_WEIGHTS,
+            on_progress=lambda epoch, loss: self.after(0, lambda: self.srs_status.configure(
+                text=f"Fitting... pass {epoch}, log-loss {loss:.4f}")))
+
+    def _show_fit_result(self, r):
+        self.optimize_btn.configure(text="🧮 Fit FSRS to My Reviews")
+        if "error" in r:
+            self.srs_status.configure(text=f"🔴 {r['error']}", text_color=COLORS["danger"])
+        elif not r["reviews"]:
+            self.srs_status.configure(text="⚠️ No repeat reviews to fit yet", text_color=COLORS["warning"])
+        else:
+            self._fsrs_weights = r["weights"]
+            self.srs_status.configure(
+                text=f"✅ {r['reviews']:,} reviews, {r['seconds']:.1f} s  ·  log-loss {r['log_loss_before']:.4f} → "
+                     f"{r['log_loss']:.4f}  ·  RMSE {r['rmse_before']:.1%} → {r['rmse']:.1%}  (save to use)",
+                text_color=COLORS["success"])
+
+    def _save_scheduler_settings(self):
+        scheduler = self._scheduler_names[self.scheduler_var.get()]
+        try:
+            retention = min(0.99, max(0.7, float(self.retention_var.get())))
+        except Exception:
+            retention = 0.9
+        cfg.update_setting("scheduler", scheduler)
+        cfg.update_setting("desired_retention", retention)
+        cfg.update_setting("fsrs_weights", self._fsrs_weights)
+        cfg.update_setting("load_balancing", self.load_balancing_var.get())
+        self.app.config = cfg.load_config()
+        srs_engine.set_scheduler(scheduler, weights=self._fsrs_weights, desired_retention=retention)
+        srs_engine.set_load_balancing(self.load_balancing_var.get())
+        self.srs_status.configure(text=f"✅ Reviews now scheduled with {self.scheduler_var.get()}",
+                                  text_color=COLORS["success"])